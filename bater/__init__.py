@@ -0,0 +1,10 @@
+"""BATER: Terminal Command Controller.
+
+The core modules (storage, manager, executor) do not depend on wxPython; only
+bater.gui does, so stored commands can be used headless through bater.cli.
+"""
+
+from .executor import CommandExecutor, ExecutionService
+from .manager import CommandManager
+
+__all__ = ['CommandExecutor', 'CommandManager', 'ExecutionService']
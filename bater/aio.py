@@ -0,0 +1,184 @@
+"""Asyncio execution engine: commands run as coroutines on one shared event loop thread."""
+
+import asyncio
+import codecs
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .executor import (OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, CommandExecutor, OutputBuffer, command_result,
+                       failed_start_result, merge_output_chunks, process_group_options)
+
+# Seconds a terminated command gets to exit before its process group is killed.
+TERMINATE_GRACE_PERIOD = 2.0
+
+class EventLoopThread(threading.Thread):
+    """Daemon thread running the asyncio event loop shared by every AsyncCommandExecutor."""
+
+    def __init__(self):
+        """Create the event loop, awaiting child processes through pidfds where available."""
+        super().__init__(name="bater-event-loop", daemon=True)
+        self.loop = asyncio.new_event_loop()
+        if sys.version_info < (3, 12) and hasattr(os, 'pidfd_open'):
+            # Before Python 3.12 the default child watcher waits for each process on a thread of its own.
+            watcher = asyncio.PidfdChildWatcher()
+            watcher.attach_loop(self.loop)
+            asyncio.get_event_loop_policy().set_child_watcher(watcher)
+
+    def run(self):
+        """Run the event loop until the process exits."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        """Schedule a coroutine on the loop from any thread and return its concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+# The event loop thread, started by the first asynchronous execution.
+event_loop_thread = None
+event_loop_lock = threading.Lock()
+
+def get_event_loop_thread():
+    """Return the shared event loop thread, starting it on first use."""
+    global event_loop_thread
+    with event_loop_lock:
+        if event_loop_thread is None:
+            event_loop_thread = EventLoopThread()
+            event_loop_thread.start()
+        return event_loop_thread
+
+async def terminate_process_group(process, grace_period=TERMINATE_GRACE_PERIOD):
+    """Terminate an asyncio subprocess started with process_group_options() and everything it spawned."""
+    if process.returncode is not None:
+        return
+    try:
+        if os.name == 'nt':
+            killer = await asyncio.create_subprocess_exec('taskkill', '/F', '/T', '/PID', str(process.pid),
+                                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            await killer.wait()
+            return
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), grace_period)
+        except asyncio.TimeoutError:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError) as e:
+        logging.error(f"Error terminating process {process.pid}: {e}")
+
+async def stream_command_async(command, on_output=None, head_size=OUTPUT_HEAD_BYTES, tail_size=OUTPUT_TAIL_BYTES,
+                               output_interval=0.1, on_start=None, timeout=None):
+    """Coroutine counterpart of CommandExecutor.stream_command(), returning the same result.
+
+    Both streams are read by the event loop instead of reader threads. The resource 'usage'
+    is always None, since the loop reaps the process without reporting it.
+    """
+    try:
+        process = await asyncio.create_subprocess_shell(command, stdout=asyncio.subprocess.PIPE,
+                                                        stderr=asyncio.subprocess.PIPE, **process_group_options())
+    except (subprocess.SubprocessError, OSError) as e:
+        return failed_start_result(e)
+    if on_start:
+        on_start(process)
+
+    buffers = {'stdout': OutputBuffer(head_size, tail_size), 'stderr': OutputBuffer(head_size, tail_size)}
+    pending = []
+
+    async def read_stream(stream, pipe):
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        while True:
+            chunk = await pipe.read(65536)
+            if not chunk:
+                break
+            buffers[stream].write(chunk)
+            if on_output:
+                pending.append((stream, decoder.decode(chunk)))
+
+    def push_pending():
+        chunks = pending[:]
+        pending.clear()
+        for stream, text in merge_output_chunks(chunks):
+            on_output(stream, text)
+
+    loop = asyncio.get_running_loop()
+    readers = asyncio.gather(read_stream('stdout', process.stdout), read_stream('stderr', process.stderr))
+    deadline = loop.time() + timeout if timeout else None
+    timed_out = False
+    while not readers.done():
+        wait = output_interval if on_output else None
+        if deadline is not None and not timed_out:
+            remaining = max(0.0, deadline - loop.time())
+            wait = remaining if wait is None else min(wait, remaining)
+        await asyncio.wait([readers], timeout=wait)
+        if on_output:
+            push_pending()
+        if deadline is not None and not timed_out and not readers.done() and loop.time() >= deadline:
+            timed_out = True
+            await terminate_process_group(process)
+    # A command may close its output and keep running, e.g. 'cmd >/dev/null 2>&1 &' or a daemonizing tool.
+    try:
+        remaining = None if deadline is None or timed_out else max(0.0, deadline - loop.time())
+        returncode = await asyncio.wait_for(asyncio.shield(process.wait()), remaining)
+    except asyncio.TimeoutError:
+        timed_out = True
+        await terminate_process_group(process)
+        returncode = await process.wait()
+    if on_output:
+        push_pending()
+    return command_result(returncode, buffers, None, timed_out, timeout)
+
+class AsyncCommandExecutor(CommandExecutor):
+    """CommandExecutor whose command runs as a coroutine on the shared event loop thread.
+
+    Any number of commands can run at once without a thread each. The callback and output
+    listener are still invoked through dispatch, e.g. wx.CallAfter, and the history is
+    recorded as with the thread engine, without the CPU time and peak memory.
+    """
+
+    asynchronous = True
+
+    def execute(self):
+        """Run the command on the event loop and block until its callback was dispatched."""
+        self.launch().result()
+
+    async def execute_async(self):
+        """Run the command, or reuse its cached result, then record it and pass it to the callback.
+
+        Looking up the cache and recording the history read and write the store, so they run
+        on the loop's default executor instead of stalling the other commands on the loop.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        result = await loop.run_in_executor(None, self.cached_result)
+        if result is None:
+            session = self.command_manager.shell_session(self.app_name, self.command_id)
+            if session is not None:
+                # Sessions read their shell's output on threads of their own; wait for them off the loop.
+                result = await loop.run_in_executor(None, self.run_in_session, session)
+            else:
+                result = await stream_command_async(self.command, self.output_listener(), self.head_size, self.tail_size,
+                                                    self.output_interval, on_start=self.on_process_started,
+                                                    timeout=self.timeout)
+            result['cancelled'] = self.terminated
+        await loop.run_in_executor(None, self.finish, result, started)
+
+    def launch(self):
+        """Start the command on the event loop and return a concurrent.futures.Future set once it finished."""
+        return get_event_loop_thread().submit(self.execute_async())
+
+    def on_process_started(self, process):
+        """Keep the process handle, terminating it right away if cancelled before it started."""
+        self.process = process
+        if self.terminated:
+            get_event_loop_thread().submit(terminate_process_group(process))
+
+    def terminate(self):
+        """Terminate the running command together with any processes it started."""
+        self.terminated = True
+        if self.session is not None:
+            self.session.terminate()
+        elif self.process is not None:
+            get_event_loop_thread().submit(terminate_process_group(self.process))
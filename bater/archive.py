@@ -0,0 +1,167 @@
+"""Streaming archives of a store, written and read one record per line."""
+
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import tempfile
+from datetime import datetime
+
+from .storage import upgrade_history_entry, validate_commands_data
+
+# Format name and version written in the header record of every archive.
+ARCHIVE_FORMAT = 'bater-archive'
+ARCHIVE_VERSION = 1
+
+# Compressed archives are recognized by the extension of their file name.
+COMPRESSORS = {'.gz': gzip.open, '.xz': lzma.open, '.lzma': lzma.open}
+
+# Import modes: merge into the store, or replace the store with the archive.
+IMPORT_MODES = ('merge', 'replace')
+
+# How the histories of commands present in both the store and the archive are combined.
+HISTORY_MERGES = ('dedup', 'concat')
+
+# Number of history entries read or written at a time.
+HISTORY_BATCH_SIZE = 500
+
+# Errors raised by reading an invalid, truncated or corrupt archive.
+ARCHIVE_ERRORS = (OSError, EOFError, ValueError, lzma.LZMAError)
+
+def open_archive(path):
+    """Open an archive for reading as a text stream, decompressing it according to its extension."""
+    opener = COMPRESSORS.get(os.path.splitext(path)[1].lower(), open)
+    return opener(path, 'rt', encoding='utf-8')
+
+def history_key(entry):
+    """Return the key identifying duplicate history entries: their timestamp, type, command and outputs."""
+    return hashlib.sha256(json.dumps(upgrade_history_entry(entry), sort_keys=True).encode('utf-8')).digest()
+
+def history_pages(storage, command_id, page_size=HISTORY_BATCH_SIZE):
+    """Yield the history of a command in pages of at most page_size entries, oldest entry first."""
+    total = storage.count_history(command_id)
+    for end in range(total, 0, -page_size):
+        offset = max(end - page_size, 0)
+        yield storage.get_history(command_id, offset, end - offset)[::-1]
+
+def archive_records(storage, commands, workflows, include_history=True):
+    """Yield the records of an archive of the given metadata, reading histories from storage page by page."""
+    yield {'type': 'header', 'format': ARCHIVE_FORMAT, 'version': ARCHIVE_VERSION,
+           'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'history': include_history}
+    counts = {'apps': 0, 'commands': 0, 'workflows': 0, 'history': 0}
+    for kind, items in (('command', commands), ('workflow', workflows)):
+        for app_name, app_items in items.items():
+            if kind == 'command':
+                yield {'type': 'app', 'name': app_name}
+                counts['apps'] += 1
+            for item_id, item in app_items.items():
+                yield {'type': kind, 'app': app_name, 'id': item_id, kind: item}
+                counts[f"{kind}s"] += 1
+                if include_history:
+                    for page in history_pages(storage, item_id):
+                        for entry in page:
+                            yield {'type': 'history', 'id': item_id, 'entry': entry}
+                        counts['history'] += len(page)
+    yield dict(counts, type='end')
+
+def write_archive(path, records):
+    """Write records to an archive atomically, one JSON line each, and return the counts of its end record."""
+    opener = COMPRESSORS.get(os.path.splitext(path)[1].lower(), open)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    os.close(fd)
+    try:
+        with opener(temp_path, 'wt', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, separators=(',', ':')) + "\n")
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    return {key: value for key, value in record.items() if key != 'type'}
+
+def legacy_records(data):
+    """Yield the records of a store exported in the nested JSON format of earlier versions."""
+    if not isinstance(data, dict):
+        raise ValueError("Invalid data format")
+    validate_commands_data(data)
+    yield {'type': 'header', 'format': ARCHIVE_FORMAT, 'version': 0, 'history': True}
+    counts = {'apps': 0, 'commands': 0, 'workflows': 0, 'history': 0}
+    for app_name, app_commands in data.items():
+        yield {'type': 'app', 'name': app_name}
+        counts['apps'] += 1
+        for command_id, command_data in app_commands.items():
+            command_data = dict(command_data)
+            history = command_data.pop('history', [])
+            yield {'type': 'command', 'app': app_name, 'id': command_id, 'command': command_data}
+            counts['commands'] += 1
+            for entry in history:
+                yield {'type': 'history', 'id': command_id, 'entry': entry}
+            counts['history'] += len(history)
+    yield dict(counts, type='end')
+
+def read_archive(path):
+    """Yield the records of an archive, or of a file in the nested JSON format of earlier versions.
+
+    Archives are read line by line; only the old format is loaded as a whole.
+    """
+    with open_archive(path) as file:
+        first_line = file.readline()
+        try:
+            header = json.loads(first_line)
+        except ValueError:
+            header = None
+        if not (isinstance(header, dict) and header.get('type') == 'header'):
+            file.seek(0)
+            yield from legacy_records(json.load(file))
+            return
+        if header.get('format') != ARCHIVE_FORMAT or header.get('version', 0) > ARCHIVE_VERSION:
+            raise ValueError(f"Unsupported archive format {header.get('format')} version {header.get('version')}.")
+        yield header
+        for line_number, line in enumerate(file, 2):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    raise ValueError(f"Invalid archive record on line {line_number}.")
+
+def scan_archive(path):
+    """Check every record of an archive without keeping them, and return the counts of its end record.
+
+    Raises ValueError for malformed records, histories of unknown commands and archives
+    cut short before their end record.
+    """
+    apps = set()
+    ids = set()
+    end = None
+    for record in read_archive(path):
+        if end is not None:
+            raise ValueError("Records after the end of the archive.")
+        kind = record.get('type') if isinstance(record, dict) else None
+        if kind == 'app':
+            if not isinstance(record.get('name'), str):
+                raise ValueError("Invalid application record.")
+            apps.add(record['name'])
+        elif kind in ('command', 'workflow'):
+            item = record.get(kind)
+            required = 'command' if kind == 'command' else 'nodes'
+            if not isinstance(record.get('app'), str) or not isinstance(record.get('id'), str) \
+                    or not isinstance(item, dict) or 'name' not in item or required not in item:
+                raise ValueError(f"Invalid {kind} record.")
+            if kind == 'command' and record['app'] not in apps:
+                raise ValueError(f"Command of the unknown application '{record['app']}'.")
+            ids.add(record['id'])
+        elif kind == 'history':
+            if record.get('id') not in ids or not isinstance(record.get('entry'), dict):
+                raise ValueError("History record of an unknown command.")
+        elif kind == 'end':
+            end = record
+        elif kind != 'header':
+            raise ValueError(f"Unknown archive record type '{kind}'.")
+    if end is None:
+        raise ValueError("The archive is incomplete.")
+    return {key: value for key, value in end.items() if key != 'type'}
@@ -0,0 +1,209 @@
+"""Content-addressed storage of command outputs.
+
+Outputs are compressed and stored once under the SHA-256 digest of their text;
+history entries refer to them by digest, so repeated identical outputs cost a
+few bytes per execution instead of a full copy.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zlib
+
+# Outputs shorter than this many characters stay inline in history entries.
+BLOB_MIN_SIZE = 128
+
+# History entry fields that are moved to the blob store, and the keys of their references.
+BLOB_FIELDS = {'output': 'output_ref', 'stderr': 'stderr_ref'}
+
+class BlobStore:
+    """Interface of the content-addressed stores holding compressed texts by SHA-256 digest."""
+
+    @staticmethod
+    def digest(text):
+        """Return the key under which a text is stored."""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the text stored under a key, or an empty string if it is missing."""
+        data = self.read(key)
+        if data is None:
+            logging.warning(f"Missing output blob {key}")
+            return ""
+        return zlib.decompress(data).decode('utf-8')
+
+    def put(self, text):
+        """Store a text unless an identical one is already stored, and return its key."""
+        key = self.digest(text)
+        if not self.contains(key):
+            self.write(key, zlib.compress(text.encode('utf-8')))
+        return key
+
+    def contains(self, key):
+        """Check whether a blob is stored under a key."""
+        raise NotImplementedError
+
+    def read(self, key):
+        """Return the compressed data stored under a key, or None."""
+        raise NotImplementedError
+
+    def retain(self, keys):
+        """Delete every blob whose key is not in the given set and return how many were deleted."""
+        raise NotImplementedError
+
+    def size(self, key):
+        """Return the compressed size of the blob stored under a key, or 0 if it is missing."""
+        raise NotImplementedError
+
+    def write(self, key, data):
+        """Store compressed data under a key."""
+        raise NotImplementedError
+
+class FileBlobStore(BlobStore):
+    """Stores blobs as files in a directory, fanned out by the first two characters of their key."""
+
+    def __init__(self, directory):
+        """Initialize the store in the given directory."""
+        self.directory = directory
+
+    def blob_path(self, key):
+        """Return the path of the file holding a blob."""
+        return os.path.join(self.directory, key[:2], key)
+
+    def contains(self, key):
+        """Check whether a blob is stored under a key."""
+        return os.path.exists(self.blob_path(key))
+
+    def read(self, key):
+        """Return the compressed data stored under a key, or None."""
+        try:
+            with open(self.blob_path(key), 'rb') as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def retain(self, keys):
+        """Delete every blob whose key is not in the given set and return how many were deleted."""
+        if not os.path.isdir(self.directory):
+            return 0
+        deleted = 0
+        for prefix in os.listdir(self.directory):
+            prefix_directory = os.path.join(self.directory, prefix)
+            if not os.path.isdir(prefix_directory):
+                continue
+            for key in os.listdir(prefix_directory):
+                if key not in keys:
+                    os.remove(os.path.join(prefix_directory, key))
+                    deleted += 1
+        return deleted
+
+    def size(self, key):
+        """Return the size of the file holding a blob, or 0 if it is missing."""
+        try:
+            return os.path.getsize(self.blob_path(key))
+        except OSError:
+            return 0
+
+    def write(self, key, data):
+        """Store compressed data under a key, replacing the file atomically."""
+        path = self.blob_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix=f".{key}.", suffix=".tmp", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+class SqliteBlobStore(BlobStore):
+    """Stores blobs in a table of a SQLite database shared with the rest of the store."""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, data BLOB NOT NULL)"
+
+    def __init__(self, connection, lock):
+        """Initialize the store on an open connection, guarded by the owner's lock."""
+        self.connection = connection
+        self.lock = lock
+        self.connection.execute(self.SCHEMA)
+
+    def contains(self, key):
+        """Check whether a blob is stored under a key."""
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM blobs WHERE hash = ?", (key,)).fetchone() is not None
+
+    def read(self, key):
+        """Return the compressed data stored under a key, or None."""
+        with self.lock:
+            row = self.connection.execute("SELECT data FROM blobs WHERE hash = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def retain(self, keys):
+        """Delete every blob whose key is not in the given set and return how many were deleted."""
+        with self.lock, self.connection:
+            stored = [key for (key,) in self.connection.execute("SELECT hash FROM blobs")]
+            unused = [(key,) for key in stored if key not in keys]
+            self.connection.executemany("DELETE FROM blobs WHERE hash = ?", unused)
+        return len(unused)
+
+    def size(self, key):
+        """Return the size of the data stored under a key, or 0 if it is missing."""
+        with self.lock:
+            row = self.connection.execute("SELECT length(data) FROM blobs WHERE hash = ?", (key,)).fetchone()
+        return 0 if row is None else row[0]
+
+    def write(self, key, data):
+        """Store compressed data under a key; joins the caller's transaction if there is one."""
+        with self.lock:
+            self.connection.execute("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (key, data))
+
+def pack_entry(entry, blobs):
+    """Return a history entry with its large outputs moved to the blob store and replaced by references."""
+    packed = entry
+    for field, ref in BLOB_FIELDS.items():
+        text = entry.get(field)
+        if text and len(text) >= BLOB_MIN_SIZE:
+            if packed is entry:
+                packed = dict(entry)
+            packed[ref] = blobs.put(text)
+            del packed[field]
+    return packed
+
+def unpack_entry(entry, blobs):
+    """Return a history entry with its output references resolved from the blob store."""
+    unpacked = entry
+    for field, ref in BLOB_FIELDS.items():
+        if ref in entry:
+            if unpacked is entry:
+                unpacked = dict(entry)
+            unpacked[field] = blobs.get(unpacked.pop(ref))
+    return unpacked
+
+def entry_blob_keys(entry):
+    """Return the blob keys referenced by a history entry."""
+    return [entry[ref] for ref in BLOB_FIELDS.values() if ref in entry]
+
+def entry_blob_sizes(entry, blobs, known=None):
+    """Return the compressed sizes of the blobs a packed history entry refers to, as {key: size}, or None.
+
+    known maps keys to sizes already looked up, e.g. for the other entries of a history.
+    """
+    keys = entry_blob_keys(entry)
+    if not keys:
+        return None
+    if known is None:
+        known = {}
+    for key in keys:
+        if key not in known:
+            known[key] = blobs.size(key)
+    return {key: known[key] for key in keys}
+
+def entry_size(entry):
+    """Return the bytes a packed history entry takes in the store, not counting the blobs it refers to.
+
+    Blobs may be shared by many entries, so they are accounted for separately (see HistoryRing).
+    """
+    return len(json.dumps(entry))
@@ -0,0 +1,104 @@
+"""Cache of command results, for commands whose output does not change within a time-to-live."""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+# Bound of the result cache, in bytes of cached output.
+RESULT_CACHE_BYTES = int(os.environ.get('BATER_RESULT_CACHE_BYTES', 16 * 1024 * 1024))
+
+# Environment variables that change what a command does; their values are part of the cache key.
+CACHE_KEY_ENVIRONMENT = ('PATH', 'HOME', 'USER', 'SHELL', 'LANG', 'LC_ALL', 'TZ')
+
+def result_cache_key(app_name, command_id, command, cwd=None, environment=None):
+    """Return the cache key of a stored command run with a rendered text in a working directory and environment.
+
+    The key includes the application and command ID, so commands with the same text do
+    not share results and each command's results are dropped with its own.
+    """
+    environment = os.environ if environment is None else environment
+    key_data = {
+        'app': app_name,
+        'id': command_id,
+        'command': command,
+        'cwd': os.getcwd() if cwd is None else cwd,
+        'environment': {name: environment.get(name) for name in CACHE_KEY_ENVIRONMENT}
+    }
+    return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ResultCache:
+    """LRU cache of successful command results that expire after a per-command time-to-live.
+
+    The cache is bounded by the size of the cached output, and counts hits and misses.
+    """
+
+    def __init__(self, max_bytes=RESULT_CACHE_BYTES, clock=time.monotonic):
+        """Initialize an empty cache holding at most max_bytes of output."""
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.results = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a copy of an unexpired result marked as cached, or None."""
+        with self.lock:
+            cached = self.results.get(key)
+            if cached is None or cached['expires'] <= self.clock():
+                if cached is not None:
+                    self.remove(key)
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.results.move_to_end(key)
+            return dict(cached['result'], cached=True)
+
+    def invalidate(self, command_ids=None):
+        """Drop the cached results of the given commands, or all of them, and return how many were dropped."""
+        with self.lock:
+            keys = [key for key, cached in self.results.items()
+                    if command_ids is None or cached['command_id'] in command_ids]
+            for key in keys:
+                self.remove(key)
+            return len(keys)
+
+    def put(self, key, command_id, result, ttl):
+        """Cache a result of a command for ttl seconds, evicting the least recently used results if needed."""
+        size = len(result.get('stdout', '')) + len(result.get('stderr', ''))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            self.remove(key)
+            self.results[key] = {
+                'command_id': command_id,
+                'result': dict(result),
+                'expires': self.clock() + ttl,
+                'size': size
+            }
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                self.remove(next(iter(self.results)))
+
+    def remove(self, key):
+        """Drop a cached result; the caller holds the lock."""
+        cached = self.results.pop(key, None)
+        if cached is not None:
+            self.total_bytes -= cached['size']
+
+    def stats(self, command_ids=None):
+        """Return the hit and miss counts and the number and size of cached results, of the given commands or all."""
+        with self.lock:
+            results = [cached for cached in self.results.values()
+                       if command_ids is None or cached['command_id'] in command_ids]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'results': len(results),
+                'bytes': sum(cached['size'] for cached in results),
+                'max_bytes': self.max_bytes
+            }
@@ -0,0 +1,591 @@
+"""Command-line interface running stored commands without the GUI.
+
+Every subcommand prints JSON to stdout; errors are reported on stderr.
+"""
+
+import argparse
+import json
+import signal
+import sys
+
+from .archive import HISTORY_MERGES, IMPORT_MODES
+from .daemon import BaterDaemon, DaemonError, open_manager
+from .executor import EXECUTION_ENGINE, MAX_CONCURRENT_COMMANDS, ExecutionService, create_executor
+from .manager import CommandManager
+from .matrix import MatrixRun, parse_parameter_sets, template_placeholders
+from .policy import check_command, describe_verdict
+from .scheduler import OVERLAP_POLICIES
+from .trace import tracer
+from .utils import fill_placeholders
+from .workflow import WORKFLOW_POLICIES, WorkflowRun
+
+class CommandLineError(Exception):
+    """Error in the arguments of a subcommand, reported without a traceback."""
+
+def find_command(command_manager, app_name, command):
+    """Return the ID of a command of an application, given its name or ID."""
+    app_commands = command_manager.commands.get(app_name)
+    if app_commands is None:
+        raise CommandLineError(f"Application '{app_name}' not found.")
+    if command in app_commands:
+        return command
+    matches = [command_id for command_id, command_data in app_commands.items() if command_data['name'] == command]
+    if not matches:
+        raise CommandLineError(f"Command '{command}' not found in application '{app_name}'.")
+    if len(matches) > 1:
+        raise CommandLineError(f"Several commands of '{app_name}' are named '{command}'; use a command ID.")
+    return matches[0]
+
+def find_workflow(command_manager, app_name, workflow):
+    """Return the ID of a workflow of an application, given its name or ID."""
+    app_workflows = command_manager.workflows.get(app_name, {})
+    if workflow in app_workflows:
+        return workflow
+    matches = [workflow_id for workflow_id, workflow_data in app_workflows.items() if workflow_data['name'] == workflow]
+    if not matches:
+        raise CommandLineError(f"Workflow '{workflow}' not found in application '{app_name}'.")
+    if len(matches) > 1:
+        raise CommandLineError(f"Several workflows of '{app_name}' are named '{workflow}'; use a workflow ID.")
+    return matches[0]
+
+def exit_status(returncode):
+    """Map a command's exit code to a shell exit status: 128 + N if signal N killed it, 1 if it is unknown."""
+    if returncode is None:
+        return 1
+    if returncode < 0:
+        return 128 + min(-returncode, 127)
+    return min(returncode, 255)
+
+def print_json(data):
+    """Print data as JSON on stdout."""
+    json.dump(data, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+def check_safety(command_text, force):
+    """Refuse potentially dangerous commands unless forced."""
+    verdict = check_command(command_text)
+    if verdict['dangerous'] and not force:
+        findings = "".join(f"\n  {line}" for line in describe_verdict(verdict))
+        raise CommandLineError(f"Command '{command_text}' may be dangerous; use --force to run it anyway.{findings}")
+
+def parse_parameters(assignments):
+    """Parse NAME=VALUE arguments into a dict of placeholder values."""
+    values = {}
+    for assignment in assignments or []:
+        name, separator, value = assignment.partition('=')
+        if not separator:
+            raise CommandLineError(f"Invalid parameter '{assignment}'; expected NAME=VALUE.")
+        values[name] = value
+    return values
+
+def parse_step(command_manager, app_name, spec):
+    """Parse a COMMAND[:DEPENDENCY,...] step argument into a command ID and the IDs it depends on."""
+    app_commands = command_manager.commands.get(app_name, {})
+    if spec in app_commands or any(command_data['name'] == spec for command_data in app_commands.values()):
+        return find_command(command_manager, app_name, spec), []
+    command, _, dependencies = spec.rpartition(':')
+    if not command:
+        return find_command(command_manager, app_name, spec), []
+    return find_command(command_manager, app_name, command), [
+        find_command(command_manager, app_name, dependency.strip()) for dependency in dependencies.split(',') if dependency.strip()]
+
+def make_executor(command_manager, app_name, command_id, results, command_text=None):
+    """Create an executor that appends its result, with timing information, to a results list.
+
+    command_text overrides the stored text, e.g. with its placeholders filled.
+    """
+    command_data = command_manager.commands[app_name][command_id]
+    command_text = command_text or command_data['command']
+
+    def on_finished(success, result):
+        results.append({
+            'app': app_name,
+            'id': command_id,
+            'name': command_data['name'],
+            'command': command_text,
+            'success': success,
+            'cached': result.get('cached', False),
+            'returncode': result['returncode'],
+            'duration': result['duration'],
+            'usage': result.get('usage'),
+            'stdout': result['stdout'],
+            'stderr': result['stderr']
+        })
+
+    return create_executor(command_text, on_finished, app_name, command_id, command_manager)
+
+def command_list(args, command_manager):
+    """List applications and their commands."""
+    print_json([
+        {'app': app_name, 'id': command_id, 'name': command_data['name'], 'command': command_data['command']}
+        for app_name, app_commands in command_manager.commands.items()
+        if args.app is None or app_name == args.app
+        for command_id, command_data in app_commands.items()
+    ])
+    return 0
+
+def command_run(args, command_manager):
+    """Run a single command and record it in its history."""
+    command_id = find_command(command_manager, args.app, args.command)
+    try:
+        command_text = fill_placeholders(command_manager.commands[args.app][command_id]['command'],
+                                         parse_parameters(args.param))
+    except ValueError as e:
+        raise CommandLineError(f"{e}; pass it with --param NAME=VALUE.")
+    check_safety(command_text, args.force)
+    results = []
+    make_executor(command_manager, args.app, command_id, results, command_text).execute()
+    print_json(results[0])
+    return exit_status(results[0]['returncode'])
+
+def command_run_app(args, command_manager):
+    """Run every command of an application on a bounded worker pool."""
+    app_commands = command_manager.commands.get(args.app)
+    if app_commands is None:
+        raise CommandLineError(f"Application '{args.app}' not found.")
+    for command_data in app_commands.values():
+        check_safety(command_data['command'], args.force)
+
+    results = []
+    service = ExecutionService(max_workers=args.parallel, max_per_app=args.parallel)
+    for command_id in app_commands:
+        service.submit(args.app, command_id, make_executor(command_manager, args.app, command_id, results))
+    service.wait()
+    service.shutdown()
+    print_json(results)
+    return 0 if all(result['success'] for result in results) else 1
+
+def command_matrix(args, command_manager):
+    """Run a command template once per parameter set and print a table of the results."""
+    command_id = find_command(command_manager, args.app, args.command)
+    placeholders = template_placeholders(command_manager.commands[args.app][command_id]['command'])
+    if not placeholders:
+        raise CommandLineError(f"Command '{args.command}' has no placeholders.")
+    try:
+        if args.values:
+            if len(placeholders) > 1:
+                raise CommandLineError("--values only applies to templates with a single placeholder; use --csv.")
+            parameter_sets = [{placeholders[0]: value} for value in args.values]
+        elif args.csv:
+            with open(args.csv, 'r', encoding='utf-8') as file:
+                parameter_sets = parse_parameter_sets(file.read(), placeholders)
+        else:
+            parameter_sets = parse_parameter_sets(sys.stdin.read(), placeholders)
+    except (IOError, ValueError) as e:
+        raise CommandLineError(f"Invalid parameter sets: {e}")
+
+    matrix_run = MatrixRun(command_manager, args.app, command_id, parameter_sets, args.parallel)
+    for row in matrix_run.rows:
+        if row['command']:
+            check_safety(row['command'], args.force)
+    matrix_run.start()
+    matrix_run.wait()
+    print_json({
+        'summary': matrix_run.summary(),
+        'rows': [
+            {key: row[key] for key in ('index', 'parameters', 'command', 'state', 'success', 'returncode', 'duration',
+                                       'stdout', 'stderr')}
+            for row in matrix_run.rows
+        ]
+    })
+    return 0 if all(row['success'] for row in matrix_run.rows) else 1
+
+def command_workflows(args, command_manager):
+    """List the workflows of an application with their steps."""
+    if args.app not in command_manager.commands:
+        raise CommandLineError(f"Application '{args.app}' not found.")
+    app_commands = command_manager.commands[args.app]
+    print_json([
+        {
+            'id': workflow_id,
+            'name': workflow['name'],
+            'policy': workflow['policy'],
+            'steps': [
+                {'name': app_commands[command_id]['name'],
+                 'depends_on': [app_commands[dependency]['name'] for dependency in node['depends_on']]}
+                for command_id, node in workflow['nodes'].items()
+            ]
+        }
+        for workflow_id, workflow in command_manager.workflows.get(args.app, {}).items()
+    ])
+    return 0
+
+def command_add_workflow(args, command_manager):
+    """Add a workflow made of steps of an application's commands."""
+    nodes = {}
+    for spec in args.step:
+        command_id, dependencies = parse_step(command_manager, args.app, spec)
+        nodes[command_id] = {'depends_on': dependencies}
+    try:
+        workflow_id = command_manager.add_workflow(args.app, args.name, nodes, args.policy)
+    except ValueError as e:
+        raise CommandLineError(str(e))
+    print_json({'app': args.app, 'id': workflow_id, 'name': args.name})
+    return 0
+
+def command_run_workflow(args, command_manager):
+    """Run a workflow, running independent steps in parallel, and print the timings of its steps."""
+    if args.app not in command_manager.commands:
+        raise CommandLineError(f"Application '{args.app}' not found.")
+    workflow_id = find_workflow(command_manager, args.app, args.workflow)
+    workflow_run = WorkflowRun(command_manager, args.app, workflow_id, args.parallel)
+    for step in workflow_run.steps.values():
+        check_safety(step['command'], args.force)
+    workflow_run.start()
+    workflow_run.wait()
+    run = workflow_run.history_entry()
+    del run['output']
+    for step in run['steps']:
+        step['stdout'] = workflow_run.steps[step['id']]['stdout']
+        step['stderr'] = workflow_run.steps[step['id']]['stderr']
+    run['critical_path'] = [workflow_run.steps[step_id]['name'] for step_id in run['critical_path']]
+    print_json(dict(run, app=args.app, id=workflow_id, name=workflow_run.workflow['name']))
+    return 0 if run['success'] else 1
+
+def command_history(args, command_manager):
+    """Print a page of history for one command, one application or all of them."""
+    if args.app is None:
+        entries = command_manager.query_history(args.type, args.offset, args.limit)
+    elif args.command is None:
+        if args.app not in command_manager.commands:
+            raise CommandLineError(f"Application '{args.app}' not found.")
+        entries = []
+        for command_id in list(command_manager.commands[args.app]) + list(command_manager.workflows.get(args.app, {})):
+            page = command_manager.get_command_history(args.app, command_id, limit=args.offset + args.limit,
+                                                       event_type=args.type)
+            entries += [(args.app, command_id, entry) for entry in page]
+        entries.sort(key=lambda item: item[2].get('timestamp', ''), reverse=True)
+        entries = entries[args.offset:args.offset + args.limit]
+    else:
+        if args.app in command_manager.commands and any(
+                workflow['name'] == args.command or workflow_id == args.command
+                for workflow_id, workflow in command_manager.workflows.get(args.app, {}).items()):
+            command_id = find_workflow(command_manager, args.app, args.command)
+        else:
+            command_id = find_command(command_manager, args.app, args.command)
+        page = command_manager.get_command_history(args.app, command_id, args.offset, args.limit, args.type)
+        entries = [(args.app, command_id, entry) for entry in page]
+
+    print_json([dict(entry, app=app_name, id=command_id) for app_name, command_id, entry in entries])
+    return 0
+
+# Orderings of the stats subcommand, as functions of a stats dict sorted in ascending order.
+STATS_ORDERS = {
+    'name': lambda stats: stats['name'].lower(),
+    'p95': lambda stats: -(stats['duration'] or {}).get('p95', 0.0),
+    'failure-rate': lambda stats: -stats['failure_rate'],
+    'trend': lambda stats: -(stats['trend'] or {}).get('change', 0.0)
+}
+
+def command_stats(args, command_manager):
+    """Print duration percentiles, failure rate, resource usage and trend of one command or an application's commands."""
+    if args.command is None:
+        if args.app not in command_manager.commands:
+            raise CommandLineError(f"Application '{args.app}' not found.")
+        command_ids = list(command_manager.commands[args.app])
+    else:
+        command_ids = [find_command(command_manager, args.app, args.command)]
+    results = [
+        dict(command_manager.command_stats(args.app, command_id), app=args.app, id=command_id,
+             name=command_manager.commands[args.app][command_id]['name'])
+        for command_id in command_ids
+    ]
+    results.sort(key=STATS_ORDERS[args.sort])
+    print_json(results if args.command is None else results[0])
+    return 0
+
+def command_cache(args, command_manager):
+    """Show or change the result caching of a command."""
+    command_id = find_command(command_manager, args.app, args.command)
+    if args.ttl is not None:
+        command_manager.set_cache_ttl(args.app, command_id, args.ttl)
+    print_json({
+        'app': args.app,
+        'id': command_id,
+        'cache_ttl': command_manager.cache_ttl(args.app, command_id)
+    })
+    return 0
+
+def command_session(args, command_manager):
+    """Show or change whether a command runs in its application's shell session."""
+    command_id = find_command(command_manager, args.app, args.command)
+    if args.session is not None:
+        command_manager.set_session(args.app, command_id, args.session)
+    print_json({
+        'app': args.app,
+        'id': command_id,
+        'session': command_manager.uses_session(args.app, command_id)
+    })
+    return 0
+
+def schedule_state(command_manager, app_name, command_id, schedule_times):
+    """Return the schedule of a command with its next and last run times, known only while a daemon runs it."""
+    command_data = command_manager.commands[app_name][command_id]
+    state = {'app': app_name, 'id': command_id, 'name': command_data['name'], 'schedule': command_data.get('schedule'),
+             'next_run': None, 'last_run': None}
+    times = schedule_times.get(command_id)
+    if times:
+        state.update((key, times[key]) for key in ('next_run', 'last_run', 'runs', 'skipped', 'coalesced'))
+    return state
+
+def command_schedule(args, command_manager):
+    """Show or change when a command runs on its own while the GUI or the daemon is open."""
+    command_id = find_command(command_manager, args.app, args.command)
+    try:
+        if args.off:
+            command_manager.set_schedule(args.app, command_id, None)
+        elif args.every or args.cron:
+            schedule = {'interval': args.every} if args.every else {'cron': args.cron}
+            command_manager.set_schedule(args.app, command_id, dict(schedule, jitter=args.jitter, overlap=args.overlap))
+    except ValueError as e:
+        raise CommandLineError(str(e))
+    print_json(schedule_state(command_manager, args.app, command_id, command_manager.schedule_times()))
+    return 0
+
+def command_schedules(args, command_manager):
+    """List the scheduled commands with their next and last run times."""
+    schedule_times = command_manager.schedule_times()
+    print_json([
+        schedule_state(command_manager, app_name, command_id, schedule_times)
+        for app_name, app_commands in command_manager.commands.items()
+        for command_id, command_data in app_commands.items()
+        if command_data.get('schedule')
+    ])
+    return 0
+
+def command_search(args, command_manager):
+    """Search the command text and output of all history entries."""
+    print_json(command_manager.search_history(" ".join(args.query), args.limit, args.sort))
+    return 0
+
+def command_info(args, command_manager):
+    """Print the store location, its size, the execution engine, whether a daemon serves it and the history cache state."""
+    print_json(dict(command_manager.store_info(), engine=EXECUTION_ENGINE,
+                    daemon=getattr(command_manager, 'remote', False)))
+    return 0
+
+def command_check(args, command_manager):
+    """Check a command line against the safety policy; exits with 1 if it is dangerous."""
+    command_text = " ".join(args.text)
+    verdict = check_command(command_text)
+    print_json(dict(verdict, command=command_text))
+    return 1 if verdict['dangerous'] else 0
+
+def command_export(args, command_manager):
+    """Export the store to an archive, compressed if its name ends with .gz or .xz."""
+    counts = command_manager.export_commands(args.file, include_history=not args.no_history)
+    if counts is None:
+        return 1
+    print_json(dict(counts, file=args.file))
+    return 0
+
+def command_import(args, command_manager):
+    """Merge an archive into the store, or replace the store with it."""
+    counts = command_manager.import_commands(args.file, args.mode, args.history, include_history=not args.no_history)
+    if counts is None:
+        return 1
+    print_json(dict(counts, file=args.file, mode=args.mode))
+    return 0
+
+def command_prune(args, command_manager):
+    """Downsample and trim every history to the retention limits and the store-wide size budget."""
+    print_json(command_manager.apply_retention())
+    return 0
+
+def command_gc(args, command_manager):
+    """Delete stored outputs that no history entry refers to any more."""
+    print_json({'deleted_blobs': command_manager.collect_garbage()})
+    return 0
+
+def command_daemon(args, command_manager):
+    """Serve the store to the GUI and other commands on a Unix socket until stopped."""
+    daemon = BaterDaemon(command_manager, args.socket)
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.shutdown())
+    print_json({'store': command_manager.json_file, 'socket': daemon.socket_path})
+    sys.stdout.flush()
+    try:
+        daemon.serve_forever()
+    except DaemonError as e:
+        raise CommandLineError(str(e))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def command_gui(args):
+    """Start the graphical application, importing wxPython only now."""
+    from .gui import main as gui_main
+    gui_main(args.store)
+    return 0
+
+def build_parser():
+    """Build the argument parser of the bater command."""
+    parser = argparse.ArgumentParser(prog='bater', description="Run and inspect stored terminal commands.")
+    parser.add_argument('--store', help="store file (default: $BATER_STORE or commands.json)")
+    parser.add_argument('--no-daemon', action='store_true', help="open the store directly even if a daemon serves it")
+    parser.add_argument('--trace', metavar='FILE', help="write the timings of the run to FILE as Chrome trace-event JSON")
+    subparsers = parser.add_subparsers(dest='subcommand', required=True)
+
+    list_parser = subparsers.add_parser('list', help="list applications and commands")
+    list_parser.add_argument('app', nargs='?', help="only list the commands of this application")
+    list_parser.set_defaults(handler=command_list)
+
+    run_parser = subparsers.add_parser('run', help="run a command")
+    run_parser.add_argument('app', help="application name")
+    run_parser.add_argument('command', help="command name or ID")
+    run_parser.add_argument('--param', '-p', action='append', metavar='NAME=VALUE', help="value of a placeholder")
+    run_parser.add_argument('--force', action='store_true', help="run even if the command looks dangerous")
+    run_parser.set_defaults(handler=command_run)
+
+    matrix_parser = subparsers.add_parser('matrix', help="run a command template once per parameter set")
+    matrix_parser.add_argument('app', help="application name")
+    matrix_parser.add_argument('command', help="command name or ID")
+    matrix_parser.add_argument('--csv', help="CSV file whose header names the placeholders (default: stdin)")
+    matrix_parser.add_argument('--values', nargs='+', help="values of the template's single placeholder")
+    matrix_parser.add_argument('--parallel', type=int, default=MAX_CONCURRENT_COMMANDS,
+                               help=f"number of rows run at once (default: {MAX_CONCURRENT_COMMANDS})")
+    matrix_parser.add_argument('--force', action='store_true', help="run even if a row looks dangerous")
+    matrix_parser.set_defaults(handler=command_matrix)
+
+    run_app_parser = subparsers.add_parser('run-app', help="run every command of an application")
+    run_app_parser.add_argument('app', help="application name")
+    run_app_parser.add_argument('--parallel', type=int, default=1, help="number of commands run at once (default: 1)")
+    run_app_parser.add_argument('--force', action='store_true', help="run even if a command looks dangerous")
+    run_app_parser.set_defaults(handler=command_run_app)
+
+    workflows_parser = subparsers.add_parser('workflows', help="list the workflows of an application")
+    workflows_parser.add_argument('app', help="application name")
+    workflows_parser.set_defaults(handler=command_workflows)
+
+    add_workflow_parser = subparsers.add_parser('add-workflow', help="add a workflow of an application's commands")
+    add_workflow_parser.add_argument('app', help="application name")
+    add_workflow_parser.add_argument('name', help="workflow name")
+    add_workflow_parser.add_argument('--step', action='append', required=True, metavar='COMMAND[:DEPENDENCY,...]',
+                                     help="a command to run, after the commands it depends on")
+    add_workflow_parser.add_argument('--policy', choices=WORKFLOW_POLICIES, default=WORKFLOW_POLICIES[0],
+                                     help="stop everything when a step fails, or only its dependents (default: fail-fast)")
+    add_workflow_parser.set_defaults(handler=command_add_workflow)
+
+    run_workflow_parser = subparsers.add_parser('run-workflow', help="run a workflow")
+    run_workflow_parser.add_argument('app', help="application name")
+    run_workflow_parser.add_argument('workflow', help="workflow name or ID")
+    run_workflow_parser.add_argument('--parallel', type=int, default=MAX_CONCURRENT_COMMANDS,
+                                     help=f"number of steps run at once (default: {MAX_CONCURRENT_COMMANDS})")
+    run_workflow_parser.add_argument('--force', action='store_true', help="run even if a step looks dangerous")
+    run_workflow_parser.set_defaults(handler=command_run_workflow)
+
+    history_parser = subparsers.add_parser('history', help="show history, newest first")
+    history_parser.add_argument('app', nargs='?', help="application name")
+    history_parser.add_argument('command', nargs='?', help="command or workflow name or ID")
+    history_parser.add_argument('--type', choices=['creation', 'edit', 'execution', 'workflow'],
+                                help="only show this event type")
+    history_parser.add_argument('--limit', type=int, default=50, help="number of entries (default: 50)")
+    history_parser.add_argument('--offset', type=int, default=0, help="number of newest entries to skip")
+    history_parser.set_defaults(handler=command_history)
+
+    stats_parser = subparsers.add_parser('stats', help="show execution time, failure rate and resource statistics")
+    stats_parser.add_argument('app', help="application name")
+    stats_parser.add_argument('command', nargs='?', help="command name or ID (default: every command of the application)")
+    stats_parser.add_argument('--sort', choices=list(STATS_ORDERS), default='name',
+                              help="order of the commands: by name, slowest p95, highest failure rate or most slowed down")
+    stats_parser.set_defaults(handler=command_stats)
+
+    cache_parser = subparsers.add_parser('cache', help="show or set how long a command's results are reused")
+    cache_parser.add_argument('app', help="application name")
+    cache_parser.add_argument('command', help="command name or ID")
+    cache_parser.add_argument('--ttl', type=int, help="seconds a successful result is reused; 0 disables caching")
+    cache_parser.set_defaults(handler=command_cache)
+
+    session_parser = subparsers.add_parser('session', help="show or set whether a command runs in its application's shell session")
+    session_parser.add_argument('app', help="application name")
+    session_parser.add_argument('command', help="command name or ID")
+    session_group = session_parser.add_mutually_exclusive_group()
+    session_group.add_argument('--on', dest='session', action='store_const', const=True,
+                               help="run the command in a shell kept running between commands")
+    session_group.add_argument('--off', dest='session', action='store_const', const=False,
+                               help="run the command in a new shell each time")
+    session_parser.set_defaults(handler=command_session)
+
+    schedule_parser = subparsers.add_parser('schedule', help="show or set when a command runs on its own")
+    schedule_parser.add_argument('app', help="application name")
+    schedule_parser.add_argument('command', help="command name or ID")
+    schedule_group = schedule_parser.add_mutually_exclusive_group()
+    schedule_group.add_argument('--every', help="run at this interval, in seconds or e.g. 90s, 5m, 1h30m")
+    schedule_group.add_argument('--cron', help="run on a cron expression, e.g. '*/5 * * * *' or @hourly")
+    schedule_group.add_argument('--off', action='store_true', help="stop running the command on a schedule")
+    schedule_parser.add_argument('--jitter', type=float, default=0, help="delay each run randomly by up to this many seconds")
+    schedule_parser.add_argument('--overlap', choices=OVERLAP_POLICIES, default='skip',
+                                 help="skip a run while the previous one has not finished, or queue it (default: skip)")
+    schedule_parser.set_defaults(handler=command_schedule)
+
+    schedules_parser = subparsers.add_parser('schedules', help="list the scheduled commands and their run times")
+    schedules_parser.set_defaults(handler=command_schedules)
+
+    search_parser = subparsers.add_parser('search', help="search history commands and outputs")
+    search_parser.add_argument('query', nargs='+', help="words to search for; the last one may be a prefix")
+    search_parser.add_argument('--sort', choices=['rank', 'newest', 'oldest'], default='rank',
+                               help="order of the hits (default: rank)")
+    search_parser.add_argument('--limit', type=int, default=20, help="number of hits (default: 20)")
+    search_parser.set_defaults(handler=command_search)
+
+    info_parser = subparsers.add_parser('info', help="show the store and history cache state")
+    info_parser.set_defaults(handler=command_info)
+
+    check_parser = subparsers.add_parser('check', help="check a command line against the safety policy")
+    check_parser.add_argument('text', nargs='+', help="command line to check, e.g. -- 'sudo rm -rf /tmp/x'")
+    check_parser.set_defaults(handler=command_check)
+
+    export_parser = subparsers.add_parser('export', help="export the store to an archive (.jsonl, .jsonl.gz or .jsonl.xz)")
+    export_parser.add_argument('file', help="archive file")
+    export_parser.add_argument('--no-history', action='store_true', help="only export applications, commands and workflows")
+    export_parser.set_defaults(handler=command_export)
+
+    import_parser = subparsers.add_parser('import', help="import an archive or a JSON export into the store")
+    import_parser.add_argument('file', help="archive file")
+    import_parser.add_argument('--mode', choices=IMPORT_MODES, default=IMPORT_MODES[0],
+                               help="merge into the store, keeping stored commands, or replace it (default: merge)")
+    import_parser.add_argument('--history', choices=HISTORY_MERGES, default=HISTORY_MERGES[0],
+                               help="skip history entries already stored, or add all of them (default: dedup)")
+    import_parser.add_argument('--no-history', action='store_true', help="do not import history entries")
+    import_parser.set_defaults(handler=command_import)
+
+    prune_parser = subparsers.add_parser('prune', help="apply the history retention limits and downsampling now")
+    prune_parser.set_defaults(handler=command_prune)
+
+    gc_parser = subparsers.add_parser('gc', help="delete stored outputs no longer referenced by history")
+    gc_parser.set_defaults(handler=command_gc)
+
+    daemon_parser = subparsers.add_parser('daemon', help="serve the store to the GUI and other commands on a Unix socket")
+    daemon_parser.add_argument('--socket', help="socket path (default: $BATER_SOCKET or the store path ending in .sock)")
+    daemon_parser.set_defaults(handler=command_daemon)
+
+    subparsers.add_parser('gui', help="start the graphical application")
+    return parser
+
+def main(argv=None):
+    """Run the bater command and return its exit status."""
+    args = build_parser().parse_args(argv)
+    if args.subcommand == 'gui':
+        return command_gui(args)
+    if args.trace:
+        tracer.set_enabled(True)
+
+    if args.no_daemon or args.subcommand == 'daemon':
+        command_manager = CommandManager(args.store)
+    else:
+        command_manager = open_manager(args.store)
+    try:
+        with tracer.span(args.subcommand, category='cli'):
+            return args.handler(args, command_manager)
+    except CommandLineError as e:
+        print(f"bater: {e}", file=sys.stderr)
+        return 2
+    except DaemonError as e:
+        print(f"bater: {e} Use --no-daemon to open the store directly.", file=sys.stderr)
+        return 1
+    finally:
+        try:
+            command_manager.flush()
+        except DaemonError as e:
+            print(f"bater: {e}", file=sys.stderr)
+        if args.trace:
+            tracer.save(args.trace)
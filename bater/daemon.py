@@ -0,0 +1,710 @@
+"""Optional daemon owning the store and the executor, serving them to clients over a Unix socket.
+
+Requests, responses and notifications are JSON-RPC 2.0 messages, one per line. Requests
+name a CommandManager method and pass its arguments as named parameters. The daemon
+notifies subscribed clients of every change, so they can keep a copy of the metadata
+instead of reading the store, and several GUIs and scripts can share one store.
+"""
+
+import inspect
+import itertools
+import json
+import logging
+import os
+import queue
+import select
+import socket
+import socketserver
+import threading
+import time
+import uuid
+
+from .executor import CommandExecutor, ExecutionService, create_executor, failed_start_result
+from .manager import CommandManager, store_path
+from .scheduler import Scheduler
+
+# Socket of the daemon; by default next to the store, e.g. commands.sock for commands.json.
+DAEMON_SOCKET = os.environ.get('BATER_SOCKET')
+
+# Whether clients use a daemon: 'auto' connects to one serving the store if it runs, 'off' never does.
+DAEMON_MODE = os.environ.get('BATER_DAEMON', 'auto')
+
+# Seconds a client waits to connect before opening the store itself.
+CONNECT_TIMEOUT = 1.0
+
+# Seconds a client waits for the daemon to take a request and answer it.
+REQUEST_TIMEOUT = float(os.environ.get('BATER_DAEMON_TIMEOUT', 30))
+
+# Seconds a client waits for the result of a running command past its timeout before giving up on the daemon.
+RUN_RESULT_MARGIN = float(os.environ.get('BATER_RUN_RESULT_MARGIN', 30))
+
+# Seconds between the checks that the daemon still runs a command whose result a client waits for.
+RUN_CHECK_INTERVAL = 5.0
+
+# Messages queued for a client that does not read them before it is disconnected.
+MAX_PENDING_MESSAGES = 10000
+
+# CommandManager methods served to clients: those only reading, and those changing the metadata or a history.
+READ_METHODS = ('cache_ttl', 'cached_result_stats', 'collect_garbage', 'command_stats', 'count_command_history',
+                'export_commands', 'flush', 'get_command_history', 'history_cache_stats', 'invalidate_cached_results',
+                'query_history', 'schedule', 'schedule_times', 'search_history', 'store_info', 'uses_session')
+METADATA_METHODS = ('add_application', 'add_command', 'add_workflow', 'apply_retention', 'delete_application',
+                    'delete_command', 'delete_workflow', 'edit_command', 'import_commands', 'reload',
+                    'rename_application', 'set_cache_ttl', 'set_schedule', 'set_session', 'update_show_output',
+                    'update_workflow')
+HISTORY_METHODS = ('add_command_history', 'add_workflow_history')
+
+# Exceptions raised by CommandManager methods that clients raise again with their own type.
+REMOTE_EXCEPTIONS = {error.__name__: error for error in (KeyError, LookupError, OSError, TypeError, ValueError)}
+
+# JSON-RPC error codes.
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+class DaemonError(Exception):
+    """Error reported by the daemon, or failure to reach it."""
+
+    def __init__(self, message, code=SERVER_ERROR):
+        """Initialize the error with its message and JSON-RPC error code."""
+        super().__init__(message)
+        self.code = code
+
+def daemon_socket_path(json_file=None):
+    """Return the socket of the daemon serving a store."""
+    return DAEMON_SOCKET or f"{os.path.splitext(os.path.abspath(store_path(json_file)))[0]}.sock"
+
+def encode_message(message):
+    """Return a JSON-RPC message as one line of bytes."""
+    return (json.dumps(message, separators=(',', ':')) + "\n").encode('utf-8')
+
+def remote_exception(error):
+    """Return the exception to raise for the error object of a response."""
+    error_type = REMOTE_EXCEPTIONS.get((error.get('data') or {}).get('type'))
+    if error_type is not None:
+        return error_type(error.get('message', ''))
+    return DaemonError(error.get('message', "Unknown daemon error."), error.get('code', SERVER_ERROR))
+
+class DaemonConnection(socketserver.StreamRequestHandler):
+    """A client connection: requests are read line by line and each is answered on a thread of its own.
+
+    Responses and notifications are queued and written by a writer thread, so a client that
+    stops reading cannot block the daemon; it is disconnected once too many are queued.
+    """
+
+    def setup(self):
+        """Start the writer thread and register the connection with the daemon."""
+        super().setup()
+        self.daemon = self.server.daemon
+        self.outbox = queue.Queue()
+        self.writer = threading.Thread(target=self.write_messages, daemon=True)
+        self.writer.start()
+        self.daemon.add_connection(self)
+
+    def finish(self):
+        """Unregister the connection and stop its writer."""
+        self.daemon.remove_connection(self)
+        self.outbox.put(None)
+        super().finish()
+
+    def handle(self):
+        """Answer the requests of the client until it disconnects."""
+        for line in self.rfile:
+            if line.strip():
+                threading.Thread(target=self.process, args=(line,), daemon=True).start()
+
+    def notify(self, method, params):
+        """Queue a notification for the client."""
+        self.send({'jsonrpc': '2.0', 'method': method, 'params': params})
+
+    def process(self, line):
+        """Run one request and queue its response."""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            self.send({'jsonrpc': '2.0', 'id': None, 'error': {'code': PARSE_ERROR, 'message': f"Invalid JSON: {e}"}})
+            return
+        request_id = request.get('id') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get('params', {}), dict):
+                raise DaemonError("Requests need a method and named parameters.", INVALID_PARAMS)
+            response = {'result': self.daemon.call(self, request.get('method'), request.get('params') or {})}
+        except DaemonError as e:
+            response = {'error': {'code': e.code, 'message': str(e)}}
+        except Exception as e:
+            logging.error(f"Error in daemon request {request.get('method')}: {e}")
+            response = {'error': {'code': SERVER_ERROR, 'message': str(e), 'data': {'type': type(e).__name__}}}
+        if request_id is not None:
+            self.send(dict(response, jsonrpc='2.0', id=request_id))
+
+    def send(self, message):
+        """Queue a message, disconnecting the client if it fell too far behind."""
+        if self.outbox.qsize() > MAX_PENDING_MESSAGES:
+            logging.error("Disconnecting a daemon client that does not read its messages")
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.outbox.put(message)
+
+    def write_messages(self):
+        """Writer loop sending the queued messages until the connection is finished."""
+        for message in iter(self.outbox.get, None):
+            try:
+                self.wfile.write(encode_message(message))
+            except (OSError, ValueError):
+                return
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handing each connection to a DaemonConnection thread."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, daemon):
+        """Bind the socket, readable and writable by the current user only."""
+        self.daemon = daemon
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, DaemonConnection)
+        finally:
+            os.umask(umask)
+
+class BaterDaemon:
+    """Owns a CommandManager and an ExecutionService and serves them to clients on a Unix socket.
+
+    Besides the methods in READ_METHODS, METADATA_METHODS and HISTORY_METHODS, clients may
+    call 'ping', 'snapshot' (the metadata, its version and the IDs with a history),
+    'subscribe' (receive 'changed', 'history', 'schedule' and 'status' notifications), 'run'
+    'cancel_run' and 'run_state' (execute a command here, streaming its 'output' and 'finished'
+    result) and 'shutdown'. The daemon also runs the scheduled commands of the store.
+    """
+
+    def __init__(self, command_manager, socket_path=None):
+        """Initialize the daemon for an opened store; serving starts with serve_forever()."""
+        self.command_manager = command_manager
+        self.socket_path = socket_path or daemon_socket_path(command_manager.json_file)
+        self.execution_service = ExecutionService(on_status=self.on_status)
+        self.scheduler = Scheduler(command_manager, self.execution_service, on_change=self.on_schedule_change)
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.subscribers = set()
+        self.runs_lock = threading.Lock()
+        self.runs = {}
+        self.version = 0
+        self.server = None
+
+    def add_connection(self, connection):
+        """Register a client connection."""
+        with self.lock:
+            self.connections.add(connection)
+
+    def broadcast(self, method, params):
+        """Send a notification to every subscribed client."""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for connection in subscribers:
+            connection.notify(method, params)
+
+    def call(self, connection, method, params):
+        """Run a request of a client and return its result."""
+        if method in ('cancel_run', 'ping', 'run', 'run_state', 'shutdown', 'snapshot', 'subscribe'):
+            handler = getattr(self, f"rpc_{method}")
+            params = dict(params, connection=connection)
+        elif method in READ_METHODS + METADATA_METHODS + HISTORY_METHODS:
+            handler = getattr(self.command_manager, method)
+        else:
+            raise DaemonError(f"Unknown method '{method}'.", METHOD_NOT_FOUND)
+        try:
+            arguments = inspect.signature(handler).bind(**params)
+        except TypeError as e:
+            raise DaemonError(f"Invalid parameters of '{method}': {e}", INVALID_PARAMS)
+        result = handler(*arguments.args, **arguments.kwargs)
+        if method in METADATA_METHODS:
+            self.notify_changed(method)
+        elif method in HISTORY_METHODS:
+            self.notify_history(params.get('app_name'), params.get('command_id', params.get('workflow_id')))
+        return result
+
+    def notify_changed(self, method):
+        """Tell the clients that the metadata changed and give it a new version."""
+        with self.lock:
+            self.version += 1
+            version = self.version
+        self.broadcast('changed', {'version': version, 'method': method})
+
+    def notify_history(self, app_name, command_id):
+        """Tell the clients that an entry was added to a history."""
+        self.broadcast('history', {'app_name': app_name, 'command_id': command_id})
+
+    def on_schedule_change(self, app_name, command_id):
+        """Tell the clients that a scheduled run of a command started or finished."""
+        self.broadcast('schedule', {'app_name': app_name, 'command_id': command_id,
+                                    'has_history': self.command_manager.has_command_history(app_name, command_id)})
+
+    def on_status(self, app_name, command_id):
+        """Tell the clients that the queued or running executions of a command changed."""
+        self.broadcast('status', {'app_name': app_name, 'command_id': command_id,
+                                  'status': self.execution_service.status(app_name, command_id)})
+
+    def remove_connection(self, connection):
+        """Unregister a client connection."""
+        with self.lock:
+            self.connections.discard(connection)
+            self.subscribers.discard(connection)
+
+    def rpc_cancel_run(self, connection, run):
+        """Cancel an execution started with 'run'; returns whether it was still queued or running.
+
+        A run cancelled before it started never executes, so its 'finished' notification is sent here.
+        """
+        with self.runs_lock:
+            job = self.runs.get(run)
+        if job is None:
+            return False
+        self.execution_service.cancel(job)
+        if job.state == 'cancelled':
+            with self.runs_lock:
+                self.runs.pop(run, None)
+            connection.notify('finished', {'run': run, 'result': {
+                'success': False, 'returncode': None, 'stdout': "", 'stderr': "Cancelled before it started.",
+                'stdout_bytes': 0, 'stderr_bytes': 0, 'usage': None, 'timed_out': False, 'cancelled': True}})
+        return True
+
+    def rpc_ping(self, connection):
+        """Return the store, the process ID and the metadata version of the daemon."""
+        return {'store': self.command_manager.json_file, 'pid': os.getpid(), 'version': self.version}
+
+    def rpc_run(self, connection, app_name, command_id, command, run=None, stream=False, record_history=True,
+                timeout=None):
+        """Queue a command on the daemon's ExecutionService and return its run ID.
+
+        With stream, 'output' notifications carry its output as it is produced; a 'finished'
+        notification carries its result in any case.
+        """
+        run = run or uuid.uuid4().hex
+
+        def on_finished(success, result):
+            connection.notify('finished', {'run': run, 'result': result})
+            with self.runs_lock:
+                self.runs.pop(run, None)
+            if record_history:
+                self.notify_history(app_name, command_id)
+
+        def on_output(stream_name, text):
+            connection.notify('output', {'run': run, 'stream': stream_name, 'text': text})
+
+        executor = create_executor(command, on_finished, app_name, command_id, self.command_manager,
+                                   on_output=on_output if stream else None, record_history=record_history,
+                                   timeout=timeout)
+        with self.runs_lock:
+            self.runs[run] = self.execution_service.submit(app_name, command_id, executor)
+        return {'run': run}
+
+    def rpc_run_state(self, connection, run):
+        """Return the state of an execution started with 'run': 'queued' or 'running', or None once it finished.
+
+        The 'finished' notification of a run is sent before it is forgotten, so a client that
+        is told None has received its result.
+        """
+        with self.runs_lock:
+            job = self.runs.get(run)
+        return job.state if job is not None else None
+
+    def rpc_shutdown(self, connection):
+        """Stop serving once the running request was answered."""
+        self.shutdown()
+        return True
+
+    def rpc_snapshot(self, connection):
+        """Return the metadata, the workflows, their version and the IDs of the commands and workflows with a history."""
+        command_manager = self.command_manager
+        with command_manager.lock:
+            commands = {app_name: dict(app_commands) for app_name, app_commands in command_manager.commands.items()}
+            workflows = {app_name: dict(app_workflows) for app_name, app_workflows in command_manager.workflows.items()}
+            version = self.version
+        return {'version': version, 'store': command_manager.json_file, 'commands': commands, 'workflows': workflows,
+                'history_ids': list(command_manager.history_ids())}
+
+    def rpc_subscribe(self, connection):
+        """Send the notifications of every change to the client from now on."""
+        with self.lock:
+            self.subscribers.add(connection)
+        return {'version': self.version}
+
+    def serve_forever(self):
+        """Serve clients until shutdown() is called, then stop the executions and write pending changes.
+
+        Raises DaemonError if another daemon already serves the socket.
+        """
+        if os.path.exists(self.socket_path):
+            if is_daemon_running(self.socket_path):
+                raise DaemonError(f"A daemon already serves '{self.socket_path}'.")
+            os.remove(self.socket_path)
+        self.server = DaemonServer(self.socket_path, self)
+        if self.command_manager.retention_pass_enabled():
+            threading.Thread(target=self.command_manager.apply_retention, daemon=True).start()
+        self.command_manager.scheduler = self.scheduler
+        self.scheduler.start()
+        logging.info(f"Serving '{self.command_manager.json_file}' on '{self.socket_path}'")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            self.scheduler.stop()
+            with self.lock:
+                connections = list(self.connections)
+            for connection in connections:
+                try:
+                    connection.connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            try:
+                os.remove(self.socket_path)
+            except OSError:
+                pass
+            self.execution_service.shutdown()
+            self.command_manager.shell_sessions.stop()
+            self.command_manager.flush()
+
+    def shutdown(self):
+        """Stop serve_forever(); may be called from any thread, including a request or a signal handler."""
+        if self.server is not None:
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+class DaemonClient:
+    """Connection to a daemon, sending requests from any thread and passing notifications to listeners.
+
+    Listeners are called on the reader thread with the notification's method and parameters,
+    and with 'disconnected' when the connection is lost.
+    """
+
+    def __init__(self, socket_path, timeout=CONNECT_TIMEOUT):
+        """Connect to the daemon's socket; raises OSError if no daemon listens on it."""
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.settimeout(timeout)
+            self.socket.connect(socket_path)
+            self.socket.settimeout(None)
+        except OSError:
+            self.socket.close()
+            raise
+        self.reader = self.socket.makefile('rb')
+        self.write_lock = threading.Lock()
+        self.pending_lock = threading.Lock()
+        self.pending = {}
+        self.ids = itertools.count(1)
+        self.listeners = []
+        self.connected = True
+        threading.Thread(target=self.read_messages, daemon=True).start()
+
+    def add_listener(self, listener):
+        """Call listener(method, params) for each notification."""
+        self.listeners.append(listener)
+
+    def call(self, method, params=None, timeout=REQUEST_TIMEOUT):
+        """Send a request and wait for its result, raising the error it reported.
+
+        Raises DaemonError if the daemon does not take the request or answer it within
+        timeout seconds; a request it could not take closes the connection, whose stream
+        may hold part of it.
+        """
+        request_id = next(self.ids)
+        waiter = {'done': threading.Event()}
+        deadline = time.monotonic() + timeout
+        with self.pending_lock:
+            if not self.connected:
+                raise DaemonError("Not connected to the daemon.")
+            self.pending[request_id] = waiter
+        try:
+            with self.write_lock:
+                self.send(encode_message({'jsonrpc': '2.0', 'id': request_id, 'method': method,
+                                          'params': params or {}}), deadline)
+        except (OSError, ValueError) as e:
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+            self.close()
+            raise DaemonError(f"Lost the connection to the daemon. Details: {e}")
+        if not waiter['done'].wait(max(0.0, deadline - time.monotonic())):
+            with self.pending_lock:
+                self.pending.pop(request_id, None)
+            raise DaemonError(f"The daemon did not answer '{method}' within {timeout:g} seconds.")
+        response = waiter.get('response')
+        if response is None:
+            raise DaemonError("Lost the connection to the daemon.")
+        if 'error' in response:
+            raise remote_exception(response['error'])
+        return response.get('result')
+
+    def close(self):
+        """Close the connection."""
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+    def read_messages(self):
+        """Reader loop passing responses to the waiting calls and notifications to the listeners."""
+        try:
+            for line in self.reader:
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    logging.error("Ignoring an invalid message from the daemon")
+                    continue
+                if 'method' in message:
+                    self.notify_listeners(message['method'], message.get('params') or {})
+                    continue
+                with self.pending_lock:
+                    waiter = self.pending.pop(message.get('id'), None)
+                if waiter is not None:
+                    waiter['response'] = message
+                    waiter['done'].set()
+        except (OSError, ValueError):
+            pass
+        with self.pending_lock:
+            self.connected = False
+            waiters = list(self.pending.values())
+            self.pending.clear()
+        for waiter in waiters:
+            waiter['done'].set()
+        self.notify_listeners('disconnected', {})
+
+    def notify_listeners(self, method, params):
+        """Pass a notification to every listener, logging their errors."""
+        for listener in list(self.listeners):
+            try:
+                listener(method, params)
+            except Exception as e:
+                logging.error(f"Error handling the daemon notification {method}: {e}")
+
+    def remove_listener(self, listener):
+        """Stop calling a listener."""
+        if listener in self.listeners:
+            self.listeners.remove(listener)
+
+    def send(self, data, deadline):
+        """Write data to the socket without blocking past deadline; raises TimeoutError if it is reached.
+
+        The socket itself stays blocking, as the reader thread reads from it.
+        """
+        view = memoryview(data)
+        while view:
+            if not select.select([], [self.socket], [], max(0.0, deadline - time.monotonic()))[1]:
+                raise TimeoutError("the daemon is not reading requests")
+            try:
+                view = view[self.socket.send(view, socket.MSG_DONTWAIT):]
+            except BlockingIOError:
+                pass
+
+class RemoteCommandManager:
+    """Stand-in for CommandManager whose store is owned by a daemon.
+
+    The applications, commands and workflows are mirrored from the daemon's snapshot and
+    refreshed on its change notifications, so they can be read as with CommandManager; the
+    methods of READ_METHODS, METADATA_METHODS and HISTORY_METHODS are forwarded to the
+    daemon, and commands run there through RemoteCommandExecutor.
+    """
+
+    # Makes create_executor() return a RemoteCommandExecutor for this manager.
+    remote = True
+
+    def __init__(self, client):
+        """Mirror the daemon's metadata and subscribe to its changes."""
+        self.client = client
+        self.lock = threading.RLock()
+        self.commands = {}
+        self.workflows = {}
+        self.ids_with_history = set()
+        self.version = -1
+        self.json_file = None
+        self.change_listeners = []
+        self.refresh_needed = threading.Event()
+        client.add_listener(self.on_notification)
+        client.call('subscribe')
+        self.refresh()
+        threading.Thread(target=self.refresh_changes, daemon=True).start()
+
+    def __getattr__(self, name):
+        """Return a function forwarding a CommandManager method to the daemon."""
+        if name not in READ_METHODS + METADATA_METHODS + HISTORY_METHODS:
+            raise AttributeError(name)
+        signature = inspect.signature(getattr(CommandManager, name))
+
+        def call(*args, **kwargs):
+            params = signature.bind(self, *args, **kwargs).arguments
+            del params['self']
+            result = self.client.call(name, params)
+            if name in METADATA_METHODS:
+                self.refresh()
+            return result
+        return call
+
+    def add_change_listener(self, listener):
+        """Call listener(kind) when the store changed: 'changed', 'history', 'schedule' or 'disconnected'."""
+        self.change_listeners.append(listener)
+
+    def close(self):
+        """Close the connection to the daemon; the change listeners are not told about it."""
+        self.change_listeners = []
+        self.client.close()
+
+    def has_command_history(self, app_name, command_id):
+        """Check whether a command or workflow has any history entry."""
+        return command_id in self.ids_with_history
+
+    def history_ids(self):
+        """Return the IDs of the commands and workflows that have any history entry."""
+        return set(self.ids_with_history)
+
+    def notify_change_listeners(self, kind):
+        """Pass a kind of change to the change listeners."""
+        for listener in list(self.change_listeners):
+            listener(kind)
+
+    def on_notification(self, method, params):
+        """Keep the mirror up to date with the notifications of the daemon."""
+        if method == 'changed' and params.get('version', 0) > self.version:
+            self.refresh_needed.set()
+        elif method == 'history':
+            self.ids_with_history.add(params.get('command_id'))
+            self.notify_change_listeners('history')
+        elif method == 'schedule':
+            if params.get('has_history'):
+                self.ids_with_history.add(params.get('command_id'))
+            self.notify_change_listeners('schedule')
+        elif method == 'disconnected':
+            self.notify_change_listeners('disconnected')
+            self.refresh_needed.set()
+
+    def refresh(self):
+        """Replace the mirror with the daemon's current snapshot."""
+        snapshot = self.client.call('snapshot')
+        with self.lock:
+            if snapshot['version'] >= self.version:
+                self.version = snapshot['version']
+                self.json_file = snapshot['store']
+                self.commands = snapshot['commands']
+                self.workflows = snapshot['workflows']
+                self.ids_with_history = set(snapshot['history_ids'])
+
+    def refresh_changes(self):
+        """Refresh the mirror after change notifications, coalescing bursts, until the connection is lost."""
+        while True:
+            self.refresh_needed.wait()
+            self.refresh_needed.clear()
+            try:
+                self.refresh()
+            except DaemonError:
+                return
+            self.notify_change_listeners('changed')
+
+    def shell_session(self, app_name, command_id):
+        """Return None: shell sessions are kept by the daemon, which runs the commands."""
+        return None
+
+class RemoteCommandExecutor(CommandExecutor):
+    """CommandExecutor running its command in the daemon of a RemoteCommandManager.
+
+    The daemon queues the command on its own ExecutionService, records it in the history
+    and streams its output back; the callback and output listener are invoked here through
+    dispatch as with a local executor.
+    """
+
+    def execute(self):
+        """Run the command in the daemon and block until its result is back."""
+        client = self.command_manager.client
+        run = uuid.uuid4().hex
+        finished = threading.Event()
+        outcome = {}
+
+        def on_notification(method, params):
+            if method == 'disconnected':
+                outcome.setdefault('result', failed_start_result(DaemonError("Lost the connection to the daemon.")))
+                finished.set()
+            elif params.get('run') != run:
+                return
+            elif method == 'output' and self.on_output:
+                self.dispatch(self.on_output, params['stream'], params['text'])
+            elif method == 'finished':
+                outcome['result'] = params['result']
+                finished.set()
+
+        self.run_id = run
+        client.add_listener(on_notification)
+        try:
+            client.call('run', {'app_name': self.app_name, 'command_id': self.command_id, 'command': self.command,
+                                'run': run, 'stream': bool(self.on_output), 'record_history': self.record_history,
+                                'timeout': self.timeout})
+            if self.terminated:
+                self.terminate()
+            self.wait_for_result(client, run, finished)
+            result = outcome['result']
+        except DaemonError as e:
+            result = failed_start_result(e)
+        finally:
+            client.remove_listener(on_notification)
+        result.setdefault('cancelled', self.terminated)
+        self.dispatch(self.callback, result['success'], result)
+
+    def wait_for_result(self, client, run, finished):
+        """Block until the 'finished' notification of a run was received.
+
+        The daemon is asked for the state of the run every RUN_CHECK_INTERVAL seconds. Raises
+        DaemonError if it does not answer, has forgotten the run without sending its result, or
+        still runs the command RUN_RESULT_MARGIN seconds after its timeout; the run is then
+        cancelled if the daemon still answers.
+        """
+        deadline = None
+        while not finished.wait(RUN_CHECK_INTERVAL):
+            state = client.call('run_state', {'run': run})
+            if finished.is_set():
+                break
+            if state is None:
+                raise DaemonError("The daemon lost the command before reporting its result.")
+            if state != 'running' or not self.timeout:
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + self.timeout + RUN_RESULT_MARGIN
+            elif time.monotonic() >= deadline:
+                try:
+                    client.call('cancel_run', {'run': run})
+                except DaemonError:
+                    pass
+                raise DaemonError(f"The daemon did not report the result of the command within "
+                                  f"{self.timeout + RUN_RESULT_MARGIN:g} seconds of its start.")
+
+    def terminate(self):
+        """Ask the daemon to cancel the command."""
+        self.terminated = True
+        run = getattr(self, 'run_id', None)
+        if run is not None:
+            try:
+                self.command_manager.client.call('cancel_run', {'run': run})
+            except DaemonError as e:
+                logging.error(f"Error cancelling command {self.command_id}: {e}")
+
+def is_daemon_running(socket_path):
+    """Check whether a daemon accepts connections on a socket."""
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.settimeout(CONNECT_TIMEOUT)
+        probe.connect(socket_path)
+        return True
+    except OSError:
+        return False
+    finally:
+        probe.close()
+
+def open_manager(json_file=None):
+    """Return a RemoteCommandManager if a daemon serves the store, or else a CommandManager opening it."""
+    if DAEMON_MODE != 'off':
+        try:
+            client = DaemonClient(daemon_socket_path(json_file))
+        except OSError:
+            return CommandManager(json_file)
+        try:
+            return RemoteCommandManager(client)
+        except DaemonError as e:
+            logging.error(f"Error connecting to the daemon, opening the store directly: {e}")
+            client.close()
+    return CommandManager(json_file)
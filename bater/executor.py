@@ -0,0 +1,523 @@
+"""Execution of shell commands with streamed, bounded output capture and a bounded worker pool."""
+
+import codecs
+import heapq
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from .cache import result_cache_key
+
+# Bytes of each output stream kept from the start and from the end of a command's output.
+OUTPUT_HEAD_BYTES = 64 * 1024
+OUTPUT_TAIL_BYTES = 256 * 1024
+
+# Limits on how many commands run at once, overall and per application.
+MAX_CONCURRENT_COMMANDS = int(os.environ.get('BATER_MAX_WORKERS', os.cpu_count() or 4))
+MAX_CONCURRENT_COMMANDS_PER_APP = int(os.environ.get('BATER_MAX_WORKERS_PER_APP', 2))
+
+# How commands run: 'thread' blocks a worker thread per running command, 'asyncio' runs
+# every command on a single event loop thread (see aio.py).
+EXECUTION_ENGINES = ('thread', 'asyncio')
+EXECUTION_ENGINE = os.environ.get('BATER_ENGINE', 'thread')
+
+# Seconds after which a running command is terminated, or None to let commands run as long as they need.
+COMMAND_TIMEOUT = float(os.environ.get('BATER_COMMAND_TIMEOUT', 0)) or None
+
+def call_directly(function, *args):
+    """Dispatcher running callbacks on the calling thread, used when there is no UI event loop."""
+    function(*args)
+
+def create_executor(*args, engine=None, **kwargs):
+    """Return an executor for the configured engine, taking the arguments of CommandExecutor.
+
+    Commands of a store served by a daemon run in the daemon (see daemon.py).
+    """
+    if getattr(args[4] if len(args) > 4 else kwargs.get('command_manager'), 'remote', False):
+        from .daemon import RemoteCommandExecutor
+        return RemoteCommandExecutor(*args, **kwargs)
+    engine = engine or EXECUTION_ENGINE
+    if engine == 'asyncio':
+        from .aio import AsyncCommandExecutor
+        return AsyncCommandExecutor(*args, **kwargs)
+    if engine != 'thread':
+        logging.error(f"Unknown execution engine '{engine}', using 'thread'.")
+    return CommandExecutor(*args, **kwargs)
+
+def process_group_options():
+    """Return Popen keyword arguments that start a command in its own process group."""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def terminate_process_tree(process, grace_period=2.0):
+    """Terminate a process started with process_group_options() and everything it spawned."""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            return
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(grace_period)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError, OSError) as e:
+        logging.error(f"Error terminating process {process.pid}: {e}")
+
+def wait_for_exit(process, timeout=None):
+    """Wait for a process to exit and return its resource usage, or None where it cannot be measured.
+
+    The usage covers the process and the descendants it waited for, as reported by os.wait4,
+    with the CPU time in seconds and the peak resident set size in kilobytes. Raises
+    subprocess.TimeoutExpired if the process is still running after timeout seconds.
+    """
+    if hasattr(os, 'wait4'):
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        delay = 0.001
+        while True:
+            try:
+                pid, status, usage = os.wait4(process.pid, 0 if deadline is None else os.WNOHANG)
+            except ChildProcessError:
+                break  # Already reaped, e.g. by terminate_process_tree().
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                max_rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+                return {
+                    'cpu_user': round(usage.ru_utime, 3),
+                    'cpu_system': round(usage.ru_stime, 3),
+                    'max_rss_kb': max_rss
+                }
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(process.args, timeout)
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.05)
+    process.wait(timeout)
+    return None
+
+def failed_start_result(error):
+    """Return the result of a command whose process could not be started."""
+    logging.error(f"Error running command: {error}")
+    return {'success': False, 'returncode': None, 'stdout': "", 'stderr': f"Failed to execute command. Details: {error}",
+            'stdout_bytes': 0, 'stderr_bytes': 0, 'usage': None, 'timed_out': False}
+
+def command_result(returncode, buffers, usage, timed_out, timeout):
+    """Return the result of a finished command from its exit code and its 'stdout' and 'stderr' OutputBuffers."""
+    stderr = buffers['stderr'].getvalue().strip()
+    if timed_out:
+        stderr = f"{stderr}\nTimed out after {timeout:g} seconds.".strip()
+    return {
+        'success': returncode == 0 and not timed_out,
+        'returncode': returncode,
+        'stdout': buffers['stdout'].getvalue().strip(),
+        'stderr': stderr,
+        'stdout_bytes': buffers['stdout'].total_bytes,
+        'stderr_bytes': buffers['stderr'].total_bytes,
+        'usage': usage,
+        'timed_out': timed_out
+    }
+
+def merge_output_chunks(chunks):
+    """Merge consecutive (stream, text) chunks of the same stream into a single update."""
+    merged = []
+    for stream, text in chunks:
+        if merged and merged[-1][0] == stream:
+            merged[-1][1].append(text)
+        else:
+            merged.append((stream, [text]))
+    return [(stream, "".join(texts)) for stream, texts in merged]
+
+class OutputBuffer:
+    """Bounded capture of an output stream that keeps its first and last bytes."""
+
+    def __init__(self, head_size=OUTPUT_HEAD_BYTES, tail_size=OUTPUT_TAIL_BYTES):
+        """Initialize the buffer with the number of bytes to keep from the head and the tail."""
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.total_bytes = 0
+
+    def write(self, data):
+        """Add a chunk of output, discarding the middle once both ends are full."""
+        self.total_bytes += len(data)
+        room = self.head_size - len(self.head)
+        if room > 0:
+            self.head += data[:room]
+            data = data[room:]
+        if data:
+            self.tail += data
+            if len(self.tail) > self.tail_size:
+                del self.tail[:len(self.tail) - self.tail_size]
+
+    def getvalue(self):
+        """Return the captured output as text, marking where bytes were dropped."""
+        dropped = self.total_bytes - len(self.head) - len(self.tail)
+        text = self.head.decode(errors='replace')
+        if dropped:
+            text += f"\n... [{dropped} bytes truncated] ...\n"
+        return text + self.tail.decode(errors='replace')
+
+class CommandExecutor(threading.Thread):
+    """Class responsible for executing shell commands in a separate thread to avoid freezing the UI."""
+
+    # Whether the executor runs without blocking the thread that starts it (see aio.AsyncCommandExecutor).
+    asynchronous = False
+
+    def __init__(self, command, callback, app_name, command_id, command_manager, on_output=None,
+                 head_size=OUTPUT_HEAD_BYTES, tail_size=OUTPUT_TAIL_BYTES, output_interval=0.1, dispatch=call_directly,
+                 record_history=True, timeout=COMMAND_TIMEOUT):
+        """Initialize the thread with a command, a callback function and an optional output listener.
+
+        The callback receives the success flag and the result dictionary; on_output receives
+        (stream, text) chunks at most every output_interval seconds. Both are invoked through
+        dispatch, e.g. wx.CallAfter to run them on the UI thread. Without record_history the
+        execution is left out of the command's history, for callers recording it themselves.
+        A command still running after timeout seconds is terminated.
+        """
+        super().__init__()
+        self.command = command
+        self.callback = callback
+        self.app_name = app_name
+        self.command_id = command_id
+        self.command_manager = command_manager
+        self.on_output = on_output
+        self.head_size = head_size
+        self.tail_size = tail_size
+        self.output_interval = output_interval
+        self.dispatch = dispatch
+        self.record_history = record_history
+        self.timeout = timeout
+        self.process = None
+        self.session = None
+        self.terminated = False
+        self.cache_key = None
+        self.cache_ttl = None
+
+    def run(self):
+        """Run the command and return the result to the callback."""
+        self.execute()
+
+    def execute(self):
+        """Run the command on the calling thread and return the result to the callback.
+
+        A command with a cache TTL reuses a recent successful result for the same command
+        text and environment instead of running again; the result then has 'cached' set.
+        The result also holds the 'duration' of the execution in seconds, which is recorded in
+        the history with the resource usage and output sizes. Commands set to use their
+        application's shell session run there instead of in a new shell.
+        """
+        started = time.monotonic()
+        result = self.cached_result()
+        if result is None:
+            session = self.command_manager.shell_session(self.app_name, self.command_id)
+            if session is not None:
+                result = self.run_in_session(session)
+            else:
+                result = self.stream_command(self.command, self.output_listener(), self.head_size, self.tail_size,
+                                             self.output_interval, on_start=self.on_process_started, timeout=self.timeout)
+            result['cancelled'] = self.terminated
+        self.finish(result, started)
+
+    def cached_result(self):
+        """Return a recent result of the command if it has a cache TTL, replaying its output, or None."""
+        self.cache_ttl = self.command_manager.cache_ttl(self.app_name, self.command_id)
+        self.cache_key = result_cache_key(self.app_name, self.command_id, self.command) if self.cache_ttl else None
+        result = self.command_manager.result_cache.get(self.cache_key) if self.cache_key else None
+        if result is not None:
+            result['cancelled'] = False
+            result['usage'] = None  # Nothing ran, so nothing was used.
+            on_output = self.output_listener()
+            if on_output:
+                for stream in ('stdout', 'stderr'):
+                    if result[stream]:
+                        on_output(stream, result[stream])
+        return result
+
+    def finish(self, result, started):
+        """Record the result of an execution started at the given monotonic time and pass it to the callback.
+
+        A fresh successful result of a command with a cache TTL is cached along with the
+        timestamp of its history entry, which the entries of later cached runs refer to.
+        """
+        result['duration'] = round(time.monotonic() - started, 3)
+        history_entry = None
+        if self.record_history:
+            metrics = {
+                'duration': result['duration'],
+                'stdout_bytes': result.get('stdout_bytes', 0),
+                'stderr_bytes': result.get('stderr_bytes', 0)
+            }
+            metrics.update(result.get('usage') or {})
+            history_entry = self.command_manager.add_command_history(
+                self.app_name, self.command_id, self.command, result['stdout'], stderr=result['stderr'],
+                returncode=result['returncode'], cached=result.get('cached', False), metrics=metrics,
+                cached_from=result.get('cached_from'))
+        if self.cache_key and result['success'] and not result.get('cached') and not result['cancelled']:
+            cached_from = history_entry['timestamp'] if history_entry else None
+            self.command_manager.result_cache.put(self.cache_key, self.command_id, dict(result, cached_from=cached_from),
+                                                  self.cache_ttl)
+        self.dispatch(self.callback, result['success'], result)
+
+    def output_listener(self):
+        """Return the on_output listener wrapped to run through dispatch, or None."""
+        if not self.on_output:
+            return None
+        return lambda stream, text: self.dispatch(self.on_output, stream, text)
+
+    def on_process_started(self, process):
+        """Keep the process handle, terminating it right away if cancelled before it started."""
+        self.process = process
+        if self.terminated:
+            terminate_process_tree(process)
+
+    def on_session_started(self, session):
+        """Keep the shell session running the command, terminating it right away if cancelled before."""
+        self.session = session
+        if self.terminated:
+            session.terminate()
+
+    def run_in_session(self, session):
+        """Run the command in a shell session and return its result."""
+        return session.run(self.command, self.output_listener(), self.head_size, self.tail_size, self.output_interval,
+                           on_start=self.on_session_started, timeout=self.timeout)
+
+    def terminate(self):
+        """Terminate the running command together with any processes it started."""
+        self.terminated = True
+        if self.session is not None:
+            self.session.terminate()
+        elif self.process is not None:
+            terminate_process_tree(self.process)
+
+    @staticmethod
+    def run_command(command):
+        """Static method to execute the command and capture the output."""
+        result = CommandExecutor.stream_command(command)
+        return result['success'], result['stdout'] or result['stderr']
+
+    @staticmethod
+    def stream_command(command, on_output=None, head_size=OUTPUT_HEAD_BYTES, tail_size=OUTPUT_TAIL_BYTES, output_interval=0.1,
+                       on_start=None, timeout=None):
+        """Execute a command, reading stdout and stderr incrementally into bounded buffers.
+
+        Returns a dictionary with 'success', 'returncode', 'stdout' and 'stderr', the byte counts
+        of both streams before truncation, the resource 'usage' from wait_for_exit() and whether
+        the command 'timed_out'. If on_output is given, it is called with (stream, text) chunks at
+        most every output_interval seconds. The command runs in its own process group, which is
+        terminated after timeout seconds; on_start receives the process once started.
+        """
+        try:
+            process = subprocess.Popen(command, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       **process_group_options())
+        except (subprocess.SubprocessError, OSError) as e:
+            return failed_start_result(e)
+        if on_start:
+            on_start(process)
+
+        buffers = {'stdout': OutputBuffer(head_size, tail_size), 'stderr': OutputBuffer(head_size, tail_size)}
+        pending = []
+        pending_lock = threading.Lock()
+
+        def read_stream(stream, pipe):
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+            for chunk in iter(lambda: pipe.read1(65536), b''):
+                buffers[stream].write(chunk)
+                if on_output:
+                    with pending_lock:
+                        pending.append((stream, decoder.decode(chunk)))
+            pipe.close()
+
+        def push_pending():
+            with pending_lock:
+                chunks = pending[:]
+                pending.clear()
+            for stream, text in merge_output_chunks(chunks):
+                on_output(stream, text)
+
+        readers = [threading.Thread(target=read_stream, args=(stream, pipe), daemon=True)
+                   for stream, pipe in (('stdout', process.stdout), ('stderr', process.stderr))]
+        for reader in readers:
+            reader.start()
+        deadline = time.monotonic() + timeout if timeout else None
+        timed_out = False
+        for reader in readers:
+            while reader.is_alive():
+                reader.join(output_interval)
+                if on_output:
+                    push_pending()
+                if deadline is not None and not timed_out and time.monotonic() >= deadline:
+                    timed_out = True
+                    terminate_process_tree(process)
+        # A command may close its output and keep running, e.g. 'cmd >/dev/null 2>&1 &' or a daemonizing tool.
+        try:
+            usage = wait_for_exit(process, None if deadline is None or timed_out else max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            terminate_process_tree(process)
+            usage = wait_for_exit(process)
+        if on_output:
+            push_pending()
+        return command_result(process.returncode, buffers, usage, timed_out, timeout)
+
+class ExecutionJob:
+    """A command execution waiting in, or taken from, the ExecutionService queue."""
+
+    def __init__(self, app_name, command_id, executor, priority=0):
+        """Initialize the job for an executor that has not been started."""
+        self.app_name = app_name
+        self.command_id = command_id
+        self.executor = executor
+        self.priority = priority
+        self.state = 'queued'
+
+class ExecutionService:
+    """Runs commands on a bounded pool of worker threads, with a priority queue and per-application limits.
+
+    At most max_workers commands run at once. Thread executors occupy a worker thread while
+    their command runs; asynchronous executors are only started by a worker, so with the
+    'asyncio' engine a single worker thread starts up to max_workers concurrent commands.
+    """
+
+    def __init__(self, max_workers=MAX_CONCURRENT_COMMANDS, max_per_app=MAX_CONCURRENT_COMMANDS_PER_APP, on_status=None,
+                 dispatch=call_directly, engine=None):
+        """Start the worker threads; on_status(app_name, command_id) is invoked through dispatch when a job changes state."""
+        self.max_workers = max(1, max_workers)
+        self.max_per_app = max_per_app
+        self.on_status = on_status
+        self.dispatch = dispatch
+        self.condition = threading.Condition()
+        self.queue = []
+        self.sequence = 0
+        self.running = []
+        self.running_per_app = {}
+        self.stopped = False
+        threads = 1 if (engine or EXECUTION_ENGINE) == 'asyncio' else self.max_workers
+        self.workers = [threading.Thread(target=self.work, daemon=True) for _ in range(threads)]
+        for worker in self.workers:
+            worker.start()
+
+    def cancel(self, job):
+        """Remove a queued job, or terminate the process of a running one."""
+        with self.condition:
+            state = job.state
+            if state == 'queued':
+                job.state = 'cancelled'
+                self.queue = [item for item in self.queue if item[2] is not job]
+                heapq.heapify(self.queue)
+        if state == 'running':
+            job.executor.terminate()
+        self.notify_status(job)
+
+    def cancel_command(self, app_name, command_id):
+        """Cancel every queued and running job of a command."""
+        for job in self.jobs_for(app_name, command_id):
+            self.cancel(job)
+
+    def finish_job(self, job, error=None):
+        """Release the slot of a job whose execution is over."""
+        if error is not None:
+            logging.error(f"Error executing command {job.command_id}: {error}")
+        with self.condition:
+            job.state = 'finished'
+            self.running.remove(job)
+            self.running_per_app[job.app_name] -= 1
+            self.condition.notify_all()
+        self.notify_status(job)
+
+    def jobs_for(self, app_name, command_id):
+        """Return the queued and running jobs of a command."""
+        with self.condition:
+            jobs = [item[2] for item in self.queue] + self.running
+            return [job for job in jobs if job.app_name == app_name and job.command_id == command_id]
+
+    def next_job(self):
+        """Pop the highest-priority queued job whose application is below its limit; the caller holds the lock."""
+        if len(self.running) >= self.max_workers:
+            return None
+        for item in sorted(self.queue):
+            job = item[2]
+            if self.running_per_app.get(job.app_name, 0) < self.max_per_app:
+                self.queue.remove(item)
+                heapq.heapify(self.queue)
+                return job
+        return None
+
+    def notify_status(self, job):
+        """Report that the state of a command's jobs changed."""
+        if self.on_status:
+            self.dispatch(self.on_status, job.app_name, job.command_id)
+
+    def shutdown(self):
+        """Drop queued jobs, terminate running ones and stop the workers."""
+        with self.condition:
+            self.stopped = True
+            self.queue = []
+            running = list(self.running)
+            self.condition.notify_all()
+        for job in running:
+            job.executor.terminate()
+
+    def status(self, app_name, command_id):
+        """Return a short description of a command's running and queued jobs, or an empty string."""
+        jobs = self.jobs_for(app_name, command_id)
+        running = sum(1 for job in jobs if job.state == 'running')
+        queued = sum(1 for job in jobs if job.state == 'queued')
+        parts = []
+        if running:
+            parts.append("running" if running == 1 else f"running ({running})")
+        if queued:
+            parts.append("queued" if queued == 1 else f"queued ({queued})")
+        return ", ".join(parts)
+
+    def wait(self):
+        """Block until the queue is empty and no job is running."""
+        with self.condition:
+            while self.queue or self.running:
+                self.condition.wait()
+
+    def submit(self, app_name, command_id, executor, priority=0):
+        """Queue a CommandExecutor; lower priority values run first, ties in submission order."""
+        job = ExecutionJob(app_name, command_id, executor, priority)
+        with self.condition:
+            heapq.heappush(self.queue, (priority, self.sequence, job))
+            self.sequence += 1
+            self.condition.notify()
+        self.notify_status(job)
+        return job
+
+    def work(self):
+        """Worker loop taking jobs from the queue and executing them."""
+        while True:
+            with self.condition:
+                job = None
+                while not self.stopped:
+                    job = self.next_job()
+                    if job:
+                        break
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                job.state = 'running'
+                self.running.append(job)
+                self.running_per_app[job.app_name] = self.running_per_app.get(job.app_name, 0) + 1
+            self.notify_status(job)
+
+            if job.executor.asynchronous:
+                future = job.executor.launch()
+                future.add_done_callback(lambda future, job=job: self.finish_job(
+                    job, None if future.cancelled() else future.exception()))
+                continue
+            try:
+                job.executor.execute()
+            except Exception as e:
+                self.finish_job(job, e)
+            else:
+                self.finish_job(job)
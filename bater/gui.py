@@ -0,0 +1,1929 @@
+"""wxPython user interface of BATER."""
+
+import csv
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+import wx
+import wx.lib.scrolledpanel as scrolled
+
+from .daemon import open_manager
+from .executor import MAX_CONCURRENT_COMMANDS, ExecutionService, create_executor
+from .matrix import MatrixRun, parse_parameter_sets, template_placeholders
+from .policy import check_command, describe_verdict
+from .scheduler import Schedule, Scheduler
+from .session import SESSIONS_SUPPORTED
+from .trace import SLOW_OPERATION_MS, ActionProfiler, slow_log, traced, tracer
+from .utils import fill_placeholders, format_history_entry, set_message_handler, summarize_history_entry
+from .workflow import WORKFLOW_POLICIES, WorkflowRun, critical_path
+
+# Number of commands above which the home view switches to a searchable virtual list.
+LARGE_VIEW_THRESHOLD = 200
+
+# Slow-operation threshold used when the log is switched on from the Debug menu without BATER_SLOW_MS.
+DEBUG_SLOW_OPERATION_MS = 100
+
+# Number of UI actions profiled by default from the Debug menu.
+PROFILED_ACTIONS = 5
+
+# Events counted as UI actions while profiling.
+PROFILED_EVENT_TYPES = (wx.wxEVT_BUTTON, wx.wxEVT_MENU, wx.wxEVT_CHECKBOX, wx.wxEVT_LIST_ITEM_ACTIVATED)
+
+# File types offered when exporting and importing the store.
+ARCHIVE_WILDCARD = ("Archives (*.jsonl;*.jsonl.gz;*.jsonl.xz)|*.jsonl;*.jsonl.gz;*.jsonl.xz|"
+                    "JSON exports (*.json)|*.json|All files (*.*)|*.*")
+
+# Import choices, as (label, mode, history merge, include history).
+IMPORT_OPTIONS = [
+    ("Merge, skipping history entries already stored", 'merge', 'dedup', True),
+    ("Merge, adding every history entry", 'merge', 'concat', True),
+    ("Merge commands only, without history", 'merge', 'dedup', False),
+    ("Replace all commands and history", 'replace', 'dedup', True)
+]
+
+def format_run_time(timestamp):
+    """Return a run time as its time of day if it is today, or else as its date and time."""
+    if timestamp.startswith(datetime.now().strftime("%Y-%m-%d")):
+        return timestamp[11:16]
+    return timestamp[:16]
+
+def describe_schedule_times(times):
+    """Return the next and last run times of a scheduled command for the home view."""
+    if not times:
+        return "scheduled"
+    parts = [f"next {format_run_time(times['next_run'])}" if times['next_run'] else "not planned"]
+    if times['last_run']:
+        parts.append(f"last {format_run_time(times['last_run'])}")
+    return ", ".join(parts)
+
+def build_home_view_model(command_manager):
+    """Capture the state shown on the home view as {app_name: {command_id: row_state}}."""
+    schedule_times = command_manager.schedule_times()
+    history_ids = command_manager.history_ids()
+    with command_manager.lock:
+        return {
+            app_name: {
+                command_id: {
+                    'name': command_data['name'],
+                    'command': command_data['command'],
+                    'show_output': command_data.get('show_output', True),
+                    'has_history': command_id in history_ids,
+                    'schedule': describe_schedule_times(schedule_times.get(command_id)) if command_data.get('schedule') else ""
+                }
+                for command_id, command_data in app_commands.items()
+                if isinstance(command_data, dict) and 'name' in command_data and 'command' in command_data
+            }
+            for app_name, app_commands in command_manager.commands.items()
+            if isinstance(app_commands, dict)
+        }
+
+def diff_home_view_models(old, new):
+    """Compare two home view models and return the applications and rows to remove, add and update."""
+    removed_apps = [app_name for app_name in old if app_name not in new]
+    added_apps = [app_name for app_name in new if app_name not in old]
+    removed_rows, added_rows, changed_rows = [], [], []
+    for app_name, rows in new.items():
+        if app_name not in old:
+            continue
+        old_rows = old[app_name]
+        removed_rows += [(app_name, command_id) for command_id in old_rows if command_id not in rows]
+        for command_id, row_state in rows.items():
+            if command_id not in old_rows:
+                added_rows.append((app_name, command_id))
+            elif old_rows[command_id] != row_state:
+                changed_rows.append((app_name, command_id))
+    return {
+        'removed_apps': removed_apps,
+        'added_apps': added_apps,
+        'removed_rows': removed_rows,
+        'added_rows': added_rows,
+        'changed_rows': changed_rows
+    }
+
+class ActionFilter(wx.EventFilter):
+    """Event filter reporting clicks and menu choices to a callback, used to profile the next UI actions."""
+
+    def __init__(self, on_action):
+        """Initialize the filter with the callback to invoke for each action."""
+        super(ActionFilter, self).__init__()
+        self.on_action = on_action
+
+    def FilterEvent(self, event):
+        """Report UI actions and let every event be handled as usual."""
+        if event.GetEventType() in PROFILED_EVENT_TYPES:
+            self.on_action()
+        return self.Event_Skip
+
+class CommandApp(wx.Frame):
+    """The main application class responsible for the UI and user interaction."""
+
+    def __init__(self, parent, title, json_file=None):
+        """Initialize the main application window and its components, opening the given store or the default one."""
+        screen_width, screen_height = wx.GetDisplaySize()
+        initial_size = (1280, 720) if screen_width >= 1920 and screen_height >= 1080 else (640, 480)
+        super(CommandApp, self).__init__(parent, title=title, size=initial_size)
+
+        self.command_manager = open_manager(json_file)
+        self.execution_service = ExecutionService(on_status=self.update_command_status, dispatch=wx.CallAfter)
+        self.profiler = None
+        self.action_filter = None
+        self.scheduler = None
+        self.schedule_refresh_pending = False
+        if getattr(self.command_manager, 'remote', False):
+            # The daemon owns the store and runs the schedules; show what other clients change in it.
+            self.command_manager.add_change_listener(lambda kind: wx.CallAfter(self.on_store_changed, kind))
+        else:
+            # Downsampling and the store-wide budget, when configured, need a pass over every history,
+            # so they run off the UI thread.
+            if self.command_manager.retention_pass_enabled():
+                threading.Thread(target=self.command_manager.apply_retention, daemon=True).start()
+            self.scheduler = Scheduler(self.command_manager, self.execution_service,
+                                       on_change=lambda app_name, command_id: wx.CallAfter(self.on_schedule_change))
+            self.command_manager.scheduler = self.scheduler
+            self.scheduler.start()
+        self.last_parameters = {}
+        self.view_model = {}
+        self.app_frames = {}
+        self.command_rows = {}
+        self.command_list = None
+        self.apps_sizer = None
+
+        self.panel = scrolled.ScrolledPanel(self)
+        self.panel.SetAutoLayout(1)
+        self.panel.SetupScrolling()
+
+        self.sizer = wx.BoxSizer(wx.VERTICAL)
+
+        self.create_menu_bar()
+        self.update_home_display()
+        self.panel.SetSizer(self.sizer)
+
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+
+    def create_menu_bar(self):
+        """Create the main menu bar with File, Help, Restart, and About menus."""
+        menu_bar = wx.MenuBar()
+
+        file_menu = wx.Menu()
+        about_item = file_menu.Append(wx.ID_ABOUT, "About")
+        file_menu.AppendSeparator()
+        add_app = file_menu.Append(wx.ID_ANY, "Add APP")
+        search_item = file_menu.Append(wx.ID_ANY, "Search History\tCtrl+F")
+        import_item = file_menu.Append(wx.ID_ANY, "Import Commands...")
+        export_item = file_menu.Append(wx.ID_ANY, "Export Commands...")
+        reload_item = file_menu.Append(wx.ID_ANY, "Reload\tCtrl+R")
+        help_item = file_menu.Append(wx.ID_ANY, "Help")
+
+        file_menu.AppendSeparator()
+        restart_app = file_menu.Append(wx.ID_ANY, "Restart")
+        exit_app = file_menu.Append(wx.ID_EXIT, "Exit")
+
+
+        menu_bar.Append(file_menu, "BATER")
+
+        debug_menu = wx.Menu()
+        trace_item = debug_menu.AppendCheckItem(wx.ID_ANY, "Record Trace")
+        trace_item.Check(tracer.enabled)
+        save_trace_item = debug_menu.Append(wx.ID_ANY, "Save Trace...")
+        slow_item = debug_menu.AppendCheckItem(wx.ID_ANY, "Log Slow Operations")
+        slow_item.Check(bool(tracer.slow_ms))
+        debug_menu.AppendSeparator()
+        profile_item = debug_menu.Append(wx.ID_ANY, "Profile Next Actions...")
+        menu_bar.Append(debug_menu, "Debug")
+        self.SetMenuBar(menu_bar)
+
+        self.Bind(wx.EVT_MENU, self.open_add_application_window, add_app)
+        self.Bind(wx.EVT_MENU, self.open_search_window, search_item)
+        self.Bind(wx.EVT_MENU, self.open_import_window, import_item)
+        self.Bind(wx.EVT_MENU, self.open_export_window, export_item)
+        self.Bind(wx.EVT_MENU, self.reload_store, reload_item)
+        self.Bind(wx.EVT_MENU, self.open_help_window, help_item)
+        self.Bind(wx.EVT_MENU, self.open_about_window, about_item)
+        self.Bind(wx.EVT_MENU, self.quit_application, exit_app)
+        self.Bind(wx.EVT_MENU, self.restart_application, restart_app)
+        self.Bind(wx.EVT_MENU, lambda event: tracer.set_enabled(event.IsChecked()), trace_item)
+        self.Bind(wx.EVT_MENU, self.save_trace, save_trace_item)
+        self.Bind(wx.EVT_MENU, self.toggle_slow_log, slow_item)
+        self.Bind(wx.EVT_MENU, self.start_profiling, profile_item)
+
+    def open_add_application_window(self, event=None):
+        """Open a dialog to add a new application."""
+        dialog = wx.TextEntryDialog(self, "Enter application name:", "Add Application")
+        if dialog.ShowModal() == wx.ID_OK:
+            app_name = dialog.GetValue()
+            if app_name:
+                if self.command_manager.add_application(app_name):
+                    self.update_home_display()
+                else:
+                    wx.MessageBox(f"Application '{app_name}' already exists.", "Warning", wx.OK | wx.ICON_WARNING)
+
+    def open_add_command_window(self, app_name):
+        """Open a dialog to add a new command to an application."""
+        command_name = wx.GetTextFromUser(f"Enter command name for application '{app_name}':", "Add Command")
+        if command_name:
+            command_text = wx.GetTextFromUser(f"Enter command text for '{command_name}':", "Add Command Text")
+            if command_text:
+                if self.command_manager.add_command(app_name, command_name, command_text):
+                    self.update_home_display()
+                else:
+                    wx.MessageBox(f"Failed to add command '{command_name}' to application '{app_name}'.", "Warning", wx.OK | wx.ICON_WARNING)
+
+    def open_help_window(self, event):
+        """Open the Help window with usage instructions."""
+        help_text = (
+            "Help:\n\n"
+            "1. **Add Application**: Use 'File > Add Application' to add a new application.\n\n"
+            "2. **Add Command**: Click 'Add Cmd' under an application's frame to add a new command.\n\n"
+            "3. **Edit Command**: Use the 'Edit' button next to a command to modify it.\n\n"
+            "4. **Delete Command**: Use the 'Delete' button to remove a command.\n\n"
+            "5. **Run Command**: Click 'Run' to execute a command.\n\n"
+            "6. **View History**: Click 'History' next to a command to see its past executions.\n\n"
+            "7. **Edit Application**: Use the 'Edit' button to modify the name of an application.\n\n"
+            "8. **Delete Application**: Use the 'Delete' button to remove an entire application and its commands.\n\n"
+            "9. **Restart Application**: Use 'File > Restart Application' to restart the application.\n\n"
+            "10. **Exit**: Use 'File > Exit' to quit the application.\n\n"
+            "11. **Search History**: Use 'File > Search History' (Ctrl+F) to search the commands and outputs of all histories.\n\n"
+            "12. **Cache Results**: Use the 'Cache' button to reuse a command's successful output for a number of seconds instead of running it again.\n\n"
+            "13. **Templates**: Write placeholders such as {host} in a command; 'Run' asks for their values, and 'Matrix Run...' runs the command once per row of a CSV or list of values, in parallel.\n\n"
+            "14. **Workflows**: Click 'Flows' in an application's frame to chain its commands into steps with dependencies; independent steps run in parallel.\n\n"
+            "15. **Statistics**: Click 'Statistics...' in a command's history to see its duration percentiles, failure rate, resource usage and trend.\n\n"
+            "16. **Shell Sessions**: Check 'Run in the application's shell session' when editing a command to run it in a shell kept open between runs, which starts faster and keeps 'cd' and exported variables.\n\n"
+            "17. **Import and Export**: Use 'File > Export Commands...' to save everything to an archive, compressed when its name ends with .gz or .xz, and 'File > Import Commands...' to merge an archive into your commands or replace them with it.\n\n"
+            "18. **Daemon and Reload**: While 'bater daemon' runs, the GUI and the command line share its store and run commands through it, and changes made by others show up at once; otherwise use 'File > Reload' (Ctrl+R) to read changes made to the store by other programs.\n\n"
+            "19. **Schedules**: Click 'Schedule' next to a command to run it every few seconds, minutes or hours, or on a cron expression such as '*/5 * * * *'; the next and last run times are shown on its row and the runs are added to its history. Schedules run while the GUI or 'bater daemon' is open.\n\n"
+            "20. **Debug**: When the GUI is slow, check 'Debug > Record Trace', repeat what was slow, and use 'Debug > Save Trace...' to open the timings in chrome://tracing; 'Log Slow Operations' writes operations slower than 100 ms to bater_slow.log, and 'Profile Next Actions...' profiles the next clicks with cProfile.\n\n"
+            "For further assistance, refer to the documentation or contact support."
+        )
+        wx.MessageBox(help_text, "Help", wx.OK | wx.ICON_INFORMATION)
+
+    def open_workflows_window(self, app_name):
+        """Open the dialog managing and running the workflows of an application."""
+        dialog = WorkflowsDialog(self, self.command_manager, app_name)
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def open_export_window(self, event=None):
+        """Ask for an archive file and export the store to it on a background thread."""
+        with wx.FileDialog(self, "Export Commands", defaultFile="bater.jsonl.gz", wildcard=ARCHIVE_WILDCARD,
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            path = dialog.GetPath()
+        include_history = wx.MessageBox("Include the history of the commands?", "Export Commands",
+                                        wx.YES_NO | wx.ICON_QUESTION) == wx.YES
+
+        def export():
+            counts = self.command_manager.export_commands(path, include_history)
+            if counts is not None:
+                wx.CallAfter(wx.MessageBox, f"Exported {counts['commands']} commands, {counts['workflows']} workflows and "
+                             f"{counts['history']} history entries to '{path}'.", "Export Commands", wx.OK | wx.ICON_INFORMATION)
+
+        threading.Thread(target=export, daemon=True).start()
+
+    def open_import_window(self, event=None):
+        """Ask for an archive file and how to import it, then import it on a background thread."""
+        with wx.FileDialog(self, "Import Commands", wildcard=ARCHIVE_WILDCARD,
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            path = dialog.GetPath()
+        with wx.SingleChoiceDialog(self, "How should the archive be imported?", "Import Commands",
+                                   [option[0] for option in IMPORT_OPTIONS]) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            _, mode, history, include_history = IMPORT_OPTIONS[dialog.GetSelection()]
+        if mode == 'replace' and wx.MessageBox("Replace all commands and their history with the archive?",
+                                               "Import Commands", wx.YES_NO | wx.ICON_QUESTION) != wx.YES:
+            return
+
+        def import_archive():
+            counts = self.command_manager.import_commands(path, mode, history, include_history)
+            if counts is not None:
+                wx.CallAfter(self.on_import_finished, counts)
+
+        threading.Thread(target=import_archive, daemon=True).start()
+
+    def on_import_finished(self, counts):
+        """Show the imported commands and report what was imported."""
+        self.update_home_display()
+        wx.MessageBox(f"Imported {counts['apps']} applications, {counts['commands']} commands, {counts['workflows']} workflows "
+                      f"and {counts['history']} history entries; {counts['duplicates']} duplicate entries were skipped.",
+                      "Import Commands", wx.OK | wx.ICON_INFORMATION)
+
+    def on_schedule_change(self):
+        """Show the next and last run times after scheduled runs, once for a burst of them."""
+        if not self.schedule_refresh_pending:
+            self.schedule_refresh_pending = True
+            wx.CallLater(500, self.refresh_schedules)
+
+    def refresh_schedules(self):
+        """Bring the home view's run times up to date."""
+        self.schedule_refresh_pending = False
+        self.update_home_display()
+
+    def on_store_changed(self, kind):
+        """Show the changes another client made through the daemon, or report that the daemon stopped."""
+        if kind == 'disconnected':
+            wx.MessageBox("The connection to the bater daemon was lost; changes can no longer be saved. Restart to continue.",
+                          "Error", wx.OK | wx.ICON_ERROR)
+        elif kind == 'schedule':
+            self.on_schedule_change()
+        else:
+            self.update_home_display()
+
+    def reload_store(self, event=None):
+        """Read the store again to show changes made by other programs."""
+        self.command_manager.reload()
+        self.update_home_display()
+
+    def open_search_window(self, event=None):
+        """Open the dialog searching the history of all commands."""
+        dialog = SearchDialog(self, self.command_manager)
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def open_about_window(self, event):
+        """Open the About window with application details."""
+        about_text = (
+            "BATER: Terminal Command Controller\n"
+            "Version 1.0\n"
+            "Developed by Rafael Martins\n"
+            "© 2024"
+        )
+        cache_stats = self.command_manager.history_cache_stats()
+        if cache_stats:
+            about_text += (
+                f"\n\nHistory cache: {cache_stats['commands']} commands, "
+                f"{cache_stats['bytes'] // 1024} KB of {cache_stats['max_bytes'] // 1024} KB"
+            )
+        wx.MessageBox(about_text, "About", wx.OK | wx.ICON_INFORMATION)
+
+    def edit_application_name(self, app_name):
+        """Edit the name of the application."""
+        dialog = wx.TextEntryDialog(self, f"Enter new name for the application '{app_name}':", "Edit Application Name")
+        if dialog.ShowModal() == wx.ID_OK:
+            new_name = dialog.GetValue()
+            if new_name and new_name != app_name:
+                if self.command_manager.rename_application(app_name, new_name):
+                    self.update_home_display()
+                else:
+                    wx.MessageBox(f"Application '{new_name}' already exists.", "Warning", wx.OK | wx.ICON_WARNING)
+
+    def delete_application(self, app_name):
+        """Delete an entire application and all its commands."""
+        if app_name in self.command_manager.commands:
+            confirm = wx.MessageBox(f"Are you sure you want to delete '{app_name}'?", "Delete Application", wx.YES_NO | wx.ICON_QUESTION)
+            if confirm == wx.YES:
+                self.command_manager.delete_application(app_name)
+                self.update_home_display()
+        else:
+            wx.MessageBox(f"Application '{app_name}' not found.", "Warning", wx.OK | wx.ICON_WARNING)
+
+    def open_edit_command_window(self, app_name, command_id):
+        """Open a window to edit an existing command."""
+        command_data = self.command_manager.commands.get(app_name, {}).get(command_id, {})
+        if not command_data:
+            wx.MessageBox("Command not found.", "Warning", wx.OK | wx.ICON_WARNING)
+            return
+
+        dialog = wx.Dialog(self, title=f"Edit Command: {command_data['name']}", size=(400, 300))
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        name_label = wx.StaticText(dialog, label="Command Name:")
+        vbox.Add(name_label, 0, wx.ALL | wx.EXPAND, 5)
+        name_entry = wx.TextCtrl(dialog, value=command_data['name'])
+        vbox.Add(name_entry, 0, wx.ALL | wx.EXPAND, 5)
+
+        command_label = wx.StaticText(dialog, label="Command Text:")
+        vbox.Add(command_label, 0, wx.ALL | wx.EXPAND, 5)
+        command_entry = wx.TextCtrl(dialog, value=command_data['command'], style=wx.TE_MULTILINE)
+        vbox.Add(command_entry, 1, wx.ALL | wx.EXPAND, 5)
+
+        session_checkbox = wx.CheckBox(dialog, label="Run in the application's shell session")
+        session_checkbox.SetValue(self.command_manager.uses_session(app_name, command_id))
+        session_checkbox.Enable(SESSIONS_SUPPORTED)
+        vbox.Add(session_checkbox, 0, wx.ALL | wx.EXPAND, 5)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        save_button = wx.Button(dialog, label="Save")
+        save_button.Bind(wx.EVT_BUTTON, lambda event: self.save_command_changes(dialog, app_name, command_id, name_entry.GetValue(), command_entry.GetValue(),
+                                                                                session_checkbox.GetValue()))
+        button_sizer.Add(save_button, 0, wx.ALL, 5)
+
+        execute_button = wx.Button(dialog, label="Execute")
+        execute_button.Bind(wx.EVT_BUTTON, lambda event: self.execute_command(app_name, command_id, command_entry.GetValue()))
+        button_sizer.Add(execute_button, 0, wx.ALL, 5)
+
+        close_button = wx.Button(dialog, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda event: dialog.Destroy())
+        button_sizer.Add(close_button, 0, wx.ALL, 5)
+
+        vbox.Add(button_sizer, 0, wx.ALIGN_RIGHT | wx.ALL, 5)
+
+        dialog.SetSizer(vbox)
+        dialog.ShowModal()
+
+    def save_command_changes(self, dialog, app_name, command_id, new_name, new_command_text, use_session=False):
+        """Save the edited command changes."""
+        if new_name and new_command_text:
+            self.command_manager.edit_command(app_name, command_id, new_name, new_command_text)
+            self.command_manager.set_session(app_name, command_id, use_session)
+            self.update_home_display()
+            dialog.Destroy()
+
+    def execute_command(self, app_name, command_id, command):
+        """Execute a command, with a warning if it's potentially dangerous."""
+        verdict = check_command(command)
+        if verdict['dangerous']:
+            wx.MessageBox("This command may be dangerous. Please confirm its safety.\n\n" + "\n".join(describe_verdict(verdict)),
+                          "Dangerous Command", wx.OK | wx.ICON_WARNING)
+            return
+
+        command_data = self.command_manager.commands[app_name][command_id]
+        output_window = None
+        if command_data.get('show_output', True):
+            output_window = OutputWindow(self, f"Command Output: {command_data['name']}")
+            output_window.Show()
+
+        def on_command_finished(success, result):
+            if output_window:
+                output_window.set_finished(result)
+
+        executor = create_executor(command, on_command_finished, app_name, command_id, self.command_manager,
+                                   on_output=output_window.append_output if output_window else None,
+                                   dispatch=wx.CallAfter)
+        self.execution_service.submit(app_name, command_id, executor)
+
+    def stop_command(self, app_name, command_id):
+        """Cancel the queued and running executions of a command."""
+        self.execution_service.cancel_command(app_name, command_id)
+
+    def update_command_status(self, app_name, command_id):
+        """Show whether a command is running or queued on its row."""
+        if self.command_list is not None:
+            self.command_list.refresh_status(app_name, command_id)
+            return
+        row = self.command_rows.get((app_name, command_id))
+        if not row:
+            return
+        status = self.execution_service.status(app_name, command_id)
+        row['status'].SetLabel(status)
+        row['stop'].Enable(bool(status))
+        if not status:
+            # A finished run may have added the first history entry.
+            row['history'].Enable(self.command_manager.has_command_history(app_name, command_id))
+        row['panel'].Layout()
+
+    def delete_command(self, app_name, command_id):
+        """Delete a specific command from an application."""
+        if self.command_manager.delete_command(app_name, command_id):
+            self.update_home_display()
+        else:
+            wx.MessageBox("Failed to delete command.", "Warning", wx.OK | wx.ICON_WARNING)
+
+    def on_checkbox_toggle(self, event, app_name, command_id):
+        """Handle the checkbox toggle to update the JSON file."""
+        checkbox = event.GetEventObject()
+        show_output = checkbox.GetValue()
+        self.command_manager.update_show_output(app_name, command_id, show_output)
+
+    def open_cache_window(self, app_name, command_id):
+        """Open a dialog setting how long a command's results are reused."""
+        dialog = CacheDialog(self, self.command_manager, app_name, command_id)
+        if dialog.ShowModal() == wx.ID_OK:
+            self.command_manager.set_cache_ttl(app_name, command_id, dialog.ttl_spin.GetValue())
+        dialog.Destroy()
+
+    def save_trace(self, event=None):
+        """Save the recorded spans as a Chrome trace-event file."""
+        if not tracer.events:
+            wx.MessageBox("No spans were recorded. Check 'Debug > Record Trace' first.", "Save Trace",
+                          wx.OK | wx.ICON_INFORMATION)
+            return
+        with wx.FileDialog(self, "Save Trace", defaultFile="bater_trace.json", wildcard="Trace files (*.json)|*.json",
+                           style=wx.FD_SAVE | wx.FD_OVERWRITE_PROMPT) as dialog:
+            if dialog.ShowModal() != wx.ID_OK:
+                return
+            path = dialog.GetPath()
+        try:
+            count = tracer.save(path)
+        except OSError as e:
+            logging.error(f"Error saving trace: {e}")
+            wx.MessageBox(f"Failed to save the trace. Details: {e}", "Error", wx.OK | wx.ICON_ERROR)
+            return
+        wx.MessageBox(f"Saved {count} trace events to {path}.\nOpen it in chrome://tracing or https://ui.perfetto.dev.",
+                      "Save Trace", wx.OK | wx.ICON_INFORMATION)
+
+    def toggle_slow_log(self, event):
+        """Start or stop logging slow operations to bater_slow.log."""
+        tracer.set_slow_threshold((SLOW_OPERATION_MS or DEBUG_SLOW_OPERATION_MS) if event.IsChecked() else 0)
+
+    def start_profiling(self, event=None):
+        """Profile the next few UI actions with cProfile."""
+        if self.profiler is not None:
+            wx.MessageBox("Profiling is already running.", "Profile", wx.OK | wx.ICON_INFORMATION)
+            return
+        actions = wx.GetNumberFromUser("Profile how many of the next UI actions (clicks and menu choices)?", "Actions:",
+                                       "Profile Next Actions", PROFILED_ACTIONS, 1, 100, self)
+        if actions < 1:
+            return
+        self.profiler = ActionProfiler(actions)
+        self.action_filter = ActionFilter(self.on_profiled_action)
+        wx.EvtHandler.AddFilter(self.action_filter)
+
+    def on_profiled_action(self):
+        """Count a UI action while profiling, and stop once its handler ran if it was the last one."""
+        if self.profiler is not None and self.profiler.count_action():
+            wx.CallAfter(self.stop_profiling)
+
+    def stop_profiling(self):
+        """Stop profiling, save the statistics and show the slowest functions."""
+        if self.profiler is None:
+            return
+        wx.EvtHandler.RemoveFilter(self.action_filter)
+        path = f"bater_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}.prof"
+        try:
+            report = self.profiler.stop(path)
+        except OSError as e:
+            logging.error(f"Error saving profile: {e}")
+            report = self.profiler.stop()
+            path = None
+        actions = self.profiler.actions
+        self.profiler = None
+        self.action_filter = None
+        report_window = OutputWindow(self, f"Profile of {actions} actions")
+        report_window.append_output('stdout', report)
+        report_window.status_label.SetLabel(f"Saved to {path}" if path else "Not saved")
+        report_window.Show()
+
+    def open_schedule_window(self, app_name, command_id):
+        """Open a dialog setting when a command runs on its own."""
+        dialog = ScheduleDialog(self, self.command_manager, app_name, command_id)
+        if dialog.ShowModal() == wx.ID_OK:
+            try:
+                self.command_manager.set_schedule(app_name, command_id, dialog.get_schedule())
+            except ValueError as e:
+                wx.MessageBox(f"Failed to set the schedule. Details: {e}", "Error", wx.OK | wx.ICON_ERROR)
+            self.update_home_display()
+        dialog.Destroy()
+
+    def restart_application(self, event):
+        """Restart the application."""
+        self.Close()
+        wx.GetApp().ExitMainLoop()
+
+        # Re-launch the application
+        python = sys.executable
+        os.execl(python, python, *sys.argv)
+
+    def quit_application(self, event):
+        """Quit the application."""
+        self.Close()
+
+    def on_close(self, event):
+        """Stop running commands and flush pending changes to disk before the window closes."""
+        if self.action_filter is not None:
+            # Event filters must be removed before the application exits.
+            wx.EvtHandler.RemoveFilter(self.action_filter)
+            self.profiler.stop()
+        if self.scheduler:
+            self.scheduler.stop()
+        self.execution_service.shutdown()
+        if getattr(self.command_manager, 'remote', False):
+            self.command_manager.close()
+        else:
+            self.command_manager.flush()
+        event.Skip()
+
+    def show_command_history(self, app_name, command_id):
+        """Show the history of a specific command in a new window."""
+        if not self.command_manager.count_command_history(app_name, command_id):
+            wx.MessageBox("No history available for this command.", "History", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        with tracer.span('show_command_history'):
+            dialog = HistoryDialog(self, self.command_manager, app_name, command_id)
+            if tracer.active:
+                tracer.add('widgets', len(dialog.GetChildren()))
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    @traced('update_home_display')
+    def update_home_display(self):
+        """Bring the home display in line with the stored commands, touching only what changed."""
+        new_model = build_home_view_model(self.command_manager)
+        command_count = sum(len(rows) for rows in new_model.values())
+
+        if command_count > LARGE_VIEW_THRESHOLD:
+            if self.command_list is None:
+                self.clear_home_display()
+                self.command_list = CommandListPanel(self.panel, self)
+                self.sizer.Add(self.command_list, 1, wx.EXPAND | wx.ALL, 10)
+            self.command_list.set_model(new_model)
+            self.view_model = new_model
+            self.Layout()
+            return
+
+        if self.apps_sizer is None:
+            self.clear_home_display()
+            self.apps_sizer = wx.FlexGridSizer(cols=2, hgap=10, vgap=10)
+            self.apps_sizer.AddGrowableCol(0, 1)
+            self.apps_sizer.AddGrowableCol(1, 1)
+            self.sizer.Add(self.apps_sizer, 1, wx.EXPAND | wx.ALL, 10)
+
+        diff = diff_home_view_models(self.view_model, new_model)
+        for app_name in diff['removed_apps']:
+            self.remove_app_frame(app_name)
+        for app_name, command_id in diff['removed_rows']:
+            self.remove_command_row(app_name, command_id)
+        for app_name in diff['added_apps']:
+            self.add_app_frame(app_name, list(new_model).index(app_name), new_model[app_name])
+        for app_name, command_id in diff['added_rows']:
+            self.add_command_row(app_name, command_id, list(new_model[app_name]).index(command_id),
+                                 new_model[app_name][command_id])
+        for app_name, command_id in diff['changed_rows']:
+            self.update_command_row(app_name, command_id, new_model[app_name][command_id])
+        self.view_model = new_model
+
+        self.panel.SetupScrolling(scrollToTop=False)
+        self.Layout()
+
+    def clear_home_display(self):
+        """Destroy every widget on the home display, e.g. when switching between grid and list views."""
+        self.sizer.Clear(True)
+        self.view_model = {}
+        self.app_frames = {}
+        self.command_rows = {}
+        self.command_list = None
+        self.apps_sizer = None
+
+    def add_app_frame(self, app_name, index, rows):
+        """Create the frame of an application with its commands at a position of the grid."""
+        app_box = wx.StaticBox(self.panel, label=app_name)
+        app_sizer = wx.StaticBoxSizer(app_box, wx.VERTICAL)
+
+        label_panel = wx.Panel(self.panel)
+        label_sizer = wx.BoxSizer(wx.HORIZONTAL)
+
+        add_cmd_label = wx.StaticText(label_panel, label="Add Cmd")
+        add_cmd_label.SetForegroundColour(wx.Colour(0, 128, 0))
+        add_cmd_label.SetCursor(wx.Cursor(wx.CURSOR_HAND))
+        add_cmd_label.Bind(wx.EVT_LEFT_DOWN, lambda event, app=app_name: self.open_add_command_window(app))
+        label_sizer.Add(add_cmd_label, 0, wx.ALL | wx.ALIGN_LEFT, 5)
+
+        flows_label = wx.StaticText(label_panel, label="Flows")
+        flows_label.SetForegroundColour(wx.Colour(128, 0, 128))
+        flows_label.SetCursor(wx.Cursor(wx.CURSOR_HAND))
+        flows_label.Bind(wx.EVT_LEFT_DOWN, lambda event, app=app_name: self.open_workflows_window(app))
+        label_sizer.Add(flows_label, 0, wx.ALL, 5)
+
+        label_sizer.AddStretchSpacer(1)
+
+        edit_label = wx.StaticText(label_panel, label="Edit")
+        edit_label.SetForegroundColour(wx.BLUE)
+        edit_label.SetCursor(wx.Cursor(wx.CURSOR_HAND))
+        edit_label.Bind(wx.EVT_LEFT_DOWN, lambda event, app=app_name: self.edit_application_name(app))
+        label_sizer.Add(edit_label, 0, wx.ALL, 5)
+
+        del_label = wx.StaticText(label_panel, label="Del")
+        del_label.SetForegroundColour(wx.RED)
+        del_label.SetCursor(wx.Cursor(wx.CURSOR_HAND))
+        del_label.Bind(wx.EVT_LEFT_DOWN, lambda event, app=app_name: self.delete_application(app))
+        label_sizer.Add(del_label, 0, wx.ALL, 5)
+
+        label_panel.SetSizer(label_sizer)
+        app_sizer.Add(label_panel, 0, wx.ALL | wx.EXPAND, 5)
+
+        self.apps_sizer.Insert(index, app_sizer, 1, wx.ALL | wx.EXPAND, 10)
+        self.app_frames[app_name] = {'box': app_box, 'sizer': app_sizer}
+
+        for position, (command_id, row_state) in enumerate(rows.items()):
+            self.add_command_row(app_name, command_id, position, row_state)
+
+    def remove_app_frame(self, app_name):
+        """Destroy the frame of an application and all of its rows."""
+        frame = self.app_frames.pop(app_name)
+        for key in [key for key in self.command_rows if key[0] == app_name]:
+            del self.command_rows[key]
+        frame['sizer'].Clear(True)
+        # Removing the sizer deletes it, and a StaticBoxSizer deletes the static box it owns.
+        self.apps_sizer.Remove(frame['sizer'])
+
+    def add_command_row(self, app_name, command_id, index, row_state):
+        """Create the row of a command at a position within its application frame."""
+        command_panel = wx.Panel(self.panel)
+        command_sizer = wx.BoxSizer(wx.HORIZONTAL)
+
+        checkbox = wx.CheckBox(command_panel, label="")
+        checkbox.SetToolTip("Show Output")
+        checkbox.Bind(wx.EVT_CHECKBOX, lambda event, app=app_name, cmd_id=command_id: self.on_checkbox_toggle(event, app, cmd_id))
+        command_sizer.Add(checkbox, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        command_label = wx.StaticText(command_panel, label="")
+        command_sizer.Add(command_label, 1, wx.ALL | wx.EXPAND, 5)
+
+        schedule_label = wx.StaticText(command_panel, label="")
+        command_sizer.Add(schedule_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        status_label = wx.StaticText(command_panel, label="")
+        command_sizer.Add(status_label, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+
+        run_button = wx.Button(command_panel, label="Run")
+        run_button.Bind(wx.EVT_BUTTON, lambda event, app=app_name, cmd_id=command_id: self.run_stored_command(app, cmd_id))
+        command_sizer.Add(run_button, 0, wx.ALL, 5)
+
+        stop_button = wx.Button(command_panel, label="Stop")
+        stop_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.stop_command(app, cmd_id))
+        command_sizer.Add(stop_button, 0, wx.ALL, 5)
+
+        edit_button = wx.Button(command_panel, label="Edit")
+        edit_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.open_edit_command_window(app, cmd_id))
+        command_sizer.Add(edit_button, 0, wx.ALL, 5)
+
+        cache_button = wx.Button(command_panel, label="Cache")
+        cache_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.open_cache_window(app, cmd_id))
+        command_sizer.Add(cache_button, 0, wx.ALL, 5)
+
+        schedule_button = wx.Button(command_panel, label="Schedule")
+        schedule_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.open_schedule_window(app, cmd_id))
+        command_sizer.Add(schedule_button, 0, wx.ALL, 5)
+
+        history_button = wx.Button(command_panel, label="History")
+        history_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.show_command_history(app, cmd_id))
+        command_sizer.Add(history_button, 0, wx.ALL, 5)
+
+        delete_button = wx.Button(command_panel, label="Delete")
+        delete_button.Bind(wx.EVT_BUTTON, lambda event, cmd_id=command_id, app=app_name: self.delete_command(app, cmd_id))
+        command_sizer.Add(delete_button, 0, wx.ALL, 5)
+
+        command_panel.SetSizer(command_sizer)
+        self.app_frames[app_name]['sizer'].Insert(index, command_panel, 0, wx.ALL | wx.EXPAND, 5)
+        if tracer.active:
+            tracer.add('widgets', len(command_panel.GetChildren()) + 1)
+
+        self.command_rows[(app_name, command_id)] = {
+            'panel': command_panel,
+            'checkbox': checkbox,
+            'label': command_label,
+            'schedule': schedule_label,
+            'status': status_label,
+            'stop': stop_button,
+            'history': history_button
+        }
+        self.update_command_row(app_name, command_id, row_state)
+        self.update_command_status(app_name, command_id)
+
+    def remove_command_row(self, app_name, command_id):
+        """Destroy the row of a command."""
+        row = self.command_rows.pop((app_name, command_id))
+        self.app_frames[app_name]['sizer'].Detach(row['panel'])
+        row['panel'].Destroy()
+
+    def update_command_row(self, app_name, command_id, row_state):
+        """Refresh the widgets of a row from its view model state."""
+        row = self.command_rows[(app_name, command_id)]
+        row['checkbox'].SetValue(row_state['show_output'])
+        row['label'].SetLabel(row_state['name'])
+        row['schedule'].SetLabel(row_state['schedule'])
+        row['history'].Enable(row_state['has_history'])
+        row['panel'].Layout()
+
+    def run_stored_command(self, app_name, command_id):
+        """Execute the current text of a stored command, asking first for the values of its placeholders."""
+        command_data = self.command_manager.commands.get(app_name, {}).get(command_id)
+        if not command_data:
+            return
+        placeholders = template_placeholders(command_data['command'])
+        if not placeholders:
+            self.execute_command(app_name, command_id, command_data['command'])
+            return
+
+        dialog = ParametersDialog(self, command_data['name'], placeholders,
+                                  self.last_parameters.get((app_name, command_id), {}))
+        choice = dialog.ShowModal()
+        values = dialog.get_values()
+        dialog.Destroy()
+        if choice == wx.ID_OK:
+            self.last_parameters[(app_name, command_id)] = values
+            self.execute_command(app_name, command_id, fill_placeholders(command_data['command'], values))
+        elif choice == ParametersDialog.ID_MATRIX:
+            MatrixWindow(self, self.command_manager, app_name, command_id).Show()
+
+class CommandListCtrl(wx.ListCtrl):
+    """Virtual list of commands used by the home view when there are too many for the grid."""
+
+    def __init__(self, parent, app):
+        """Initialize the list for the main application window."""
+        super(CommandListCtrl, self).__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.app = app
+        self.rows = []
+
+        self.InsertColumn(0, "Application", width=140)
+        self.InsertColumn(1, "Command", width=160)
+        self.InsertColumn(2, "Status", width=90)
+        self.InsertColumn(3, "Schedule", width=150)
+        self.InsertColumn(4, "Command Text", width=320)
+
+    def OnGetItemText(self, item, column):
+        """Return the text of a cell; called by wx only for visible rows."""
+        app_name, command_id, row_state = self.rows[item]
+        if column == 0:
+            return app_name
+        if column == 1:
+            return row_state['name']
+        if column == 2:
+            return self.app.execution_service.status(app_name, command_id)
+        if column == 3:
+            return row_state['schedule']
+        return row_state['command']
+
+    def set_rows(self, rows):
+        """Show a new list of (app_name, command_id, row_state) rows."""
+        self.rows = rows
+        self.SetItemCount(len(rows))
+        self.Refresh()
+
+class CommandListPanel(wx.Panel):
+    """Searchable command list with actions on the selected command."""
+
+    def __init__(self, parent, app):
+        """Initialize the panel for the main application window."""
+        super(CommandListPanel, self).__init__(parent)
+        self.app = app
+        self.model = {}
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.search_entry = wx.SearchCtrl(self)
+        self.search_entry.ShowCancelButton(True)
+        self.search_entry.Bind(wx.EVT_TEXT, lambda event: self.apply_filter())
+        self.search_entry.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, lambda event: self.search_entry.SetValue(""))
+        vbox.Add(self.search_entry, 0, wx.ALL | wx.EXPAND, 5)
+
+        self.command_list = CommandListCtrl(self, app)
+        self.command_list.Bind(wx.EVT_LIST_ITEM_SELECTED, lambda event: self.update_buttons())
+        self.command_list.Bind(wx.EVT_LIST_ITEM_ACTIVATED, lambda event: self.on_action(app.run_stored_command))
+        vbox.Add(self.command_list, 1, wx.ALL | wx.EXPAND, 5)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.show_output_checkbox = wx.CheckBox(self, label="Show Output")
+        self.show_output_checkbox.Bind(wx.EVT_CHECKBOX, self.on_show_output_toggle)
+        button_sizer.Add(self.show_output_checkbox, 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.buttons = {}
+        for label, action in (("Run", app.run_stored_command), ("Stop", app.stop_command),
+                              ("Edit", app.open_edit_command_window), ("Cache", app.open_cache_window),
+                              ("Schedule", app.open_schedule_window), ("History", app.show_command_history),
+                              ("Delete", app.delete_command)):
+            button = wx.Button(self, label=label)
+            button.Bind(wx.EVT_BUTTON, lambda event, action=action: self.on_action(action))
+            button_sizer.Add(button, 0, wx.ALL, 5)
+            self.buttons[label] = button
+        button_sizer.AddStretchSpacer(1)
+        for label, action in (("Add Cmd", app.open_add_command_window), ("Workflows", app.open_workflows_window),
+                              ("Edit App", app.edit_application_name), ("Delete App", app.delete_application)):
+            button = wx.Button(self, label=label)
+            button.Bind(wx.EVT_BUTTON, lambda event, action=action: self.on_app_action(action))
+            button_sizer.Add(button, 0, wx.ALL, 5)
+            self.buttons[label] = button
+        vbox.Add(button_sizer, 0, wx.EXPAND)
+
+        self.SetSizer(vbox)
+        self.update_buttons()
+
+    def apply_filter(self):
+        """Show the commands whose application, name or text contain every word of the search."""
+        words = self.search_entry.GetValue().lower().split()
+        rows = []
+        for app_name, app_rows in self.model.items():
+            for command_id, row_state in app_rows.items():
+                haystack = f"{app_name} {row_state['name']} {row_state['command']}".lower()
+                if all(word in haystack for word in words):
+                    rows.append((app_name, command_id, row_state))
+        self.command_list.set_rows(rows)
+        self.update_buttons()
+
+    def on_action(self, action):
+        """Run a command action on the selected row."""
+        selected = self.selected_row()
+        if selected:
+            action(selected[0], selected[1])
+
+    def on_app_action(self, action):
+        """Run an application action on the application of the selected row."""
+        selected = self.selected_row()
+        if selected:
+            action(selected[0])
+
+    def on_show_output_toggle(self, event):
+        """Store the 'show output' setting of the selected command."""
+        selected = self.selected_row()
+        if selected:
+            selected[2]['show_output'] = self.show_output_checkbox.GetValue()
+            self.app.command_manager.update_show_output(selected[0], selected[1], selected[2]['show_output'])
+
+    def refresh_status(self, app_name, command_id):
+        """Redraw the row of a command whose execution status changed."""
+        for index, (row_app, row_command_id, row_state) in enumerate(self.command_list.rows):
+            if row_app == app_name and row_command_id == command_id:
+                if not self.app.execution_service.status(app_name, command_id):
+                    row_state['has_history'] = self.app.command_manager.has_command_history(app_name, command_id)
+                self.command_list.RefreshItem(index)
+                break
+        self.update_buttons()
+
+    def selected_row(self):
+        """Return the (app_name, command_id, row_state) of the selected row, or None."""
+        index = self.command_list.GetFirstSelected()
+        if index < 0 or index >= len(self.command_list.rows):
+            return None
+        return self.command_list.rows[index]
+
+    def set_model(self, model):
+        """Show a new home view model, keeping the current search."""
+        self.model = model
+        self.apply_filter()
+
+    def update_buttons(self):
+        """Enable the actions that apply to the selected row."""
+        selected = self.selected_row()
+        for button in self.buttons.values():
+            button.Enable(selected is not None)
+        if selected:
+            app_name, command_id, row_state = selected
+            self.show_output_checkbox.SetValue(row_state['show_output'])
+            self.buttons["History"].Enable(row_state['has_history'])
+            self.buttons["Stop"].Enable(bool(self.app.execution_service.status(app_name, command_id)))
+
+class HistoryListCtrl(wx.ListCtrl):
+    """Virtual list showing one history entry per row, fetched from the store one page at a time."""
+
+    PAGE_SIZE = 100
+    MAX_CACHED_PAGES = 20
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the list for a command's history."""
+        super(HistoryListCtrl, self).__init__(parent, style=wx.LC_REPORT | wx.LC_VIRTUAL | wx.LC_SINGLE_SEL)
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.command_id = command_id
+        self.filters = {}
+        self.pages = {}
+
+        self.InsertColumn(0, "Time", width=150)
+        self.InsertColumn(1, "Type", width=80)
+        self.InsertColumn(2, "Exit Code", width=70)
+        self.InsertColumn(3, "Duration (s)", width=80)
+        self.InsertColumn(4, "Command", width=260)
+        self.set_filters()
+
+    def entry_at(self, index):
+        """Return the entry shown in a row, without its output, loading its page if needed."""
+        page_number = index // self.PAGE_SIZE
+        page = self.pages.pop(page_number, None)
+        if page is None:
+            page = self.command_manager.get_command_history(
+                self.app_name, self.command_id, offset=page_number * self.PAGE_SIZE, limit=self.PAGE_SIZE,
+                include_output=False, **self.filters)
+            if len(self.pages) >= self.MAX_CACHED_PAGES:
+                del self.pages[next(iter(self.pages))]
+        self.pages[page_number] = page  # Re-inserting keeps the most recently used pages last.
+        offset = index % self.PAGE_SIZE
+        return page[offset] if offset < len(page) else {}
+
+    def full_entry_at(self, index):
+        """Load the complete entry shown in a row, including its output."""
+        entries = self.command_manager.get_command_history(self.app_name, self.command_id, offset=index, limit=1,
+                                                          **self.filters)
+        return entries[0] if entries else None
+
+    def OnGetItemText(self, item, column):
+        """Return the text of a cell; called by wx only for visible rows."""
+        entry = self.entry_at(item)
+        if column == 0:
+            return entry.get('timestamp', '')
+        if column == 1:
+            return f"{entry.get('type', '')} (cached)" if entry.get('cached') else entry.get('type', '')
+        if column == 2:
+            returncode = entry.get('returncode')
+            return "" if returncode is None else str(returncode)
+        if column == 3:
+            return f"{entry['duration']:.2f}" if 'duration' in entry else ""
+        return summarize_history_entry(entry)
+
+    def set_filters(self, **filters):
+        """Apply type and date filters and reset the row count."""
+        self.filters = filters
+        self.pages = {}
+        self.SetItemCount(self.command_manager.count_command_history(self.app_name, self.command_id, **filters))
+        self.Refresh()
+
+class HistoryDialog(wx.Dialog):
+    """Dialog listing a command's history with type and date filters; entry bodies load when selected."""
+
+    EVENT_TYPES = [("All", None), ("Creation", "creation"), ("Edit", "edit"), ("Execution", "execution"),
+                   ("Workflow", "workflow")]
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the dialog for the history of a command or a workflow."""
+        owner = command_manager.commands[app_name].get(command_id) or command_manager.workflows[app_name][command_id]
+        command_name = owner['name']
+        super(HistoryDialog, self).__init__(parent, title=f"History for Command: {command_name}", size=(700, 500),
+                                            style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        filter_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        filter_sizer.Add(wx.StaticText(self, label="Type:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.type_choice = wx.Choice(self, choices=[label for label, _ in self.EVENT_TYPES])
+        self.type_choice.SetSelection(0)
+        self.type_choice.Bind(wx.EVT_CHOICE, self.on_filter_changed)
+        filter_sizer.Add(self.type_choice, 0, wx.ALL, 5)
+
+        filter_sizer.Add(wx.StaticText(self, label="From:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.since_entry = wx.TextCtrl(self, size=(100, -1))
+        self.since_entry.SetHint("YYYY-MM-DD")
+        self.since_entry.Bind(wx.EVT_TEXT, self.on_filter_changed)
+        filter_sizer.Add(self.since_entry, 0, wx.ALL, 5)
+
+        filter_sizer.Add(wx.StaticText(self, label="To:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.until_entry = wx.TextCtrl(self, size=(100, -1))
+        self.until_entry.SetHint("YYYY-MM-DD")
+        self.until_entry.Bind(wx.EVT_TEXT, self.on_filter_changed)
+        filter_sizer.Add(self.until_entry, 0, wx.ALL, 5)
+        vbox.Add(filter_sizer, 0, wx.LEFT | wx.RIGHT | wx.TOP, 5)
+
+        self.history_list = HistoryListCtrl(self, command_manager, app_name, command_id)
+        self.history_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_entry_selected)
+        vbox.Add(self.history_list, 1, wx.ALL | wx.EXPAND, 10)
+
+        self.entry_text = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY)
+        vbox.Add(self.entry_text, 1, wx.LEFT | wx.RIGHT | wx.EXPAND, 10)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        if command_id in command_manager.commands[app_name]:
+            stats_button = wx.Button(self, label="Statistics...")
+            stats_button.Bind(wx.EVT_BUTTON, lambda event: self.show_stats(command_manager, app_name, command_id))
+            button_sizer.Add(stats_button, 0, wx.ALL, 5)
+        close_button = wx.Button(self, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda event: self.EndModal(wx.ID_CLOSE))
+        button_sizer.Add(close_button, 0, wx.ALL, 5)
+        vbox.Add(button_sizer, 0, wx.ALIGN_CENTER | wx.ALL, 5)
+
+        self.SetSizer(vbox)
+
+    @staticmethod
+    def parse_date(text, end_of_day=False):
+        """Convert a 'YYYY-MM-DD' filter value into a timestamp bound, or None if empty or invalid."""
+        try:
+            date = datetime.strptime(text.strip(), "%Y-%m-%d")
+        except ValueError:
+            return None
+        return date.strftime("%Y-%m-%d 23:59:59" if end_of_day else "%Y-%m-%d 00:00:00")
+
+    def on_entry_selected(self, event):
+        """Load and show the full entry of the selected row."""
+        entry = self.history_list.full_entry_at(event.GetIndex())
+        self.entry_text.SetValue(format_history_entry(entry) if entry else "")
+
+    def show_stats(self, command_manager, app_name, command_id):
+        """Open the statistics of the command's executions."""
+        dialog = StatsDialog(self, command_manager, app_name, command_id)
+        dialog.ShowModal()
+        dialog.Destroy()
+
+    def on_filter_changed(self, event):
+        """Re-query the list with the current filters."""
+        self.history_list.set_filters(
+            event_type=self.EVENT_TYPES[self.type_choice.GetSelection()][1],
+            since=self.parse_date(self.since_entry.GetValue()),
+            until=self.parse_date(self.until_entry.GetValue(), end_of_day=True))
+        self.entry_text.SetValue("")
+
+class StatsDialog(wx.Dialog):
+    """Dialog showing the latency percentiles, failure rate, resource usage and duration trend of a command."""
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the dialog with the statistics of the command's recorded executions."""
+        command_name = command_manager.commands[app_name][command_id]['name']
+        super(StatsDialog, self).__init__(parent, title=f"Statistics: {command_name}")
+        stats = command_manager.command_stats(app_name, command_id)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        grid = wx.FlexGridSizer(cols=2, vgap=5, hgap=15)
+        for label, value in self.format_stats(stats):
+            grid.Add(wx.StaticText(self, label=label), 0, wx.ALIGN_CENTER_VERTICAL)
+            grid.Add(wx.StaticText(self, label=value), 0, wx.ALIGN_CENTER_VERTICAL)
+        vbox.Add(grid, 0, wx.ALL, 15)
+
+        vbox.Add(self.CreateStdDialogButtonSizer(wx.OK), 0, wx.ALL | wx.EXPAND, 10)
+        self.SetSizerAndFit(vbox)
+
+    @staticmethod
+    def format_stats(stats):
+        """Return (label, value) rows describing the statistics."""
+        def summary(values, unit, scale=1.0, digits=2):
+            if values is None:
+                return "no data"
+            return (f"p50 {values['p50'] * scale:.{digits}f} {unit}, p95 {values['p95'] * scale:.{digits}f} {unit}, "
+                    f"max {values['max'] * scale:.{digits}f} {unit}")
+
+        rows = [
+            ("Executions:", f"{stats['executions']} ({stats['cached']} from cache)"),
+            ("Last run:", stats['last_run'] or "never"),
+            ("Failure rate:", f"{stats['failure_rate'] * 100:.1f}% ({stats['failures']} failed)"),
+            ("Duration:", summary(stats['duration'], "s")),
+            ("CPU time:", summary(stats['cpu_time'], "s")),
+            ("Peak memory:", summary(stats['max_rss_kb'], "MB", 1 / 1024, 1)),
+            ("Output:", summary(stats['output_bytes'], "KB", 1 / 1024, 1))
+        ]
+        trend = stats['trend']
+        if trend is None:
+            rows.append(("Trend:", "not enough executions"))
+        else:
+            rows.append(("Trend:", f"{trend['direction']}: median {trend['recent_p50']:.2f} s over the last "
+                                   f"{trend['window']} runs vs {trend['previous_p50']:.2f} s before "
+                                   f"({trend['change'] * 100:+.0f}%)"))
+        return rows
+
+class CacheDialog(wx.Dialog):
+    """Dialog setting how long a command's results are reused, with the state of the result cache."""
+
+    # Longest time-to-live offered, in seconds.
+    MAX_TTL = 7 * 24 * 3600
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the dialog with the command's current time-to-live."""
+        command_name = command_manager.commands[app_name][command_id]['name']
+        super(CacheDialog, self).__init__(parent, title=f"Result Cache: {command_name}")
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.command_id = command_id
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        ttl_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        ttl_sizer.Add(wx.StaticText(self, label="Reuse successful results for (seconds, 0 = never):"), 0,
+                      wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.ttl_spin = wx.SpinCtrl(self, min=0, max=self.MAX_TTL,
+                                    initial=command_manager.cache_ttl(app_name, command_id))
+        ttl_sizer.Add(self.ttl_spin, 0, wx.ALL, 5)
+        vbox.Add(ttl_sizer, 0, wx.ALL, 5)
+
+        stats_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.stats_label = wx.StaticText(self, label="")
+        stats_sizer.Add(self.stats_label, 1, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        invalidate_button = wx.Button(self, label="Invalidate")
+        invalidate_button.Bind(wx.EVT_BUTTON, self.on_invalidate)
+        stats_sizer.Add(invalidate_button, 0, wx.ALL, 5)
+        vbox.Add(stats_sizer, 0, wx.ALL | wx.EXPAND, 5)
+
+        vbox.Add(self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL), 0, wx.ALL | wx.EXPAND, 10)
+        self.SetSizerAndFit(vbox)
+        self.refresh_stats()
+
+    def on_invalidate(self, event):
+        """Drop the cached results of the command."""
+        self.command_manager.invalidate_cached_results(self.app_name, self.command_id)
+        self.refresh_stats()
+
+    def refresh_stats(self):
+        """Show the cached results of the command and the cache-wide hit and miss counts."""
+        stats = self.command_manager.cached_result_stats(self.app_name, self.command_id)
+        self.stats_label.SetLabel(
+            f"Cached results: {stats['results']} ({stats['bytes'] // 1024} KB). "
+            f"All commands: {stats['hits']} hits, {stats['misses']} misses.")
+
+class ScheduleDialog(wx.Dialog):
+    """Dialog setting when a command runs on its own, with its next and last run times."""
+
+    # Kinds of schedule offered, as (label, key of the schedule dictionary).
+    KINDS = [("Not scheduled", None), ("Every (e.g. 30s, 5m, 1h30m)", 'interval'), ("Cron expression", 'cron')]
+
+    # Longest jitter offered, in seconds.
+    MAX_JITTER = 24 * 3600
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the dialog with the command's current schedule."""
+        command_name = command_manager.commands[app_name][command_id]['name']
+        super(ScheduleDialog, self).__init__(parent, title=f"Schedule: {command_name}")
+        schedule = command_manager.schedule(app_name, command_id) or {}
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.kind_choice = wx.RadioBox(self, label="Run", choices=[label for label, _ in self.KINDS],
+                                       majorDimension=1, style=wx.RA_SPECIFY_COLS)
+        kind = 'interval' if 'interval' in schedule else 'cron' if 'cron' in schedule else None
+        self.kind_choice.SetSelection([key for _, key in self.KINDS].index(kind))
+        self.kind_choice.Bind(wx.EVT_RADIOBOX, lambda event: self.update_fields())
+        vbox.Add(self.kind_choice, 0, wx.ALL | wx.EXPAND, 5)
+
+        value = f"{schedule['interval']:g}s" if kind == 'interval' else schedule.get('cron', "*/5 * * * *")
+        self.value_entry = wx.TextCtrl(self, value=value)
+        vbox.Add(self.value_entry, 0, wx.ALL | wx.EXPAND, 5)
+
+        jitter_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        jitter_sizer.Add(wx.StaticText(self, label="Delay each run randomly by up to (seconds):"), 0,
+                         wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.jitter_spin = wx.SpinCtrl(self, min=0, max=self.MAX_JITTER, initial=int(schedule.get('jitter', 0)))
+        jitter_sizer.Add(self.jitter_spin, 0, wx.ALL, 5)
+        vbox.Add(jitter_sizer, 0, wx.ALL, 5)
+
+        self.skip_checkbox = wx.CheckBox(self, label="Skip a run while the previous one has not finished")
+        self.skip_checkbox.SetValue(schedule.get('overlap', 'skip') == 'skip')
+        vbox.Add(self.skip_checkbox, 0, wx.ALL | wx.EXPAND, 5)
+
+        times = command_manager.schedule_times().get(command_id)
+        if times:
+            vbox.Add(wx.StaticText(self, label=f"Next run: {times['next_run'] or '-'}. Last run: {times['last_run'] or '-'}. "
+                                               f"{times['runs']} runs, {times['skipped']} skipped, "
+                                               f"{times['coalesced']} missed runs merged."), 0, wx.ALL, 10)
+
+        vbox.Add(self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL), 0, wx.ALL | wx.EXPAND, 10)
+        self.SetSizerAndFit(vbox)
+        self.update_fields()
+
+    def get_schedule(self):
+        """Return the schedule entered, or None to remove it; raises ValueError if it is invalid."""
+        kind = self.KINDS[self.kind_choice.GetSelection()][1]
+        if kind is None:
+            return None
+        schedule = {kind: self.value_entry.GetValue().strip(), 'jitter': self.jitter_spin.GetValue(),
+                    'overlap': 'skip' if self.skip_checkbox.GetValue() else 'queue'}
+        return Schedule.from_dict(schedule).to_dict()
+
+    def update_fields(self):
+        """Enable the fields that apply to the selected kind of schedule."""
+        scheduled = self.KINDS[self.kind_choice.GetSelection()][1] is not None
+        for control in (self.value_entry, self.jitter_spin, self.skip_checkbox):
+            control.Enable(scheduled)
+
+class SearchDialog(wx.Dialog):
+    """Dialog searching the command text and output of every command's history as you type."""
+
+    ORDERS = [("Best match", 'rank'), ("Newest", 'newest'), ("Oldest", 'oldest')]
+    MAX_HITS = 200
+    SEARCH_DELAY_MS = 150
+
+    def __init__(self, parent, command_manager):
+        """Initialize the dialog with an empty query."""
+        super(SearchDialog, self).__init__(parent, title="Search History", size=(800, 550),
+                                           style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.app = parent
+        self.command_manager = command_manager
+        self.hits = []
+        self.search_call = None
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        search_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.search_entry = wx.SearchCtrl(self)
+        self.search_entry.ShowCancelButton(True)
+        self.search_entry.Bind(wx.EVT_TEXT, self.on_query_changed)
+        self.search_entry.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, lambda event: self.search_entry.SetValue(""))
+        search_sizer.Add(self.search_entry, 1, wx.ALL | wx.EXPAND, 5)
+        self.order_choice = wx.Choice(self, choices=[label for label, _ in self.ORDERS])
+        self.order_choice.SetSelection(0)
+        self.order_choice.Bind(wx.EVT_CHOICE, self.on_query_changed)
+        search_sizer.Add(self.order_choice, 0, wx.ALL, 5)
+        vbox.Add(search_sizer, 0, wx.LEFT | wx.RIGHT | wx.TOP | wx.EXPAND, 5)
+
+        self.hit_list = wx.ListCtrl(self, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        self.hit_list.InsertColumn(0, "App", width=100)
+        self.hit_list.InsertColumn(1, "Command", width=120)
+        self.hit_list.InsertColumn(2, "Time", width=150)
+        self.hit_list.InsertColumn(3, "Exit Code", width=70)
+        self.hit_list.InsertColumn(4, "Match", width=340)
+        self.hit_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_hit_selected)
+        self.hit_list.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.on_hit_activated)
+        vbox.Add(self.hit_list, 1, wx.ALL | wx.EXPAND, 10)
+
+        self.hit_text = wx.TextCtrl(self, style=wx.TE_MULTILINE | wx.TE_READONLY)
+        vbox.Add(self.hit_text, 0, wx.LEFT | wx.RIGHT | wx.EXPAND, 10)
+
+        bottom_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        self.status_label = wx.StaticText(self, label="Double-click a hit to open the command's history.")
+        bottom_sizer.Add(self.status_label, 1, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 10)
+        close_button = wx.Button(self, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda event: self.EndModal(wx.ID_CLOSE))
+        bottom_sizer.Add(close_button, 0, wx.ALL, 10)
+        vbox.Add(bottom_sizer, 0, wx.EXPAND)
+
+        self.SetSizer(vbox)
+
+    def on_hit_activated(self, event):
+        """Open the history of the command of the activated hit."""
+        hit = self.hits[event.GetIndex()]
+        self.app.show_command_history(hit['app'], hit['id'])
+
+    def on_hit_selected(self, event):
+        """Show the command and the matching text of the selected hit."""
+        hit = self.hits[event.GetIndex()]
+        self.hit_text.SetValue(
+            f"{hit['app']} / {hit['name']} ({hit['type']}, {hit['timestamp']})\n"
+            f"Command:\n{hit['command']}\n"
+            f"Match:\n{hit['snippet']}")
+
+    def on_query_changed(self, event):
+        """Search again shortly after the last keystroke."""
+        if self.search_call is not None and self.search_call.IsRunning():
+            self.search_call.Restart(self.SEARCH_DELAY_MS)
+        else:
+            self.search_call = wx.CallLater(self.SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        """Query the index and fill the hit list."""
+        started = time.perf_counter()
+        self.hits = self.command_manager.search_history(
+            self.search_entry.GetValue(), self.MAX_HITS, self.ORDERS[self.order_choice.GetSelection()][1])
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.hit_list.DeleteAllItems()
+        for index, hit in enumerate(self.hits):
+            self.hit_list.InsertItem(index, hit['app'])
+            self.hit_list.SetItem(index, 1, hit['name'])
+            self.hit_list.SetItem(index, 2, hit['timestamp'])
+            self.hit_list.SetItem(index, 3, "" if hit['returncode'] is None else str(hit['returncode']))
+            self.hit_list.SetItem(index, 4, " ".join(hit['snippet'].split()))
+        self.hit_text.SetValue("")
+        self.status_label.SetLabel(f"{len(self.hits)} hits in {elapsed_ms:.0f} ms")
+
+class ParametersDialog(wx.Dialog):
+    """Dialog asking for the values of a command template's placeholders before it runs."""
+
+    # Return code of ShowModal when the user asks for a matrix run instead.
+    ID_MATRIX = wx.NewIdRef()
+
+    def __init__(self, parent, command_name, placeholders, values):
+        """Initialize the dialog with one field per placeholder, filled with the previous values."""
+        super(ParametersDialog, self).__init__(parent, title=f"Run Command: {command_name}")
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        grid = wx.FlexGridSizer(cols=2, vgap=5, hgap=5)
+        grid.AddGrowableCol(1)
+        self.entries = {}
+        for name in placeholders:
+            grid.Add(wx.StaticText(self, label=f"{name}:"), 0, wx.ALIGN_CENTER_VERTICAL)
+            entry = wx.TextCtrl(self, value=values.get(name, ""), size=(250, -1))
+            grid.Add(entry, 1, wx.EXPAND)
+            self.entries[name] = entry
+        vbox.Add(grid, 1, wx.ALL | wx.EXPAND, 10)
+
+        button_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        run_button = wx.Button(self, wx.ID_OK, label="Run")
+        run_button.SetDefault()
+        button_sizer.Add(run_button, 0, wx.ALL, 5)
+        matrix_button = wx.Button(self, label="Matrix Run...")
+        matrix_button.Bind(wx.EVT_BUTTON, lambda event: self.EndModal(self.ID_MATRIX))
+        button_sizer.Add(matrix_button, 0, wx.ALL, 5)
+        button_sizer.Add(wx.Button(self, wx.ID_CANCEL, label="Cancel"), 0, wx.ALL, 5)
+        vbox.Add(button_sizer, 0, wx.ALIGN_CENTER | wx.ALL, 5)
+
+        self.SetSizerAndFit(vbox)
+
+    def get_values(self):
+        """Return the entered value of every placeholder."""
+        return {name: entry.GetValue() for name, entry in self.entries.items()}
+
+class MatrixWindow(wx.Frame):
+    """Window running a command template once per parameter set and showing a table of the results."""
+
+    # Interval at which the states of running rows are refreshed, in milliseconds.
+    REFRESH_MS = 500
+
+    def __init__(self, parent, command_manager, app_name, command_id):
+        """Initialize the window for a stored command template."""
+        command_data = command_manager.commands[app_name][command_id]
+        super(MatrixWindow, self).__init__(parent, title=f"Matrix Run: {command_data['name']}", size=(800, 600))
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.command_id = command_id
+        self.placeholders = template_placeholders(command_data['command'])
+        self.matrix_run = None
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        vbox.Add(wx.StaticText(panel, label=f"Template: {command_data['command']}"), 0, wx.ALL, 5)
+        vbox.Add(wx.StaticText(panel, label=f"Parameter sets: CSV with a header row naming "
+                                            f"{', '.join(self.placeholders)}, or one value per line."), 0, wx.ALL, 5)
+        self.parameters_text = wx.TextCtrl(panel, style=wx.TE_MULTILINE, size=(-1, 100))
+        vbox.Add(self.parameters_text, 0, wx.ALL | wx.EXPAND, 5)
+
+        control_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        load_button = wx.Button(panel, label="Load CSV...")
+        load_button.Bind(wx.EVT_BUTTON, self.on_load_csv)
+        control_sizer.Add(load_button, 0, wx.ALL, 5)
+        control_sizer.Add(wx.StaticText(panel, label="Parallel:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.parallel_spin = wx.SpinCtrl(panel, min=1, max=256, initial=MAX_CONCURRENT_COMMANDS)
+        control_sizer.Add(self.parallel_spin, 0, wx.ALL, 5)
+        self.start_button = wx.Button(panel, label="Start")
+        self.start_button.Bind(wx.EVT_BUTTON, self.on_start)
+        control_sizer.Add(self.start_button, 0, wx.ALL, 5)
+        self.cancel_button = wx.Button(panel, label="Cancel")
+        self.cancel_button.Bind(wx.EVT_BUTTON, lambda event: self.matrix_run and self.matrix_run.cancel())
+        self.cancel_button.Disable()
+        control_sizer.Add(self.cancel_button, 0, wx.ALL, 5)
+        vbox.Add(control_sizer, 0)
+
+        self.result_list = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        self.result_list.InsertColumn(0, "#", width=40)
+        self.result_list.InsertColumn(1, "Parameters", width=330)
+        self.result_list.InsertColumn(2, "State", width=90)
+        self.result_list.InsertColumn(3, "Exit Code", width=70)
+        self.result_list.InsertColumn(4, "Duration (s)", width=90)
+        self.result_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_row_selected)
+        vbox.Add(self.result_list, 1, wx.ALL | wx.EXPAND, 5)
+
+        self.output_text = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY, size=(-1, 120))
+        vbox.Add(self.output_text, 0, wx.ALL | wx.EXPAND, 5)
+        self.status_label = wx.StaticText(panel, label="")
+        vbox.Add(self.status_label, 0, wx.ALL, 5)
+
+        panel.SetSizer(vbox)
+        self.refresh_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda event: self.refresh_rows(), self.refresh_timer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+
+    def on_close(self, event):
+        """Cancel a matrix run still in progress when the window is closed."""
+        self.refresh_timer.Stop()
+        if self.matrix_run:
+            self.matrix_run.cancel()
+        event.Skip()
+
+    def on_load_csv(self, event):
+        """Load parameter sets from a CSV file into the text area."""
+        with wx.FileDialog(self, "Load parameter sets", wildcard="CSV files (*.csv)|*.csv|All files (*.*)|*.*",
+                           style=wx.FD_OPEN | wx.FD_FILE_MUST_EXIST) as dialog:
+            if dialog.ShowModal() == wx.ID_OK:
+                try:
+                    with open(dialog.GetPath(), 'r', encoding='utf-8') as file:
+                        self.parameters_text.SetValue(file.read())
+                except (IOError, UnicodeDecodeError) as e:
+                    logging.error(f"Error loading parameter sets: {e}")
+                    show_message_dialog(f"Failed to load parameter sets. Details: {e}", "Error", logging.ERROR)
+
+    def on_row_finished(self, row):
+        """Update the table row of a finished parameter set."""
+        if self:
+            self.update_row(row)
+            self.refresh_rows()
+
+    def on_row_selected(self, event):
+        """Show the rendered command and the output of the selected row."""
+        row = self.matrix_run.rows[event.GetIndex()]
+        text = f"$ {row['command']}\n{row['stdout']}"
+        if row['stderr']:
+            text += f"\nErrors:\n{row['stderr']}"
+        self.output_text.SetValue(text)
+
+    def on_start(self, event):
+        """Parse the parameter sets and start running them."""
+        try:
+            parameter_sets = parse_parameter_sets(self.parameters_text.GetValue(), self.placeholders)
+        except (ValueError, csv.Error) as e:
+            wx.MessageBox(str(e), "Invalid Parameter Sets", wx.OK | wx.ICON_WARNING)
+            return
+        if not parameter_sets:
+            wx.MessageBox("Enter at least one parameter set.", "Matrix Run", wx.OK | wx.ICON_INFORMATION)
+            return
+
+        matrix_run = MatrixRun(self.command_manager, self.app_name, self.command_id, parameter_sets,
+                               self.parallel_spin.GetValue(), on_row_finished=self.on_row_finished,
+                               dispatch=wx.CallAfter)
+        verdict = next((verdict for verdict in (check_command(row['command']) for row in matrix_run.rows if row['command'])
+                        if verdict['dangerous']), None)
+        if verdict:
+            wx.MessageBox("This command may be dangerous. Please confirm its safety.\n\n" + "\n".join(describe_verdict(verdict)),
+                          "Dangerous Command", wx.OK | wx.ICON_WARNING)
+            return
+
+        self.matrix_run = matrix_run
+        self.result_list.DeleteAllItems()
+        for row in matrix_run.rows:
+            self.result_list.InsertItem(row['index'], str(row['index'] + 1))
+            self.result_list.SetItem(row['index'], 1, ", ".join(f"{name}={value}" for name, value in row['parameters'].items()))
+            self.update_row(row)
+        self.output_text.SetValue("")
+        self.start_button.Disable()
+        self.cancel_button.Enable()
+        matrix_run.start()
+        self.refresh_timer.Start(self.REFRESH_MS)
+        self.refresh_rows()
+
+    def refresh_rows(self):
+        """Refresh the states of the rows and the summary, and stop refreshing once the run is over."""
+        if not self.matrix_run:
+            return
+        for row in self.matrix_run.rows:
+            self.result_list.SetItem(row['index'], 2, self.matrix_run.row_state(row))
+        summary = self.matrix_run.summary()
+        self.status_label.SetLabel(
+            f"{summary['succeeded']} succeeded, {summary['failed']} failed, {summary['cancelled']} cancelled "
+            f"of {summary['rows']} in {summary['elapsed']:.1f} s (sum of durations {summary['total_duration']:.1f} s)")
+        if self.matrix_run.done.is_set():
+            self.refresh_timer.Stop()
+            self.start_button.Enable()
+            self.cancel_button.Disable()
+
+    def update_row(self, row):
+        """Show the state, exit code and duration of a row."""
+        self.result_list.SetItem(row['index'], 2, row['state'])
+        self.result_list.SetItem(row['index'], 3, "" if row['returncode'] is None else str(row['returncode']))
+        self.result_list.SetItem(row['index'], 4, "" if row['duration'] is None else f"{row['duration']:.2f}")
+
+class WorkflowsDialog(wx.Dialog):
+    """Dialog listing the workflows of an application, to create, edit, delete, run them and see their runs."""
+
+    def __init__(self, parent, command_manager, app_name):
+        """Initialize the dialog with the application's workflows."""
+        super(WorkflowsDialog, self).__init__(parent, title=f"Workflows: {app_name}", size=(450, 350),
+                                              style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        self.app = parent
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.workflow_ids = []
+        hbox = wx.BoxSizer(wx.HORIZONTAL)
+
+        self.workflow_list = wx.ListBox(self, style=wx.LB_SINGLE)
+        self.workflow_list.Bind(wx.EVT_LISTBOX, lambda event: self.update_buttons())
+        self.workflow_list.Bind(wx.EVT_LISTBOX_DCLICK, self.on_run)
+        hbox.Add(self.workflow_list, 1, wx.ALL | wx.EXPAND, 10)
+
+        button_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.buttons = {}
+        for label, handler in (("New...", self.on_new), ("Edit...", self.on_edit), ("Delete", self.on_delete),
+                               ("Run", self.on_run), ("History", self.on_history)):
+            button = wx.Button(self, label=label)
+            button.Bind(wx.EVT_BUTTON, handler)
+            button_sizer.Add(button, 0, wx.ALL | wx.EXPAND, 5)
+            self.buttons[label] = button
+        button_sizer.AddStretchSpacer(1)
+        close_button = wx.Button(self, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda event: self.EndModal(wx.ID_CLOSE))
+        button_sizer.Add(close_button, 0, wx.ALL | wx.EXPAND, 5)
+        hbox.Add(button_sizer, 0, wx.TOP | wx.BOTTOM | wx.RIGHT | wx.EXPAND, 5)
+
+        self.SetSizer(hbox)
+        self.refresh_list()
+
+    def edit_workflow(self, workflow_id=None):
+        """Show the edit dialog for a new or an existing workflow and store the result."""
+        workflow = self.command_manager.workflows.get(self.app_name, {}).get(workflow_id)
+        dialog = WorkflowEditDialog(self, self.command_manager.commands[self.app_name], workflow)
+        while dialog.ShowModal() == wx.ID_OK:
+            name, policy, nodes = dialog.get_workflow()
+            try:
+                if workflow_id is None:
+                    self.command_manager.add_workflow(self.app_name, name, nodes, policy)
+                else:
+                    self.command_manager.update_workflow(self.app_name, workflow_id, name, nodes, policy)
+                break
+            except ValueError as e:
+                wx.MessageBox(str(e), "Invalid Workflow", wx.OK | wx.ICON_WARNING)
+        dialog.Destroy()
+        self.refresh_list()
+
+    def on_delete(self, event):
+        """Delete the selected workflow after confirmation."""
+        workflow_id = self.selected_workflow()
+        if workflow_id is None:
+            return
+        name = self.command_manager.workflows[self.app_name][workflow_id]['name']
+        confirm = wx.MessageBox(f"Are you sure you want to delete the workflow '{name}'?", "Delete Workflow",
+                                wx.YES_NO | wx.ICON_QUESTION)
+        if confirm == wx.YES:
+            self.command_manager.delete_workflow(self.app_name, workflow_id)
+            self.refresh_list()
+
+    def on_edit(self, event):
+        """Edit the selected workflow."""
+        workflow_id = self.selected_workflow()
+        if workflow_id is not None:
+            self.edit_workflow(workflow_id)
+
+    def on_history(self, event):
+        """Show the past runs of the selected workflow."""
+        workflow_id = self.selected_workflow()
+        if workflow_id is not None:
+            self.app.show_command_history(self.app_name, workflow_id)
+
+    def on_new(self, event):
+        """Create a workflow."""
+        self.edit_workflow()
+
+    def on_run(self, event):
+        """Open the window running the selected workflow."""
+        workflow_id = self.selected_workflow()
+        if workflow_id is not None:
+            WorkflowWindow(self.app, self.command_manager, self.app_name, workflow_id).Show()
+
+    def refresh_list(self):
+        """Fill the list with the application's workflows."""
+        workflows = self.command_manager.workflows.get(self.app_name, {})
+        self.workflow_ids = list(workflows)
+        self.workflow_list.Set([f"{workflow['name']} ({len(workflow['nodes'])} steps, {workflow['policy']})"
+                                for workflow in workflows.values()])
+        self.update_buttons()
+
+    def selected_workflow(self):
+        """Return the ID of the selected workflow, or None."""
+        index = self.workflow_list.GetSelection()
+        return self.workflow_ids[index] if index != wx.NOT_FOUND else None
+
+    def update_buttons(self):
+        """Enable the actions that apply to the selected workflow."""
+        selected = self.selected_workflow() is not None
+        for label in ("Edit...", "Delete", "Run", "History"):
+            self.buttons[label].Enable(selected)
+
+class WorkflowEditDialog(wx.Dialog):
+    """Dialog choosing the steps of a workflow among an application's commands, and what each step depends on."""
+
+    def __init__(self, parent, app_commands, workflow=None):
+        """Initialize the dialog with an existing workflow, or an empty one."""
+        super(WorkflowEditDialog, self).__init__(parent, title="Edit Workflow" if workflow else "New Workflow",
+                                                 size=(600, 450), style=wx.DEFAULT_DIALOG_STYLE | wx.RESIZE_BORDER)
+        workflow = workflow or {'name': "", 'policy': WORKFLOW_POLICIES[0], 'nodes': {}}
+        self.command_ids = list(app_commands)
+        self.command_names = [command_data['name'] for command_data in app_commands.values()]
+        self.nodes = {command_id: list(node.get('depends_on', [])) for command_id, node in workflow['nodes'].items()}
+        self.current_step = None
+        self.dependency_ids = []
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        form_sizer = wx.FlexGridSizer(cols=2, vgap=5, hgap=5)
+        form_sizer.AddGrowableCol(1)
+        form_sizer.Add(wx.StaticText(self, label="Name:"), 0, wx.ALIGN_CENTER_VERTICAL)
+        self.name_entry = wx.TextCtrl(self, value=workflow['name'])
+        form_sizer.Add(self.name_entry, 1, wx.EXPAND)
+        form_sizer.Add(wx.StaticText(self, label="On failure:"), 0, wx.ALIGN_CENTER_VERTICAL)
+        self.policy_choice = wx.Choice(self, choices=["Stop the workflow (fail-fast)",
+                                                      "Run the steps that do not depend on it (continue)"])
+        self.policy_choice.SetSelection(WORKFLOW_POLICIES.index(workflow.get('policy', WORKFLOW_POLICIES[0])))
+        form_sizer.Add(self.policy_choice, 1, wx.EXPAND)
+        vbox.Add(form_sizer, 0, wx.ALL | wx.EXPAND, 10)
+
+        lists_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        steps_sizer = wx.BoxSizer(wx.VERTICAL)
+        steps_sizer.Add(wx.StaticText(self, label="Steps (check the commands to run):"), 0, wx.BOTTOM, 5)
+        self.step_list = wx.CheckListBox(self, choices=self.command_names)
+        self.step_list.SetCheckedItems([index for index, command_id in enumerate(self.command_ids)
+                                        if command_id in self.nodes])
+        self.step_list.Bind(wx.EVT_LISTBOX, self.on_step_selected)
+        self.step_list.Bind(wx.EVT_CHECKLISTBOX, self.on_step_checked)
+        steps_sizer.Add(self.step_list, 1, wx.EXPAND)
+        lists_sizer.Add(steps_sizer, 1, wx.ALL | wx.EXPAND, 5)
+
+        dependencies_sizer = wx.BoxSizer(wx.VERTICAL)
+        self.dependencies_label = wx.StaticText(self, label="Select a step to choose what it depends on.")
+        dependencies_sizer.Add(self.dependencies_label, 0, wx.BOTTOM, 5)
+        self.dependency_list = wx.CheckListBox(self)
+        self.dependency_list.Bind(wx.EVT_CHECKLISTBOX, self.on_dependency_checked)
+        dependencies_sizer.Add(self.dependency_list, 1, wx.EXPAND)
+        lists_sizer.Add(dependencies_sizer, 1, wx.ALL | wx.EXPAND, 5)
+        vbox.Add(lists_sizer, 1, wx.LEFT | wx.RIGHT | wx.EXPAND, 5)
+
+        vbox.Add(self.CreateStdDialogButtonSizer(wx.OK | wx.CANCEL), 0, wx.ALL | wx.EXPAND, 10)
+        self.SetSizer(vbox)
+
+    def get_workflow(self):
+        """Return the entered name, policy and steps, as {command_id: {'depends_on': [...]}}."""
+        nodes = {command_id: {'depends_on': self.nodes[command_id]}
+                 for command_id in self.command_ids if command_id in self.nodes}
+        return (self.name_entry.GetValue().strip(), WORKFLOW_POLICIES[self.policy_choice.GetSelection()], nodes)
+
+    def on_dependency_checked(self, event):
+        """Store the dependencies checked for the selected step."""
+        if self.current_step in self.nodes:
+            self.nodes[self.current_step] = [self.dependency_ids[index]
+                                             for index in self.dependency_list.GetCheckedItems()]
+
+    def on_step_checked(self, event):
+        """Add or remove a step; steps depending on a removed step no longer do."""
+        command_id = self.command_ids[event.GetInt()]
+        if self.step_list.IsChecked(event.GetInt()):
+            self.nodes.setdefault(command_id, [])
+        else:
+            self.nodes.pop(command_id, None)
+            for dependencies in self.nodes.values():
+                if command_id in dependencies:
+                    dependencies.remove(command_id)
+        self.show_dependencies(self.current_step)
+
+    def on_step_selected(self, event):
+        """Show the possible dependencies of the selected step."""
+        self.show_dependencies(self.command_ids[event.GetSelection()])
+
+    def show_dependencies(self, command_id):
+        """Fill the dependency list with the other steps, checking those the step depends on."""
+        self.current_step = command_id
+        if command_id not in self.nodes:
+            self.dependencies_label.SetLabel("Select a checked step to choose what it depends on.")
+            self.dependency_ids = []
+            self.dependency_list.Set([])
+            return
+        self.dependencies_label.SetLabel(f"'{self.command_names[self.command_ids.index(command_id)]}' runs after:")
+        self.dependency_ids = [other_id for other_id in self.command_ids if other_id in self.nodes and other_id != command_id]
+        self.dependency_list.Set([self.command_names[self.command_ids.index(other_id)] for other_id in self.dependency_ids])
+        self.dependency_list.SetCheckedItems([index for index, other_id in enumerate(self.dependency_ids)
+                                              if other_id in self.nodes[command_id]])
+
+class WorkflowWindow(wx.Frame):
+    """Window running a workflow and showing the state and timings of its steps."""
+
+    # Interval at which the states of running steps are refreshed, in milliseconds.
+    REFRESH_MS = 500
+
+    def __init__(self, parent, command_manager, app_name, workflow_id):
+        """Initialize the window for a stored workflow."""
+        workflow = command_manager.workflows[app_name][workflow_id]
+        super(WorkflowWindow, self).__init__(parent, title=f"Workflow: {workflow['name']}", size=(800, 550))
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.workflow_id = workflow_id
+        self.workflow_run = None
+        self.shown_run = None
+        self.step_ids = []
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        control_sizer = wx.BoxSizer(wx.HORIZONTAL)
+        control_sizer.Add(wx.StaticText(panel, label="Parallel:"), 0, wx.ALL | wx.ALIGN_CENTER_VERTICAL, 5)
+        self.parallel_spin = wx.SpinCtrl(panel, min=1, max=256, initial=MAX_CONCURRENT_COMMANDS)
+        control_sizer.Add(self.parallel_spin, 0, wx.ALL, 5)
+        self.start_button = wx.Button(panel, label="Start")
+        self.start_button.Bind(wx.EVT_BUTTON, self.on_start)
+        control_sizer.Add(self.start_button, 0, wx.ALL, 5)
+        self.cancel_button = wx.Button(panel, label="Cancel")
+        self.cancel_button.Bind(wx.EVT_BUTTON, lambda event: self.workflow_run and self.workflow_run.cancel())
+        self.cancel_button.Disable()
+        control_sizer.Add(self.cancel_button, 0, wx.ALL, 5)
+        vbox.Add(control_sizer, 0)
+
+        self.step_list = wx.ListCtrl(panel, style=wx.LC_REPORT | wx.LC_SINGLE_SEL)
+        self.step_list.InsertColumn(0, "Step", width=160)
+        self.step_list.InsertColumn(1, "Runs After", width=220)
+        self.step_list.InsertColumn(2, "State", width=90)
+        self.step_list.InsertColumn(3, "Exit Code", width=70)
+        self.step_list.InsertColumn(4, "Start (s)", width=80)
+        self.step_list.InsertColumn(5, "Duration (s)", width=90)
+        self.step_list.Bind(wx.EVT_LIST_ITEM_SELECTED, self.on_step_selected)
+        vbox.Add(self.step_list, 1, wx.ALL | wx.EXPAND, 5)
+
+        self.output_text = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY, size=(-1, 120))
+        vbox.Add(self.output_text, 0, wx.ALL | wx.EXPAND, 5)
+        self.status_label = wx.StaticText(panel, label="")
+        vbox.Add(self.status_label, 0, wx.ALL, 5)
+
+        panel.SetSizer(vbox)
+        self.refresh_timer = wx.Timer(self)
+        self.Bind(wx.EVT_TIMER, lambda event: self.refresh_steps(), self.refresh_timer)
+        self.Bind(wx.EVT_CLOSE, self.on_close)
+        self.show_steps(WorkflowRun(command_manager, app_name, workflow_id))
+
+    def on_close(self, event):
+        """Cancel a workflow run still in progress when the window is closed."""
+        self.refresh_timer.Stop()
+        if self.workflow_run:
+            self.workflow_run.cancel()
+        event.Skip()
+
+    def on_start(self, event):
+        """Start a new run of the workflow."""
+        workflow_run = WorkflowRun(self.command_manager, self.app_name, self.workflow_id, self.parallel_spin.GetValue(),
+                                   on_step_finished=self.on_step_finished, dispatch=wx.CallAfter)
+        verdicts = [check_command(step['command']) for step in workflow_run.steps.values()]
+        findings = [line for verdict in verdicts if verdict['dangerous'] for line in describe_verdict(verdict)]
+        if findings:
+            wx.MessageBox("This workflow runs a command that may be dangerous. Please confirm its safety.\n\n" + "\n".join(findings),
+                          "Dangerous Command", wx.OK | wx.ICON_WARNING)
+            return
+
+        self.workflow_run = workflow_run
+        self.show_steps(workflow_run)
+        self.output_text.SetValue("")
+        self.start_button.Disable()
+        self.cancel_button.Enable()
+        workflow_run.start()
+        self.refresh_timer.Start(self.REFRESH_MS)
+        self.refresh_steps()
+
+    def on_step_finished(self, step):
+        """Update the table row of a finished step."""
+        if self:
+            self.refresh_steps()
+
+    def on_step_selected(self, event):
+        """Show the command and the output of the selected step."""
+        step = self.shown_run.steps[self.step_ids[event.GetIndex()]]
+        text = f"$ {step['command']}\n{step['stdout']}"
+        if step['stderr']:
+            text += f"\nErrors:\n{step['stderr']}"
+        self.output_text.SetValue(text)
+
+    def refresh_steps(self):
+        """Refresh the states and timings of the steps, and show the critical path once the run is over."""
+        if not self.workflow_run:
+            return
+        workflow_run = self.workflow_run
+        for index, step_id in enumerate(self.step_ids):
+            step = workflow_run.steps[step_id]
+            self.step_list.SetItem(index, 2, workflow_run.step_state(step))
+            self.step_list.SetItem(index, 3, "" if step['returncode'] is None else str(step['returncode']))
+            self.step_list.SetItem(index, 4, "" if step['start'] is None else f"{step['start']:.2f}")
+            self.step_list.SetItem(index, 5, "" if step['duration'] is None else f"{step['duration']:.2f}")
+
+        if not workflow_run.done.is_set():
+            elapsed = time.monotonic() - workflow_run.started
+            finished = sum(1 for step in workflow_run.steps.values() if step['state'] == 'finished')
+            self.status_label.SetLabel(f"{finished} of {len(workflow_run.steps)} steps finished in {elapsed:.1f} s")
+            return
+        self.refresh_timer.Stop()
+        self.start_button.Enable()
+        self.cancel_button.Disable()
+        path, path_duration = critical_path(
+            {step_id: {'depends_on': step['depends_on']} for step_id, step in workflow_run.steps.items()},
+            {step_id: step['duration'] or 0.0 for step_id, step in workflow_run.steps.items()})
+        outcome = "Succeeded" if workflow_run.succeeded() else "Failed"
+        self.status_label.SetLabel(
+            f"{outcome} in {workflow_run.finished - workflow_run.started:.1f} s. Critical path: "
+            f"{' -> '.join(workflow_run.steps[step_id]['name'] for step_id in path)} ({path_duration:.1f} s)")
+
+    def show_steps(self, workflow_run):
+        """Fill the table with the steps of a run, dependencies first."""
+        self.shown_run = workflow_run
+        self.step_ids = [step['id'] for step in workflow_run.ordered_steps()]
+        self.step_list.DeleteAllItems()
+        for index, step_id in enumerate(self.step_ids):
+            step = workflow_run.steps[step_id]
+            self.step_list.InsertItem(index, step['name'])
+            self.step_list.SetItem(index, 1, ", ".join(workflow_run.steps[dependency]['name']
+                                                       for dependency in step['depends_on']))
+            self.step_list.SetItem(index, 2, step['state'])
+
+class OutputWindow(wx.Frame):
+    """Window showing the output of a running command as it is produced."""
+
+    # Characters kept in the text control; older output is dropped from the top.
+    MAX_CHARS = 1024 * 1024
+
+    def __init__(self, parent, title):
+        """Initialize the window with an empty output area and a status line."""
+        super(OutputWindow, self).__init__(parent, title=title, size=(600, 400))
+        panel = wx.Panel(self)
+        vbox = wx.BoxSizer(wx.VERTICAL)
+
+        self.output_text = wx.TextCtrl(panel, style=wx.TE_MULTILINE | wx.TE_READONLY | wx.TE_RICH2)
+        vbox.Add(self.output_text, 1, wx.ALL | wx.EXPAND, 10)
+
+        self.status_label = wx.StaticText(panel, label="Running...")
+        vbox.Add(self.status_label, 0, wx.LEFT | wx.RIGHT, 10)
+
+        close_button = wx.Button(panel, label="Close")
+        close_button.Bind(wx.EVT_BUTTON, lambda event: self.Destroy())
+        vbox.Add(close_button, 0, wx.ALIGN_CENTER | wx.ALL, 10)
+
+        panel.SetSizer(vbox)
+
+    def append_output(self, stream, text):
+        """Append a chunk of output, showing stderr in red."""
+        if not self:
+            return  # The window was closed while the command was still running.
+        colour = wx.RED if stream == 'stderr' else wx.BLACK
+        self.output_text.SetDefaultStyle(wx.TextAttr(colour))
+        self.output_text.AppendText(text)
+        excess = self.output_text.GetLastPosition() - self.MAX_CHARS
+        if excess > 0:
+            self.output_text.Remove(0, excess)
+
+    def set_finished(self, result):
+        """Show the final status of the command."""
+        if not self:
+            return
+        if result['returncode'] is None:
+            self.append_output('stderr', result['stderr'])
+            self.status_label.SetLabel("Failed to start")
+        else:
+            self.status_label.SetLabel(f"Finished with exit code {result['returncode']}")
+
+def show_message_dialog(message, title, level):
+    """Show a message from the core modules in a dialog on the UI thread."""
+    icon = wx.ICON_ERROR if level >= logging.ERROR else wx.ICON_WARNING if level >= logging.WARNING else wx.ICON_INFORMATION
+    wx.CallAfter(wx.MessageBox, message, title, wx.OK | icon)
+
+def main(json_file=None):
+    """Start the graphical application on the given store, or the default one."""
+    # Configure logging with rotation to avoid large log files.
+    handler = RotatingFileHandler('command_app.log', maxBytes=10000, backupCount=3)
+    logging.basicConfig(handlers=[handler], level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Slow operations get a log of their own, so they do not push errors out of the small one.
+    slow_handler = RotatingFileHandler('bater_slow.log', maxBytes=1024 * 1024, backupCount=1)
+    slow_handler.setFormatter(logging.Formatter('%(asctime)s - %(threadName)s - %(message)s'))
+    slow_log.addHandler(slow_handler)
+    slow_log.propagate = False
+
+    app = wx.App(False)
+    set_message_handler(show_message_dialog)
+    frame = CommandApp(None, "BATER: Terminal Command Controller", json_file)
+    frame.Show(True)
+    app.MainLoop()
@@ -0,0 +1,625 @@
+"""Command management on top of a storage backend."""
+
+import copy
+import logging
+import os
+import threading
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from .archive import (ARCHIVE_ERRORS, HISTORY_BATCH_SIZE, HISTORY_MERGES, IMPORT_MODES, archive_records, history_key,
+                      history_pages, read_archive, scan_archive, write_archive)
+from .cache import ResultCache
+from .scheduler import Schedule
+from .search import SearchIndex
+from .session import SESSIONS_SUPPORTED, SessionPool
+from .stats import METRIC_FIELDS, execution_stats
+from .storage import open_storage, validate_commands_data
+from .trace import traced
+from .utils import HISTORY_ENTRY_VERSION, extract_placeholders, sanitize_text, show_message
+from .workflow import validate_workflow
+
+def store_path(json_file=None):
+    """Return the store path to use: the given one, the BATER_STORE environment variable, or 'commands.json'."""
+    return json_file or os.environ.get('BATER_STORE', 'commands.json')
+
+class CommandManager:
+    """Class responsible for managing commands and their history on top of a storage backend."""
+
+    def __init__(self, json_file=None, storage=None):
+        """Initialize the CommandManager with a store path or an already opened storage backend.
+
+        The store path defaults to the BATER_STORE environment variable, or 'commands.json'.
+        """
+        self.json_file = store_path(json_file)
+        self.storage = storage or open_storage(self.json_file)
+        self.search_index = SearchIndex(f"{os.path.splitext(self.json_file)[0]}_search.db")
+        self.result_cache = ResultCache()
+        self.shell_sessions = SessionPool()
+        # Scheduler running the scheduled commands, set by the process running them (see scheduler.py).
+        self.scheduler = None
+        self.lock = threading.RLock()
+        self.commands = self.storage.load()
+        self.workflows = self.storage.load_workflows()
+
+    def add_application(self, app_name):
+        """Add a new application to the commands list."""
+        with self.lock:
+            if app_name.lower() not in [key.lower() for key in self.commands.keys()]:
+                self.commands[app_name] = {}
+                self.save_commands()
+                return True
+            return False
+
+    def add_command(self, app_name, command_name, command_text):
+        """Add a new command to the specified application."""
+        with self.lock:
+            if app_name in self.commands:
+                command_id = str(uuid.uuid4())
+                self.commands[app_name][command_id] = {
+                    'name': command_name,
+                    'command': command_text,
+                    'show_output': True  # Default value for showing output
+                }
+                self.save_commands()
+                self.add_command_history(app_name, command_id, command_text, event_type="creation")
+                return True
+            return False
+
+    def add_command_history(self, app_name, command_id, command_text_in, output="", event_type="execution", show_output=True, stderr="", returncode=None,
+                            cached=False, metrics=None, cached_from=None):
+        """Add a history entry to a specific command and return it, or None if the command does not exist.
+
+        Executions may carry metrics such as their duration, CPU time, peak memory and
+        output sizes, keyed by the names in METRIC_FIELDS. A cached execution does not store
+        its output again; cached_from is the timestamp of the run whose output it reused.
+        """
+        if app_name in self.commands and command_id in self.commands[app_name]:
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            command_text = sanitize_text(command_text_in)
+            if event_type not in ("creation", "edit"):
+                event_type = "execution"
+
+            history_entry = {
+                "timestamp": timestamp,
+                "type": event_type,
+                "command": command_text,
+                "v": HISTORY_ENTRY_VERSION
+            }
+            if event_type == "execution":
+                if cached:
+                    history_entry["cached"] = True
+                    if cached_from:
+                        history_entry["cached_from"] = cached_from
+                else:
+                    history_entry["output"] = sanitize_text(output)
+                    if stderr:
+                        history_entry["stderr"] = sanitize_text(stderr)
+                history_entry["returncode"] = returncode
+                for field in METRIC_FIELDS:
+                    if metrics and metrics.get(field) is not None:
+                        history_entry[field] = metrics[field]
+
+            self.storage.append_history(command_id, history_entry)
+            self.search_index.add(command_id, history_entry)
+            return history_entry
+        return None
+
+    def add_workflow(self, app_name, name, nodes, policy='fail-fast'):
+        """Add a workflow over commands of an application and return its ID.
+
+        nodes maps command IDs to {'depends_on': [command IDs]}. Raises ValueError if the
+        workflow refers to unknown commands or its dependencies form a cycle.
+        """
+        with self.lock:
+            if app_name not in self.commands:
+                raise ValueError(f"Unknown application '{app_name}'.")
+            workflow = {'name': name, 'policy': policy, 'nodes': nodes}
+            validate_workflow(workflow, self.commands[app_name])
+            workflow_id = str(uuid.uuid4())
+            self.workflows.setdefault(app_name, {})[workflow_id] = workflow
+            self.save_workflows()
+            return workflow_id
+
+    def add_workflow_history(self, app_name, workflow_id, run):
+        """Record a workflow run, with the timings and output of its steps, as a single history entry."""
+        workflow = self.workflows.get(app_name, {}).get(workflow_id)
+        if workflow is None:
+            return
+        history_entry = {
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "type": "workflow",
+            "command": workflow['name'],
+            "v": HISTORY_ENTRY_VERSION
+        }
+        history_entry.update(run)
+        history_entry["output"] = sanitize_text(run.get('output', ''))
+        self.storage.append_history(workflow_id, history_entry)
+        self.search_index.add(workflow_id, history_entry)
+
+    def apply_retention(self, now=None):
+        """Apply the retention policy to every history, then the store-wide size budget.
+
+        Histories are downsampled and trimmed one at a time. If they still take more than
+        the budget, the oldest entries of all histories are deleted, an hour of timestamps
+        at a time, until the newest entries fit. The deleted entries are logged. Returns the
+        number of deleted entries, of the histories they were deleted from and the bytes of
+        history left.
+        """
+        policy = self.storage.retention
+        with self.lock:
+            history_ids = [history_id for app_items in list(self.commands.values()) + list(self.workflows.values())
+                           for history_id in app_items]
+        trimmed = set()
+        deleted = 0
+        for history_id in history_ids:
+            count = self.storage.apply_retention(history_id, now)
+            if count:
+                deleted += count
+                trimmed.add(history_id)
+
+        hours = Counter()
+        for history_id in history_ids:
+            for timestamp, size in self.storage.history_sizes(history_id):
+                hours[timestamp[:13]] += size
+        total_bytes = sum(hours.values())
+        if policy.store_max_bytes and total_bytes > policy.store_max_bytes:
+            kept_bytes = 0
+            for hour in sorted(hours, reverse=True):
+                if kept_bytes + hours[hour] > policy.store_max_bytes and kept_bytes:
+                    break
+                kept_bytes += hours[hour]
+                cutoff = hour
+            for history_id in history_ids:
+                count = self.storage.delete_history_before(history_id, cutoff)
+                if count:
+                    deleted += count
+                    trimmed.add(history_id)
+            total_bytes = kept_bytes
+        for history_id in trimmed:
+            self.search_index.retain(history_id, self.storage.get_history(history_id, include_output=False))
+        if deleted:
+            logging.warning(f"History retention deleted {deleted} entries from {len(trimmed)} histories "
+                            f"({', '.join(sorted(trimmed))}); limits: {policy.settings()}")
+        return {'deleted_entries': deleted, 'trimmed_histories': len(trimmed), 'history_bytes': total_bytes}
+
+    def cache_ttl(self, app_name, command_id):
+        """Return the number of seconds a command's results may be reused, or 0 if they are not cached."""
+        return self.commands.get(app_name, {}).get(command_id, {}).get('cache_ttl', 0)
+
+    def cached_command_ids(self, app_name, command_id=None):
+        """Return the IDs of an application's commands, or the given one if it belongs to the application."""
+        app_commands = self.commands.get(app_name, {})
+        if command_id is None:
+            return set(app_commands)
+        return {command_id} if command_id in app_commands else set()
+
+    def cached_result_stats(self, app_name, command_id):
+        """Return the number and size of a command's cached results and the cache-wide hit and miss counts."""
+        return self.result_cache.stats(self.cached_command_ids(app_name, command_id))
+
+    def collect_garbage(self):
+        """Delete stored outputs that no history entry refers to any more and return how many were deleted."""
+        return self.storage.collect_garbage()
+
+    def command_stats(self, app_name, command_id):
+        """Return the latency, failure rate, resource usage and duration trend of a command's recorded executions."""
+        if command_id not in self.commands.get(app_name, {}):
+            return None
+        entries = self.storage.get_history(command_id, event_type="execution", include_output=False)
+        return execution_stats(entries[::-1])
+
+    def count_command_history(self, app_name, command_id, event_type=None, since=None, until=None):
+        """Return the number of history entries of a specific command or workflow matching the filters."""
+        if not self.owns_history(app_name, command_id):
+            return 0
+        return self.storage.count_history(command_id, event_type, since, until)
+
+    def delete_command(self, app_name, command_id):
+        """Delete a specific command from an application."""
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                del self.commands[app_name][command_id]
+                if not self.commands[app_name]:
+                    del self.commands[app_name]
+                self.save_commands()
+                self.prune_workflows()
+                self.storage.delete_history(command_id)
+                self.search_index.delete_command(command_id)
+                self.result_cache.invalidate({command_id})
+                return True
+            return False
+
+    def delete_application(self, app_name):
+        """Delete an application and all of its commands."""
+        with self.lock:
+            if app_name in self.commands:
+                command_ids = list(self.commands.pop(app_name))
+                self.save_commands()
+                self.prune_workflows()
+                for command_id in command_ids:
+                    self.storage.delete_history(command_id)
+                    self.search_index.delete_command(command_id)
+                    self.result_cache.invalidate({command_id})
+                self.shell_sessions.close(app_name)
+                return True
+            return False
+
+    def rename_application(self, app_name, new_name):
+        """Rename an application, keeping its commands."""
+        with self.lock:
+            if app_name in self.commands and new_name not in self.commands:
+                self.commands[new_name] = self.commands.pop(app_name)
+                self.save_commands()
+                self.shell_sessions.close(app_name)
+                if app_name in self.workflows:
+                    self.workflows[new_name] = self.workflows.pop(app_name)
+                    self.save_workflows()
+                return True
+            return False
+
+    def delete_workflow(self, app_name, workflow_id):
+        """Delete a workflow and its history; the commands it runs are kept."""
+        with self.lock:
+            if workflow_id in self.workflows.get(app_name, {}):
+                del self.workflows[app_name][workflow_id]
+                if not self.workflows[app_name]:
+                    del self.workflows[app_name]
+                self.save_workflows()
+                self.storage.delete_history(workflow_id)
+                self.search_index.delete_command(workflow_id)
+                return True
+            return False
+
+    def edit_command(self, app_name, command_id, new_name, new_command_text):
+        """Edit an existing command's name and text."""
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                command_data = self.commands[app_name][command_id]
+                old_name = command_data['name']
+                old_command_text = command_data['command']
+
+                command_data['name'] = new_name
+                command_data['command'] = new_command_text
+                self.result_cache.invalidate({command_id})
+
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                history_entry = {
+                    "timestamp": timestamp,
+                    "type": "edit",
+                    "command": new_command_text,
+                    "name": new_name,
+                    "old_name": old_name,
+                    "old_command": old_command_text,
+                    "v": HISTORY_ENTRY_VERSION
+                }
+                self.save_commands()
+                self.storage.append_history(command_id, history_entry)
+                self.search_index.add(command_id, history_entry)
+                return True
+            return False
+
+    def export_commands(self, export_file, include_history=True):
+        """Export all applications, commands and workflows, with their history unless excluded, to an archive.
+
+        The archive holds one JSON record per line and is gzip or lzma compressed when the
+        file name ends with .gz or .xz. Histories are read from the store a page at a time
+        and written as they are read. Returns the numbers of exported applications, commands,
+        workflows and history entries, or None on failure.
+        """
+        with self.lock:
+            commands = copy.deepcopy(self.commands)
+            workflows = copy.deepcopy(self.workflows)
+        try:
+            return write_archive(export_file, archive_records(self.storage, commands, workflows, include_history))
+        except ARCHIVE_ERRORS as e:
+            logging.error(f"Error exporting commands: {e}")
+            show_message(f"Failed to export commands. Details: {e}", "Error")
+            return None
+
+    def flush(self):
+        """Write any pending changes to disk immediately."""
+        self.storage.flush()
+
+    def get_command_history(self, app_name, command_id, offset=0, limit=None, event_type=None, since=None, until=None,
+                            include_output=True):
+        """Retrieve a page of the history of a specific command or workflow matching the filters, newest entry first."""
+        if not self.owns_history(app_name, command_id):
+            return []
+        return self.storage.get_history(command_id, offset, limit, event_type, since, until, include_output)
+
+    def has_command_history(self, app_name, command_id):
+        """Check whether a specific command or workflow has any history entry, without loading its history."""
+        if not self.owns_history(app_name, command_id):
+            return False
+        return self.storage.has_history(command_id)
+
+    def history_ids(self):
+        """Return the IDs of the commands and workflows that have any history entry."""
+        with self.lock:
+            command_ids = [command_id for app_items in list(self.commands.values()) + list(self.workflows.values())
+                           for command_id in app_items]
+        return self.storage.history_ids(command_ids)
+
+    def history_cache_stats(self):
+        """Return statistics of the in-memory history cache, or None if the store has no such cache."""
+        return self.storage.cache_stats()
+
+    def import_commands(self, import_file, mode='merge', history='dedup', include_history=True):
+        """Import applications, commands and workflows from an archive, or from a JSON export of earlier versions.
+
+        The whole archive is checked before the store is changed, then read again record by
+        record. In 'merge' mode, applications, commands and workflows missing from the store
+        are added and those already stored are kept, with the archive's history entries added
+        to their history; history='dedup' skips the entries already stored. In 'replace' mode
+        the store is replaced by the archive. Returns the numbers of imported applications,
+        commands, workflows, history entries and skipped duplicates, or None on failure.
+        """
+        if mode not in IMPORT_MODES or history not in HISTORY_MERGES:
+            raise ValueError(f"Unknown import mode '{mode}' or history merge '{history}'.")
+        try:
+            scan_archive(import_file)
+            with self.lock:
+                if mode == 'replace':
+                    self.storage.replace_all({})
+                    self.commands = {}
+                    self.workflows = {}
+                    self.result_cache.invalidate()
+                    self.shell_sessions.close()
+                counts = self.merge_archive(import_file, history, include_history)
+                self.save_commands()
+                self.save_workflows()
+                self.prune_workflows()
+                self.search_index.clear()
+            self.flush()
+            return counts
+        except ARCHIVE_ERRORS as e:
+            logging.error(f"Error importing commands: {e}")
+            show_message(f"Failed to import commands. Details: {e}", "Error")
+            return None
+
+    def invalidate_cached_results(self, app_name=None, command_id=None):
+        """Drop the cached results of a command, of an application's commands or of all commands.
+
+        Returns how many were dropped.
+        """
+        if app_name is None:
+            return self.result_cache.invalidate(None if command_id is None else {command_id})
+        return self.result_cache.invalidate(self.cached_command_ids(app_name, command_id))
+
+    def merge_archive(self, import_file, history='dedup', include_history=True):
+        """Add the records of a checked archive to the loaded metadata and the stored histories; the caller holds the lock.
+
+        History entries are written to the store in batches of HISTORY_BATCH_SIZE.
+        """
+        counts = {'apps': 0, 'commands': 0, 'workflows': 0, 'history': 0, 'duplicates': 0}
+        known_ids = {item_id for app_items in list(self.commands.values()) + list(self.workflows.values())
+                     for item_id in app_items}
+        batch = []
+        batch_id = None
+        keys = None
+        for record in read_archive(import_file):
+            kind = record['type']
+            if kind == 'app' and record['name'] not in self.commands:
+                self.commands[record['name']] = {}
+                counts['apps'] += 1
+            elif kind in ('command', 'workflow') and record['id'] not in known_ids:
+                items = self.commands if kind == 'command' else self.workflows
+                items.setdefault(record['app'], {})[record['id']] = record[kind]
+                known_ids.add(record['id'])
+                counts[f"{kind}s"] += 1
+            elif kind == 'history' and include_history:
+                if record['id'] != batch_id or len(batch) >= HISTORY_BATCH_SIZE:
+                    if batch:
+                        self.storage.import_history(batch_id, batch)
+                        batch = []
+                    if record['id'] != batch_id:
+                        batch_id = record['id']
+                        keys = None if history == 'concat' else Counter(
+                            history_key(entry) for page in history_pages(self.storage, batch_id) for entry in page)
+                if keys:
+                    key = history_key(record['entry'])
+                    if keys[key] > 0:
+                        # Each stored entry accounts for one archived copy, so repeated runs are kept.
+                        keys[key] -= 1
+                        counts['duplicates'] += 1
+                        continue
+                batch.append(record['entry'])
+                counts['history'] += 1
+        if batch:
+            self.storage.import_history(batch_id, batch)
+        return counts
+
+    def owns_history(self, app_name, history_id):
+        """Check whether a history ID is a command or a workflow of an application."""
+        return history_id in self.commands.get(app_name, {}) or history_id in self.workflows.get(app_name, {})
+
+    def prune_workflows(self):
+        """Remove the steps of workflows whose commands no longer exist, and the workflows left empty.
+
+        Steps depending on a removed step inherit its dependencies, so the order of the
+        remaining steps is kept.
+        """
+        with self.lock:
+            changed = False
+            for app_name in list(self.workflows):
+                app_commands = self.commands.get(app_name, {})
+                for workflow_id in list(self.workflows[app_name]):
+                    nodes = self.workflows[app_name][workflow_id]['nodes']
+                    for command_id in [command_id for command_id in nodes if command_id not in app_commands]:
+                        inherited = nodes.pop(command_id).get('depends_on', [])
+                        for node in nodes.values():
+                            if command_id in node.get('depends_on', []):
+                                node['depends_on'] = list(dict.fromkeys(
+                                    dependency for dependency in node['depends_on'] + inherited
+                                    if dependency != command_id))
+                        changed = True
+                    if not nodes:
+                        del self.workflows[app_name][workflow_id]
+                        self.storage.delete_history(workflow_id)
+                        self.search_index.delete_command(workflow_id)
+                if not self.workflows[app_name]:
+                    del self.workflows[app_name]
+            if changed:
+                self.save_workflows()
+
+    def query_history(self, event_type=None, offset=0, limit=50):
+        """Return a page of history entries across all commands, newest first, as (app_name, command_id, entry) tuples."""
+        with self.lock:
+            locations = {command_id: app_name for app_name, app_commands in self.commands.items() for command_id in app_commands}
+        return [
+            (locations[command_id], command_id, entry)
+            for command_id, entry in self.storage.query_history(event_type, offset, limit)
+            if command_id in locations
+        ]
+
+    def reload(self):
+        """Read the metadata and workflows from the store again, picking up changes made by other processes."""
+        self.flush()
+        with self.lock:
+            self.commands = self.storage.load()
+            self.workflows = self.storage.load_workflows()
+            self.search_index.clear()
+            self.result_cache.invalidate()
+            if self.scheduler:
+                self.scheduler.sync()
+
+    def retention_pass_enabled(self):
+        """Check whether the retention policy has limits that only apply_retention() applies."""
+        return self.storage.retention.needs_pass()
+
+    @traced('save_commands')
+    def save_commands(self):
+        """Persist the command metadata through the storage backend and update the running schedules."""
+        with self.lock:
+            self.storage.save(self.commands)
+            if self.scheduler:
+                self.scheduler.sync()
+
+    def schedule(self, app_name, command_id):
+        """Return the schedule of a command as stored in its metadata, or None if it is not scheduled."""
+        return self.commands.get(app_name, {}).get(command_id, {}).get('schedule')
+
+    def schedule_times(self):
+        """Return the next and last run times of the scheduled commands by command ID, empty if no scheduler runs."""
+        return self.scheduler.times() if self.scheduler else {}
+
+    def save_workflows(self):
+        """Persist the workflows through the storage backend."""
+        with self.lock:
+            self.storage.save_workflows(self.workflows)
+
+    def search_history(self, text, limit=50, order='rank'):
+        """Search the command text and output of all history entries.
+
+        Returns up to limit hits as dicts with the app, command or workflow ID and name,
+        timestamp, type, exit code and a snippet of the matching text with the match in
+        brackets. The index is built from the store on the first search.
+        """
+        with self.lock:
+            locations = {command_id: (app_name, command_data['name'])
+                         for app_name, app_commands in list(self.commands.items()) + list(self.workflows.items())
+                         for command_id, command_data in app_commands.items()}
+        if not self.search_index.is_built():
+            self.search_index.rebuild(
+                (command_id, self.storage.get_history(command_id)[::-1]) for command_id in locations)
+
+        return [
+            dict(hit, app=locations[hit['id']][0], name=locations[hit['id']][1])
+            for hit in self.search_index.search(text, limit, order)
+            if hit['id'] in locations
+        ]
+
+    def set_cache_ttl(self, app_name, command_id, cache_ttl):
+        """Set how many seconds a command's results may be reused; 0 disables caching and drops cached results."""
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                command_data = self.commands[app_name][command_id]
+                if cache_ttl > 0:
+                    command_data['cache_ttl'] = cache_ttl
+                else:
+                    command_data.pop('cache_ttl', None)
+                    self.result_cache.invalidate({command_id})
+                self.save_commands()
+                return True
+            return False
+
+    def set_schedule(self, app_name, command_id, schedule):
+        """Set when a command runs on its own, as a dictionary with 'interval' or 'cron' and optional 'jitter' and 'overlap'.
+
+        None removes the schedule. Raises ValueError for invalid schedules and for templates,
+        whose placeholders cannot be filled in unattended.
+        """
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                command_data = self.commands[app_name][command_id]
+                if schedule:
+                    if extract_placeholders(command_data['command']):
+                        raise ValueError("Commands with placeholders cannot be scheduled.")
+                    command_data['schedule'] = Schedule.from_dict(schedule).to_dict()
+                else:
+                    command_data.pop('schedule', None)
+                self.save_commands()
+                return True
+            return False
+
+    def set_session(self, app_name, command_id, enabled):
+        """Set whether a command runs in its application's shell session instead of a new shell."""
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                command_data = self.commands[app_name][command_id]
+                if enabled:
+                    command_data['session'] = True
+                else:
+                    command_data.pop('session', None)
+                self.save_commands()
+                return True
+            return False
+
+    def shell_session(self, app_name, command_id):
+        """Return the shell session a command runs in, or None if it runs in a new shell."""
+        if SESSIONS_SUPPORTED and self.uses_session(app_name, command_id):
+            return self.shell_sessions.get(app_name)
+        return None
+
+    def update_workflow(self, app_name, workflow_id, name, nodes, policy='fail-fast'):
+        """Replace the name, steps and policy of a workflow.
+
+        Raises ValueError if the workflow refers to unknown commands or its dependencies form a cycle.
+        """
+        with self.lock:
+            if workflow_id not in self.workflows.get(app_name, {}):
+                return False
+            workflow = {'name': name, 'policy': policy, 'nodes': nodes}
+            validate_workflow(workflow, self.commands[app_name])
+            self.workflows[app_name][workflow_id] = workflow
+            self.save_workflows()
+            return True
+
+    def update_show_output(self, app_name, command_id, show_output):
+        """Update the 'show_output' setting for a command in the JSON file."""
+        with self.lock:
+            if app_name in self.commands and command_id in self.commands[app_name]:
+                self.commands[app_name][command_id]['show_output'] = show_output
+                self.save_commands()
+
+    def store_info(self):
+        """Return the store location, backend and size, the state of the history cache and the retention limits."""
+        with self.lock:
+            return {
+                'store': self.json_file,
+                'backend': type(self.storage).__name__,
+                'apps': len(self.commands),
+                'commands': sum(len(app_commands) for app_commands in self.commands.values()),
+                'history_cache': self.history_cache_stats(),
+                'retention': self.storage.retention.settings()
+            }
+
+    def uses_session(self, app_name, command_id):
+        """Check whether a command is set to run in its application's shell session."""
+        return self.commands.get(app_name, {}).get(command_id, {}).get('session', False)
+
+    def validate_commands_data(self, data):
+        """Validate the structure of the commands data."""
+        validate_commands_data(data)
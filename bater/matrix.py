@@ -0,0 +1,134 @@
+"""Matrix runs: one command template executed once per parameter set on a bounded worker pool."""
+
+import csv
+import io
+import threading
+import time
+
+from .executor import MAX_CONCURRENT_COMMANDS, ExecutionService, call_directly, create_executor
+from .utils import extract_placeholders, fill_placeholders
+
+def template_placeholders(command_template):
+    """Return the distinct placeholder names of a command template, in order of appearance."""
+    return list(dict.fromkeys(extract_placeholders(command_template)))
+
+def parse_parameter_sets(text, placeholders):
+    """Parse parameter sets from CSV text whose header names the placeholders.
+
+    A template with a single placeholder also accepts one value per line, without a header.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if not lines:
+        return []
+    header = [name.strip() for name in next(csv.reader([lines[0]]))]
+    if len(placeholders) == 1 and placeholders[0] not in header:
+        return [{placeholders[0]: line.strip()} for line in lines]
+
+    missing = [name for name in placeholders if name not in header]
+    if missing:
+        raise ValueError(f"The CSV header has no column for: {', '.join(missing)}")
+    reader = csv.DictReader(io.StringIO("\n".join(lines)), fieldnames=header)
+    next(reader)
+    return [{name: (row.get(name) or "").strip() for name in placeholders} for row in reader]
+
+class MatrixRun:
+    """Runs a stored command template once per parameter set and collects a table of results.
+
+    Rows run concurrently on a dedicated pool of max_workers threads, so a run takes about
+    as long as its slowest rows rather than the sum of all rows. Each row is a dict with its
+    index, parameters, rendered command, state, success, exit code, duration and output.
+    on_row_finished(row) is invoked through dispatch as rows finish.
+    """
+
+    def __init__(self, command_manager, app_name, command_id, parameter_sets, max_workers=MAX_CONCURRENT_COMMANDS,
+                 on_row_finished=None, dispatch=call_directly):
+        """Render the command of every row; rows whose parameters are incomplete are marked failed."""
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.command_id = command_id
+        self.max_workers = max(1, max_workers)
+        self.on_row_finished = on_row_finished
+        self.dispatch = dispatch
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.service = None
+        self.started = None
+        self.finished = None
+        self.rows = []
+
+        template = command_manager.commands[app_name][command_id]['command']
+        for index, parameters in enumerate(parameter_sets):
+            row = {'index': index, 'parameters': parameters, 'command': '', 'state': 'queued', 'job': None,
+                   'success': False, 'returncode': None, 'duration': None, 'stdout': '', 'stderr': ''}
+            try:
+                row['command'] = fill_placeholders(template, parameters)
+            except ValueError as e:
+                row.update(state='failed', stderr=str(e))
+            self.rows.append(row)
+
+    def cancel(self):
+        """Drop the rows that have not started and terminate the running ones."""
+        if self.service:
+            self.service.shutdown()
+        with self.lock:
+            for row in self.rows:
+                if self.row_state(row) == 'queued':
+                    row['state'] = 'cancelled'
+        self.check_finished()
+
+    def check_finished(self):
+        """Stop the pool and record the end time once no row is queued or running."""
+        with self.lock:
+            if self.finished is not None or any(row['state'] in ('queued', 'running') for row in self.rows):
+                return
+            self.finished = time.monotonic()
+        if self.service:
+            self.service.shutdown()
+        self.done.set()
+
+    def on_finished(self, row, success, result):
+        """Store the result of a row."""
+        with self.lock:
+            row.update(state='cancelled' if result['cancelled'] else 'finished', success=success,
+                       returncode=result['returncode'], duration=result['duration'],
+                       stdout=result['stdout'], stderr=result['stderr'])
+        if self.on_row_finished:
+            self.on_row_finished(row)
+        self.check_finished()
+
+    def row_state(self, row):
+        """Return the state of a row, reporting queued rows already taken by a worker as running."""
+        job = row['job']
+        if row['state'] == 'queued' and job is not None and job.state == 'running':
+            return 'running'
+        return row['state']
+
+    def start(self):
+        """Queue every row on a new worker pool."""
+        self.started = time.monotonic()
+        self.service = ExecutionService(max_workers=self.max_workers, max_per_app=self.max_workers)
+        for row in self.rows:
+            if row['state'] != 'queued':
+                continue
+            executor = create_executor(row['command'], lambda success, result, row=row: self.on_finished(row, success, result),
+                                       self.app_name, self.command_id, self.command_manager, dispatch=self.dispatch)
+            row['job'] = self.service.submit(self.app_name, self.command_id, executor)
+        self.check_finished()
+
+    def summary(self):
+        """Return the counts of rows by outcome, the elapsed time and the summed duration of the rows."""
+        with self.lock:
+            end = self.finished if self.finished is not None else time.monotonic()
+            return {
+                'rows': len(self.rows),
+                'succeeded': sum(1 for row in self.rows if row['state'] == 'finished' and row['success']),
+                'failed': sum(1 for row in self.rows if row['state'] in ('finished', 'failed') and not row['success']),
+                'cancelled': sum(1 for row in self.rows if row['state'] == 'cancelled'),
+                'pending': sum(1 for row in self.rows if row['state'] == 'queued'),
+                'elapsed': round(end - self.started, 3) if self.started is not None else 0.0,
+                'total_duration': round(sum(row['duration'] or 0.0 for row in self.rows), 3)
+            }
+
+    def wait(self, timeout=None):
+        """Block until every row has finished or been cancelled, and return whether they have."""
+        return self.done.wait(timeout)
@@ -0,0 +1,398 @@
+"""Command safety policy: a configurable rule set checked against the pipeline segments of a command."""
+
+import json
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+
+# JSON file with rules added to, or replacing, the default ones: {"rules": [...], "disable": [rule IDs]}.
+POLICY_FILE = os.environ.get('BATER_POLICY_FILE')
+
+# Number of command verdicts, and of program names with their matching rules, kept in memory.
+VERDICT_CACHE_SIZE = 4096
+
+# Severities of findings; only 'danger' findings make a command dangerous.
+SEVERITIES = ('danger', 'warning')
+
+# Commands that run the command given as their arguments, possibly with options of their own.
+WRAPPERS = {'sudo', 'doas', 'su', 'pkexec', 'env', 'nice', 'ionice', 'nohup', 'time', 'command', 'builtin', 'exec',
+            'stdbuf', 'timeout', 'xargs', 'watch', 'chroot', 'strace', 'unbuffer', 'busybox'}
+
+# Wrapper options followed by a value rather than by the wrapped command.
+WRAPPER_VALUE_OPTIONS = {'-u', '-g', '-n', '-c', '-C', '-p', '-U', '-s', '-k', '-I', '-P', '-d', '-E', '-L'}
+
+# Wrapper options that make the wrapper only look the command up, e.g. `command -v rm`, by wrapper.
+LOOKUP_OPTIONS = {'command': set('vV')}
+
+# Wrappers none of whose options take a value.
+FLAG_ONLY_WRAPPERS = {'command', 'builtin', 'nohup'}
+
+# Shell words that may precede a command without being one.
+RESERVED_WORDS = {'if', 'then', 'else', 'elif', 'do', 'while', 'until', '!', '{', '}'}
+
+# Programs whose -c argument is itself a command line.
+SHELLS = {'sh', 'bash', 'dash', 'zsh', 'ksh', 'fish', 'busybox', 'su'}
+
+# Rules checked by default. A rule matches either the program of a segment, given as a regular
+# expression of its base name, with an optional 'args' expression searched in its arguments
+# and 'piped' set for segments reading from a pipe, or a 'pattern' searched in the whole command.
+DEFAULT_RULES = [
+    {'id': 'rm', 'program': r'rm|unlink|shred|srm', 'message': "Deletes files"},
+    {'id': 'rm-recursive', 'program': r'rm', 'args': r'(^|\s)(-[a-zA-Z]*[rR]|--recursive)',
+     'message': "Recursively deletes directories"},
+    {'id': 'rm-root', 'program': r'rm', 'args': r'(^|\s)(/|/\*|~|~/|\$HOME/?)(\s|$)',
+     'message': "Deletes the root or home directory"},
+    {'id': 'find-delete', 'program': r'find', 'args': r'(^|\s)(-delete|-exec\s+(\S*/)?rm)\b',
+     'message': "Deletes the files found"},
+    {'id': 'shutdown', 'program': r'shutdown|reboot|halt|poweroff', 'message': "Shuts down or restarts the machine"},
+    {'id': 'init-runlevel', 'program': r'init|telinit', 'args': r'^[06](\s|$)',
+     'message': "Shuts down or restarts the machine"},
+    {'id': 'systemctl-power', 'program': r'systemctl', 'args': r'(^|\s)(poweroff|reboot|halt|kexec)(\s|$)',
+     'message': "Shuts down or restarts the machine"},
+    {'id': 'dd', 'program': r'dd', 'message': "Writes raw data to files or devices"},
+    {'id': 'mkfs', 'program': r'mkfs(\..+)?|mke2fs|mkswap|wipefs', 'message': "Creates a filesystem, erasing the device"},
+    {'id': 'partition', 'program': r'fdisk|sfdisk|gdisk|cfdisk|parted', 'message': "Changes partition tables"},
+    {'id': 'crontab-remove', 'program': r'crontab', 'args': r'(^|\s)-[a-zA-Z]*r', 'message': "Removes the crontab"},
+    {'id': 'kill-all', 'program': r'kill', 'args': r'(^|\s)-1(\s|$)', 'message': "Kills every process of the user"},
+    {'id': 'pipe-to-shell', 'program': r'sh|bash|dash|zsh|ksh|fish|python[0-9.]*|perl|ruby|node', 'piped': True,
+     'args': r'^(-\S*\s+)*(-\S*|--\s.*)?$', 'message': "Runs a script piped from another command"},
+    {'id': 'fork-bomb', 'pattern': r':\(\)\s*\{\s*:\s*\|\s*:\s*&\s*\}', 'message': "Fork bomb"},
+    {'id': 'device-write', 'pattern': r'>\s*/dev/(sd|hd|vd|xvd|nvme|mmcblk|disk)\w*',
+     'message': "Overwrites a disk device"},
+    {'id': 'system-file-write', 'pattern': r'>\s*/etc/(passwd|shadow|group|sudoers|fstab)\b',
+     'message': "Overwrites a system file"},
+    {'id': 'privileged', 'program': r'sudo|doas|su|pkexec', 'severity': 'warning',
+     'message': "Runs with elevated privileges"},
+    {'id': 'recursive-permissions', 'program': r'chmod|chown|chgrp', 'args': r'(^|\s)(-[a-zA-Z]*R|--recursive)',
+     'severity': 'warning', 'message': "Recursively changes permissions or ownership"},
+    {'id': 'kill-by-name', 'program': r'killall|pkill', 'severity': 'warning', 'message': "Kills processes by name"},
+    {'id': 'git-destructive', 'program': r'git',
+     'args': r'^(push\b.*\s(--force\S*|-f)(\s|$)|reset\s+--hard|clean\s+-[a-zA-Z]*f)', 'severity': 'warning',
+     'message': "Discards commits or uncommitted changes"},
+    {'id': 'container-prune', 'program': r'docker|podman', 'args': r'(^|\s)prune(\s|$)', 'severity': 'warning',
+     'message': "Deletes unused containers, images or volumes"},
+    {'id': 'firewall-flush', 'program': r'iptables|ip6tables|nft', 'args': r'(^|\s)(-F|--flush|flush)(\s|$)',
+     'severity': 'warning', 'message': "Removes firewall rules"},
+    {'id': 'truncate', 'program': r'truncate', 'severity': 'warning', 'message': "Truncates files"}
+]
+
+def find_closing(text, start, opening, closing):
+    """Return the index of the bracket closing the one before start, skipping quoted text, or len(text)."""
+    depth = 1
+    index = start
+    while index < len(text):
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == "'":
+            end = text.find("'", index + 1)
+            index = len(text) if end < 0 else end + 1
+            continue
+        if char == opening:
+            depth += 1
+        elif char == closing:
+            depth -= 1
+            if depth == 0:
+                return index
+        index += 1
+    return len(text)
+
+def split_command(command, context='command'):
+    """Split a shell command line into its simple commands.
+
+    Returns segments as dicts with the unquoted 'words', whether the segment is 'piped' from
+    the previous one and its 'context': the given one, or 'substitution' for commands run by
+    $(...), backticks and process substitution, which are split recursively. Unbalanced
+    quotes never raise; the rest of the line is taken as quoted.
+    """
+    segments = []
+    words = []
+    word = []
+    in_word = False
+    piped = False
+
+    def end_word():
+        nonlocal in_word
+        if in_word:
+            words.append("".join(word))
+            word.clear()
+            in_word = False
+
+    def end_segment(piped_next):
+        nonlocal piped
+        end_word()
+        if words:
+            segments.append({'words': words[:], 'piped': piped, 'context': context})
+            words.clear()
+        piped = piped_next
+
+    def substitute(index, opening, closing):
+        end = find_closing(command, index, opening, closing) if opening else command.find(closing, index)
+        end = len(command) if end < 0 else end
+        segments.extend(split_command(command[index:end], 'substitution'))
+        return end + 1
+
+    length = len(command)
+    index = 0
+    while index < length:
+        char = command[index]
+        if char in ' \t':
+            end_word()
+            index += 1
+        elif char == '#' and not in_word:
+            newline = command.find('\n', index)
+            index = length if newline < 0 else newline
+        elif char == '\\':
+            if index + 1 < length and command[index + 1] != '\n':
+                word.append(command[index + 1])
+                in_word = True
+            index += 2
+        elif char == "'":
+            end = command.find("'", index + 1)
+            end = length if end < 0 else end
+            word.append(command[index + 1:end])
+            in_word = True
+            index = end + 1
+        elif char == '"':
+            in_word = True
+            index += 1
+            while index < length and command[index] != '"':
+                if command[index] == '\\' and index + 1 < length:
+                    word.append(command[index + 1])
+                    index += 2
+                elif command.startswith('$(', index):
+                    index = substitute(index + 2, '(', ')')
+                elif command[index] == '`':
+                    index = substitute(index + 1, None, '`')
+                else:
+                    word.append(command[index])
+                    index += 1
+            index += 1
+        elif command.startswith('$((', index):
+            end = command.find('))', index)
+            end = length if end < 0 else end
+            word.append(command[index:end + 2])
+            in_word = True
+            index = end + 2
+        elif command.startswith(('$(', '<(', '>('), index):
+            in_word = True
+            index = substitute(index + 2, '(', ')')
+        elif char == '`':
+            in_word = True
+            index = substitute(index + 1, None, '`')
+        elif command.startswith(('>&', '<&', '&>'), index):
+            word.append(command[index:index + 2])
+            in_word = True
+            index += 2
+        elif command.startswith(('||', '&&', ';;'), index):
+            end_segment(False)
+            index += 2
+        elif command.startswith('|&', index):
+            end_segment(True)
+            index += 2
+        elif char == '|':
+            end_segment(True)
+            index += 1
+        elif char in ';&\n()':
+            end_segment(False)
+            index += 1
+        else:
+            word.append(char)
+            in_word = True
+            index += 1
+    end_segment(False)
+    return segments
+
+def command_views(segment):
+    """Return the (program, arguments) pairs a segment runs: any wrappers, then the wrapped command.
+
+    Leading variable assignments and reserved words are skipped and wrapper options are skipped
+    heuristically. A wrapper given one of its LOOKUP_OPTIONS only looks its arguments up, which
+    are then not returned as a program. A shell's -c argument and eval's arguments are returned
+    as further segments, in the 'shell' context.
+    """
+    words = segment['words']
+    index = 0
+    while index < len(words) and (words[index] in RESERVED_WORDS or re.match(r'[A-Za-z_]\w*=', words[index])):
+        index += 1
+    views = []
+    nested = []
+    while index < len(words):
+        program = os.path.basename(words[index])
+        arguments = words[index + 1:]
+        views.append((program, arguments))
+        if program == 'eval':
+            nested.extend(split_command(" ".join(arguments), 'shell'))
+            break
+        if program in SHELLS and '-c' in arguments and arguments.index('-c') + 1 < len(arguments):
+            nested.extend(split_command(arguments[arguments.index('-c') + 1], 'shell'))
+            break
+        if program not in WRAPPERS:
+            break
+        index += 1
+        lookup = False
+        while index < len(words) and (words[index].startswith('-') or re.match(r'[A-Za-z_]\w*=|\d+[smhd]?$', words[index])):
+            if re.match(r'-[A-Za-z]', words[index]) and LOOKUP_OPTIONS.get(program, set()) & set(words[index][1:]):
+                lookup = True
+            takes_value = words[index] in WRAPPER_VALUE_OPTIONS and program not in FLAG_ONLY_WRAPPERS
+            index += 2 if takes_value else 1
+        if lookup:
+            break
+    return views, nested
+
+class PolicyRule:
+    """A compiled rule of the policy."""
+
+    def __init__(self, rule):
+        """Compile a rule given as a dict, raising ValueError if it is malformed."""
+        if not rule.get('id'):
+            raise ValueError(f"Policy rule without an 'id': {rule}")
+        if bool(rule.get('program')) == bool(rule.get('pattern')):
+            raise ValueError(f"Policy rule '{rule['id']}' needs either a 'program' or a 'pattern'.")
+        if rule.get('severity', 'danger') not in SEVERITIES:
+            raise ValueError(f"Policy rule '{rule['id']}' has an unknown severity '{rule.get('severity')}'.")
+        self.id = rule['id']
+        self.severity = rule.get('severity', 'danger')
+        self.message = rule.get('message', self.id)
+        self.piped = rule.get('piped', False)
+        try:
+            self.program = re.compile(rule['program']) if rule.get('program') else None
+            self.args = re.compile(rule['args']) if rule.get('args') else None
+            self.pattern = re.compile(rule['pattern']) if rule.get('pattern') else None
+        except re.error as e:
+            raise ValueError(f"Policy rule '{self.id}' has an invalid expression: {e}")
+
+    def finding(self, text, context):
+        """Return the finding of this rule for the matched text."""
+        return {'rule': self.id, 'severity': self.severity, 'message': self.message, 'segment': text, 'context': context}
+
+class CommandPolicy:
+    """Checks commands against a rule set, memoizing the verdicts of recent commands.
+
+    Program rules are looked up by the program name of each segment, and the matching rules of
+    recent program names are memoized like the verdicts; pattern rules are combined into a single expression
+    that rejects most commands in one search.
+    """
+
+    def __init__(self, rules=None, cache_size=VERDICT_CACHE_SIZE):
+        """Compile the rules, the default ones if none are given; raises ValueError for malformed rules."""
+        compiled = [PolicyRule(rule) for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.program_rules = [rule for rule in compiled if rule.program]
+        self.pattern_rules = [rule for rule in compiled if rule.pattern]
+        self.combined_pattern = None
+        if self.pattern_rules:
+            self.combined_pattern = re.compile("|".join(f"(?:{rule.pattern.pattern})" for rule in self.pattern_rules))
+        self.programs = OrderedDict()
+        self.cache_size = cache_size
+        self.verdicts = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def check(self, command):
+        """Return the verdict on a command: whether it is 'dangerous', its highest 'severity' and the 'findings'.
+
+        Verdicts are shared between calls for the same command and must not be modified.
+        """
+        with self.lock:
+            verdict = self.verdicts.get(command)
+            if verdict is not None:
+                self.verdicts.move_to_end(command)
+                self.hits += 1
+                return verdict
+            self.misses += 1
+
+        findings = []
+        pending = split_command(command)
+        while pending:
+            segment = pending.pop(0)
+            views, nested = command_views(segment)
+            pending.extend(nested)
+            for position, (program, arguments) in enumerate(views):
+                piped = segment['piped'] and position == len(views) - 1
+                text = " ".join([program] + arguments)
+                argument_text = " ".join(arguments)
+                for rule in self.rules_for_program(program):
+                    if (rule.piped and not piped) or (rule.args and not rule.args.search(argument_text)):
+                        continue
+                    findings.append(rule.finding(text, segment['context']))
+        if self.combined_pattern and self.combined_pattern.search(command):
+            for rule in self.pattern_rules:
+                match = rule.pattern.search(command)
+                if match:
+                    findings.append(rule.finding(match.group(0), 'command'))
+
+        severities = {finding['severity'] for finding in findings}
+        verdict = {
+            'dangerous': 'danger' in severities,
+            'severity': next((severity for severity in SEVERITIES if severity in severities), None),
+            'findings': findings
+        }
+        with self.lock:
+            self.verdicts[command] = verdict
+            while len(self.verdicts) > self.cache_size:
+                self.verdicts.popitem(last=False)
+        return verdict
+
+    def rules_for_program(self, program):
+        """Return the program rules whose expression matches a program name, memoizing those of recent names."""
+        with self.lock:
+            rules = self.programs.get(program)
+            if rules is not None:
+                self.programs.move_to_end(program)
+                return rules
+            rules = [rule for rule in self.program_rules if rule.program.fullmatch(program)]
+            self.programs[program] = rules
+            while len(self.programs) > self.cache_size:
+                self.programs.popitem(last=False)
+            return rules
+
+    def stats(self):
+        """Return the number of rules and the hits and misses of the verdict cache."""
+        with self.lock:
+            return {
+                'rules': len(self.program_rules) + len(self.pattern_rules),
+                'cached_verdicts': len(self.verdicts),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+def load_rules(policy_file):
+    """Return the default rules combined with those of a policy file, which replace rules with the same ID."""
+    with open(policy_file, 'r') as file:
+        config = json.load(file)
+    rules = {rule['id']: rule for rule in DEFAULT_RULES}
+    for rule in config.get('rules', []):
+        rules[rule.get('id')] = rule
+    for rule_id in config.get('disable', []):
+        rules.pop(rule_id, None)
+    return list(rules.values())
+
+# The policy used by check_command(), loaded on first use.
+default_policy = None
+default_policy_lock = threading.Lock()
+
+def get_policy():
+    """Return the policy of BATER_POLICY_FILE, or of the default rules if it is unset or invalid."""
+    global default_policy
+    with default_policy_lock:
+        if default_policy is None:
+            if POLICY_FILE:
+                try:
+                    default_policy = CommandPolicy(load_rules(POLICY_FILE))
+                except (OSError, ValueError, AttributeError, TypeError) as e:
+                    logging.error(f"Error loading policy file {POLICY_FILE}, using the default rules: {e}")
+            if default_policy is None:
+                default_policy = CommandPolicy()
+        return default_policy
+
+def check_command(command):
+    """Check a command against the configured policy and return its verdict."""
+    return get_policy().check(command)
+
+def describe_verdict(verdict):
+    """Return the findings of a verdict as lines of text."""
+    return [f"{finding['message']} ({finding['severity']}): {finding['segment']}" for finding in verdict['findings']]
@@ -0,0 +1,208 @@
+"""History retention: limits by count, age and size, and downsampling of old executions."""
+
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+# Maximum number of history entries kept per command.
+MAX_HISTORY_ENTRIES = int(os.environ.get('BATER_HISTORY_MAX_ENTRIES', 1000))
+
+# Maximum bytes of history kept per command, outputs included; 0 for no limit.
+HISTORY_MAX_BYTES = int(os.environ.get('BATER_HISTORY_MAX_BYTES', 64 * 1024 * 1024))
+
+# Days after which history entries are deleted; 0 keeps them.
+HISTORY_MAX_AGE_DAYS = float(os.environ.get('BATER_HISTORY_MAX_AGE_DAYS', 0))
+
+# Days after which only the first, last and failed executions of each day are kept; 0, the default, keeps them all.
+HISTORY_DOWNSAMPLE_DAYS = float(os.environ.get('BATER_HISTORY_DOWNSAMPLE_DAYS', 0))
+
+# Maximum bytes of history in the whole store; 0, the default, for no limit.
+STORE_MAX_HISTORY_BYTES = int(os.environ.get('BATER_STORE_MAX_HISTORY_BYTES', 0))
+
+class HistoryRing:
+    """Fixed-capacity circular buffer of a command's history entries, oldest first.
+
+    Appending to a full ring overwrites its oldest entry in constant time. The ring keeps
+    the size of each entry and their total, so size limits need no pass over the entries.
+    Each entry may also refer to blobs, given as {key: size}; the total counts a blob
+    once however many entries refer to it.
+    """
+
+    def __init__(self, capacity=MAX_HISTORY_ENTRIES, entries=(), sizes=(), blobs=None):
+        """Initialize a ring holding at most capacity entries, filled with the newest of the given ones."""
+        self.capacity = max(1, capacity)
+        self.slots = [None] * self.capacity
+        self.slot_sizes = [0] * self.capacity
+        self.slot_blobs = [None] * self.capacity
+        self.blob_refs = Counter()
+        self.start = 0
+        self.count = 0
+        self.total_bytes = 0
+        for entry, size, entry_blobs in zip(entries, sizes, blobs or [None] * len(sizes)):
+            self.append(entry, size, entry_blobs)
+
+    def __getitem__(self, index):
+        """Return the entry at a position counted from the oldest one, or a list of entries for a slice."""
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("history index out of range")
+        return self.slots[(self.start + index) % self.capacity]
+
+    def __iter__(self):
+        """Iterate over the entries, oldest first."""
+        for position in range(self.count):
+            yield self.slots[(self.start + position) % self.capacity]
+
+    def __len__(self):
+        """Return the number of entries."""
+        return self.count
+
+    def append(self, entry, size, blobs=None):
+        """Add an entry taking size bytes besides its blobs; return the (entry, size) it overwrote when full, or None."""
+        evicted = self.popleft() if self.count == self.capacity else None
+        slot = (self.start + self.count) % self.capacity
+        self.slots[slot] = entry
+        self.slot_sizes[slot] = size
+        self.slot_blobs[slot] = blobs
+        self.count += 1
+        self.total_bytes += size
+        for key, blob_size in (blobs or {}).items():
+            self.blob_refs[key] += 1
+            if self.blob_refs[key] == 1:
+                self.total_bytes += blob_size
+        return evicted
+
+    def items(self):
+        """Iterate over the entries, their sizes besides their blobs and their blobs, oldest first."""
+        for position in range(self.count):
+            slot = (self.start + position) % self.capacity
+            yield self.slots[slot], self.slot_sizes[slot], self.slot_blobs[slot]
+
+    def oldest(self):
+        """Return the oldest entry, or None if the ring is empty."""
+        return self.slots[self.start] if self.count else None
+
+    def popleft(self):
+        """Remove the oldest entry and return it with the bytes freed, those of blobs no other entry refers to included."""
+        entry, size, blobs = self.slots[self.start], self.slot_sizes[self.start], self.slot_blobs[self.start]
+        for key, blob_size in (blobs or {}).items():
+            self.blob_refs[key] -= 1
+            if not self.blob_refs[key]:
+                del self.blob_refs[key]
+                size += blob_size
+        self.slots[self.start] = None
+        self.slot_blobs[self.start] = None
+        self.start = (self.start + 1) % self.capacity
+        self.count -= 1
+        self.total_bytes -= size
+        return entry, size
+
+    def sizes(self):
+        """Return the (timestamp, bytes) pairs of the entries, oldest first.
+
+        Each blob is counted with the newest entry referring to it, so dropping the oldest
+        entries frees the bytes reported for them.
+        """
+        sizes = []
+        counted = set()
+        for entry, size, blobs in reversed(list(self.items())):
+            for key, blob_size in (blobs or {}).items():
+                if key not in counted:
+                    counted.add(key)
+                    size += blob_size
+            sizes.append((entry.get('timestamp', ''), size))
+        return sizes[::-1]
+
+def is_failure(entry):
+    """Check whether an execution entry failed, which includes executions without a known exit code."""
+    return entry.get('returncode') != 0
+
+class RetentionPolicy:
+    """Limits on the history kept for each command and in the whole store.
+
+    The count, size and age limits are applied to a command's history whenever an entry is
+    added. Downsampling and the store-wide size budget need a pass over every history and
+    are applied by CommandManager.apply_retention(); both are disabled unless configured.
+    """
+
+    def __init__(self, max_entries=MAX_HISTORY_ENTRIES, max_bytes=HISTORY_MAX_BYTES, max_age_days=HISTORY_MAX_AGE_DAYS,
+                 downsample_days=HISTORY_DOWNSAMPLE_DAYS, store_max_bytes=STORE_MAX_HISTORY_BYTES):
+        """Initialize the policy; limits of 0 are disabled."""
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.downsample_days = downsample_days
+        self.store_max_bytes = store_max_bytes
+
+    @staticmethod
+    def cutoff(days, now=None):
+        """Return the timestamp of the given number of days before now, or None if days is 0."""
+        if not days:
+            return None
+        return ((now or datetime.now()) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+    def needs_pass(self):
+        """Check whether downsampling or the store-wide budget is enabled, which only a pass over every history applies."""
+        return bool(self.downsample_days or self.store_max_bytes)
+
+    def select(self, entries, sizes, now=None, blobs=None):
+        """Return which of a command's chronological entries to keep, as a list of booleans.
+
+        Executions older than downsample_days are reduced to the first, the last and the
+        failed ones of each day; then the entries older than max_age_days are dropped, and
+        the oldest ones beyond max_entries or max_bytes. sizes leave out the blobs the entries
+        refer to, given in blobs as {key: size} per entry; a blob counts once for the entries kept.
+        """
+        keep = [True] * len(entries)
+        sample_cutoff = self.cutoff(self.downsample_days, now)
+        if sample_cutoff:
+            days = {}
+            for index, entry in enumerate(entries):
+                if entry.get('type') == 'execution' and entry.get('timestamp', '') < sample_cutoff:
+                    days.setdefault(entry.get('timestamp', '')[:10], []).append(index)
+            for indices in days.values():
+                for index in indices[1:-1]:
+                    keep[index] = is_failure(entries[index])
+
+        age_cutoff = self.cutoff(self.max_age_days, now)
+        kept_count = 0
+        kept_bytes = 0
+        counted = set()
+        for index in range(len(entries) - 1, -1, -1):
+            if not keep[index]:
+                continue
+            if age_cutoff and entries[index].get('timestamp', '') < age_cutoff:
+                keep[index] = False
+                continue
+            kept_count += 1
+            kept_bytes += sizes[index]
+            for key, blob_size in ((blobs[index] or {}) if blobs else {}).items():
+                if key not in counted:
+                    counted.add(key)
+                    kept_bytes += blob_size
+            if kept_count > self.max_entries or (self.max_bytes and kept_bytes > self.max_bytes and kept_count > 1):
+                keep[index] = False
+        return keep
+
+    def settings(self):
+        """Return the limits of the policy."""
+        return {
+            'max_entries': self.max_entries,
+            'max_bytes': self.max_bytes,
+            'max_age_days': self.max_age_days,
+            'downsample_days': self.downsample_days,
+            'store_max_bytes': self.store_max_bytes
+        }
+
+    def trim(self, ring, now=None):
+        """Drop the oldest entries of a ring beyond the size and age limits and return them with their sizes."""
+        dropped = []
+        age_cutoff = self.cutoff(self.max_age_days, now)
+        while len(ring) > 1 and self.max_bytes and ring.total_bytes > self.max_bytes:
+            dropped.append(ring.popleft())
+        while len(ring) and age_cutoff and ring.oldest().get('timestamp', '') < age_cutoff:
+            dropped.append(ring.popleft())
+        return dropped
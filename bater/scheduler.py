@@ -0,0 +1,380 @@
+"""Recurring execution of stored commands on intervals or cron expressions, driven by a single timer thread."""
+
+import heapq
+import logging
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+
+from .executor import create_executor
+from .policy import check_command, describe_verdict
+from .utils import extract_placeholders
+
+# What to do when a command is due while its previous run is still queued or running.
+OVERLAP_POLICIES = ('skip', 'queue')
+
+# Priority of scheduled runs in the ExecutionService queue; runs started by hand (priority 0) go first.
+SCHEDULE_PRIORITY = 10
+
+# Longest time the timer thread sleeps at once, so a changed wall clock is noticed.
+MAX_TIMER_SLEEP = 60.0
+
+# Units accepted in intervals such as '90s', '5m' or '1h30m'.
+INTERVAL_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+
+# Shorthands for common cron expressions.
+CRON_ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *'
+}
+
+# Cron fields as (name, lowest value, highest value, value names).
+CRON_FIELDS = (
+    ('minute', 0, 59, ()),
+    ('hour', 0, 23, ()),
+    ('day of month', 1, 31, ()),
+    ('month', 1, 12, ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec')),
+    ('day of week', 0, 7, ('sun', 'mon', 'tue', 'wed', 'thu', 'fri', 'sat'))
+)
+
+# Format of the run times reported by the scheduler, the same as history timestamps.
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def parse_interval(text):
+    """Parse an interval such as '30', '90s', '5m' or '1h30m' and return it in seconds.
+
+    Raises ValueError for invalid or non-positive intervals.
+    """
+    text = str(text).strip().lower()
+    if re.fullmatch(r'\d+(\.\d+)?', text):
+        seconds = float(text)
+    elif re.fullmatch(r'(\d+[smhdw])+', text):
+        seconds = sum(int(number) * INTERVAL_UNITS[unit] for number, unit in re.findall(r'(\d+)([smhdw])', text))
+    else:
+        raise ValueError(f"Invalid interval '{text}'; use seconds or a duration such as 5m or 1h30m.")
+    if seconds <= 0:
+        raise ValueError("The interval must be positive.")
+    return seconds
+
+def parse_cron_field(text, low, high, names):
+    """Return the set of values matched by one cron field, e.g. '*/15', '1-5' or 'mon,wed,fri'."""
+    values = set()
+    for part in text.lower().split(','):
+        for index, name in enumerate(names):
+            part = part.replace(name, str(index + low))
+        match = re.fullmatch(r'(\*|\d+)(?:-(\d+))?(?:/(\d+))?', part)
+        if not match:
+            raise ValueError(f"Invalid cron field '{text}'.")
+        start, end, step = match.groups()
+        if start == '*':
+            start, end = low, high
+        else:
+            start = int(start)
+            end = int(end) if end is not None else (high if step else start)
+        step = int(step) if step else 1
+        if not low <= start <= end <= high or step < 1:
+            raise ValueError(f"Cron field '{text}' is out of range {low}-{high}.")
+        values.update(range(start, end + 1, step))
+    return values
+
+class CronExpression:
+    """Five-field cron expression (minute, hour, day of month, month, day of week) in local time.
+
+    As in cron, a command is due when the day of the month or the day of the week
+    matches if both are restricted, and when both match otherwise.
+    """
+
+    def __init__(self, expression):
+        """Parse an expression such as '*/5 * * * *' or an alias such as '@daily'; raises ValueError if invalid."""
+        self.expression = expression.strip()
+        fields = CRON_ALIASES.get(self.expression.lower(), self.expression).split()
+        if len(fields) != 5:
+            raise ValueError(f"Invalid cron expression '{expression}'; it needs five fields.")
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            parse_cron_field(text, low, high, names) for text, (_, low, high, names) in zip(fields, CRON_FIELDS))
+        if 7 in self.weekdays:
+            self.weekdays = (self.weekdays - {7}) | {0}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+        self.next_after(datetime.now())
+
+    def day_matches(self, moment):
+        """Check whether the day of a datetime matches the day of month and day of week fields."""
+        day_match = moment.day in self.days
+        weekday_match = (moment.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return day_match and weekday_match
+        return day_match or weekday_match
+
+    def next_after(self, moment):
+        """Return the first matching minute after a datetime.
+
+        Raises ValueError if no date matches within five years, e.g. for February 30.
+        """
+        moment = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        last_year = moment.year + 5
+        while moment.year <= last_year:
+            if moment.month not in self.months:
+                moment = (moment.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self.day_matches(moment):
+                moment = moment.replace(hour=0, minute=0) + timedelta(days=1)
+            elif moment.hour not in self.hours:
+                moment = moment.replace(minute=0) + timedelta(hours=1)
+            elif moment.minute not in self.minutes:
+                moment += timedelta(minutes=1)
+            else:
+                return moment
+        raise ValueError(f"The cron expression '{self.expression}' never matches.")
+
+class Schedule:
+    """When a command runs: every interval seconds or on a cron expression, with a random delay of up to jitter seconds."""
+
+    def __init__(self, interval=None, cron=None, jitter=0, overlap='skip'):
+        """Initialize a schedule; exactly one of interval and cron is required. Raises ValueError if invalid."""
+        if (interval is None) == (cron is None):
+            raise ValueError("A schedule needs either an interval or a cron expression.")
+        if overlap not in OVERLAP_POLICIES:
+            raise ValueError(f"Unknown overlap policy '{overlap}'; use one of {', '.join(OVERLAP_POLICIES)}.")
+        self.interval = parse_interval(interval) if interval is not None else None
+        self.cron = CronExpression(cron) if cron is not None else None
+        self.jitter = float(jitter)
+        if self.jitter < 0:
+            raise ValueError("The jitter must not be negative.")
+        self.overlap = overlap
+
+    @classmethod
+    def from_dict(cls, data):
+        """Return the schedule stored as a dictionary in a command's metadata."""
+        if not isinstance(data, dict):
+            raise ValueError("Invalid schedule.")
+        return cls(data.get('interval'), data.get('cron'), data.get('jitter', 0), data.get('overlap', 'skip'))
+
+    def describe(self):
+        """Return a short description of the schedule."""
+        when = f"every {self.interval:g} s" if self.interval else f"cron {self.cron.expression}"
+        if self.jitter:
+            when += f" (+ up to {self.jitter:g} s)"
+        return when
+
+    def next_run(self, after):
+        """Return the epoch time of the first run due after an epoch time, before jitter."""
+        if self.interval:
+            return after + self.interval
+        return self.cron.next_after(datetime.fromtimestamp(after)).timestamp()
+
+    def to_dict(self):
+        """Return the schedule as stored in a command's metadata."""
+        data = {'interval': self.interval} if self.interval else {'cron': self.cron.expression}
+        if self.jitter:
+            data['jitter'] = self.jitter
+        if self.overlap != 'skip':
+            data['overlap'] = self.overlap
+        return data
+
+def format_time(timestamp):
+    """Return an epoch time in the format of history timestamps, or None."""
+    return datetime.fromtimestamp(timestamp).strftime(TIME_FORMAT) if timestamp else None
+
+class ScheduleEntry:
+    """Timer state of one scheduled command."""
+
+    def __init__(self, app_name, command_id, schedule, last_run=None):
+        """Initialize the entry of a command last run at an epoch time, or never."""
+        self.app_name = app_name
+        self.command_id = command_id
+        self.schedule = schedule
+        self.last_run = last_run
+        self.next_run = None
+        self.removed = False
+        self.runs = 0
+        self.skipped = 0
+        self.coalesced = 0
+
+    def plan(self, now):
+        """Set the time of the next run, right away if a run was missed since the last one."""
+        base = self.last_run if self.last_run is not None else now
+        due = self.schedule.next_run(base)
+        if due <= now and self.last_run is not None:
+            # Runs were missed while nothing ran the schedule; they are merged into one run now.
+            self.coalesced += 1
+            self.next_run = now
+        else:
+            self.next_run = due + random.uniform(0, self.schedule.jitter)
+
+    def times(self):
+        """Return the next and last run times and the run counters of the entry."""
+        return {
+            'schedule': self.schedule.describe(),
+            'next_run': format_time(self.next_run),
+            'last_run': format_time(self.last_run),
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'coalesced': self.coalesced
+        }
+
+class Scheduler:
+    """Runs the scheduled commands of a CommandManager on an ExecutionService.
+
+    Every schedule waits in one heap ordered by due time and a single timer thread sleeps
+    until the earliest one, so thousands of schedules need no thread each. Runs missed
+    while the process was busy, suspended or stopped are coalesced into a single run, and a
+    command still queued or running when it is due again is skipped unless its schedule's
+    overlap policy is 'queue'. Scheduled runs go through create_executor() and are recorded
+    in the command's history like any other run.
+    """
+
+    def __init__(self, command_manager, execution_service, on_change=None):
+        """Initialize the scheduler; on_change(app_name, command_id) is called when a scheduled run starts or ends."""
+        self.command_manager = command_manager
+        self.execution_service = execution_service
+        self.on_change = on_change
+        self.condition = threading.Condition()
+        self.entries = {}
+        self.heap = []
+        self.sequence = 0
+        self.stopped = False
+        self.thread = None
+
+    def fire(self, entry):
+        """Start a due run of a command, unless its previous run is still going and overlaps are skipped."""
+        command_data = self.command_manager.commands.get(entry.app_name, {}).get(entry.command_id)
+        if not command_data:
+            return
+        if entry.schedule.overlap == 'skip' and self.execution_service.jobs_for(entry.app_name, entry.command_id):
+            entry.skipped += 1
+            logging.info(f"Skipping the scheduled run of {command_data['name']}: the previous run has not finished")
+            return
+        if extract_placeholders(command_data['command']):
+            entry.skipped += 1
+            logging.error(f"Not running the scheduled command {command_data['name']}: it has placeholders")
+            return
+        verdict = check_command(command_data['command'])
+        if verdict['dangerous']:
+            entry.skipped += 1
+            logging.error(f"Not running the scheduled command {command_data['name']}: " + "; ".join(describe_verdict(verdict)))
+            return
+        entry.runs += 1
+        executor = create_executor(command_data['command'], lambda success, result: self.notify(entry), entry.app_name,
+                                   entry.command_id, self.command_manager)
+        self.execution_service.submit(entry.app_name, entry.command_id, executor, SCHEDULE_PRIORITY)
+        self.notify(entry)
+
+    def last_run_time(self, app_name, command_id):
+        """Return the epoch time of a command's newest execution from its history, or None."""
+        entries = self.command_manager.get_command_history(app_name, command_id, limit=1, event_type='execution',
+                                                           include_output=False)
+        if not entries:
+            return None
+        try:
+            return datetime.strptime(entries[0]['timestamp'], TIME_FORMAT).timestamp()
+        except (KeyError, ValueError):
+            return None
+
+    def notify(self, entry):
+        """Report a change in the runs of a scheduled command."""
+        if self.on_change:
+            self.on_change(entry.app_name, entry.command_id)
+
+    def push(self, entry):
+        """Queue an entry at its next run time; the caller holds the lock."""
+        heapq.heappush(self.heap, (entry.next_run, self.sequence, entry))
+        self.sequence += 1
+        if len(self.heap) > 2 * len(self.entries) + 64:
+            # Drop the heap items left behind by rescheduled and removed entries.
+            self.heap = [item for item in self.heap if not item[2].removed and item[0] == item[2].next_run]
+            heapq.heapify(self.heap)
+        self.condition.notify()
+
+    def run(self):
+        """Timer loop: sleep until the earliest schedule is due, then start every due run."""
+        while True:
+            due_entries = []
+            with self.condition:
+                while not self.stopped:
+                    now = time.time()
+                    while self.heap and (self.heap[0][2].removed or self.heap[0][0] != self.heap[0][2].next_run):
+                        heapq.heappop(self.heap)
+                    if self.heap and self.heap[0][0] <= now:
+                        break
+                    timeout = min(self.heap[0][0] - now, MAX_TIMER_SLEEP) if self.heap else None
+                    self.condition.wait(timeout)
+                if self.stopped:
+                    return
+                while self.heap and self.heap[0][0] <= now:
+                    due, _, entry = heapq.heappop(self.heap)
+                    if entry.removed or due != entry.next_run:
+                        continue
+                    if entry.schedule.next_run(due) <= now:
+                        # Later runs were due too; they are merged into this one.
+                        entry.coalesced += 1
+                    entry.last_run = now
+                    entry.plan(now)
+                    self.push(entry)
+                    due_entries.append(entry)
+            for entry in due_entries:
+                try:
+                    self.fire(entry)
+                except Exception as e:
+                    logging.error(f"Error starting the scheduled command {entry.command_id}: {e}")
+
+    def start(self):
+        """Load the schedules and start the timer thread."""
+        self.sync()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the timer thread; runs already started go on."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+
+    def sync(self):
+        """Bring the schedules in line with the commands' metadata, keeping the timers of unchanged ones."""
+        with self.command_manager.lock:
+            schedules = {
+                command_id: (app_name, command_data['schedule'])
+                for app_name, app_commands in self.command_manager.commands.items()
+                for command_id, command_data in app_commands.items()
+                if isinstance(command_data, dict) and command_data.get('schedule')
+            }
+        added = []
+        with self.condition:
+            for command_id in [command_id for command_id in self.entries if command_id not in schedules]:
+                self.entries.pop(command_id).removed = True
+            for command_id, (app_name, data) in schedules.items():
+                entry = self.entries.get(command_id)
+                if entry is not None and entry.schedule.to_dict() == data:
+                    entry.app_name = app_name
+                    continue
+                try:
+                    schedule = Schedule.from_dict(data)
+                except ValueError as e:
+                    logging.error(f"Ignoring the invalid schedule of command {command_id}: {e}")
+                    continue
+                if entry is not None:
+                    entry.removed = True
+                    added.append(ScheduleEntry(app_name, command_id, schedule, entry.last_run))
+                else:
+                    added.append(ScheduleEntry(app_name, command_id, schedule))
+        for entry in added:
+            if entry.last_run is None:
+                entry.last_run = self.last_run_time(entry.app_name, entry.command_id)
+        now = time.time()
+        with self.condition:
+            for entry in added:
+                entry.plan(now)
+                self.entries[entry.command_id] = entry
+                self.push(entry)
+
+    def times(self):
+        """Return the next and last run times of every scheduled command by command ID."""
+        with self.condition:
+            return {command_id: entry.times() for command_id, entry in self.entries.items()}
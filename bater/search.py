@@ -0,0 +1,182 @@
+"""Full-text search index over command history, kept in a SQLite FTS5 database."""
+
+import logging
+import sqlite3
+import threading
+from collections import Counter
+
+from .storage import MAX_HISTORY_ENTRIES
+from .utils import show_message
+
+# Orderings of search results: best match first, or by time. Entries are indexed in
+# chronological order, so their row IDs order them by time.
+SEARCH_ORDERS = {
+    'rank': "rank",
+    'newest': "entries_text.rowid DESC",
+    'oldest': "entries_text.rowid ASC"
+}
+
+# Number of most recent matches ranked by relevance; ranking every match of a very
+# common word would take time proportional to the size of the history.
+RANK_CANDIDATES = 2000
+
+def build_match_query(text):
+    """Turn user input into an FTS5 query matching all its terms, the last one as a prefix."""
+    terms = ['"' + term.replace('"', '""') + '"' for term in text.split()]
+    if terms:
+        terms[-1] += '*'
+    return " ".join(terms)
+
+class SearchIndex:
+    """Inverted index of history entries by command text and output, updated as entries are added.
+
+    The index lives in its own database next to the store, so it can be dropped and rebuilt
+    from the store at any time. It is built from the store on first use and then maintained
+    incrementally; entries trimmed from the history are removed from it as well.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            command_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            type TEXT NOT NULL,
+            returncode INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS entries_command ON entries (command_id, id);
+        CREATE VIRTUAL TABLE IF NOT EXISTS entries_text USING fts5 (command, output, tokenize='unicode61');
+        CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, db_file):
+        """Open the index database, creating its schema if needed."""
+        self.db_file = db_file
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+
+    def add(self, command_id, entry):
+        """Index a history entry and drop the command's entries beyond the history limit."""
+        try:
+            with self.lock, self.connection:
+                self.insert(command_id, [entry])
+                stale = self.connection.execute(
+                    "SELECT id FROM entries WHERE command_id = ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+                    (command_id, MAX_HISTORY_ENTRIES)).fetchall()
+                self.delete_rows(stale)
+        except sqlite3.Error as e:
+            logging.error(f"Error indexing history entry: {e}")
+
+    def clear(self):
+        """Empty the index and mark it as needing a rebuild."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM entries")
+            self.connection.execute("DELETE FROM entries_text")
+            self.connection.execute("DELETE FROM state WHERE key = 'built'")
+
+    def close(self):
+        """Close the index database."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def delete_command(self, command_id):
+        """Remove every indexed entry of a command."""
+        try:
+            with self.lock, self.connection:
+                rows = self.connection.execute("SELECT id FROM entries WHERE command_id = ?", (command_id,)).fetchall()
+                self.delete_rows(rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error removing command from the search index: {e}")
+
+    def delete_rows(self, rows):
+        """Delete indexed entries by (id,) rows; the caller owns the transaction."""
+        self.connection.executemany("DELETE FROM entries WHERE id = ?", rows)
+        self.connection.executemany("DELETE FROM entries_text WHERE rowid = ?", rows)
+
+    def insert(self, command_id, entries):
+        """Insert history entries for a command; the caller owns the transaction."""
+        for entry in entries:
+            cursor = self.connection.execute(
+                "INSERT INTO entries (command_id, timestamp, type, returncode) VALUES (?, ?, ?, ?)",
+                (command_id, entry.get('timestamp', ''), entry.get('type', 'execution'), entry.get('returncode')))
+            output = "\n".join(text for text in (entry.get('output', ''), entry.get('stderr', '')) if text)
+            self.connection.execute("INSERT INTO entries_text (rowid, command, output) VALUES (?, ?, ?)",
+                                    (cursor.lastrowid, entry.get('command', ''), output))
+
+    def is_built(self):
+        """Check whether the index has been built from the store."""
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM state WHERE key = 'built'").fetchone() is not None
+
+    def rebuild(self, histories):
+        """Replace the index with the entries of (command_id, entries) pairs, inserted in chronological order."""
+        entries = sorted(((entry, command_id) for command_id, history in histories for entry in history),
+                         key=lambda item: item[0].get('timestamp', ''))
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM entries")
+                self.connection.execute("DELETE FROM entries_text")
+                for entry, command_id in entries:
+                    self.insert(command_id, [entry])
+                self.connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('built', '1')")
+        except sqlite3.Error as e:
+            logging.error(f"Error building the search index: {e}")
+            show_message(f"Failed to build the search index. Details: {e}", "Error")
+
+    def retain(self, command_id, entries):
+        """Remove the indexed entries of a command missing from its remaining history entries.
+
+        Entries are matched by timestamp, type and exit code; the newest indexed ones are kept
+        for each match, and the row IDs of kept entries are left as they are.
+        """
+        remaining = Counter((entry.get('timestamp', ''), entry.get('type', 'execution'), entry.get('returncode'))
+                            for entry in entries)
+        try:
+            with self.lock, self.connection:
+                rows = self.connection.execute(
+                    "SELECT id, timestamp, type, returncode FROM entries WHERE command_id = ? ORDER BY id DESC",
+                    (command_id,)).fetchall()
+                stale = []
+                for row_id, *key in rows:
+                    key = tuple(key)
+                    if remaining[key] > 0:
+                        remaining[key] -= 1
+                    else:
+                        stale.append((row_id,))
+                self.delete_rows(stale)
+        except sqlite3.Error as e:
+            logging.error(f"Error removing trimmed entries from the search index: {e}")
+
+    def search(self, text, limit=50, order='rank'):
+        """Return the entries matching a query as dicts with command ID, timestamp, type, exit code and snippet."""
+        match_query = build_match_query(text)
+        if not match_query:
+            return []
+        query = (
+            "SELECT entries.command_id, entries.timestamp, entries.type, entries.returncode,"
+            " snippet(entries_text, -1, '[', ']', '...', 12), entries_text.command"
+            " FROM entries_text JOIN entries ON entries.id = entries_text.rowid"
+            " WHERE entries_text MATCH ?"
+        )
+        params = [match_query]
+        if order == 'rank':
+            query += (" AND entries_text.rowid >= (SELECT coalesce(min(rowid), 0) FROM ("
+                      "  SELECT rowid FROM entries_text WHERE entries_text MATCH ? ORDER BY rowid DESC LIMIT ?))")
+            params += [match_query, RANK_CANDIDATES]
+        query += f" ORDER BY {SEARCH_ORDERS[order]} LIMIT ?"
+        params.append(limit)
+        try:
+            with self.lock:
+                rows = self.connection.execute(query, params).fetchall()
+        except sqlite3.Error as e:
+            logging.error(f"Error searching history: {e}")
+            return []
+        return [
+            {'id': command_id, 'timestamp': timestamp, 'type': event_type, 'returncode': returncode,
+             'snippet': snippet, 'command': command}
+            for command_id, timestamp, event_type, returncode, snippet, command in rows
+        ]
@@ -0,0 +1,305 @@
+"""Long-lived shell sessions that run the commands of an application without starting a shell per run."""
+
+import codecs
+import os
+import queue
+import shlex
+import subprocess
+import threading
+import time
+import uuid
+
+from .executor import (OUTPUT_HEAD_BYTES, OUTPUT_TAIL_BYTES, OutputBuffer, command_result, failed_start_result,
+                       merge_output_chunks, process_group_options, terminate_process_tree)
+
+# Sessions need a POSIX shell reading commands from its standard input.
+SESSIONS_SUPPORTED = os.name == 'posix'
+
+# Shell started for each session, e.g. "bash -l" to load the login profile once.
+SESSION_SHELL = os.environ.get('BATER_SESSION_SHELL', '/bin/sh')
+
+# Seconds a session may stay unused before its shell is closed.
+SESSION_IDLE_TIMEOUT = float(os.environ.get('BATER_SESSION_IDLE_TIMEOUT', 600))
+
+class SentinelParser:
+    """Splits a session's output stream at the line marking the end of the current command.
+
+    The marker is a newline followed by the run's token and a colon; the rest of that line
+    holds the exit status on stdout and is empty on stderr.
+    """
+
+    def __init__(self, token):
+        """Initialize the parser for the marker of one run."""
+        self.marker = b"\n" + token + b":"
+        self.pending = b""
+        self.trailer = None
+        self.done = False
+
+    def feed(self, chunk):
+        """Add a chunk of the stream and return the bytes that belong to the command's output."""
+        if self.trailer is not None:
+            self.trailer += chunk
+            self.done = b"\n" in self.trailer
+            return b""
+        self.pending += chunk
+        index = self.pending.find(self.marker)
+        if index >= 0:
+            output, self.trailer = self.pending[:index], self.pending[index + len(self.marker):]
+            self.pending = b""
+            self.done = b"\n" in self.trailer
+            return output
+        # Keep the end of the chunk if it could be the start of a marker split across chunks.
+        index = self.pending.find(b"\n", max(0, len(self.pending) - len(self.marker) + 1))
+        while index >= 0 and not self.marker.startswith(self.pending[index:]):
+            index = self.pending.find(b"\n", index + 1)
+        if index < 0:
+            output, self.pending = self.pending, b""
+        else:
+            output, self.pending = self.pending[:index], self.pending[index:]
+        return output
+
+    def flush(self):
+        """Return the bytes held back as a possible marker, once the stream has ended without one."""
+        output, self.pending = self.pending, b""
+        return output
+
+    def status(self):
+        """Return the exit status written after the marker, or None if it was not a number."""
+        try:
+            return int(self.trailer.split(b"\n", 1)[0])
+        except (AttributeError, ValueError):
+            return None
+
+class ShellSession:
+    """A shell process that keeps running between commands, so its directory and variables persist.
+
+    Each command is sent on the shell's standard input through eval, followed by lines echoing
+    a unique token and the exit status on both output streams, which frame the command's output.
+    Commands run one at a time. A shell that exits, e.g. because a command called exit, is
+    started again on the next run; terminating a command terminates the shell with it. Once
+    the pool closed the session, a run through a reference taken before starts a shell
+    that it closes again when done.
+    """
+
+    def __init__(self, app_name, shell=SESSION_SHELL):
+        """Initialize the session of an application; the shell is started by the first run."""
+        self.app_name = app_name
+        self.shell = shell
+        self.lock = threading.Lock()
+        self.process = None
+        self.chunks = None
+        self.last_used = time.monotonic()
+        self.runs = 0
+        self.closed = False
+
+    def alive(self):
+        """Check whether the shell process is running."""
+        return self.process is not None and self.process.poll() is None
+
+    def busy(self):
+        """Check whether a command is running in the session."""
+        return self.lock.locked()
+
+    def close(self):
+        """Ask the shell to exit by closing its input, terminating it if it does not; the caller holds the lock."""
+        process, self.process = self.process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+            process.wait(1.0)
+        except (OSError, subprocess.TimeoutExpired):
+            terminate_process_tree(process)
+
+    def read_stream(self, stream, pipe, chunks):
+        """Forward the chunks of one of the shell's output streams to the session queue until it closes."""
+        for chunk in iter(lambda: pipe.read1(65536), b''):
+            chunks.put((stream, chunk))
+        chunks.put((stream, None))
+        pipe.close()
+
+    def run(self, command, on_output=None, head_size=OUTPUT_HEAD_BYTES, tail_size=OUTPUT_TAIL_BYTES, output_interval=0.1,
+            on_start=None, timeout=None):
+        """Run a command in the session and return the same result as CommandExecutor.stream_command().
+
+        The command's standard input is /dev/null, since the shell reads the commands from its
+        own. The resource 'usage' is None, as the shell is not waited for between commands.
+        on_start receives the session once the command was sent to the shell.
+        """
+        with self.lock:
+            try:
+                token = self.send(command)
+            except OSError as e:
+                return failed_start_result(e)
+            if on_start:
+                on_start(self)
+
+            buffers = {'stdout': OutputBuffer(head_size, tail_size), 'stderr': OutputBuffer(head_size, tail_size)}
+            parsers = {'stdout': SentinelParser(token), 'stderr': SentinelParser(token)}
+            decoders = {stream: codecs.getincrementaldecoder('utf-8')(errors='replace') for stream in buffers}
+            pending = []
+            closed = set()
+            deadline = time.monotonic() + timeout if timeout else None
+            timed_out = False
+            last_push = time.monotonic()
+            while not all(parser.done or stream in closed for stream, parser in parsers.items()):
+                wait = output_interval
+                if deadline is not None:
+                    wait = max(0.0, min(wait, deadline - time.monotonic()))
+                try:
+                    stream, chunk = self.chunks.get(timeout=wait)
+                except queue.Empty:
+                    stream, chunk = None, None
+                if stream is not None:
+                    if chunk is None:
+                        closed.add(stream)
+                        output = parsers[stream].flush()
+                    else:
+                        output = parsers[stream].feed(chunk)
+                    buffers[stream].write(output)
+                    if on_output and output:
+                        pending.append((stream, decoders[stream].decode(output)))
+                if on_output and pending and time.monotonic() - last_push >= output_interval:
+                    self.push_output(pending, on_output)
+                    last_push = time.monotonic()
+                if deadline is not None and not timed_out and time.monotonic() >= deadline:
+                    timed_out = True
+                    self.terminate()
+            if on_output:
+                self.push_output(pending, on_output)
+
+            if closed:
+                # The shell exited before finishing the command; the next run starts a new one.
+                returncode = self.process.wait() if self.process else None
+                self.process = None
+            else:
+                returncode = parsers['stdout'].status()
+            self.last_used = time.monotonic()
+            self.runs += 1
+            if self.closed:
+                self.close()
+            return command_result(returncode, buffers, None, timed_out, timeout)
+
+    def retire(self):
+        """Close the session for good, terminating the command running in it, if any."""
+        self.closed = True
+        if self.lock.acquire(blocking=False):
+            try:
+                self.close()
+            finally:
+                self.lock.release()
+        else:
+            self.terminate()
+
+    @staticmethod
+    def push_output(pending, on_output):
+        """Pass the pending (stream, text) chunks to on_output and clear them."""
+        chunks = pending[:]
+        pending.clear()
+        for stream, text in merge_output_chunks(chunks):
+            on_output(stream, text)
+
+    def send(self, command):
+        """Write a command and its end markers to the shell, starting the shell if needed, and return the run's token."""
+        token = uuid.uuid4().hex
+        script = (f"eval {shlex.quote(command)} </dev/null\n"
+                  f"printf '\\n%s:%s\\n' {token} \"$?\"\n"
+                  f"printf '\\n%s:\\n' {token} >&2\n").encode()
+        for attempt in range(2):
+            if not self.alive():
+                self.start()
+            try:
+                self.process.stdin.write(script)
+                self.process.stdin.flush()
+                return token.encode()
+            except BrokenPipeError:
+                # The shell exited since the last run; start a new one and try once more.
+                self.process = None
+                if attempt:
+                    raise
+
+    def start(self):
+        """Start the shell and the threads reading its output."""
+        self.process = subprocess.Popen(shlex.split(self.shell), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE, **process_group_options())
+        self.chunks = queue.Queue()
+        for stream, pipe in (('stdout', self.process.stdout), ('stderr', self.process.stderr)):
+            threading.Thread(target=self.read_stream, args=(stream, pipe, self.chunks), daemon=True).start()
+
+    def terminate(self):
+        """Terminate the shell together with the command it runs; the next run starts a new shell."""
+        process = self.process
+        if process is not None:
+            terminate_process_tree(process)
+
+class SessionPool:
+    """The shell sessions of the applications, closing those left unused for idle_timeout seconds."""
+
+    def __init__(self, idle_timeout=SESSION_IDLE_TIMEOUT, shell=SESSION_SHELL):
+        """Initialize an empty pool; the idle reaper starts with the first session."""
+        self.idle_timeout = idle_timeout
+        self.shell = shell
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.reaper = None
+        self.stopped = threading.Event()
+
+    def close(self, app_name=None):
+        """Close the session of an application, or every session."""
+        with self.lock:
+            names = [app_name] if app_name is not None else list(self.sessions)
+            sessions = [self.sessions.pop(name) for name in names if name in self.sessions]
+        for session in sessions:
+            session.retire()
+
+    def close_idle(self):
+        """Close the sessions that ran no command for idle_timeout seconds, and return their applications.
+
+        Each session's lock is taken before it is found idle and held until its shell is
+        closed, so no command can start in it meanwhile.
+        """
+        now = time.monotonic()
+        closed = []
+        with self.lock:
+            for app_name, session in list(self.sessions.items()):
+                if not session.lock.acquire(blocking=False):
+                    continue  # A command runs in it.
+                if now - session.last_used > self.idle_timeout:
+                    session.closed = True
+                    del self.sessions[app_name]
+                    closed.append(session)
+                else:
+                    session.lock.release()
+        for session in closed:
+            try:
+                session.close()
+            finally:
+                session.lock.release()
+        return [session.app_name for session in closed]
+
+    def get(self, app_name):
+        """Return the session of an application, creating it if needed."""
+        with self.lock:
+            session = self.sessions.get(app_name)
+            if session is None:
+                session = self.sessions[app_name] = ShellSession(app_name, self.shell)
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=self.reap, daemon=True)
+                self.reaper.start()
+            return session
+
+    def reap(self):
+        """Reaper loop closing idle sessions until the pool is stopped."""
+        while not self.stopped.wait(max(1.0, min(self.idle_timeout / 4, 60.0))):
+            self.close_idle()
+
+    def stats(self):
+        """Return the applications with a session, whether their shell runs and how many commands it ran."""
+        with self.lock:
+            return [{'app': app_name, 'alive': session.alive(), 'busy': session.busy(), 'runs': session.runs}
+                    for app_name, session in self.sessions.items()]
+
+    def stop(self):
+        """Stop the reaper and close every session."""
+        self.stopped.set()
+        self.close()
@@ -0,0 +1,83 @@
+"""Latency and resource statistics over the recorded executions of a command."""
+
+# Resource metrics recorded with each execution, besides its exit code.
+METRIC_FIELDS = ('duration', 'cpu_user', 'cpu_system', 'max_rss_kb', 'stdout_bytes', 'stderr_bytes')
+
+# Number of most recent executions compared with the ones before them to detect a trend.
+TREND_WINDOW = 20
+
+# Relative change of the median duration above which a command is reported slower or faster.
+TREND_THRESHOLD = 0.2
+
+def percentile(values, fraction):
+    """Return the percentile of sorted values at a fraction between 0 and 1, interpolating linearly."""
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+def summarize_values(values):
+    """Return the p50, p95, maximum and mean of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        'p50': round(percentile(values, 0.5), 3),
+        'p95': round(percentile(values, 0.95), 3),
+        'max': round(values[-1], 3),
+        'mean': round(sum(values) / len(values), 3)
+    }
+
+def duration_trend(durations, window=TREND_WINDOW):
+    """Compare the median duration of the latest executions with the window of executions before them.
+
+    durations are in chronological order. Returns the two medians, their relative change and a
+    direction of 'slower', 'faster' or 'stable', or None without enough executions.
+    """
+    window = min(window, len(durations) // 2)
+    if window < 2:
+        return None
+    recent = percentile(sorted(durations[-window:]), 0.5)
+    previous = percentile(sorted(durations[-2 * window:-window]), 0.5)
+    change = (recent - previous) / previous if previous > 0 else 0.0
+    direction = 'stable'
+    if change > TREND_THRESHOLD:
+        direction = 'slower'
+    elif change < -TREND_THRESHOLD:
+        direction = 'faster'
+    return {
+        'window': window,
+        'recent_p50': round(recent, 3),
+        'previous_p50': round(previous, 3),
+        'change': round(change, 3),
+        'direction': direction
+    }
+
+def execution_stats(entries):
+    """Compute statistics over history entries given in chronological order.
+
+    Only execution entries count. Results reused from the cache count towards the failure
+    rate but not towards the duration and resource figures, since nothing ran. Entries
+    recorded before exit codes and metrics were captured only count as executions.
+    """
+    executions = [entry for entry in entries if entry.get('type', 'execution') == 'execution']
+    outcomes = [entry for entry in executions if 'returncode' in entry]
+    measured = [entry for entry in executions if not entry.get('cached') and 'duration' in entry]
+    failures = sum(1 for entry in outcomes if entry['returncode'] != 0)
+    durations = [entry['duration'] for entry in measured]
+    return {
+        'executions': len(executions),
+        'cached': sum(1 for entry in executions if entry.get('cached')),
+        'failures': failures,
+        'failure_rate': round(failures / len(outcomes), 3) if outcomes else 0.0,
+        'last_run': executions[-1].get('timestamp') if executions else None,
+        'duration': summarize_values(durations),
+        'cpu_time': summarize_values([entry['cpu_user'] + entry['cpu_system'] for entry in measured
+                                      if 'cpu_user' in entry]),
+        'max_rss_kb': summarize_values([entry['max_rss_kb'] for entry in measured if 'max_rss_kb' in entry]),
+        'output_bytes': summarize_values([entry.get('stdout_bytes', 0) + entry.get('stderr_bytes', 0)
+                                          for entry in measured]),
+        'trend': duration_trend(durations)
+    }
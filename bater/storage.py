@@ -0,0 +1,1234 @@
+"""Storage backends keeping command metadata and history on disk."""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from .blobs import (FileBlobStore, SqliteBlobStore, entry_blob_keys, entry_blob_sizes, entry_size, pack_entry,
+                    unpack_entry)
+from .retention import MAX_HISTORY_ENTRIES, HistoryRing, RetentionPolicy
+from .trace import traced, tracer
+from .utils import HISTORY_ENTRY_VERSION, atomic_write, show_message
+
+# Number of trimmed entries a history file may keep before it is rewritten.
+HISTORY_REWRITE_SLACK = MAX_HISTORY_ENTRIES // 4
+
+# Seconds the persistence worker waits before retrying a write that failed unexpectedly.
+PERSISTENCE_RETRY_DELAY = 5.0
+
+# Bound of the in-memory history cache, in bytes of serialized entries.
+HISTORY_CACHE_BYTES = int(os.environ.get('BATER_HISTORY_CACHE_BYTES', 32 * 1024 * 1024))
+
+# Pre-rendered banners of version 1 history entries, holding the raw command text in their group.
+LEGACY_BANNERS = {
+    'execution': re.compile(r"Executed on: [^\n]*\nCommand executed:\n(.*)\nOutput:\n", re.DOTALL),
+    'creation': re.compile(r"(?:-+\n)*Command Created on: [^\n]*\nCommand:\n(.*?)\n(?:-+\n)*", re.DOTALL)
+}
+
+class HistoryJournal:
+    """Append-only JSONL files holding history entries, one segment per command."""
+
+    def __init__(self, directory):
+        """Initialize the journal in the given directory."""
+        self.directory = directory
+
+    def segment_path(self, command_id):
+        """Return the path of the segment holding a command's entries."""
+        return os.path.join(self.directory, f"{command_id}.jsonl")
+
+    def append(self, command_id, entries):
+        """Append a batch of history entries to the command's segment."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self.segment_path(command_id), 'a', encoding='utf-8') as file:
+            file.write("".join(json.dumps(entry) + "\n" for entry in entries))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def exists(self, command_id):
+        """Check whether a command has a non-empty segment."""
+        try:
+            return os.path.getsize(self.segment_path(command_id)) > 0
+        except OSError:
+            return False
+
+    def nonempty_segments(self):
+        """Return the IDs of the commands with a non-empty segment, from a single directory scan."""
+        try:
+            with os.scandir(self.directory) as files:
+                return {os.path.splitext(file.name)[0] for file in files
+                        if file.name.endswith('.jsonl') and file.stat().st_size > 0}
+        except FileNotFoundError:
+            return set()
+
+    def read(self, command_id):
+        """Return the entries of a command's segment and the number of bytes they take."""
+        entries = []
+        size = 0
+        try:
+            file = open(self.segment_path(command_id), 'r', encoding='utf-8')
+        except FileNotFoundError:
+            return entries, size
+        with file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A torn final line from an interrupted append; everything before it is intact.
+                    logging.warning(f"Ignoring truncated history entry of command {command_id}")
+                    break
+                size += len(line)
+        return entries, size
+
+    def replay(self, histories):
+        """Apply the segments on top of the histories of a loaded snapshot and return how many entries were applied."""
+        if not os.path.isdir(self.directory):
+            return 0
+
+        applied = 0
+        for file_name in os.listdir(self.directory):
+            command_id, extension = os.path.splitext(file_name)
+            if extension != '.jsonl' or command_id not in histories:
+                continue
+            entries, _ = self.read(command_id)
+            histories[command_id] += entries
+            del histories[command_id][:-MAX_HISTORY_ENTRIES]
+            applied += len(entries)
+        return applied
+
+    def remove(self, command_id):
+        """Delete a command's segment."""
+        try:
+            os.remove(self.segment_path(command_id))
+        except FileNotFoundError:
+            pass
+
+    def rewrite(self, command_id, entries):
+        """Atomically replace a command's segment with the given entries."""
+        os.makedirs(self.directory, exist_ok=True)
+        atomic_write(self.segment_path(command_id), "".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def clear(self):
+        """Remove all segments."""
+        if os.path.isdir(self.directory):
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith('.jsonl'):
+                    os.remove(os.path.join(self.directory, file_name))
+
+class HistoryCache:
+    """LRU cache of command histories, bounded by the serialized size of their entries."""
+
+    def __init__(self, max_bytes=HISTORY_CACHE_BYTES):
+        """Initialize an empty cache holding at most max_bytes of entries."""
+        self.max_bytes = max_bytes
+        self.histories = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, command_id):
+        """Return a cached history, marking it as recently used, or None."""
+        history = self.histories.get(command_id)
+        if history is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.histories.move_to_end(command_id)
+        return history
+
+    def put(self, command_id, history, size):
+        """Cache a history taking size bytes."""
+        self.pop(command_id)
+        self.histories[command_id] = history
+        self.sizes[command_id] = size
+        self.total_bytes += size
+
+    def resize(self, command_id, delta):
+        """Account for entries added to or removed from a cached history."""
+        self.sizes[command_id] += delta
+        self.total_bytes += delta
+
+    def pop(self, command_id):
+        """Remove a history from the cache and return it, or None."""
+        history = self.histories.pop(command_id, None)
+        self.total_bytes -= self.sizes.pop(command_id, 0)
+        return history
+
+    def clear(self):
+        """Remove every history from the cache."""
+        self.histories.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+
+    def evict(self, pinned=()):
+        """Drop least recently used histories until the cache fits its bound, keeping the pinned ones."""
+        for command_id in list(self.histories):
+            if self.total_bytes <= self.max_bytes:
+                break
+            if command_id not in pinned:
+                self.pop(command_id)
+
+    def stats(self):
+        """Return the number of cached histories, their size and the hit and miss counts."""
+        return {
+            'commands': len(self.histories),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+class PersistenceWorker(threading.Thread):
+    """Background thread that coalesces bursts of store mutations into a single write."""
+
+    def __init__(self, write, delay=0.5):
+        """Initialize the worker with the function performing a write and the coalescing delay."""
+        super().__init__(daemon=True)
+        self.write = write
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.dirty = False
+        self.stopped = False
+
+    def mark_dirty(self):
+        """Schedule a write; repeated calls before it happens are coalesced."""
+        with self.condition:
+            self.dirty = True
+            self.condition.notify()
+
+    def run(self):
+        """Wait for the store to become dirty, let the burst settle and write it out.
+
+        A write failing with an unexpected error is logged and retried later, so the
+        thread keeps persisting the changes that follow.
+        """
+        while True:
+            with self.condition:
+                while not self.dirty and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                # Further changes notify the condition too; the whole delay is waited out so they coalesce.
+                deadline = time.monotonic() + self.delay
+                while not self.stopped and time.monotonic() < deadline:
+                    self.condition.wait(deadline - time.monotonic())
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error writing pending changes, retrying in {PERSISTENCE_RETRY_DELAY:g} seconds: {e}")
+                with self.condition:
+                    if not self.stopped:
+                        self.condition.wait(PERSISTENCE_RETRY_DELAY)
+
+    def flush(self):
+        """Write pending changes immediately on the calling thread; they stay pending if the write raises."""
+        with self.write_lock:
+            with self.condition:
+                if not self.dirty:
+                    return
+                self.dirty = False
+            try:
+                self.write()
+            except Exception:
+                with self.condition:
+                    self.dirty = True
+                raise
+
+    def stop(self):
+        """Stop the worker thread after writing any pending changes."""
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+        self.flush()
+
+def validate_commands_data(data):
+    """Validate the structure of the commands data."""
+    for app_name, commands in data.items():
+        if not isinstance(commands, dict):
+            raise ValueError("Invalid commands format")
+        for command_id, command_data in commands.items():
+            if not isinstance(command_data, dict) or 'name' not in command_data or 'command' not in command_data:
+                raise ValueError("Invalid command structure.")
+
+def split_commands_data(data):
+    """Split the nested commands format into command metadata and per-command histories."""
+    metadata = {}
+    histories = {}
+    for app_name, app_commands in data.items():
+        metadata[app_name] = {}
+        for command_id, command_data in app_commands.items():
+            command_data = dict(command_data)
+            histories[command_id] = list(command_data.pop('history', []))[-MAX_HISTORY_ENTRIES:]
+            metadata[app_name][command_id] = command_data
+    return metadata, histories
+
+def upgrade_history_entry(entry):
+    """Return a version 1 history entry with its banner reduced to the raw command text, when it is recognized."""
+    if 'v' in entry or entry.get('type') not in LEGACY_BANNERS:
+        return entry
+    match = LEGACY_BANNERS[entry['type']].fullmatch(entry.get('command', ''))
+    if match is None:
+        return entry
+    upgraded = dict(entry, command=match.group(1), v=HISTORY_ENTRY_VERSION)
+    if entry['type'] == 'creation':
+        upgraded.pop('output', None)
+    return upgraded
+
+def filter_history(entries, event_type=None, since=None, until=None):
+    """Filter history entries by type and by an inclusive 'YYYY-MM-DD HH:MM:SS' timestamp range."""
+    if event_type is None and since is None and until is None:
+        return entries
+    return [
+        entry for entry in entries
+        if (event_type is None or entry.get('type') == event_type)
+        and (since is None or entry.get('timestamp', '') >= since)
+        and (until is None or entry.get('timestamp', '') <= until)
+    ]
+
+def page_newest_first(entries, offset=0, limit=None):
+    """Return a page of a chronological list, newest entry first."""
+    end = len(entries) - offset
+    if end <= 0:
+        return []
+    start = 0 if limit is None else max(end - limit, 0)
+    return entries[start:end][::-1]
+
+class StorageBackend:
+    """Interface implemented by the storage backends of CommandManager.
+
+    Backends keep command metadata (application, name, command text and settings) and
+    the history of each command. Histories are addressed by command ID and returned
+    newest first in pages.
+    """
+
+    def append_history(self, command_id, entry):
+        """Append a history entry to a command, dropping the oldest entries beyond the retention limits."""
+        raise NotImplementedError
+
+    def apply_retention(self, command_id, now=None):
+        """Apply every limit of the retention policy, downsampling included, to a command's history.
+
+        Returns the number of deleted entries.
+        """
+        raise NotImplementedError
+
+    def cache_stats(self):
+        """Return statistics of the in-memory history cache, or None for backends without one."""
+        return None
+
+    def close(self):
+        """Flush pending changes and release resources."""
+        self.flush()
+
+    def collect_garbage(self):
+        """Delete stored outputs no longer referenced by any history entry and return how many were deleted."""
+        raise NotImplementedError
+
+    def count_history(self, command_id, event_type=None, since=None, until=None):
+        """Return the number of history entries of a command matching the filters."""
+        raise NotImplementedError
+
+    def delete_history(self, command_id):
+        """Delete the whole history of a command."""
+        raise NotImplementedError
+
+    def delete_history_before(self, command_id, timestamp):
+        """Delete the history entries of a command older than a timestamp and return how many were deleted."""
+        raise NotImplementedError
+
+    def export_data(self, commands):
+        """Return the given metadata merged with the stored histories in the nested JSON format."""
+        return {
+            app_name: {
+                command_id: dict(command_data, history=self.get_history(command_id)[::-1])
+                for command_id, command_data in app_commands.items()
+            }
+            for app_name, app_commands in commands.items()
+        }
+
+    def flush(self):
+        """Write pending changes to disk."""
+
+    def get_history(self, command_id, offset=0, limit=None, event_type=None, since=None, until=None, include_output=True):
+        """Return a page of a command's history matching the filters, newest first.
+
+        With include_output=False, backends may leave out the output of the entries.
+        """
+        raise NotImplementedError
+
+    def has_history(self, command_id):
+        """Check whether a command has any history entry."""
+        return self.count_history(command_id) > 0
+
+    def history_ids(self, command_ids):
+        """Return the set of the given command IDs that have any history entry."""
+        return {command_id for command_id in command_ids if self.has_history(command_id)}
+
+    def history_sizes(self, command_id):
+        """Return the (timestamp, bytes) pairs of a command's history entries, oldest first."""
+        raise NotImplementedError
+
+    def import_history(self, command_id, entries):
+        """Add a batch of history entries to a command, keeping its history in timestamp order and trimmed."""
+        raise NotImplementedError
+
+    def load(self):
+        """Load and return the command metadata."""
+        raise NotImplementedError
+
+    def load_workflows(self):
+        """Load and return the workflows, as {app_name: {workflow_id: workflow}}."""
+        raise NotImplementedError
+
+    def pack_history_entry(self, entry):
+        """Return a history entry in the current layout, with its large outputs moved to the blob store."""
+        return pack_entry(upgrade_history_entry(entry), self.blobs)
+
+    def query_history(self, event_type=None, offset=0, limit=50):
+        """Return a page of (command_id, entry) pairs across all commands, newest first."""
+        raise NotImplementedError
+
+    def replace_all(self, data):
+        """Replace the whole store with commands data in the nested JSON format."""
+        raise NotImplementedError
+
+    def save(self, commands):
+        """Persist the command metadata."""
+        raise NotImplementedError
+
+    def save_workflows(self, workflows):
+        """Persist the workflows."""
+        raise NotImplementedError
+
+class JsonStorage(StorageBackend):
+    """Stores command metadata in a JSON file and each command's history in its own JSONL file.
+
+    Only the metadata is read at startup; histories are loaded when first needed and kept
+    in a size-bounded LRU cache. New entries are appended to the history files in batches,
+    and a file is rewritten once trimming has left enough stale entries in it.
+    """
+
+    def __init__(self, json_file='commands.json', retention=None):
+        """Initialize the storage with a specified JSON file and retention policy."""
+        self.json_file = json_file
+        self.retention = retention or RetentionPolicy()
+        base = os.path.splitext(json_file)[0]
+        self.workflows_file = f"{base}_workflows.json"
+        self.history_files = HistoryJournal(f"{base}_history")
+        self.legacy_journal = HistoryJournal(f"{base}_journal")
+        self.blobs = FileBlobStore(f"{base}_blobs")
+        self.lock = threading.RLock()
+        self.metadata = {}
+        self.workflows = {}
+        self.cache = HistoryCache()
+        self.file_lengths = {}
+        self.snapshot_dirty = False
+        self.pending_history = []
+        self.pending_rewrites = {}
+        # Histories still kept inside the JSON file by older versions, until the first change moves them.
+        self.inline_histories = {}
+        self.persistence = PersistenceWorker(self.write_pending_changes)
+        self.persistence.start()
+        atexit.register(self.flush)
+
+    def append_history(self, command_id, entry):
+        """Append a history entry to the cached history ring and queue it for its file."""
+        with self.lock:
+            entry = self.pack_history_entry(entry)
+            history = self.load_history(command_id)
+            evicted = history.append(entry, entry_size(entry), entry_blob_sizes(entry, self.blobs))
+            dropped = ([evicted] if evicted else []) + self.retention.trim(history)
+            self.cache.resize(command_id, len(json.dumps(entry)) - sum(len(json.dumps(old)) for old, _ in dropped))
+            self.pending_history.append((command_id, entry))
+            self.file_lengths[command_id] = self.file_lengths.get(command_id, 0) + 1
+            if self.pending_rewrites.get(command_id) is False or \
+                    self.file_lengths[command_id] > len(history) + HISTORY_REWRITE_SLACK:
+                self.pending_rewrites[command_id] = True
+                self.file_lengths[command_id] = len(history)
+            self.cache.evict(self.pinned_histories())
+        self.persistence.mark_dirty()
+
+    def apply_retention(self, command_id, now=None):
+        """Apply every limit of the retention policy, downsampling included, to a command's history."""
+        return self.filter_history_entries(
+            command_id, lambda entries, sizes, blobs: self.retention.select(entries, sizes, now, blobs))
+
+    def cache_stats(self):
+        """Return the number of cached histories, their size and the hit and miss counts."""
+        with self.lock:
+            return self.cache.stats()
+
+    def collect_garbage(self):
+        """Delete output blobs no longer referenced by any history entry and return how many were deleted."""
+        with self.lock:
+            keys = {
+                key
+                for command_id in self.command_ids()
+                for entry in self.read_history(command_id)
+                for key in entry_blob_keys(entry)
+            }
+            try:
+                return self.blobs.retain(keys)
+            except OSError as e:
+                logging.error(f"Error collecting output blobs: {e}")
+                show_message(f"Failed to delete unused outputs. Details: {e}", "Error")
+                return 0
+
+    def command_ids(self):
+        """Return the IDs of all stored commands and workflows, which both have a history."""
+        return [command_id for app_commands in self.metadata.values() for command_id in app_commands] + [
+            workflow_id for app_workflows in self.workflows.values() for workflow_id in app_workflows]
+
+    def count_history(self, command_id, event_type=None, since=None, until=None):
+        """Return the number of history entries of a command matching the filters."""
+        with self.lock:
+            return len(filter_history(self.load_history(command_id), event_type, since, until))
+
+    def create_new_json_file(self):
+        """Create a new, empty JSON file for storing commands."""
+        try:
+            atomic_write(self.json_file, json.dumps({}, indent=4))
+        except IOError as e:
+            logging.error(f"Error creating new JSON file: {e}")
+            show_message(f"Failed to create a new JSON file. Details: {e}", "Error")
+
+    def delete_history(self, command_id):
+        """Delete the whole history of a command."""
+        with self.lock:
+            self.cache.pop(command_id)
+            self.file_lengths.pop(command_id, None)
+            self.pending_history = [(pending_id, entry) for pending_id, entry in self.pending_history
+                                    if pending_id != command_id]
+            self.pending_rewrites[command_id] = False
+        self.persistence.mark_dirty()
+
+    def delete_history_before(self, command_id, timestamp):
+        """Delete the history entries of a command older than a timestamp and return how many were deleted."""
+        return self.filter_history_entries(
+            command_id, lambda entries, sizes, blobs: [entry.get('timestamp', '') >= timestamp for entry in entries])
+
+    def filter_history_entries(self, command_id, select):
+        """Keep the entries of a command's history chosen by select(entries, sizes, blobs), a list of booleans.
+
+        The history file is rewritten by the persistence worker; returns the number of dropped entries.
+        """
+        with self.lock:
+            items = list(self.load_history(command_id).items())
+            keep = select([entry for entry, _, _ in items], [size for _, size, _ in items], [blobs for _, _, blobs in items])
+            kept = [item for item, keep_item in zip(items, keep) if keep_item]
+            if len(kept) == len(items):
+                return 0
+            history = HistoryRing(self.retention.max_entries, [entry for entry, _, _ in kept], [size for _, size, _ in kept],
+                                  [blobs for _, _, blobs in kept])
+            self.cache.put(command_id, history, sum(len(json.dumps(entry)) for entry in history))
+            self.pending_rewrites[command_id] = True
+            self.file_lengths[command_id] = len(history)
+            self.cache.evict(self.pinned_histories())
+        self.persistence.mark_dirty()
+        return len(items) - len(kept)
+
+    def flush(self):
+        """Write any pending changes to disk immediately."""
+        self.persistence.flush()
+
+    def get_history(self, command_id, offset=0, limit=None, event_type=None, since=None, until=None, include_output=True):
+        """Return a page of a command's history matching the filters, newest first."""
+        with self.lock:
+            history = filter_history(self.load_history(command_id), event_type, since, until)
+            page = page_newest_first(history, offset, limit)
+        if include_output:
+            page = [unpack_entry(entry, self.blobs) for entry in page]
+        return page
+
+    def handle_invalid_json(self):
+        """Handle invalid JSON data by creating a backup and resetting the JSON file."""
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+            backup_file = f"{self.json_file}_old_{timestamp}.json"
+            shutil.copy(self.json_file, backup_file)
+            self.create_new_json_file()
+            show_message(f"Backup of the old file created as '{backup_file}'", "Backup Created", logging.INFO)
+        except (shutil.Error, IOError) as e:
+            logging.error(f"Error handling invalid JSON: {e}")
+            show_message(f"Failed to backup and reset JSON file. Details: {e}", "Error")
+
+    def has_history(self, command_id):
+        """Check whether a command has any history entry, without loading its history."""
+        with self.lock:
+            history = self.cache.histories.get(command_id)
+            if history is not None:
+                return bool(history)
+            return self.pending_rewrites.get(command_id) is not False and (
+                command_id in self.inline_histories or self.history_files.exists(command_id))
+
+    def history_ids(self, command_ids):
+        """Return the set of the given command IDs that have any history entry, without loading their histories."""
+        with self.lock:
+            stored = self.history_files.nonempty_segments() | set(self.inline_histories)
+            return {
+                command_id for command_id in command_ids
+                if (bool(self.cache.histories[command_id]) if command_id in self.cache.histories else
+                    self.pending_rewrites.get(command_id) is not False and command_id in stored)
+            }
+
+    def history_ring(self, entries):
+        """Return a ring holding the newest of a command's chronological entries, sized for the retention policy."""
+        entries = entries[-self.retention.max_entries:]
+        known = {}
+        return HistoryRing(self.retention.max_entries, entries, [entry_size(entry) for entry in entries],
+                           [entry_blob_sizes(entry, self.blobs, known) for entry in entries])
+
+    def history_sizes(self, command_id):
+        """Return the (timestamp, bytes) pairs of a command's history entries, oldest first."""
+        with self.lock:
+            return self.load_history(command_id).sizes()
+
+    def import_history(self, command_id, entries):
+        """Merge a batch of entries into a command's history by timestamp and rewrite its file right away.
+
+        The history is dropped from the cache afterwards, so importing many commands does
+        not keep their histories in memory. A write of the persistence worker in progress is
+        waited for, as its entries would otherwise be appended to the new file again.
+        """
+        with self.persistence.write_lock, self.lock:
+            self.migrate_inline_histories()
+            history = list(self.load_history(command_id)) + [self.pack_history_entry(entry) for entry in entries]
+            history.sort(key=lambda entry: entry.get('timestamp', ''))
+            history = self.history_ring(history)
+            self.retention.trim(history)
+            self.history_files.rewrite(command_id, list(history))
+            self.cache.pop(command_id)
+            self.file_lengths[command_id] = len(history)
+            self.pending_history = [(pending_id, entry) for pending_id, entry in self.pending_history
+                                    if pending_id != command_id]
+            self.pending_rewrites.pop(command_id, None)
+
+    def load(self):
+        """Load and return the command metadata; histories are only read when needed.
+
+        The histories of a store written by older versions, inline in the JSON file with
+        recent entries in a journal, are read from there until the first change moves them
+        to history files; opening such a store only to read it leaves it as it is.
+        """
+        data = self.load_commands()
+        metadata, histories = split_commands_data(data)
+        with self.lock:
+            self.metadata = metadata
+            self.cache.clear()
+            self.file_lengths = {}
+            # The histories to rewrite are gone from the cache; their pending entries are appended instead.
+            self.pending_rewrites = {command_id: rewrite for command_id, rewrite in self.pending_rewrites.items()
+                                     if not rewrite}
+            self.inline_histories = {}
+            if any('history' in command_data for app_commands in data.values() for command_data in app_commands.values()):
+                self.legacy_journal.replay(histories)
+                self.inline_histories = {command_id: [upgrade_history_entry(entry) for entry in history]
+                                         for command_id, history in histories.items() if history}
+                logging.info(f"'{self.json_file}' keeps its histories inline; the first change moves them to "
+                             f"'{self.history_files.directory}'")
+            return copy.deepcopy(self.metadata)
+
+    @traced('load_commands')
+    def load_commands(self):
+        """Load commands from the JSON file."""
+        if os.path.exists(self.json_file):
+            try:
+                with open(self.json_file, 'r') as file:
+                    file_content = file.read().strip()
+                tracer.add('bytes', len(file_content))
+                if not file_content:
+                    return {}
+                data = json.loads(file_content)
+                if isinstance(data, dict):
+                    validate_commands_data(data)
+                    return data
+                else:
+                    raise ValueError("Invalid data format")
+            except (json.JSONDecodeError, ValueError) as e:
+                logging.error(f"Error loading JSON: {e}")
+                self.handle_invalid_json()
+                return {}
+        else:
+            self.create_new_json_file()
+            return {}
+
+    def load_history(self, command_id):
+        """Return a command's history ring from the cache, reading its file on a miss; the caller holds the lock.
+
+        Entries beyond the count, size and age limits are dropped as the file is read.
+        """
+        history = self.cache.get(command_id)
+        if history is not None:
+            return history
+
+        if self.pending_rewrites.get(command_id) is False:
+            entries, size = [], 0
+        elif command_id in self.inline_histories:
+            entries = list(self.inline_histories[command_id])
+            size = sum(len(json.dumps(entry)) for entry in entries)
+        else:
+            entries, size = self.history_files.read(command_id)
+        self.file_lengths[command_id] = len(entries)
+        history = self.history_ring(entries)
+        self.retention.trim(history)
+        if len(history) < len(entries):
+            size -= sum(len(json.dumps(entry)) for entry in entries[:len(entries) - len(history)])
+            if self.file_lengths[command_id] > len(history) + HISTORY_REWRITE_SLACK and \
+                    command_id not in self.inline_histories:
+                self.pending_rewrites[command_id] = True
+                self.file_lengths[command_id] = len(history)
+                self.persistence.mark_dirty()
+        self.cache.put(command_id, history, size)
+        self.cache.evict(self.pinned_histories() | {command_id})
+        return history
+
+    def load_workflows(self):
+        """Load the workflows from their JSON file next to the commands file."""
+        workflows = {}
+        if os.path.exists(self.workflows_file):
+            try:
+                with open(self.workflows_file, 'r') as file:
+                    workflows = json.load(file)
+                if not isinstance(workflows, dict):
+                    raise ValueError("Invalid data format")
+            except (IOError, json.JSONDecodeError, ValueError) as e:
+                logging.error(f"Error loading workflows: {e}")
+                show_message(f"Failed to load workflows. Details: {e}", "Error")
+                workflows = {}
+        with self.lock:
+            self.workflows = copy.deepcopy(workflows)
+        return workflows
+
+    def migrate_inline_histories(self):
+        """Move the histories kept inside the JSON file, and the old journal, to history files.
+
+        The JSON file is copied next to itself and the old journal renamed before anything
+        is changed, so older versions can still open the store from them. Raises OSError
+        if the histories could not be moved; the store is then left as it was.
+        """
+        with self.lock:
+            if not self.inline_histories:
+                return
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            backup_file = f"{self.json_file}_premigration_{timestamp}.json"
+            shutil.copy2(self.json_file, backup_file)
+            for command_id, history in self.inline_histories.items():
+                self.history_files.rewrite(command_id, [self.pack_history_entry(entry) for entry in history])
+            atomic_write(self.json_file, json.dumps(self.metadata, separators=(',', ':')))
+            if os.path.isdir(self.legacy_journal.directory):
+                os.replace(self.legacy_journal.directory, f"{self.legacy_journal.directory}_premigration_{timestamp}")
+            self.inline_histories = {}
+            logging.warning(f"Moved the histories of '{self.json_file}' to '{self.history_files.directory}'; "
+                            f"the original file is kept as '{backup_file}'")
+
+    def pinned_histories(self):
+        """Return the IDs of cached histories that must stay in memory until their changes are written."""
+        return {command_id for command_id, _ in self.pending_history} | {
+            command_id for command_id, rewrite in self.pending_rewrites.items() if rewrite}
+
+    def query_history(self, event_type=None, offset=0, limit=50):
+        """Return a page of (command_id, entry) pairs across all commands, newest first."""
+        with self.lock:
+            matches = [
+                (entry.get('timestamp', ''), command_id, entry)
+                for command_id in self.command_ids()
+                for entry in self.read_history(command_id)
+                if event_type is None or entry.get('type') == event_type
+            ]
+        matches.sort(key=lambda match: match[0], reverse=True)
+        return [(command_id, unpack_entry(entry, self.blobs)) for _, command_id, entry in matches[offset:offset + limit]]
+
+    def read_history(self, command_id):
+        """Return a command's history without adding it to the cache, for scans over all commands."""
+        history = self.cache.histories.get(command_id)
+        if history is not None:
+            return history
+        if self.pending_rewrites.get(command_id) is False:
+            return []
+        if command_id in self.inline_histories:
+            return self.inline_histories[command_id]
+        return self.history_files.read(command_id)[0][-MAX_HISTORY_ENTRIES:]
+
+    def replace_all(self, data):
+        """Replace the whole store with commands data in the nested JSON format."""
+        self.flush()
+        metadata, histories = split_commands_data(data)
+        with self.persistence.write_lock, self.lock:
+            try:
+                self.migrate_inline_histories()
+                self.history_files.clear()
+                for command_id, history in histories.items():
+                    if history:
+                        self.history_files.rewrite(command_id, [self.pack_history_entry(entry) for entry in history])
+            except IOError as e:
+                logging.error(f"Error writing command histories: {e}")
+                show_message(f"Failed to write command histories. Details: {e}", "Error")
+            self.metadata = metadata
+            self.cache.clear()
+            self.file_lengths = {}
+            self.pending_history = []
+            self.pending_rewrites = {}
+            self.inline_histories = {}
+            self.snapshot_dirty = True
+        self.persistence.mark_dirty()
+
+    def save(self, commands):
+        """Mark the metadata dirty so the persistence worker writes it."""
+        with self.lock:
+            self.metadata = copy.deepcopy(commands)
+            self.snapshot_dirty = True
+        self.persistence.mark_dirty()
+
+    def save_workflows(self, workflows):
+        """Write the workflows to their JSON file."""
+        with self.lock:
+            self.workflows = copy.deepcopy(workflows)
+            try:
+                atomic_write(self.workflows_file, json.dumps(self.workflows, indent=4))
+            except IOError as e:
+                logging.error(f"Error saving workflows: {e}")
+                show_message(f"Failed to save workflows. Details: {e}", "Error")
+
+    @traced('write_pending_changes')
+    def write_pending_changes(self):
+        """Write the metadata, rewritten history files and pending entries; runs on the persistence worker."""
+        with self.lock:
+            snapshot = json.dumps(self.metadata, separators=(',', ':')) if self.snapshot_dirty else None
+            # A history dropped from the cache by load() is no longer known in full; its file is kept
+            # and its pending entries are appended to it instead.
+            rewrites = {
+                command_id: list(self.cache.histories[command_id]) if rewrite else None
+                for command_id, rewrite in self.pending_rewrites.items()
+                if not rewrite or command_id in self.cache.histories
+            }
+            pending_history = self.pending_history
+            self.snapshot_dirty = False
+            self.pending_history = []
+            self.pending_rewrites = {}
+        tracer.add('bytes', len(snapshot) if snapshot is not None else 0)
+        tracer.add('history_entries', len(pending_history))
+
+        try:
+            self.migrate_inline_histories()
+            if snapshot is not None:
+                atomic_write(self.json_file, snapshot)
+
+            for command_id, history in rewrites.items():
+                if history is None:
+                    self.history_files.remove(command_id)
+                else:
+                    self.history_files.rewrite(command_id, history)
+
+            # Entries of rewritten histories are already part of the new file.
+            entries_by_command = {}
+            for command_id, history_entry in pending_history:
+                if command_id not in rewrites:
+                    entries_by_command.setdefault(command_id, []).append(history_entry)
+            for command_id, entries in entries_by_command.items():
+                self.history_files.append(command_id, entries)
+        except IOError as e:
+            logging.error(f"Error saving commands: {e}")
+            self.restore_pending_changes(snapshot, pending_history, rewrites)
+            show_message(f"Failed to save commands. Details: {e}", "Error")
+        except Exception:
+            self.restore_pending_changes(snapshot, pending_history, rewrites)
+            raise
+
+    def restore_pending_changes(self, snapshot, pending_history, rewrites):
+        """Queue the changes of a failed write again, ahead of those made since."""
+        with self.lock:
+            self.snapshot_dirty = self.snapshot_dirty or snapshot is not None
+            self.pending_history[:0] = pending_history
+            for command_id, history in rewrites.items():
+                self.pending_rewrites.setdefault(command_id, history is not None)
+
+class SqliteStorage(StorageBackend):
+    """Stores commands in a SQLite database with indexed history tables."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS apps (
+            name TEXT PRIMARY KEY,
+            position INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS commands (
+            id TEXT PRIMARY KEY,
+            app_name TEXT NOT NULL,
+            name TEXT NOT NULL,
+            command TEXT NOT NULL,
+            show_output INTEGER NOT NULL DEFAULT 1,
+            position INTEGER NOT NULL,
+            extra TEXT
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            command_id TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            type TEXT NOT NULL,
+            command TEXT NOT NULL,
+            output TEXT NOT NULL,
+            extra TEXT,
+            size INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS workflows (
+            id TEXT PRIMARY KEY,
+            app_name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            definition TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS history_type ON history (type, timestamp);
+    """
+
+    # History entry keys stored in dedicated columns; anything else goes to the JSON 'extra' column.
+    ENTRY_COLUMNS = ('timestamp', 'type', 'command', 'output')
+
+    # Command settings stored in dedicated columns; anything else goes to the JSON 'extra' column.
+    COMMAND_COLUMNS = ('name', 'command', 'show_output')
+
+    # Version of the history sizes: from 1 on, the size column leaves out the blobs.
+    SCHEMA_VERSION = 1
+
+    # The id, timestamp and bytes of a command's history entries, each blob counted with the newest entry referring to it.
+    HISTORY_SIZES = """
+        SELECT id, timestamp, size
+            + CASE WHEN output_rank = 1 THEN coalesce((SELECT length(data) FROM blobs WHERE hash = output_ref), 0) ELSE 0 END
+            + CASE WHEN stderr_rank = 1 THEN coalesce((SELECT length(data) FROM blobs WHERE hash = stderr_ref), 0) ELSE 0 END
+            AS size
+        FROM (
+            SELECT id, timestamp, size, output_ref, stderr_ref,
+                ROW_NUMBER() OVER (PARTITION BY output_ref ORDER BY timestamp DESC, id DESC) AS output_rank,
+                ROW_NUMBER() OVER (PARTITION BY stderr_ref ORDER BY timestamp DESC, id DESC) AS stderr_rank
+            FROM (
+                SELECT id, timestamp, size, json_extract(extra, '$.output_ref') AS output_ref,
+                    json_extract(extra, '$.stderr_ref') AS stderr_ref
+                FROM history WHERE command_id = ?))
+    """
+
+    def __init__(self, db_file='commands.db', retention=None):
+        """Open the database, enabling WAL mode and creating the schema if needed."""
+        self.db_file = db_file
+        self.retention = retention or RetentionPolicy()
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_file, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+        self.blobs = SqliteBlobStore(self.connection, self.lock)
+        self.upgrade_schema()
+        atexit.register(self.close)
+
+    def append_history(self, command_id, entry):
+        """Insert a history entry and trim the command's history to the retention limits."""
+        try:
+            with self.lock, self.connection:
+                self.insert_history(command_id, [entry])
+                self.trim_history(command_id)
+        except sqlite3.Error as e:
+            logging.error(f"Error saving history entry: {e}")
+            show_message(f"Failed to save history entry. Details: {e}", "Error")
+
+    def apply_retention(self, command_id, now=None):
+        """Apply every limit of the retention policy, downsampling included, to a command's history."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT id, timestamp, type, json_extract(extra, '$.returncode'), size,"
+                " json_extract(extra, '$.output_ref'), json_extract(extra, '$.stderr_ref') FROM history"
+                " WHERE command_id = ? ORDER BY timestamp, id", (command_id,)).fetchall()
+            entries = [{'timestamp': timestamp, 'type': event_type, 'returncode': returncode}
+                       for _, timestamp, event_type, returncode, _, _, _ in rows]
+            known = {}
+            blobs = [entry_blob_sizes({'output_ref': output_ref, 'stderr_ref': stderr_ref}, self.blobs, known)
+                     if output_ref or stderr_ref else None for *_, output_ref, stderr_ref in rows]
+            keep = self.retention.select(entries, [row[4] for row in rows], now, blobs)
+            dropped = [(row[0],) for row, keep_row in zip(rows, keep) if not keep_row]
+            with self.connection:
+                self.connection.executemany("DELETE FROM history WHERE id = ?", dropped)
+        return len(dropped)
+
+    def close(self):
+        """Close the database connection."""
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+    def collect_garbage(self):
+        """Delete output blobs no longer referenced by any history entry and return how many were deleted."""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT json_extract(extra, '$.output_ref'), json_extract(extra, '$.stderr_ref')"
+                " FROM history WHERE extra IS NOT NULL").fetchall()
+            return self.blobs.retain({key for row in rows for key in row if key})
+
+    def count_history(self, command_id, event_type=None, since=None, until=None):
+        """Return the number of history entries of a command matching the filters."""
+        where, params = self.history_filter(command_id, event_type, since, until)
+        with self.lock:
+            return self.connection.execute(f"SELECT COUNT(*) FROM history WHERE {where}", params).fetchone()[0]
+
+    def delete_history(self, command_id):
+        """Delete the whole history of a command."""
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM history WHERE command_id = ?", (command_id,))
+
+    def delete_history_before(self, command_id, timestamp):
+        """Delete the history entries of a command older than a timestamp and return how many were deleted."""
+        with self.lock, self.connection:
+            return self.connection.execute(
+                "DELETE FROM history WHERE command_id = ? AND timestamp < ?", (command_id, timestamp)).rowcount
+
+    def entry_from_row(self, row):
+        """Build a history entry from a (timestamp, type, command, output, extra) row."""
+        entry = dict(zip(self.ENTRY_COLUMNS, row[:4]))
+        if row[4]:
+            entry.update(json.loads(row[4]))
+        return entry
+
+    def get_history(self, command_id, offset=0, limit=None, event_type=None, since=None, until=None, include_output=True):
+        """Return a page of a command's history matching the filters, newest first."""
+        columns = "timestamp, type, command, output, extra"
+        if not include_output:
+            columns = "timestamp, type, command, '', json_remove(extra, '$.stderr')"
+        where, params = self.history_filter(command_id, event_type, since, until)
+        query = f"SELECT {columns} FROM history WHERE {where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        entries = [self.entry_from_row(row) for row in rows]
+        if include_output:
+            entries = [unpack_entry(entry, self.blobs) for entry in entries]
+        return entries
+
+    def has_history(self, command_id):
+        """Check whether a command has any history entry."""
+        with self.lock:
+            return self.connection.execute(
+                "SELECT EXISTS (SELECT 1 FROM history WHERE command_id = ?)", (command_id,)).fetchone()[0] == 1
+
+    def history_ids(self, command_ids):
+        """Return the set of the given command IDs that have any history entry."""
+        with self.lock:
+            stored = {row[0] for row in self.connection.execute("SELECT DISTINCT command_id FROM history")}
+        return stored & set(command_ids)
+
+    @staticmethod
+    def history_filter(command_id, event_type=None, since=None, until=None):
+        """Build the WHERE clause and parameters selecting a command's history entries."""
+        clauses = ["command_id = ?"]
+        params = [command_id]
+        for clause, value in (("type = ?", event_type), ("timestamp >= ?", since), ("timestamp <= ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return " AND ".join(clauses), params
+
+    def history_sizes(self, command_id):
+        """Return the (timestamp, bytes) pairs of a command's history entries, oldest first."""
+        with self.lock:
+            return self.connection.execute(
+                f"SELECT timestamp, size FROM ({self.HISTORY_SIZES}) ORDER BY timestamp, id", (command_id,)).fetchall()
+
+    def insert_history(self, command_id, entries):
+        """Insert history entries for a command, moving large outputs to the blobs table; the caller owns the transaction."""
+        rows = []
+        for entry in entries:
+            entry = self.pack_history_entry(entry)
+            extra = {key: value for key, value in entry.items() if key not in self.ENTRY_COLUMNS}
+            rows.append((command_id, entry.get('timestamp', ''), entry.get('type', 'execution'),
+                         entry.get('command', ''), entry.get('output', ''), json.dumps(extra) if extra else None,
+                         entry_size(entry)))
+        self.connection.executemany(
+            "INSERT INTO history (command_id, timestamp, type, command, output, extra, size) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows)
+
+    def import_history(self, command_id, entries):
+        """Insert a batch of history entries and trim the command's history to the maximum size."""
+        with self.lock, self.connection:
+            self.insert_history(command_id, entries)
+            self.trim_history(command_id)
+
+    @traced('load_commands')
+    def load(self):
+        """Load and return the command metadata."""
+        with self.lock:
+            apps = self.connection.execute("SELECT name FROM apps ORDER BY position").fetchall()
+            rows = self.connection.execute(
+                "SELECT app_name, id, name, command, show_output, extra FROM commands ORDER BY position").fetchall()
+        commands = {app_name: {} for (app_name,) in apps}
+        for app_name, command_id, name, command, show_output, extra in rows:
+            command_data = {
+                'name': name,
+                'command': command,
+                'show_output': bool(show_output)
+            }
+            if extra:
+                command_data.update(json.loads(extra))
+            commands.setdefault(app_name, {})[command_id] = command_data
+        return commands
+
+    def load_workflows(self):
+        """Load and return the workflows."""
+        with self.lock:
+            rows = self.connection.execute("SELECT app_name, id, definition FROM workflows ORDER BY position").fetchall()
+        workflows = {}
+        for app_name, workflow_id, definition in rows:
+            workflows.setdefault(app_name, {})[workflow_id] = json.loads(definition)
+        return workflows
+
+    def query_history(self, event_type=None, offset=0, limit=50):
+        """Return a page of (command_id, entry) pairs across all commands, newest first."""
+        query = "SELECT command_id, timestamp, type, command, output, extra FROM history"
+        params = []
+        if event_type is not None:
+            query += " WHERE type = ?"
+            params.append(event_type)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?"
+        params += [limit, offset]
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [(row[0], unpack_entry(self.entry_from_row(row[1:]), self.blobs)) for row in rows]
+
+    def replace_all(self, data):
+        """Replace the whole store with commands data in the nested JSON format."""
+        metadata, histories = split_commands_data(data)
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM history")
+            self.write_metadata(metadata)
+            for command_id, entries in histories.items():
+                self.insert_history(command_id, entries)
+
+    @traced('write_commands')
+    def save(self, commands):
+        """Persist the command metadata in a single transaction."""
+        try:
+            with self.lock, self.connection:
+                self.write_metadata(commands)
+        except sqlite3.Error as e:
+            logging.error(f"Error saving commands: {e}")
+            show_message(f"Failed to save commands. Details: {e}", "Error")
+
+    def save_workflows(self, workflows):
+        """Replace the workflows table in a single transaction."""
+        rows = [
+            (workflow_id, app_name, position, json.dumps(workflow))
+            for app_name, app_workflows in workflows.items()
+            for position, (workflow_id, workflow) in enumerate(app_workflows.items())
+        ]
+        try:
+            with self.lock, self.connection:
+                self.connection.execute("DELETE FROM workflows")
+                self.connection.executemany(
+                    "INSERT INTO workflows (id, app_name, position, definition) VALUES (?, ?, ?, ?)", rows)
+        except sqlite3.Error as e:
+            logging.error(f"Error saving workflows: {e}")
+            show_message(f"Failed to save workflows. Details: {e}", "Error")
+
+    def trim_history(self, command_id):
+        """Delete the oldest entries of a command beyond the count, size and age limits; the caller owns the transaction.
+
+        Entries are ranked by timestamp rather than ID, since imported entries may be older
+        than the stored ones. The newest entry is kept whatever its size.
+        """
+        policy = self.retention
+        self.connection.execute(
+            "DELETE FROM history WHERE id IN ("
+            " SELECT id FROM history WHERE command_id = ? ORDER BY timestamp DESC, id DESC LIMIT -1 OFFSET ?)",
+            (command_id, policy.max_entries))
+        age_cutoff = policy.cutoff(policy.max_age_days)
+        if age_cutoff:
+            self.connection.execute("DELETE FROM history WHERE command_id = ? AND timestamp < ?", (command_id, age_cutoff))
+        if policy.max_bytes:
+            # The running sums are only computed when the total is too large.
+            total = self.connection.execute(
+                f"SELECT coalesce(SUM(size), 0) FROM ({self.HISTORY_SIZES})", (command_id,)).fetchone()[0]
+            if total > policy.max_bytes:
+                self.connection.execute(
+                    "DELETE FROM history WHERE id IN ("
+                    " SELECT id FROM ("
+                    "  SELECT id, ROW_NUMBER() OVER (ORDER BY timestamp DESC, id DESC) AS position,"
+                    "   SUM(size) OVER (ORDER BY timestamp DESC, id DESC) AS total"
+                    f"  FROM ({self.HISTORY_SIZES}))"
+                    " WHERE total > ? AND position > 1)",
+                    (command_id, policy.max_bytes))
+
+    def upgrade_schema(self):
+        """Add the columns introduced after a database was created."""
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(commands)")]
+        if 'extra' not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE commands ADD COLUMN extra TEXT")
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(history)")]
+        if 'size' not in columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE history ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+            # Approximates entry_size() for the stored entries; earlier sizes counted every blob with each entry.
+            with self.connection:
+                self.connection.execute("UPDATE history SET size = length(command) + length(output) + coalesce(length(extra), 0)")
+                self.connection.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+        # Replaces the history_command_timestamp index of earlier versions.
+        with self.connection:
+            self.connection.execute("CREATE INDEX IF NOT EXISTS history_command_size ON history (command_id, timestamp, size)")
+            self.connection.execute("DROP INDEX IF EXISTS history_command_timestamp")
+
+    def write_metadata(self, commands):
+        """Replace the apps and commands tables; the caller owns the transaction."""
+        self.connection.execute("DELETE FROM apps")
+        self.connection.execute("DELETE FROM commands")
+        self.connection.executemany(
+            "INSERT INTO apps (name, position) VALUES (?, ?)",
+            [(app_name, position) for position, app_name in enumerate(commands)])
+        rows = []
+        for app_name, app_commands in commands.items():
+            for position, (command_id, command_data) in enumerate(app_commands.items()):
+                extra = {key: value for key, value in command_data.items() if key not in self.COMMAND_COLUMNS}
+                rows.append((command_id, app_name, command_data['name'], command_data['command'],
+                             int(command_data.get('show_output', True)), position, json.dumps(extra) if extra else None))
+        self.connection.executemany(
+            "INSERT INTO commands (id, app_name, name, command, show_output, position, extra) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows)
+
+def migrate_json_to_sqlite(json_file, db_file):
+    """Copy a JSON store, including any journaled history and the workflows, into a SQLite database."""
+    source = JsonStorage(json_file)
+    try:
+        data = source.export_data(source.load())
+        workflows = source.load_workflows()
+        workflow_histories = {
+            workflow_id: source.get_history(workflow_id)[::-1]
+            for app_workflows in workflows.values() for workflow_id in app_workflows
+        }
+    finally:
+        source.persistence.stop()
+    target = SqliteStorage(db_file)
+    target.replace_all(data)
+    target.save_workflows(workflows)
+    with target.lock, target.connection:
+        for workflow_id, history in workflow_histories.items():
+            target.insert_history(workflow_id, history)
+    return target
+
+def open_storage(path):
+    """Open the storage backend matching the file extension of a store path.
+
+    A new SQLite store is populated from the JSON store next to it, if there is one.
+    """
+    if os.path.splitext(path)[1].lower() in ('.db', '.sqlite', '.sqlite3'):
+        json_file = f"{os.path.splitext(path)[0]}.json"
+        if not os.path.exists(path) and os.path.exists(json_file):
+            logging.info(f"Migrating '{json_file}' to '{path}'")
+            return migrate_json_to_sqlite(json_file, path)
+        return SqliteStorage(path)
+    return JsonStorage(path)
@@ -0,0 +1,223 @@
+"""Lightweight spans around the UI and storage hot paths, a slow-operation log and on-demand profiling.
+
+Spans record their duration and counters such as bytes serialized or widgets created.
+They are kept in memory for export as Chrome trace-event JSON (chrome://tracing or
+https://ui.perfetto.dev), and spans slower than a threshold are logged to the
+'bater.slow' logger. While neither is enabled, a span costs one attribute check.
+"""
+
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+
+# Whether spans are recorded from startup; they can also be switched on from the GUI's Debug menu.
+TRACE_ENABLED = os.environ.get('BATER_TRACE', '') not in ('', '0')
+
+# Most trace events kept in memory; the oldest are dropped first.
+MAX_TRACE_EVENTS = int(os.environ.get('BATER_TRACE_MAX_EVENTS', 100000))
+
+# Milliseconds above which an operation is logged as slow; 0 disables the slow-operation log.
+SLOW_OPERATION_MS = float(os.environ.get('BATER_SLOW_MS', 0))
+
+# Thresholds in milliseconds of single operations, overriding SLOW_OPERATION_MS, e.g. "sanitize_text=5,save_commands=50".
+SLOW_OPERATION_THRESHOLDS = os.environ.get('BATER_SLOW_THRESHOLDS', '')
+
+# Logger of the slow-operation log.
+slow_log = logging.getLogger('bater.slow')
+
+def parse_thresholds(text):
+    """Parse thresholds written as 'name=milliseconds,...' into a dictionary; raises ValueError if invalid."""
+    thresholds = {}
+    for item in text.split(','):
+        if item.strip():
+            name, _, value = item.partition('=')
+            thresholds[name.strip()] = float(value)
+    return thresholds
+
+class NullSpan:
+    """Span returned while tracing and the slow-operation log are off; every method does nothing."""
+
+    def __enter__(self):
+        """Enter the with block."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Leave the with block without handling exceptions."""
+        return False
+
+    def add(self, key, amount=1):
+        """Ignore a counter."""
+
+    def set(self, key, value):
+        """Ignore an argument."""
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    """A timed operation with its arguments, used as a context manager."""
+
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer, name, category, args):
+        """Initialize a span; its time starts when the with block is entered."""
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        """Start timing the span and make it the innermost span of the thread."""
+        self.tracer.stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Stop timing the span and record it, noting the exception that ended it, if any."""
+        duration = time.perf_counter() - self.start
+        self.tracer.stack().pop()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer.finish(self, duration)
+        return False
+
+    def add(self, key, amount=1):
+        """Add to a counter of the span, such as 'bytes' or 'widgets'."""
+        self.args[key] = self.args.get(key, 0) + amount
+
+    def set(self, key, value):
+        """Set an argument of the span."""
+        self.args[key] = value
+
+class Tracer:
+    """Creates spans and keeps the finished ones as trace events, logging the slow ones."""
+
+    def __init__(self, enabled=TRACE_ENABLED, slow_ms=SLOW_OPERATION_MS, thresholds=None, max_events=MAX_TRACE_EVENTS):
+        """Initialize the tracer; spans are only timed while tracing or the slow-operation log is enabled."""
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        try:
+            self.thresholds = parse_thresholds(SLOW_OPERATION_THRESHOLDS) if thresholds is None else thresholds
+        except ValueError as e:
+            logging.error(f"Ignoring invalid BATER_SLOW_THRESHOLDS: {e}")
+            self.thresholds = {}
+        self.events = deque(maxlen=max_events)
+        self.local = threading.local()
+        self.origin = time.perf_counter()
+        self.active = False
+        self.update_active()
+
+    def add(self, key, amount=1):
+        """Add to a counter of the innermost span open on this thread, if any."""
+        if self.active:
+            stack = self.stack()
+            if stack:
+                stack[-1].add(key, amount)
+
+    def chrome_trace(self):
+        """Return the recorded spans as a Chrome trace-event document."""
+        events = list(self.events)
+        names = {event['tid']: event['thread'] for event in events}
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                    for tid, name in names.items()]
+        events = [{key: value for key, value in event.items() if key != 'thread'} for event in events]
+        return {'traceEvents': metadata + events, 'displayTimeUnit': 'ms'}
+
+    def clear(self):
+        """Drop the recorded spans."""
+        self.events.clear()
+
+    def finish(self, span, duration):
+        """Record a finished span and log it if it was slow."""
+        if self.enabled:
+            thread = threading.current_thread()
+            self.events.append({
+                'name': span.name, 'cat': span.category, 'ph': 'X', 'pid': os.getpid(), 'tid': thread.ident,
+                'thread': thread.name, 'ts': round((span.start - self.origin) * 1e6, 1),
+                'dur': round(duration * 1e6, 1), 'args': span.args
+            })
+        threshold = self.thresholds.get(span.name, self.slow_ms)
+        if threshold and duration * 1000 >= threshold:
+            details = ", ".join(f"{key}={value}" for key, value in span.args.items())
+            slow_log.warning(f"{span.name} took {duration * 1000:.1f} ms" + (f" ({details})" if details else ""))
+
+    def save(self, path):
+        """Write the recorded spans to a Chrome trace-event JSON file and return the number of events."""
+        document = self.chrome_trace()
+        with open(path, 'w') as file:
+            json.dump(document, file)
+        return len(document['traceEvents'])
+
+    def set_enabled(self, enabled):
+        """Start or stop recording spans."""
+        self.enabled = enabled
+        self.update_active()
+
+    def set_slow_threshold(self, slow_ms):
+        """Set the default slow-operation threshold in milliseconds; 0 stops logging operations without their own."""
+        self.slow_ms = slow_ms
+        self.update_active()
+
+    def span(self, name, category='bater', **args):
+        """Return a span for a with block, or a span that does nothing while tracing is off."""
+        if not self.active:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def stack(self):
+        """Return the spans open on the current thread, innermost last."""
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def update_active(self):
+        """Time spans only while they are recorded or may be logged as slow."""
+        self.active = bool(self.enabled or self.slow_ms or self.thresholds)
+
+# Tracer used by the instrumented code.
+tracer = Tracer()
+
+def traced(name, category='bater'):
+    """Decorator running a function inside a span of the given name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not tracer.active:
+                return function(*args, **kwargs)
+            with Span(tracer, name, category, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class ActionProfiler:
+    """cProfile capture of the next few UI actions, started on demand."""
+
+    def __init__(self, actions):
+        """Start profiling until actions UI actions have been handled."""
+        self.remaining = actions
+        self.actions = actions
+        self.profile = cProfile.Profile()
+        self.profile.enable()
+
+    def count_action(self):
+        """Count a UI action; return True when it was the last one to profile."""
+        self.remaining -= 1
+        return self.remaining <= 0
+
+    def stop(self, path=None, limit=25):
+        """Stop profiling, save the statistics to path if given, and return the slowest functions as text."""
+        self.profile.disable()
+        if path:
+            self.profile.dump_stats(path)
+        output = io.StringIO()
+        stats = pstats.Stats(self.profile, stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
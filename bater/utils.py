@@ -0,0 +1,155 @@
+"""Text helpers, atomic file writes and user-facing messages shared by the GUI and the CLI."""
+
+import logging
+import os
+import re
+import shlex
+import sys
+import tempfile
+
+from .policy import check_command
+from .trace import traced, tracer
+
+# Layout of the history entries written by CommandManager. Version 1 entries carry
+# pre-rendered banners in their 'command' field; later ones hold the raw command text.
+HISTORY_ENTRY_VERSION = 2
+
+# Separator framing creation and edit events in the history viewer.
+HISTORY_SEPARATOR = "----------------------------------------------------\n" * 2
+
+# Function showing messages to the user; the GUI replaces it with one that opens dialogs.
+message_handler = None
+
+def set_message_handler(handler):
+    """Register a handler(message, title, level) used to show messages to the user."""
+    global message_handler
+    message_handler = handler
+
+def show_message(message, title, level=logging.ERROR):
+    """Show a message to the user through the registered handler, or on stderr without one."""
+    if message_handler:
+        message_handler(message, title, level)
+    else:
+        print(f"{title}: {message}", file=sys.stderr)
+
+def extract_placeholders(command_template):
+    """Extract placeholders from a command template."""
+    return re.findall(r'\{(\w+)}', command_template)
+
+def fill_placeholders(command_template, values):
+    """Replace the placeholders of a command template with shell-quoted values."""
+    def replace(match):
+        name = match.group(1)
+        if name not in values:
+            raise ValueError(f"Missing value for placeholder '{name}'")
+        return shlex.quote(str(values[name]))
+    return re.sub(r'\{(\w+)}', replace, command_template)
+
+def is_dangerous_command(command):
+    """Check if a command contains potentially dangerous operations, according to the safety policy."""
+    return check_command(command)['dangerous']
+
+@traced('sanitize_text')
+def sanitize_text(output):
+    """Replace special characters in the output with a space."""
+    if tracer.active:
+        tracer.add('bytes', len(output))
+    sanitized_output = re.sub(r'[^\w\s.,;:!?@#%&()\[\]{}<>+\-/*=]', ' ', output)
+    return sanitized_output
+
+def format_history_entry(entry):
+    """Render a history entry as the text block shown in the history viewer."""
+    timestamp = entry.get('timestamp', 'Unknown time')
+    command = entry.get('command', 'Unknown command')
+    output = entry.get('output', '')
+    stderr = entry.get('stderr', '')
+
+    if 'v' in entry:
+        if entry.get('type') == "creation":
+            return f"{HISTORY_SEPARATOR}Command Created on: {timestamp}\nCommand:\n{command}\n{HISTORY_SEPARATOR}"
+        if entry.get('type') == "edit":
+            return (f"{HISTORY_SEPARATOR}Command Edited on: {timestamp}\n"
+                    f"Old Command Name:\n{entry.get('old_name', '')}\nOld Command:\n{entry.get('old_command', '')}\n"
+                    f"New Command Name:\n{entry.get('name', '')}\nNew Command:\n{command}\n{HISTORY_SEPARATOR}")
+        if entry.get('type') == "workflow":
+            return format_workflow_entry(entry)
+        command = f"Command executed:\n{command}"
+
+    if entry.get('type') == "creation":
+        text = f"Command Created on: {timestamp}\n{command}\n"
+    elif entry.get('type') == "edit":
+        text = f"Command Edited on: {timestamp}\n{command}\n"
+    else:  # execution
+        text = f"Executed on: {timestamp}{describe_cached(entry)}\n{command}\n"
+        if output:
+            text += f"Output:\n{output}\n"
+        if stderr:
+            text += f"Errors:\n{stderr}\n"
+        if entry.get('returncode') is not None:
+            text += f"Exit code: {entry['returncode']}\n"
+        if 'duration' in entry:
+            text += f"Duration: {entry['duration']:.3f} s"
+            if 'cpu_user' in entry:
+                text += (f", CPU: {entry['cpu_user'] + entry['cpu_system']:.3f} s, "
+                         f"peak memory: {entry['max_rss_kb'] / 1024:.1f} MB")
+            text += f", output: {entry.get('stdout_bytes', 0) + entry.get('stderr_bytes', 0)} bytes\n"
+    return text
+
+def describe_cached(entry):
+    """Return the note on an execution that reused a cached result, naming the run it came from."""
+    if not entry.get('cached'):
+        return ""
+    if entry.get('cached_from'):
+        return f" (cached result of the run on {entry['cached_from']})"
+    return " (cached result)"
+
+def format_workflow_entry(entry):
+    """Render the history entry of a workflow run with the timings of its steps and its critical path."""
+    outcome = "succeeded" if entry.get('success') else "failed"
+    text = (f"Workflow run on: {entry.get('timestamp', 'Unknown time')}\n"
+            f"Workflow: {entry.get('command', '')} ({entry.get('policy', 'fail-fast')}), {outcome} "
+            f"in {entry.get('duration', 0.0):.2f} s\nSteps:\n")
+    names = {}
+    for step in entry.get('steps', []):
+        names[step['id']] = step['name']
+        text += f"  {step['name']}: {step['state']}"
+        if step.get('returncode') is not None:
+            text += f", exit code {step['returncode']}"
+        if step.get('duration') is not None:
+            text += f", {step['start']:.2f} s to {step['end']:.2f} s"
+        text += "\n"
+    if entry.get('critical_path'):
+        path = " -> ".join(names.get(step_id, step_id) for step_id in entry['critical_path'])
+        text += f"Critical path: {path} ({entry.get('critical_path_duration', 0.0):.2f} s)\n"
+    if entry.get('output'):
+        text += f"Output:\n{entry['output']}"
+    return text
+
+def summarize_history_entry(entry):
+    """Return a one-line summary of a history entry for list views."""
+    if 'v' in entry:
+        return entry.get('command', '').strip().split('\n', 1)[0]
+    lines = [line.strip() for line in entry.get('command', '').splitlines()]
+    lines = [line for line in lines if line and not line.startswith(('---', 'Command Created on:'))]
+    for marker in ('Command executed:', 'New Command:', 'Command:'):
+        if marker in lines:
+            lines = lines[lines.index(marker) + 1:]
+            break
+    return lines[0] if lines else ""
+
+def atomic_write(path, data):
+    """Write text to a file atomically using a temporary file, fsync and rename."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
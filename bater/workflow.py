@@ -0,0 +1,242 @@
+"""Workflows: commands of an application run as a dependency graph, independent steps in parallel."""
+
+import threading
+import time
+
+from .executor import MAX_CONCURRENT_COMMANDS, ExecutionService, call_directly, create_executor
+
+# What happens to the rest of a workflow when a step fails: stop everything, or keep
+# running the steps that do not depend on the failed one.
+WORKFLOW_POLICIES = ('fail-fast', 'continue')
+
+def topological_order(nodes, names=None):
+    """Return the node IDs of a {node_id: {'depends_on': [...]}} graph so that dependencies come first.
+
+    Raises ValueError if a dependency is not a node of the graph or if the graph has a cycle;
+    the message refers to nodes by their entry in names, if given.
+    """
+    names = names or {}
+    remaining = {}
+    for node_id, node in nodes.items():
+        for dependency in node.get('depends_on', []):
+            if dependency not in nodes:
+                raise ValueError(f"Step '{names.get(node_id, node_id)}' depends on '{names.get(dependency, dependency)}',"
+                                 " which is not part of the workflow.")
+        remaining[node_id] = set(node.get('depends_on', []))
+
+    order = []
+    ready = [node_id for node_id, dependencies in remaining.items() if not dependencies]
+    while ready:
+        node_id = ready.pop(0)
+        order.append(node_id)
+        for other_id, dependencies in remaining.items():
+            if node_id in dependencies:
+                dependencies.remove(node_id)
+                if not dependencies:
+                    ready.append(other_id)
+    if len(order) < len(nodes):
+        cycle = sorted(names.get(node_id, node_id) for node_id, dependencies in remaining.items() if dependencies)
+        raise ValueError(f"The workflow has a dependency cycle between: {', '.join(cycle)}")
+    return order
+
+def validate_workflow(workflow, app_commands):
+    """Check that a workflow is well formed and only uses commands of its application."""
+    if not workflow.get('name'):
+        raise ValueError("A workflow needs a name.")
+    if workflow.get('policy', 'fail-fast') not in WORKFLOW_POLICIES:
+        raise ValueError(f"Unknown workflow policy '{workflow.get('policy')}'.")
+    if not workflow.get('nodes'):
+        raise ValueError("A workflow needs at least one step.")
+    for command_id in workflow['nodes']:
+        if command_id not in app_commands:
+            raise ValueError(f"Command '{command_id}' is not part of the application.")
+    topological_order(workflow['nodes'], {command_id: command['name'] for command_id, command in app_commands.items()})
+
+def critical_path(nodes, durations):
+    """Return the chain of dependent nodes with the largest total duration, and that duration."""
+    finish = {}
+    previous = {}
+    for node_id in topological_order(nodes):
+        dependencies = nodes[node_id].get('depends_on', [])
+        slowest = max(dependencies, key=lambda dependency: finish[dependency], default=None)
+        previous[node_id] = slowest
+        finish[node_id] = durations.get(node_id, 0.0) + (finish[slowest] if slowest else 0.0)
+
+    if not finish:
+        return [], 0.0
+    node_id = max(finish, key=finish.get)
+    total = finish[node_id]
+    path = []
+    while node_id is not None:
+        path.append(node_id)
+        node_id = previous[node_id]
+    return path[::-1], round(total, 3)
+
+class WorkflowRun:
+    """Runs the steps of a workflow as soon as their dependencies have succeeded.
+
+    Ready steps run concurrently on a dedicated pool of max_workers threads. A failed step
+    skips the steps depending on it; with the 'fail-fast' policy it also cancels every other
+    queued or running step. When the run is over, a single history entry with the timings
+    of every step and the critical path is recorded for the workflow.
+    on_step_finished(step) is invoked through dispatch as steps change state.
+    """
+
+    def __init__(self, command_manager, app_name, workflow_id, max_workers=MAX_CONCURRENT_COMMANDS,
+                 on_step_finished=None, dispatch=call_directly):
+        """Prepare the steps of a stored workflow."""
+        self.command_manager = command_manager
+        self.app_name = app_name
+        self.workflow_id = workflow_id
+        self.workflow = command_manager.workflows[app_name][workflow_id]
+        self.max_workers = max(1, max_workers)
+        self.on_step_finished = on_step_finished
+        self.dispatch = dispatch
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.service = None
+        self.started = None
+        self.finished = None
+        self.cancelled = False
+
+        app_commands = command_manager.commands[app_name]
+        self.steps = {
+            command_id: {
+                'id': command_id,
+                'name': app_commands[command_id]['name'],
+                'command': app_commands[command_id]['command'],
+                'depends_on': list(node.get('depends_on', [])),
+                'state': 'pending',
+                'job': None,
+                'success': False,
+                'returncode': None,
+                'start': None,
+                'end': None,
+                'duration': None,
+                'stdout': '',
+                'stderr': ''
+            }
+            for command_id, node in self.workflow['nodes'].items()
+        }
+
+    def cancel(self):
+        """Drop the steps that have not started and terminate the running ones."""
+        if self.service:
+            self.service.shutdown()
+        with self.lock:
+            self.cancelled = True
+            for step in self.steps.values():
+                if self.step_state(step) in ('pending', 'queued'):
+                    step['state'] = 'cancelled'
+        self.check_finished()
+
+    def check_finished(self):
+        """Record the workflow's history entry and stop the pool once no step can run any more."""
+        with self.lock:
+            if self.finished is not None:
+                return
+            if any(step['state'] in ('pending', 'queued', 'running') for step in self.steps.values()):
+                return
+            self.finished = time.monotonic()
+        if self.service:
+            self.service.shutdown()
+        self.command_manager.add_workflow_history(self.app_name, self.workflow_id, self.history_entry())
+        self.done.set()
+
+    def history_entry(self):
+        """Build the aggregated history entry of the run, with the output of every step."""
+        path, path_duration = critical_path(
+            {step_id: {'depends_on': step['depends_on']} for step_id, step in self.steps.items()},
+            {step_id: step['duration'] or 0.0 for step_id, step in self.steps.items()})
+        output = ""
+        for step in self.ordered_steps():
+            status = step['state']
+            if step['returncode'] is not None:
+                status += f", exit code {step['returncode']}"
+            if step['duration'] is not None:
+                status += f", {step['duration']:.2f} s"
+            output += f"== {step['name']}: {status} ==\n{step['stdout']}{step['stderr']}\n"
+        return {
+            'policy': self.workflow.get('policy', 'fail-fast'),
+            'success': self.succeeded(),
+            'duration': round(self.finished - self.started, 3),
+            'steps': [
+                {key: step[key] for key in ('id', 'name', 'state', 'returncode', 'start', 'end', 'duration')}
+                for step in self.ordered_steps()
+            ],
+            'critical_path': path,
+            'critical_path_duration': path_duration,
+            'output': output
+        }
+
+    def on_finished(self, step, success, result):
+        """Store the result of a step and queue the steps it unblocked."""
+        with self.lock:
+            step.update(state='cancelled' if result['cancelled'] else 'finished', success=success,
+                        returncode=result['returncode'], end=round(time.monotonic() - self.started, 3),
+                        duration=result['duration'], stdout=result['stdout'], stderr=result['stderr'])
+            step['start'] = round(step['end'] - step['duration'], 3)
+            fail_fast = not success and self.workflow.get('policy', 'fail-fast') == 'fail-fast'
+        if self.on_step_finished:
+            self.on_step_finished(step)
+
+        if fail_fast:
+            self.cancel()
+        else:
+            self.schedule()
+        self.check_finished()
+
+    def ordered_steps(self):
+        """Return the steps with dependencies first."""
+        return [self.steps[step_id] for step_id in topological_order(
+            {step_id: {'depends_on': step['depends_on']} for step_id, step in self.steps.items()})]
+
+    def schedule(self):
+        """Queue the pending steps whose dependencies succeeded and skip those whose dependencies failed."""
+        to_submit = []
+        with self.lock:
+            if self.cancelled:
+                return
+            changed = True
+            while changed:
+                changed = False
+                for step in self.steps.values():
+                    if step['state'] != 'pending':
+                        continue
+                    dependencies = [self.steps[dependency] for dependency in step['depends_on']]
+                    if any(dependency['state'] in ('skipped', 'cancelled') or
+                           (dependency['state'] == 'finished' and not dependency['success'])
+                           for dependency in dependencies):
+                        step['state'] = 'skipped'
+                        changed = True
+                    elif all(dependency['state'] == 'finished' for dependency in dependencies):
+                        step['state'] = 'queued'
+                        to_submit.append(step)
+
+        for step in to_submit:
+            executor = create_executor(step['command'], lambda success, result, step=step: self.on_finished(step, success, result),
+                                       self.app_name, step['id'], self.command_manager, dispatch=self.dispatch,
+                                       record_history=False)
+            step['job'] = self.service.submit(self.app_name, step['id'], executor)
+
+    def start(self):
+        """Start the steps without dependencies."""
+        self.started = time.monotonic()
+        self.service = ExecutionService(max_workers=self.max_workers, max_per_app=self.max_workers)
+        self.schedule()
+        self.check_finished()
+
+    def step_state(self, step):
+        """Return the state of a step, reporting queued steps already taken by a worker as running."""
+        job = step['job']
+        if step['state'] == 'queued' and job is not None and job.state == 'running':
+            return 'running'
+        return step['state']
+
+    def succeeded(self):
+        """Check whether every step finished successfully."""
+        return all(step['state'] == 'finished' and step['success'] for step in self.steps.values())
+
+    def wait(self, timeout=None):
+        """Block until the run is over, and return whether it is."""
+        return self.done.wait(timeout)
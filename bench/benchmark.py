@@ -0,0 +1,303 @@
+"""Benchmarks of the store, the history views and the executor on a synthetic store.
+
+Generates a store of apps x commands x history entries, then measures load time, memory
+footprint, persistence latency, history view open time, executor throughput and, when
+wxPython and a display are available, the home view. Results are written as JSON so that
+runs can be compared:
+
+    python bench/benchmark.py --scale large --output bench-large.json
+    python bench/benchmark.py --scale large --compare bench-large.json
+
+The GUI benchmark is skipped without a display; run it under `xvfb-run` to include it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bater.executor import EXECUTION_ENGINE, EXECUTION_ENGINES, ExecutionService, create_executor  # noqa: E402
+from bater.manager import CommandManager  # noqa: E402
+from bater.stats import summarize_values  # noqa: E402
+from bater.storage import JsonStorage, SqliteStorage, validate_commands_data  # noqa: E402
+from bater.utils import HISTORY_ENTRY_VERSION  # noqa: E402
+
+# Store sizes as (apps, commands per app, history entries per command).
+SCALES = {
+    'small': (50, 10, 100),
+    'medium': (200, 10, 500),
+    'large': (1000, 10, 1000)
+}
+
+# Distinct outputs used by the synthetic history; repeated outputs exercise the blob store.
+SYNTHETIC_OUTPUTS = [
+    "OK",
+    "\n".join(f"line {line}: all services are running" for line in range(20)),
+    "\n".join(f"{host}.example.org is up, latency {host % 7} ms" for host in range(40))
+]
+
+def synthetic_history(command_text, count, rng):
+    """Return count execution entries of a command, oldest first, one minute apart."""
+    start = datetime(2024, 1, 1)
+    entries = []
+    for index in range(count):
+        returncode = 0 if rng.random() > 0.05 else 1
+        entries.append({
+            'timestamp': (start + timedelta(minutes=index)).strftime("%Y-%m-%d %H:%M:%S"),
+            'type': 'execution',
+            'command': command_text,
+            'v': HISTORY_ENTRY_VERSION,
+            'output': rng.choice(SYNTHETIC_OUTPUTS) if returncode == 0 else "",
+            'stderr': "" if returncode == 0 else "connection refused",
+            'returncode': returncode,
+            'duration': round(rng.uniform(0.01, 2.0), 3)
+        })
+    return entries
+
+def generate_store(path, apps, commands, history, seed=0):
+    """Write a synthetic store of apps x commands with history entries each, and return the metadata."""
+    rng = random.Random(seed)
+    metadata = {
+        f"app-{app:04d}": {
+            f"cmd-{app:04d}-{command:02d}": {
+                'name': f"command {command}",
+                'command': f"echo app {app} command {command}",
+                'show_output': True
+            }
+            for command in range(commands)
+        }
+        for app in range(apps)
+    }
+
+    if path.endswith('.db'):
+        storage = SqliteStorage(path)
+        with storage.lock, storage.connection:
+            storage.write_metadata(metadata)
+            for app_commands in metadata.values():
+                for command_id, command_data in app_commands.items():
+                    storage.insert_history(command_id, synthetic_history(command_data['command'], history, rng))
+        storage.close()
+    else:
+        storage = JsonStorage(path)
+        for app_commands in metadata.values():
+            for command_id, command_data in app_commands.items():
+                entries = synthetic_history(command_data['command'], history, rng)
+                storage.history_files.rewrite(command_id, [storage.pack_history_entry(entry) for entry in entries])
+        storage.save(metadata)
+        storage.flush()
+        storage.persistence.stop()
+    return metadata
+
+def timed(function, *args, **kwargs):
+    """Call a function and return its result and the elapsed time in seconds."""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def timed_ms(function, *args, **kwargs):
+    """Call a function and return the elapsed time in milliseconds."""
+    return timed(function, *args, **kwargs)[1] * 1000
+
+def benchmark_load(path, metadata):
+    """Measure opening the store, validating the metadata and the memory taken by the loaded manager."""
+    tracemalloc.start()
+    command_manager, load_time = timed(CommandManager, path)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    _, validate_time = timed(validate_commands_data, metadata)
+    return command_manager, {
+        'load_seconds': round(load_time, 4),
+        'validate_seconds': round(validate_time, 4),
+        'memory_after_load_bytes': current,
+        'memory_peak_during_load_bytes': peak
+    }
+
+def benchmark_persistence(command_manager, command_ids, events, rng):
+    """Measure the latency of saving metadata and of recording history events, then of flushing them."""
+    save_times = []
+    for _ in range(min(events, 50)):
+        save_times.append(timed_ms(command_manager.save_commands))
+    _, save_flush_time = timed(command_manager.flush)
+
+    event_times = []
+    for _ in range(events):
+        app_name, command_id = rng.choice(command_ids)
+        event_times.append(timed_ms(command_manager.add_command_history, app_name, command_id, "echo benchmark", "OK",
+                                    returncode=0, metrics={'duration': 0.01}))
+    _, event_flush_time = timed(command_manager.flush)
+    return {
+        'save_commands_ms': summarize_values(save_times),
+        'save_flush_seconds': round(save_flush_time, 4),
+        'add_history_ms': summarize_values(event_times),
+        'add_history_flush_seconds': round(event_flush_time, 4),
+        'events': events
+    }
+
+def benchmark_history_views(command_manager, command_ids, views, rng):
+    """Measure opening the history of commands: the row count and first page, then one full entry."""
+    cold_times, warm_times, entry_times = [], [], []
+    for app_name, command_id in rng.sample(command_ids, min(views, len(command_ids))):
+        for times in (cold_times, warm_times):
+            started = time.perf_counter()
+            command_manager.count_command_history(app_name, command_id)
+            command_manager.get_command_history(app_name, command_id, limit=100, include_output=False)
+            times.append((time.perf_counter() - started) * 1000)
+        entry_times.append(timed_ms(command_manager.get_command_history, app_name, command_id, 0, 1))
+    return {
+        'open_cold_ms': summarize_values(cold_times),
+        'open_warm_ms': summarize_values(warm_times),
+        'entry_ms': summarize_values(entry_times),
+        'views': len(cold_times)
+    }
+
+def benchmark_executor(command_manager, command_ids, executions, workers, engine):
+    """Measure how many trivial commands per second the execution service runs and records."""
+    service = ExecutionService(max_workers=workers, max_per_app=workers, engine=engine)
+    started = time.perf_counter()
+    for index in range(executions):
+        app_name, command_id = command_ids[index % len(command_ids)]
+        service.submit(app_name, command_id, create_executor("true", lambda success, result: None, app_name,
+                                                             command_id, command_manager, engine=engine))
+    service.wait()
+    elapsed = time.perf_counter() - started
+    service.shutdown()
+    return {
+        'executions': executions,
+        'workers': workers,
+        'engine': engine,
+        'seconds': round(elapsed, 4),
+        'commands_per_second': round(executions / elapsed, 1)
+    }
+
+def benchmark_home_view(path):
+    """Measure building the main window with its home view, or report why it was skipped."""
+    try:
+        import wx
+        app = wx.App(False)
+    except Exception as e:  # No wxPython, or no display to open.
+        return {'skipped': str(e) or type(e).__name__}
+    from bater.gui import CommandApp, build_home_view_model
+
+    os.environ['BATER_STORE'] = path
+    frame, create_time = timed(CommandApp, None, title="BATER benchmark")
+    _, model_time = timed(build_home_view_model, frame.command_manager)
+    _, refresh_time = timed(frame.update_home_display)
+    frame.command_manager.flush()
+    frame.Destroy()
+    app.Destroy()
+    return {
+        'create_window_seconds': round(create_time, 4),
+        'build_model_seconds': round(model_time, 4),
+        'refresh_unchanged_seconds': round(refresh_time, 4)
+    }
+
+def flatten(results, prefix=""):
+    """Flatten nested results into {'section.metric': number} pairs."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(previous, current):
+    """Print each metric of a previous run next to the current one, with the relative change."""
+    if previous['parameters'] != current['parameters']:
+        print(f"Warning: the runs used different parameters: {previous['parameters']} and {current['parameters']}")
+    old, new = flatten(previous['results']), flatten(current['results'])
+    print(f"{'metric':<50} {'previous':>14} {'current':>14} {'change':>8}")
+    for name in sorted(old.keys() & new.keys()):
+        change = f"{(new[name] - old[name]) / old[name] * 100:+.0f}%" if old[name] else ""
+        print(f"{name:<50} {old[name]:>14} {new[name]:>14} {change:>8}")
+
+def run(args):
+    """Generate the store, run every benchmark and return the report."""
+    apps, commands, history = SCALES[args.scale]
+    apps = args.apps or apps
+    commands = args.commands or commands
+    history = args.history if args.history is not None else history
+    rng = random.Random(args.seed)
+
+    directory = tempfile.mkdtemp(prefix="bater-bench-")
+    path = os.path.join(directory, f"commands{'.db' if args.backend == 'sqlite' else '.json'}")
+    try:
+        metadata, generate_time = timed(generate_store, path, apps, commands, history, args.seed)
+        command_manager, load_results = benchmark_load(path, metadata)
+        command_ids = [(app_name, command_id) for app_name, app_commands in metadata.items() for command_id in app_commands]
+        results = {
+            'generate_seconds': round(generate_time, 2),
+            'load': load_results,
+            'persistence': benchmark_persistence(command_manager, command_ids, args.events, rng),
+            'history_view': benchmark_history_views(command_manager, command_ids, args.views, rng),
+            'executor': benchmark_executor(command_manager, command_ids, args.executions, args.workers, args.engine)
+        }
+        command_manager.flush()
+        command_manager.storage.close()
+        command_manager.search_index.close()
+        results['home_view'] = {'skipped': "disabled with --no-gui"} if args.no_gui else benchmark_home_view(path)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return {
+        'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'platform': {
+            'python': platform.python_version(),
+            'system': platform.platform(),
+            'cpus': os.cpu_count(),
+            'sqlite': sqlite3.sqlite_version
+        },
+        'parameters': {
+            'scale': args.scale, 'backend': args.backend, 'apps': apps, 'commands': commands, 'history': history,
+            'events': args.events, 'views': args.views, 'executions': args.executions, 'workers': args.workers,
+            'engine': args.engine, 'seed': args.seed
+        },
+        'results': results
+    }
+
+def main(argv=None):
+    """Run the benchmarks and write or compare their results."""
+    parser = argparse.ArgumentParser(description="Benchmark BATER on a synthetic store.")
+    parser.add_argument('--scale', choices=list(SCALES), default='small',
+                        help="store size: small (50x10x100), medium (200x10x500) or large (1000x10x1000)")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default='json', help="storage backend (default: json)")
+    parser.add_argument('--apps', type=int, help="number of applications, overriding the scale")
+    parser.add_argument('--commands', type=int, help="commands per application, overriding the scale")
+    parser.add_argument('--history', type=int, help="history entries per command, overriding the scale")
+    parser.add_argument('--events', type=int, default=1000, help="history events recorded (default: 1000)")
+    parser.add_argument('--views', type=int, default=100, help="history views opened (default: 100)")
+    parser.add_argument('--executions', type=int, default=200, help="trivial commands executed (default: 200)")
+    parser.add_argument('--workers', type=int, default=4, help="executor worker threads (default: 4)")
+    parser.add_argument('--engine', choices=EXECUTION_ENGINES, default=EXECUTION_ENGINE,
+                        help=f"execution engine (default: $BATER_ENGINE or {EXECUTION_ENGINE})")
+    parser.add_argument('--seed', type=int, default=0, help="random seed of the synthetic store")
+    parser.add_argument('--no-gui', action='store_true', help="skip the home view benchmark")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare the results with those of a previous JSON file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as file:
+            compare(json.load(file), report)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
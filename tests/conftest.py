@@ -0,0 +1,20 @@
+import pytest
+
+from bater.manager import CommandManager
+
+
+@pytest.fixture
+def make_manager(tmp_path):
+    """Return a function opening a CommandManager on a store in the test's directory, closed afterwards."""
+    managers = []
+
+    def make(name='commands.json'):
+        manager = CommandManager(str(tmp_path / name))
+        managers.append(manager)
+        return manager
+
+    yield make
+    for manager in managers:
+        manager.shell_sessions.stop()
+        manager.storage.close()
+        manager.search_index.close()
@@ -0,0 +1,76 @@
+import time
+
+from bater.aio import AsyncCommandExecutor
+from bater.executor import ExecutionService, create_executor
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def add_command(manager, name, command):
+    manager.add_command('web', name, command)
+    return next(command_id for command_id, command_data in manager.commands['web'].items()
+                if command_data['name'] == name)
+
+
+def test_asyncio_engine_is_selected_by_name(make_manager):
+    executor = create_executor("true", lambda success, result: None, 'web', 'c1', make_manager(), engine='asyncio')
+    assert isinstance(executor, AsyncCommandExecutor) and executor.asynchronous
+
+
+def test_output_is_streamed_and_the_run_recorded(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    build = add_command(manager, 'build', "echo first; sleep 0.3; echo second >&2; exit 4")
+    chunks, results = [], []
+    create_executor(manager.commands['web'][build]['command'], lambda success, result: results.append(result), 'web',
+                    build, manager, on_output=lambda stream, text: chunks.append((stream, text.strip())),
+                    output_interval=0.05, engine='asyncio').execute()
+
+    result = results[0]
+    assert not result['success'] and result['returncode'] == 4
+    assert result['stdout'] == "first" and result['stderr'] == "second"
+    assert result['usage'] is None
+    assert chunks == [('stdout', "first"), ('stderr', "second")]
+    entry = manager.get_command_history('web', build, event_type='execution')[0]
+    assert entry['output'] == "first" and entry['returncode'] == 4
+
+
+def test_timeout_and_terminate_stop_the_command(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    results = []
+    started = time.monotonic()
+    create_executor("echo begun; sleep 30", lambda success, result: results.append(result), 'web', 'c1', manager,
+                    record_history=False, timeout=0.3, engine='asyncio').execute()
+    assert time.monotonic() - started < 10
+    assert results[0]['timed_out'] and results[0]['stdout'] == "begun"
+
+    executor = create_executor("sleep 30", lambda success, result: results.append(result), 'web', 'c1', manager,
+                               record_history=False, engine='asyncio')
+    future = executor.launch()
+    wait_until(lambda: executor.process is not None)
+    executor.terminate()
+    future.result(10)
+    assert results[1]['cancelled'] and not results[1]['success']
+
+
+def test_one_worker_thread_runs_commands_concurrently(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    done = []
+    service = ExecutionService(max_workers=4, max_per_app=4, engine='asyncio')
+    assert len(service.workers) == 1
+    started = time.monotonic()
+    for index in range(4):
+        service.submit('web', f"c{index}", create_executor(
+            "sleep 0.5", lambda success, result: done.append(success), 'web', f"c{index}",
+            manager, record_history=False, engine='asyncio'))
+    service.wait()
+    service.shutdown()
+    assert done == [True] * 4
+    assert time.monotonic() - started < 1.5
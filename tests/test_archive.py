@@ -0,0 +1,135 @@
+import gzip
+import json
+
+import pytest
+
+from bater.archive import read_archive, scan_archive
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def execution(timestamp, output, returncode=0):
+    return {'timestamp': timestamp, 'type': 'execution', 'command': "echo", 'output': output, 'returncode': returncode}
+
+
+@pytest.fixture
+def source(make_manager):
+    """A store with two applications, a workflow and some executions."""
+    manager = make_manager('source.json')
+    manager.add_application('web')
+    manager.add_application('db')
+    manager.add_command('web', 'build', "make build")
+    manager.add_command('web', 'test', "make test")
+    manager.add_command('db', 'backup', "pg_dump app")
+    build = command_id(manager, 'web', 'build')
+    test = command_id(manager, 'web', 'test')
+    manager.add_workflow('web', 'ci', {build: {'depends_on': []}, test: {'depends_on': [build]}})
+    manager.storage.import_history(build, [execution("2024-01-01 10:00:00", "ok"),
+                                           execution("2024-01-02 10:00:00", "ok"),
+                                           execution("2024-01-02 10:00:00", "ok")])
+    manager.storage.import_history(command_id(manager, 'db', 'backup'), [execution("2024-01-03 10:00:00", "dump", 1)])
+    manager.flush()
+    return manager
+
+
+def history(manager, app_name, name):
+    return manager.get_command_history(app_name, command_id(manager, app_name, name))
+
+
+@pytest.mark.parametrize('archive_name', ['backup.jsonl', 'backup.jsonl.gz', 'backup.jsonl.xz'])
+def test_export_and_import_into_an_empty_store(source, make_manager, tmp_path, archive_name):
+    archive = str(tmp_path / archive_name)
+    exported = source.export_commands(archive)
+    assert exported == {'apps': 2, 'commands': 3, 'workflows': 1, 'history': 7}
+    assert scan_archive(archive) == exported
+
+    target = make_manager('target.json')
+    counts = target.import_commands(archive)
+    assert counts == {'apps': 2, 'commands': 3, 'workflows': 1, 'history': 7, 'duplicates': 0}
+    assert target.commands == source.commands
+    assert target.workflows == source.workflows
+    for app_name, name in [('web', 'build'), ('web', 'test'), ('db', 'backup')]:
+        assert history(target, app_name, name) == history(source, app_name, name)
+
+
+def test_import_twice_skips_duplicates_but_keeps_repeated_runs(source, make_manager, tmp_path):
+    archive = str(tmp_path / 'backup.jsonl.gz')
+    source.export_commands(archive)
+    target = make_manager('target.json')
+    target.import_commands(archive)
+
+    counts = target.import_commands(archive)
+    assert counts == {'apps': 0, 'commands': 0, 'workflows': 0, 'history': 0, 'duplicates': 7}
+    builds = history(target, 'web', 'build')
+    assert [entry['timestamp'] for entry in builds if entry['type'] == 'execution'] == [
+        "2024-01-02 10:00:00", "2024-01-02 10:00:00", "2024-01-01 10:00:00"]
+
+    counts = target.import_commands(archive, history='concat')
+    assert counts['history'] == 7
+    assert len(history(target, 'web', 'build')) == 2 * len(builds)
+
+
+def test_merge_keeps_stored_commands_and_adds_new_history(source, make_manager, tmp_path):
+    archive = str(tmp_path / 'backup.jsonl')
+    source.export_commands(archive)
+    target = make_manager('target.json')
+    target.import_commands(archive)
+    target.add_application('local')
+    target.add_command('local', 'ls', "ls")
+    build = command_id(target, 'web', 'build')
+    target.storage.import_history(build, [execution("2024-01-05 10:00:00", "target only")])
+    target.edit_command('web', build, 'build', "make all")
+
+    source.storage.import_history(build, [execution("2024-01-04 10:00:00", "source only")])
+    source.export_commands(archive)
+    counts = target.import_commands(archive)
+
+    assert counts['history'] == 1
+    assert counts['commands'] == 0
+    assert target.commands['web'][build]['command'] == "make all"
+    assert 'local' in target.commands
+    outputs = [entry.get('output') for entry in history(target, 'web', 'build') if entry['type'] == 'execution']
+    assert outputs[:2] == ["target only", "source only"]
+
+
+def test_replace_mode_drops_the_stored_commands(source, make_manager, tmp_path):
+    archive = str(tmp_path / 'backup.jsonl')
+    source.export_commands(archive, include_history=False)
+    target = make_manager('target.json')
+    target.add_application('local')
+    target.add_command('local', 'ls', "ls")
+
+    counts = target.import_commands(archive, mode='replace')
+    assert counts['history'] == 0
+    assert target.commands == source.commands
+    assert target.workflows == source.workflows
+    assert history(target, 'web', 'build') == []
+
+
+def test_truncated_archive_leaves_the_store_unchanged(source, make_manager, tmp_path):
+    archive = str(tmp_path / 'backup.jsonl.gz')
+    source.export_commands(archive)
+    with gzip.open(archive, 'rt', encoding='utf-8') as file:
+        lines = file.readlines()
+    with gzip.open(archive, 'wt', encoding='utf-8') as file:
+        file.writelines(lines[:-1])
+
+    target = make_manager('target.json')
+    target.add_application('local')
+    assert target.import_commands(archive, mode='replace') is None
+    assert list(target.commands) == ['local']
+
+
+def test_import_legacy_json_export(make_manager, tmp_path):
+    legacy = tmp_path / 'export.json'
+    legacy.write_text(json.dumps({'web': {'c1': {'name': 'build', 'command': "make", 'show_output': True,
+                                                 'history': [execution("2024-01-01 10:00:00", "ok")]}}}))
+    assert [record['type'] for record in read_archive(str(legacy))] == ['header', 'app', 'command', 'history', 'end']
+
+    target = make_manager('target.json')
+    counts = target.import_commands(str(legacy))
+    assert counts == {'apps': 1, 'commands': 1, 'workflows': 0, 'history': 1, 'duplicates': 0}
+    assert [entry['output'] for entry in target.get_command_history('web', 'c1')] == ["ok"]
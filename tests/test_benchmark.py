@@ -0,0 +1,51 @@
+import importlib.util
+import json
+import os
+
+import pytest
+
+BENCHMARK_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'bench', 'benchmark.py')
+
+
+@pytest.fixture(scope='module')
+def benchmark():
+    """The benchmark script, loaded as a module."""
+    spec = importlib.util.spec_from_file_location('benchmark', BENCHMARK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('store_name', ['commands.json', 'commands.db'])
+def test_generated_store_loads_with_its_history(benchmark, make_manager, tmp_path, store_name):
+    path = str(tmp_path / store_name)
+    metadata = benchmark.generate_store(path, 2, 3, 5)
+    assert sorted(metadata) == ['app-0000', 'app-0001']
+
+    manager = make_manager(store_name)
+    assert manager.commands == metadata
+    assert manager.count_command_history('app-0001', 'cmd-0001-02') == 5
+
+
+def test_flatten_keeps_numbers_only(benchmark):
+    assert benchmark.flatten({'load': {'seconds': 1.5, 'skipped': "no display"}, 'ok': True, 'events': 3}) == \
+        {'load.seconds': 1.5, 'events': 3}
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_a_small_run_reports_every_section_and_compares(benchmark, tmp_path, capsys, backend):
+    output = str(tmp_path / 'report.json')
+    arguments = ['--backend', backend, '--apps', '2', '--commands', '2', '--history', '3', '--events', '5',
+                 '--views', '2', '--executions', '4', '--workers', '2', '--no-gui']
+    assert benchmark.main(arguments + ['--output', output]) == 0
+    with open(output) as file:
+        report = json.load(file)
+    assert report['parameters']['backend'] == backend
+    assert set(report['results']) == {'generate_seconds', 'load', 'persistence', 'history_view', 'executor', 'home_view'}
+    assert report['results']['persistence']['events'] == 5
+    assert report['results']['history_view']['views'] == 2
+    assert report['results']['executor']['executions'] == 4
+
+    capsys.readouterr()
+    assert benchmark.main(arguments + ['--compare', output]) == 0
+    assert "executor.commands_per_second" in capsys.readouterr().out
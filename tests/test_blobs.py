@@ -0,0 +1,77 @@
+import sqlite3
+import threading
+
+import pytest
+
+from bater.blobs import (BLOB_MIN_SIZE, FileBlobStore, SqliteBlobStore, entry_blob_keys, entry_blob_sizes, pack_entry,
+                         unpack_entry)
+
+
+@pytest.fixture(params=['file', 'sqlite'])
+def blobs(request, tmp_path):
+    if request.param == 'file':
+        yield FileBlobStore(str(tmp_path / 'blobs'))
+    else:
+        connection = sqlite3.connect(str(tmp_path / 'blobs.db'))
+        yield SqliteBlobStore(connection, threading.RLock())
+        connection.close()
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def test_identical_texts_are_stored_once(blobs):
+    text = "line of output\n" * 100
+    key = blobs.put(text)
+    assert blobs.put(text) == key == blobs.digest(text)
+    assert blobs.get(key) == text
+    assert 0 < blobs.size(key) < len(text)
+    assert blobs.contains(key)
+    assert blobs.get("0" * 64) == "" and blobs.size("0" * 64) == 0
+
+
+def test_retain_deletes_unreferenced_blobs(blobs):
+    kept = blobs.put("kept " * 50)
+    dropped = blobs.put("dropped " * 50)
+    assert blobs.retain({kept}) == 1
+    assert blobs.contains(kept) and not blobs.contains(dropped)
+    assert blobs.retain({kept}) == 0
+
+
+def test_large_outputs_are_packed_into_references(blobs):
+    output = "x" * BLOB_MIN_SIZE
+    entry = {'timestamp': "2024-01-01 10:00:00", 'output': output, 'stderr': "short"}
+    packed = pack_entry(entry, blobs)
+    assert 'output' not in packed and packed['stderr'] == "short"
+    assert entry_blob_keys(packed) == [packed['output_ref']]
+    assert entry_blob_sizes(packed, blobs) == {packed['output_ref']: blobs.size(packed['output_ref'])}
+    assert unpack_entry(packed, blobs) == entry
+    assert entry['output'] == output
+
+    small = {'timestamp': "2024-01-01 10:00:00", 'output': "x" * (BLOB_MIN_SIZE - 1)}
+    assert pack_entry(small, blobs) is small
+    assert entry_blob_sizes(small, blobs) is None
+
+
+@pytest.mark.parametrize('store_name', ['commands.json', 'commands.db'])
+def test_repeated_outputs_share_a_blob_until_collected(make_manager, store_name):
+    manager = make_manager(store_name)
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    manager.add_command('web', 'test', "make test")
+    build = command_id(manager, 'web', 'build')
+    test = command_id(manager, 'web', 'test')
+    output = "compiling module\n" * 50
+    for _ in range(3):
+        manager.add_command_history('web', build, "make", output=output, returncode=0)
+    manager.add_command_history('web', test, "make test", output="test output\n" * 50, returncode=0)
+    manager.flush()
+
+    assert [entry['output'] for entry in manager.get_command_history('web', build, event_type='execution')] == [output] * 3
+    assert manager.collect_garbage() == 0
+    manager.delete_command('web', test)
+    manager.flush()
+    assert manager.collect_garbage() == 1
+    assert manager.get_command_history('web', build, event_type='execution')[0]['output'] == output
@@ -0,0 +1,112 @@
+from bater.cache import ResultCache, result_cache_key
+from bater.executor import create_executor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def result(stdout, stderr=""):
+    return {'success': True, 'returncode': 0, 'stdout': stdout, 'stderr': stderr}
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def run(manager, app_name, command_id):
+    results = []
+    command = manager.commands[app_name][command_id]['command']
+    create_executor(command, lambda success, result: results.append(result), app_name, command_id, manager).execute()
+    return results[0]
+
+
+def test_results_expire_after_their_ttl():
+    clock = FakeClock()
+    cache = ResultCache(clock=clock)
+    cache.put('key', 'c1', result("out"), ttl=10)
+    cached = cache.get('key')
+    assert cached['cached'] and cached['stdout'] == "out"
+    clock.now = 10
+    assert cache.get('key') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+    assert cache.stats()['results'] == 0
+
+
+def test_cache_evicts_least_recently_used_results_beyond_its_size():
+    cache = ResultCache(max_bytes=10)
+    cache.put('a', 'c1', result("aaaa"), ttl=60)
+    cache.put('b', 'c2', result("bbbb"), ttl=60)
+    assert cache.get('a') is not None
+    cache.put('c', 'c3', result("cccc"), ttl=60)
+    assert cache.get('b') is None
+    assert cache.get('a') is not None and cache.get('c') is not None
+    cache.put('big', 'c4', result("x" * 11), ttl=60)
+    assert cache.get('big') is None
+    assert cache.stats()['bytes'] == 8
+
+
+def test_invalidate_and_stats_by_command():
+    cache = ResultCache()
+    cache.put('a', 'c1', result("a"), ttl=60)
+    cache.put('b', 'c2', result("bb"), ttl=60)
+    assert cache.stats({'c2'})['results'] == 1
+    assert cache.stats({'c2'})['bytes'] == 2
+    assert cache.invalidate({'c1'}) == 1
+    assert cache.get('a') is None and cache.get('b') is not None
+    assert cache.invalidate() == 1
+
+
+def test_cache_key_depends_on_command_directory_and_environment():
+    key = result_cache_key('A', 'c1', "echo hi", '/tmp', {'PATH': '/bin'})
+    assert key == result_cache_key('A', 'c1', "echo hi", '/tmp', {'PATH': '/bin', 'OTHER': 'x'})
+    assert key != result_cache_key('B', 'c1', "echo hi", '/tmp', {'PATH': '/bin'})
+    assert key != result_cache_key('A', 'c2', "echo hi", '/tmp', {'PATH': '/bin'})
+    assert key != result_cache_key('A', 'c1', "echo ho", '/tmp', {'PATH': '/bin'})
+    assert key != result_cache_key('A', 'c1', "echo hi", '/', {'PATH': '/bin'})
+    assert key != result_cache_key('A', 'c1', "echo hi", '/tmp', {'PATH': '/usr/bin'})
+
+
+def test_cached_runs_refer_to_the_run_they_reuse(make_manager):
+    manager = make_manager()
+    manager.add_application('A')
+    manager.add_command('A', 'a', "echo hi")
+    a = command_id(manager, 'A', 'a')
+    manager.set_cache_ttl('A', a, 60)
+
+    first = run(manager, 'A', a)
+    second = run(manager, 'A', a)
+    assert not first.get('cached')
+    assert second['cached'] and second['stdout'] == first['stdout']
+    cached_entry, original = manager.get_command_history('A', a, event_type='execution')
+    assert cached_entry['cached'] and 'output' not in cached_entry
+    assert cached_entry['cached_from'] == original['timestamp']
+    assert manager.cached_result_stats('A', a)['results'] == 1
+    assert manager.invalidate_cached_results('A', a) == 1
+    assert not run(manager, 'A', a).get('cached')
+
+
+def test_commands_with_the_same_text_do_not_share_results(make_manager):
+    manager = make_manager()
+    manager.add_application('A')
+    manager.add_application('B')
+    manager.add_command('A', 'a', "echo hi")
+    manager.add_command('B', 'b', "echo hi")
+    a = command_id(manager, 'A', 'a')
+    b = command_id(manager, 'B', 'b')
+    manager.set_cache_ttl('A', a, 60)
+    manager.set_cache_ttl('B', b, 60)
+
+    run(manager, 'A', a)
+    assert not run(manager, 'B', b).get('cached')
+    assert run(manager, 'B', b)['cached']
+    assert manager.cached_result_stats('B', b)['results'] == 1
+    assert manager.invalidate_cached_results('B', b) == 1
+    assert not run(manager, 'B', b).get('cached')
+    assert run(manager, 'A', a)['cached']
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from bater.cli import exit_status, main
+from bater.manager import CommandManager
+
+
+@pytest.fixture
+def bater(tmp_path, capsys):
+    """Return a function running the bater command on a store with a 'web' application, without a daemon."""
+    store = str(tmp_path / 'commands.json')
+    manager = CommandManager(store)
+    manager.add_application('web')
+    manager.add_command('web', 'hello', "echo hello")
+    manager.add_command('web', 'fail', "echo broken >&2; exit 3")
+    manager.add_command('web', 'greet', "echo hi {name}")
+    manager.flush()
+    manager.storage.close()
+    manager.search_index.close()
+
+    def run(*args):
+        status = main(['--no-daemon', '--store', store, *args])
+        out, err = capsys.readouterr()
+        return status, json.loads(out) if out.strip() else None, err
+
+    return run
+
+
+@pytest.mark.parametrize('returncode, status', [(0, 0), (3, 3), (300, 255), (-9, 137), (None, 1)])
+def test_exit_status(returncode, status):
+    assert exit_status(returncode) == status
+
+
+def test_list(bater):
+    status, commands, _ = bater('list', 'web')
+    assert status == 0
+    assert [command['name'] for command in commands] == ['hello', 'fail', 'greet']
+    assert bater('list', 'other')[1] == []
+
+
+def test_run_prints_the_result_and_records_it(bater):
+    status, result, _ = bater('run', 'web', 'hello')
+    assert status == 0
+    assert result['success'] and result['stdout'] == "hello"
+    status, history, _ = bater('history', 'web', 'hello', '--type', 'execution')
+    assert [entry['output'] for entry in history] == ["hello"]
+
+
+def test_run_exits_with_the_commands_status(bater):
+    status, result, _ = bater('run', 'web', 'fail')
+    assert status == 3
+    assert not result['success'] and result['stderr'] == "broken"
+
+
+def test_placeholders_are_filled_from_parameters(bater):
+    status, _, err = bater('run', 'web', 'greet')
+    assert status == 2 and "--param" in err
+    status, result, _ = bater('run', 'web', 'greet', '--param', 'name=bob')
+    assert status == 0 and result['stdout'] == "hi bob"
+
+
+def test_errors_are_reported_on_stderr(bater):
+    status, out, err = bater('run', 'missing', 'hello')
+    assert status == 2 and out is None
+    assert err == "bater: Application 'missing' not found.\n"
+    assert "not found" in bater('run', 'web', 'missing')[2]
+
+
+def test_run_app_runs_every_command(bater):
+    status, results, _ = bater('run-app', 'web', '--parallel', '2')
+    assert status == 1
+    successes = {result['name']: result['success'] for result in results}
+    assert successes['hello'] and not successes['fail']
+    assert len(results) == 3
+
+
+def test_check_flags_dangerous_commands(bater):
+    status, verdict, _ = bater('check', '--', 'rm -rf /')
+    assert status == 1 and verdict['dangerous']
+    assert bater('check', 'ls')[0] == 0
@@ -0,0 +1,146 @@
+import tempfile
+import threading
+import time
+
+import pytest
+
+from bater import daemon as daemon_module
+from bater.daemon import BaterDaemon, DaemonClient, RemoteCommandManager
+from bater.executor import ExecutionService, create_executor
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def served(make_manager):
+    """A daemon serving a new store on a short socket path, and a function connecting clients to it."""
+    socket_dir = tempfile.TemporaryDirectory(prefix='bater')
+    daemon = BaterDaemon(make_manager(), f"{socket_dir.name}/bater.sock")
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    wait_until(lambda: daemon.server is not None)
+    clients = []
+
+    def connect():
+        client = RemoteCommandManager(DaemonClient(daemon.socket_path))
+        clients.append(client)
+        return client
+
+    yield daemon, connect
+    for client in clients:
+        client.close()
+    daemon.shutdown()
+    thread.join()
+    socket_dir.cleanup()
+
+
+def run(manager, app_name, command_id, command, **options):
+    results = []
+    create_executor(command, lambda success, result: results.append(result), app_name, command_id, manager,
+                    **options).execute()
+    return results[0]
+
+
+def test_clients_share_the_store_and_its_changes(served):
+    daemon, connect = served
+    first, second = connect(), connect()
+    first.add_application('web')
+    first.add_command('web', 'build', "echo built")
+    command_id = next(iter(first.commands['web']))
+    wait_until(lambda: command_id in second.commands.get('web', {}))
+    assert second.commands['web'][command_id]['command'] == "echo built"
+    assert daemon.command_manager.commands == first.commands
+
+    with pytest.raises(ValueError, match="Unknown application"):
+        first.add_workflow('missing', 'release', {})
+
+
+def test_runs_stream_output_and_are_recorded(served):
+    daemon, connect = served
+    client = connect()
+    client.add_application('web')
+    client.add_command('web', 'build', "echo one; echo two")
+    command_id = next(iter(client.commands['web']))
+
+    output = []
+    result = run(client, 'web', command_id, "echo one; echo two", on_output=lambda stream, text: output.append(text))
+    assert result['success'] and not result['cancelled']
+    assert "".join(output).split() == ["one", "two"]
+    assert client.count_command_history('web', command_id, event_type='execution') == 1
+    wait_until(lambda: client.has_command_history('web', command_id))
+
+
+def test_finished_runs_are_forgotten(served):
+    daemon, connect = served
+    client = connect()
+    for _ in range(20):
+        assert run(client, 'web', 'c1', "true", record_history=False)['success']
+    wait_until(lambda: not daemon.runs)
+
+
+def test_cancelling_a_run(served):
+    daemon, connect = served
+    daemon.execution_service.shutdown()
+    daemon.execution_service = ExecutionService(max_workers=1, on_status=daemon.on_status)
+    client = connect()
+    results = {}
+
+    def start(name, command):
+        executor = create_executor(command, lambda success, result: results.update({name: result}), 'web', name,
+                                   client, record_history=False)
+        thread = threading.Thread(target=executor.execute)
+        thread.start()
+        return executor, thread
+
+    running, running_thread = start('running', "sleep 30")
+    wait_until(lambda: daemon.execution_service.status('web', 'running') == "running")
+    queued, queued_thread = start('queued', "echo never")
+    wait_until(lambda: daemon.execution_service.status('web', 'queued') == "queued")
+
+    queued.terminate()
+    queued_thread.join(5)
+    assert results['queued']['cancelled'] and not results['queued']['success']
+    running.terminate()
+    running_thread.join(5)
+    assert results['running']['cancelled'] and not results['running']['success']
+    wait_until(lambda: not daemon.runs)
+
+
+def test_client_stops_waiting_for_a_run_the_daemon_lost(served, monkeypatch):
+    daemon, connect = served
+    monkeypatch.setattr(daemon_module, 'RUN_CHECK_INTERVAL', 0.05)
+    client = connect()
+    results = []
+    executor = create_executor("sleep 30", lambda success, result: results.append(result), 'web', 'c1', client,
+                               record_history=False)
+    thread = threading.Thread(target=executor.execute)
+    thread.start()
+    wait_until(lambda: daemon.runs)
+    jobs = list(daemon.runs.values())
+    daemon.runs.clear()
+    thread.join(5)
+    assert not results[0]['success']
+    assert "lost the command" in results[0]['stderr']
+    for job in jobs:
+        daemon.execution_service.cancel(job)
+
+
+def test_client_gives_up_on_a_run_past_its_timeout(served, monkeypatch):
+    daemon, connect = served
+    monkeypatch.setattr(daemon_module, 'RUN_CHECK_INTERVAL', 0.05)
+    monkeypatch.setattr(daemon_module, 'RUN_RESULT_MARGIN', 0.2)
+    monkeypatch.setattr(daemon_module, 'create_executor', lambda *args, timeout=None, **kwargs: create_executor(
+        *args, **kwargs))
+    client = connect()
+
+    started = time.monotonic()
+    result = run(client, 'web', 'c1', "sleep 30", record_history=False, timeout=0.2)
+    assert time.monotonic() - started < 5
+    assert not result['success']
+    assert "did not report the result" in result['stderr']
+    wait_until(lambda: not daemon.runs)
@@ -0,0 +1,150 @@
+import threading
+import time
+
+import pytest
+
+from bater.executor import ExecutionService
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+class Tracker:
+    """Records which fake executions run at the same time."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = []
+        self.started = []
+        self.peak = 0
+        self.peak_per_app = {}
+
+
+class FakeExecutor:
+    """Executor blocking until it is released or terminated."""
+
+    asynchronous = False
+
+    def __init__(self, tracker, app_name, name):
+        self.tracker = tracker
+        self.app_name = app_name
+        self.name = name
+        self.release = threading.Event()
+        self.terminated = False
+
+    def execute(self):
+        tracker = self.tracker
+        with tracker.lock:
+            tracker.running.append(self)
+            tracker.started.append(self.name)
+            tracker.peak = max(tracker.peak, len(tracker.running))
+            per_app = sum(1 for executor in tracker.running if executor.app_name == self.app_name)
+            tracker.peak_per_app[self.app_name] = max(tracker.peak_per_app.get(self.app_name, 0), per_app)
+        self.release.wait(10)
+        with tracker.lock:
+            tracker.running.remove(self)
+
+    def terminate(self):
+        self.terminated = True
+        self.release.set()
+
+
+@pytest.fixture
+def tracker():
+    return Tracker()
+
+
+def submit(service, tracker, app_name, name, priority=0):
+    executor = FakeExecutor(tracker, app_name, name)
+    return service.submit(app_name, name, executor, priority), executor
+
+
+def test_at_most_max_workers_commands_run_at_once(tracker):
+    service = ExecutionService(max_workers=2, max_per_app=10)
+    try:
+        executors = [submit(service, tracker, 'web', f"c{index}")[1] for index in range(5)]
+        wait_until(lambda: len(tracker.running) == 2)
+        for executor in executors:
+            executor.release.set()
+        service.wait()
+        assert tracker.peak == 2
+        assert sorted(tracker.started) == [f"c{index}" for index in range(5)]
+    finally:
+        service.shutdown()
+
+
+def test_applications_are_limited_separately(tracker):
+    service = ExecutionService(max_workers=4, max_per_app=1)
+    try:
+        executors = [submit(service, tracker, 'web', f"web{index}")[1] for index in range(3)]
+        executors.append(submit(service, tracker, 'db', "db0")[1])
+        wait_until(lambda: len(tracker.running) == 2)
+        assert {executor.name for executor in tracker.running} == {"web0", "db0"}
+        assert service.status('web', 'web1') == "queued"
+        for executor in executors:
+            executor.release.set()
+        service.wait()
+        assert tracker.peak_per_app == {'web': 1, 'db': 1}
+    finally:
+        service.shutdown()
+
+
+def test_queued_jobs_run_by_priority_then_submission_order(tracker):
+    service = ExecutionService(max_workers=1, max_per_app=1)
+    try:
+        _, blocker = submit(service, tracker, 'web', "blocker")
+        wait_until(lambda: tracker.started == ["blocker"])
+        executors = [submit(service, tracker, 'web', name, priority)[1]
+                     for name, priority in [("late", 5), ("first", 0), ("second", 0)]]
+        for executor in [blocker] + executors:
+            executor.release.set()
+        service.wait()
+        assert tracker.started == ["blocker", "first", "second", "late"]
+    finally:
+        service.shutdown()
+
+
+def test_cancelling_queued_and_running_jobs(tracker):
+    statuses = []
+    service = ExecutionService(max_workers=1, max_per_app=1,
+                               on_status=lambda app_name, command_id: statuses.append(command_id))
+    try:
+        running, running_executor = submit(service, tracker, 'web', "running")
+        wait_until(lambda: running.state == 'running')
+        queued, queued_executor = submit(service, tracker, 'web', "queued")
+        assert service.status('web', 'queued') == "queued"
+
+        service.cancel(queued)
+        assert queued.state == 'cancelled'
+        assert service.status('web', 'queued') == ""
+        service.cancel(running)
+        assert running_executor.terminated
+        service.wait()
+        assert running.state == 'finished'
+        assert tracker.started == ["running"]
+        assert statuses.count("queued") == 2
+    finally:
+        service.shutdown()
+
+
+def test_cancel_command_and_shutdown(tracker):
+    service = ExecutionService(max_workers=1, max_per_app=1)
+    first, first_executor = submit(service, tracker, 'web', "build")
+    wait_until(lambda: first.state == 'running')
+    second, _ = submit(service, tracker, 'web', "build")
+    assert service.status('web', 'build') == "running, queued"
+    service.cancel_command('web', 'build')
+    assert first_executor.terminated and second.state == 'cancelled'
+    service.wait()
+
+    running, running_executor = submit(service, tracker, 'web', "test")
+    wait_until(lambda: running.state == 'running')
+    queued, _ = submit(service, tracker, 'web', "test")
+    service.shutdown()
+    assert running_executor.terminated
+    assert service.queue == []
+    assert tracker.started == ["build", "test"]
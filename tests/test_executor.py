@@ -0,0 +1,107 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from bater.executor import OutputBuffer, create_executor, merge_output_chunks
+
+
+@pytest.fixture
+def manager(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    return manager
+
+
+def run(manager, command, **options):
+    results = []
+    create_executor(command, lambda success, result: results.append(result), 'web', 'c1', manager,
+                    record_history=False, **options).execute()
+    return results[0]
+
+
+def python(code):
+    return f'"{sys.executable}" -c "{code}"'
+
+
+def test_output_buffer_keeps_head_and_tail():
+    buffer = OutputBuffer(head_size=4, tail_size=6)
+    for chunk in (b"0123", b"4567", b"89abcdef"):
+        buffer.write(chunk)
+    assert buffer.total_bytes == 16
+    assert buffer.getvalue() == "0123\n... [6 bytes truncated] ...\nabcdef"
+
+
+def test_output_buffer_keeps_short_output_whole():
+    buffer = OutputBuffer(head_size=4, tail_size=6)
+    buffer.write("héllo".encode())
+    assert buffer.getvalue() == "héllo"
+
+
+def test_consecutive_chunks_of_a_stream_are_merged():
+    chunks = [('stdout', "a"), ('stdout', "b"), ('stderr', "c"), ('stdout', "d")]
+    assert merge_output_chunks(chunks) == [('stdout', "ab"), ('stderr', "c"), ('stdout', "d")]
+
+
+def test_output_is_streamed_while_the_command_runs(manager):
+    chunks = []
+    started = time.monotonic()
+
+    def on_output(stream, text):
+        chunks.append((stream, text, time.monotonic() - started))
+
+    result = run(manager, "echo first; sleep 0.5; echo second >&2", on_output=on_output, output_interval=0.05)
+    assert result['success'] and result['returncode'] == 0
+    assert result['stdout'] == "first" and result['stderr'] == "second"
+    assert [(stream, text.strip()) for stream, text, _ in chunks] == [('stdout', "first"), ('stderr', "second")]
+    assert chunks[0][2] < 0.4
+
+
+def test_large_output_is_captured_within_bounds(manager):
+    result = run(manager, python("import sys; sys.stdout.write('x' * 100000 + 'end')"), head_size=10, tail_size=10)
+    assert result['stdout_bytes'] == 100003
+    assert result['stdout'].startswith("x" * 10)
+    assert result['stdout'].endswith("x" * 7 + "end")
+    assert "[99983 bytes truncated]" in result['stdout']
+
+
+def test_failures_report_their_exit_code(manager):
+    result = run(manager, "echo oops >&2; exit 3")
+    assert not result['success']
+    assert result['returncode'] == 3
+    assert result['stderr'] == "oops"
+    assert not result['timed_out']
+
+
+def test_commands_running_past_their_timeout_are_terminated(manager):
+    started = time.monotonic()
+    result = run(manager, "echo begun; sleep 30", timeout=0.3)
+    assert time.monotonic() - started < 10
+    assert not result['success'] and result['timed_out']
+    assert result['stdout'] == "begun"
+    assert result['stderr'].endswith("Timed out after 0.3 seconds.")
+
+
+def test_terminate_stops_a_running_command(manager):
+    results = []
+    executor = create_executor("sleep 30", lambda success, result: results.append(result), 'web', 'c1', manager,
+                               record_history=False)
+    thread = threading.Thread(target=executor.execute)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while executor.process is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    executor.terminate()
+    thread.join(10)
+    assert results[0]['cancelled'] and not results[0]['success']
+
+
+def test_runs_are_recorded_with_their_output(manager):
+    manager.add_command('web', 'build', "echo built")
+    build = next(iter(manager.commands['web']))
+    results = []
+    create_executor("echo built", lambda success, result: results.append(result), 'web', build, manager).execute()
+    entry = manager.get_command_history('web', build, event_type='execution')[0]
+    assert entry['output'] == "built"
+    assert entry['returncode'] == 0
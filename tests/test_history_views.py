@@ -0,0 +1,59 @@
+import pytest
+
+from bater.storage import filter_history, page_newest_first
+from bater.utils import summarize_history_entry
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def execution(timestamp, output, returncode=0):
+    return {'timestamp': timestamp, 'type': 'execution', 'command': "make", 'output': output, 'returncode': returncode}
+
+
+def test_pages_are_newest_first():
+    entries = list(range(10))
+    assert page_newest_first(entries, 0, 3) == [9, 8, 7]
+    assert page_newest_first(entries, 8, 3) == [1, 0]
+    assert page_newest_first(entries, 10, 3) == []
+    assert page_newest_first(entries) == entries[::-1]
+
+
+def test_filters_by_type_and_inclusive_time_range():
+    entries = [execution("2024-01-01 10:00:00", "a"), {'timestamp': "2024-01-02 10:00:00", 'type': 'edit'},
+               execution("2024-01-03 10:00:00", "b")]
+    assert filter_history(entries) is entries
+    assert [entry['output'] for entry in filter_history(entries, event_type='execution')] == ["a", "b"]
+    assert filter_history(entries, since="2024-01-02 10:00:00", until="2024-01-02 10:00:00") == [entries[1]]
+    assert filter_history(entries, event_type='execution', since="2024-01-02 00:00:00") == [entries[2]]
+
+
+def test_summaries_show_the_command_line():
+    assert summarize_history_entry({'v': 2, 'command': "make build\nmake test"}) == "make build"
+    legacy = {'command': "Executed on: 2024-01-01\nCommand executed:\nmake build\nOutput:\nok"}
+    assert summarize_history_entry(legacy) == "make build"
+
+
+@pytest.mark.parametrize('store_name', ['commands.json', 'commands.db'])
+def test_history_pages_and_filters(make_manager, store_name):
+    manager = make_manager(store_name)
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = command_id(manager, 'web', 'build')
+    manager.storage.import_history(build, [execution(f"2024-01-{day:02d} 10:00:00", f"run {day}", day % 2)
+                                           for day in range(1, 21)])
+
+    assert manager.count_command_history('web', build, event_type='execution') == 20
+    assert manager.count_command_history('web', build, event_type='execution', since="2024-01-11 00:00:00") == 10
+    page = manager.get_command_history('web', build, offset=5, limit=3, event_type='execution')
+    assert [entry['output'] for entry in page] == ["run 15", "run 14", "run 13"]
+    page = manager.get_command_history('web', build, event_type='execution', since="2024-01-03 00:00:00",
+                                       until="2024-01-05 23:59:59")
+    assert [entry['output'] for entry in page] == ["run 5", "run 4", "run 3"]
+
+    summaries = manager.get_command_history('web', build, limit=2, event_type='execution', include_output=False)
+    assert [entry['timestamp'] for entry in summaries] == ["2024-01-20 10:00:00", "2024-01-19 10:00:00"]
+    assert manager.get_command_history('web', build, offset=100) == []
+    assert manager.count_command_history('other', build) == 0
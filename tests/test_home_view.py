@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('wx')
+
+from bater.gui import build_home_view_model, diff_home_view_models
+
+
+def test_model_holds_the_rows_shown_on_the_home_view(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = next(iter(manager.commands['web']))
+    manager.update_show_output('web', build, False)
+
+    model = build_home_view_model(manager)
+    assert list(model) == ['web']
+    row = model['web'][build]
+    assert row['name'] == 'build' and row['command'] == "make"
+    assert not row['show_output']
+    assert row['schedule'] == ""
+
+
+def test_diff_lists_only_what_changed():
+    old = {'web': {'c1': {'name': 'build'}, 'c2': {'name': 'test'}}, 'db': {'c3': {'name': 'backup'}}}
+    new = {'web': {'c1': {'name': 'build all'}, 'c4': {'name': 'lint'}}, 'ops': {}}
+    assert diff_home_view_models(old, new) == {
+        'removed_apps': ['db'],
+        'added_apps': ['ops'],
+        'removed_rows': [('web', 'c2')],
+        'added_rows': [('web', 'c4')],
+        'changed_rows': [('web', 'c1')]
+    }
+    assert diff_home_view_models(new, new) == {
+        'removed_apps': [], 'added_apps': [], 'removed_rows': [], 'added_rows': [], 'changed_rows': []}
@@ -0,0 +1,79 @@
+import json
+
+from bater.manager import CommandManager
+from bater.retention import MAX_HISTORY_ENTRIES
+from bater.storage import HistoryJournal
+
+
+def entry(output):
+    return {'timestamp': "2024-01-01 10:00:00", 'type': 'execution', 'command': "make", 'output': output}
+
+
+def test_appended_batches_are_read_back_in_order(tmp_path):
+    journal = HistoryJournal(str(tmp_path / 'journal'))
+    assert journal.read('c1') == ([], 0)
+    assert not journal.exists('c1')
+
+    journal.append('c1', [entry("a"), entry("b")])
+    journal.append('c1', [entry("c")])
+    entries, size = journal.read('c1')
+    assert [item['output'] for item in entries] == ["a", "b", "c"]
+    assert size == sum(len(json.dumps(item)) for item in entries)
+    assert journal.exists('c1')
+    assert journal.nonempty_segments() == {'c1'}
+
+
+def test_torn_final_line_is_ignored(tmp_path):
+    journal = HistoryJournal(str(tmp_path / 'journal'))
+    journal.append('c1', [entry("a"), entry("b")])
+    with open(journal.segment_path('c1'), 'a', encoding='utf-8') as file:
+        file.write(json.dumps(entry("torn"))[:20])
+    assert [item['output'] for item in journal.read('c1')[0]] == ["a", "b"]
+
+
+def test_replay_appends_segments_to_known_histories(tmp_path):
+    journal = HistoryJournal(str(tmp_path / 'journal'))
+    journal.append('c1', [entry(str(index)) for index in range(MAX_HISTORY_ENTRIES)])
+    journal.append('unknown', [entry("x")])
+    histories = {'c1': [entry("snapshot")], 'c2': []}
+
+    assert journal.replay(histories) == MAX_HISTORY_ENTRIES
+    assert len(histories['c1']) == MAX_HISTORY_ENTRIES
+    assert histories['c1'][0]['output'] == "0"
+    assert histories['c2'] == []
+    assert 'unknown' not in histories
+
+
+def test_rewrite_remove_and_clear(tmp_path):
+    journal = HistoryJournal(str(tmp_path / 'journal'))
+    journal.append('c1', [entry("a"), entry("b")])
+    journal.append('c2', [entry("c")])
+    journal.rewrite('c1', [entry("b")])
+    assert [item['output'] for item in journal.read('c1')[0]] == ["b"]
+    journal.remove('c1')
+    journal.remove('missing')
+    assert journal.nonempty_segments() == {'c2'}
+    journal.clear()
+    assert journal.nonempty_segments() == set()
+
+
+def test_recording_a_run_appends_without_rewriting_the_store(make_manager, tmp_path):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = next(iter(manager.commands['web']))
+    manager.flush()
+    store = (tmp_path / 'commands.json').read_bytes()
+
+    for index in range(3):
+        manager.add_command_history('web', build, "make", output=f"run {index}", returncode=0)
+    manager.flush()
+    assert (tmp_path / 'commands.json').read_bytes() == store
+
+    reopened = CommandManager(str(tmp_path / 'commands.json'))
+    try:
+        outputs = [item['output'] for item in reopened.get_command_history('web', build, event_type='execution')]
+        assert outputs == ["run 2", "run 1", "run 0"]
+    finally:
+        reopened.storage.close()
+        reopened.search_index.close()
@@ -0,0 +1,160 @@
+import gc
+import json
+import os
+import threading
+import warnings
+
+from bater.manager import CommandManager
+from bater.storage import HistoryCache, JsonStorage
+
+
+def execution(timestamp, output):
+    return {'timestamp': timestamp, 'type': 'execution', 'command': "make", 'output': output, 'returncode': 0, 'v': 2}
+
+
+def write_legacy_store(tmp_path):
+    """Write a store of an earlier version, with histories inside the JSON file and one entry in the old journal."""
+    store = tmp_path / 'commands.json'
+    store.write_text(json.dumps({'web': {
+        'c1': {'name': 'build', 'command': "make", 'show_output': True,
+               'history': [execution("2024-01-01 10:00:00", "first"), execution("2024-01-02 10:00:00", "second")]},
+        'c2': {'name': 'idle', 'command': "true", 'show_output': True}
+    }}))
+    journal = tmp_path / 'commands_journal'
+    journal.mkdir()
+    (journal / 'c1.jsonl').write_text(json.dumps(execution("2024-01-03 10:00:00", "journaled")) + "\n")
+    return store
+
+
+def test_legacy_store_is_read_without_being_changed(tmp_path):
+    store = write_legacy_store(tmp_path)
+    original = store.read_bytes()
+
+    manager = CommandManager(str(store))
+    try:
+        assert manager.commands['web']['c1'] == {'name': 'build', 'command': "make", 'show_output': True}
+        outputs = [entry['output'] for entry in manager.get_command_history('web', 'c1')]
+        assert outputs == ["journaled", "second", "first"]
+        assert manager.has_command_history('web', 'c1')
+        assert not manager.has_command_history('web', 'c2')
+        assert manager.history_ids() == {'c1'}
+        manager.flush()
+    finally:
+        manager.storage.close()
+        manager.search_index.close()
+
+    assert store.read_bytes() == original
+    assert not (tmp_path / 'commands_history').exists()
+    assert not (tmp_path / 'commands_blobs').exists()
+    assert (tmp_path / 'commands_journal' / 'c1.jsonl').exists()
+
+
+def test_first_change_moves_legacy_histories_after_a_backup(tmp_path):
+    store = write_legacy_store(tmp_path)
+    original = store.read_bytes()
+
+    manager = CommandManager(str(store))
+    try:
+        manager.add_command_history('web', 'c1', "make", output="new", returncode=0)
+        manager.flush()
+        outputs = [entry['output'] for entry in manager.get_command_history('web', 'c1')]
+    finally:
+        manager.storage.close()
+        manager.search_index.close()
+
+    assert outputs == ["new", "journaled", "second", "first"]
+    backups = [name for name in os.listdir(tmp_path) if name.startswith('commands.json_premigration_')]
+    assert len(backups) == 1
+    assert (tmp_path / backups[0]).read_bytes() == original
+    assert 'history' not in json.loads(store.read_text())['web']['c1']
+    assert not (tmp_path / 'commands_journal').exists()
+    assert [name for name in os.listdir(tmp_path) if name.startswith('commands_journal_premigration_')]
+
+    storage = JsonStorage(str(store))
+    try:
+        storage.load()
+        assert [entry['output'] for entry in storage.get_history('c1')] == outputs
+    finally:
+        storage.close()
+
+
+def test_histories_are_read_lazily_and_stay_readable_after_eviction(tmp_path):
+    storage = JsonStorage(str(tmp_path / 'commands.json'))
+    try:
+        storage.load()
+        storage.save({'web': {f'c{index}': {'name': f'c{index}', 'command': "true"} for index in range(5)}})
+        for index in range(5):
+            storage.append_history(f'c{index}', execution("2024-01-01 10:00:00", "x" * 100))
+        storage.flush()
+        storage.cache.max_bytes = 300
+        storage.cache.clear()
+        for index in range(5):
+            assert storage.get_history(f'c{index}')[0]['output'] == "x" * 100
+            assert storage.cache.total_bytes <= 300
+        assert storage.cache.stats()['commands'] < 5
+        assert storage.history_ids([f'c{index}' for index in range(6)]) == {f'c{index}' for index in range(5)}
+    finally:
+        storage.close()
+
+
+def test_history_cache_evicts_least_recently_used_histories():
+    cache = HistoryCache(max_bytes=250)
+    for command_id in ('a', 'b', 'c'):
+        cache.put(command_id, [command_id], 100)
+    assert cache.get('a') == ['a']
+    cache.evict(pinned={'b'})
+    assert set(cache.histories) == {'a', 'b'}
+    assert cache.total_bytes == 200
+    assert cache.get('c') is None
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    cache.resize('a', 100)
+    cache.evict()
+    assert set(cache.histories) == {'a'}
+
+
+def test_loading_closes_the_json_file(tmp_path):
+    store = write_legacy_store(tmp_path)
+    storage = JsonStorage(str(store))
+    gc.collect()
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            assert storage.load_commands()['web']['c2']['name'] == 'idle'
+            gc.collect()
+        assert not [warning for warning in caught if str(store) in str(warning.message)]
+    finally:
+        storage.close()
+
+
+def test_import_waits_for_the_write_in_progress(tmp_path):
+    storage = JsonStorage(str(tmp_path / 'commands.json'))
+    storage.persistence.delay = 60
+    append = storage.history_files.append
+    appending = threading.Event()
+    resume = threading.Event()
+
+    def slow_append(command_id, entries):
+        appending.set()
+        resume.wait(5)
+        append(command_id, entries)
+
+    storage.history_files.append = slow_append
+    try:
+        storage.load()
+        storage.append_history('c1', execution("2024-01-02 10:00:00", "appended"))
+        writer = threading.Thread(target=storage.flush)
+        writer.start()
+        assert appending.wait(5)
+        importer = threading.Thread(target=storage.import_history,
+                                    args=('c1', [execution("2024-01-01 10:00:00", "imported")]))
+        importer.start()
+        importer.join(0.5)
+        resume.set()
+        writer.join(5)
+        importer.join(5)
+        storage.flush()
+        storage.cache.clear()
+        assert [entry['output'] for entry in storage.get_history('c1')] == ["appended", "imported"]
+    finally:
+        resume.set()
+        storage.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from bater.matrix import MatrixRun, parse_parameter_sets, template_placeholders
+from bater.utils import fill_placeholders
+
+
+def test_placeholders_are_filled_with_quoted_values():
+    assert fill_placeholders("deploy {env} --tag {tag}", {'env': "prod", 'tag': "v1; rm -rf /"}) == \
+        "deploy prod --tag 'v1; rm -rf /'"
+    with pytest.raises(ValueError, match="'tag'"):
+        fill_placeholders("deploy {env} --tag {tag}", {'env': "prod"})
+    assert template_placeholders("cp {src} {dst} && ls {dst}") == ['src', 'dst']
+
+
+def test_parameter_sets_from_csv_or_plain_lines():
+    assert parse_parameter_sets("env,tag\nprod, v1\n\nstaging,v2\n", ['env', 'tag']) == [
+        {'env': "prod", 'tag': "v1"}, {'env': "staging", 'tag': "v2"}]
+    assert parse_parameter_sets("prod\nstaging\n", ['env']) == [{'env': "prod"}, {'env': "staging"}]
+    assert parse_parameter_sets("", ['env']) == []
+    with pytest.raises(ValueError, match="tag"):
+        parse_parameter_sets("env\nprod\n", ['env', 'tag'])
+
+
+def test_matrix_runs_every_row_concurrently(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'greet', "sleep 0.3; echo hi {name}; test {name} != bob")
+    greet = next(iter(manager.commands['web']))
+    finished = []
+
+    matrix_run = MatrixRun(manager, 'web', greet, [{'name': "alice"}, {'name': "bob"}, {'name': "carol"}, {}],
+                           max_workers=3, on_row_finished=lambda row: finished.append(row['index']))
+    assert matrix_run.rows[3]['state'] == 'failed'
+    matrix_run.start()
+    assert matrix_run.wait(10)
+
+    assert [row['stdout'] for row in matrix_run.rows[:3]] == ["hi alice", "hi bob", "hi carol"]
+    assert [row['success'] for row in matrix_run.rows] == [True, False, True, False]
+    assert sorted(finished) == [0, 1, 2]
+    summary = matrix_run.summary()
+    assert (summary['rows'], summary['succeeded'], summary['failed'], summary['cancelled']) == (4, 2, 2, 0)
+    assert summary['elapsed'] < summary['total_duration']
+    assert manager.count_command_history('web', greet, event_type='execution') == 3
+
+
+def test_cancelling_a_matrix_run(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'wait', "sleep {seconds}")
+    command_id = next(iter(manager.commands['web']))
+
+    matrix_run = MatrixRun(manager, 'web', command_id, [{'seconds': "30"}] * 3, max_workers=1)
+    matrix_run.start()
+    matrix_run.cancel()
+    assert matrix_run.wait(10)
+    assert matrix_run.summary()['succeeded'] == 0
+    assert all(row['state'] == 'cancelled' for row in matrix_run.rows)
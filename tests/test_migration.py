@@ -0,0 +1,101 @@
+from bater.storage import JsonStorage, SqliteStorage, migrate_json_to_sqlite, open_storage
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def normalized(entries):
+    """Return history entries with an output, which SQLite returns empty for entries stored without one."""
+    return [dict({'output': ""}, **entry) for entry in entries]
+
+
+def without_output(entries):
+    """Return history entries without their outputs, which backends may leave out when asked to."""
+    return [{key: value for key, value in entry.items() if not key.startswith(('output', 'stderr'))}
+            for entry in entries]
+
+
+def build_json_store(make_manager):
+    """Fill a JSON store with commands and their settings, a workflow and histories with outputs of every size."""
+    manager = make_manager('commands.json')
+    manager.add_application('web')
+    manager.add_application('empty')
+    manager.add_command('web', 'build', "make build")
+    manager.add_command('web', 'deploy', "./deploy {env}")
+    build = command_id(manager, 'web', 'build')
+    deploy = command_id(manager, 'web', 'deploy')
+    manager.update_show_output('web', deploy, False)
+    manager.set_cache_ttl('web', build, 60)
+    manager.set_session('web', build, True)
+    manager.set_schedule('web', build, {'interval': 300, 'jitter': 5})
+    workflow_id = manager.add_workflow('web', 'release', {build: {'depends_on': []}, deploy: {'depends_on': [build]}})
+
+    large_output = "line of output\n" * 100
+    manager.add_command_history('web', build, "make build", output="done", returncode=0,
+                                metrics={'duration': 1.5})
+    manager.add_command_history('web', build, "make build", output=large_output, stderr="warning: x" * 50, returncode=0)
+    manager.add_command_history('web', build, "make build", output=large_output, returncode=0)
+    manager.add_command_history('web', build, "make build", cached=True, returncode=0, cached_from="2024-01-01 10:00:00")
+    manager.add_command_history('web', deploy, "./deploy prod", output="", stderr="failed", returncode=2)
+    manager.add_workflow_history('web', workflow_id, {'state': 'succeeded', 'steps': {build: 'succeeded'}})
+    manager.flush()
+    return manager, [build, deploy, workflow_id]
+
+
+def test_migration_copies_metadata_workflows_and_histories(make_manager, tmp_path):
+    manager, history_ids = build_json_store(make_manager)
+    db_file = str(tmp_path / 'migrated.db')
+
+    target = migrate_json_to_sqlite(manager.json_file, db_file)
+    try:
+        source = JsonStorage(manager.json_file)
+        try:
+            assert target.load() == source.load() == manager.commands
+            assert target.load_workflows() == source.load_workflows() == manager.workflows
+            for history_id in history_ids:
+                assert target.count_history(history_id) == source.count_history(history_id) > 0
+                assert normalized(target.get_history(history_id)) == normalized(source.get_history(history_id))
+                assert (without_output(target.get_history(history_id, include_output=False))
+                        == without_output(source.get_history(history_id, include_output=False)))
+        finally:
+            source.close()
+    finally:
+        target.close()
+
+
+def test_migrated_store_reopens_and_keeps_recording(make_manager, tmp_path):
+    manager, (build, deploy, workflow_id) = build_json_store(make_manager)
+    db_file = str(tmp_path / 'migrated.db')
+    migrate_json_to_sqlite(manager.json_file, db_file).close()
+
+    storage = SqliteStorage(db_file)
+    try:
+        count = storage.count_history(build)
+        storage.append_history(build, {'timestamp': "2030-01-01 00:00:00", 'type': 'execution', 'command': "make",
+                                       'output': "new", 'returncode': 0})
+        assert storage.count_history(build) == count + 1
+        assert storage.get_history(build, limit=1)[0]['output'] == "new"
+        assert storage.history_ids([build, deploy, workflow_id, 'missing']) == {build, deploy, workflow_id}
+    finally:
+        storage.close()
+
+
+def test_open_storage_migrates_the_json_store_next_to_a_new_database(make_manager, tmp_path):
+    manager, (build, deploy, workflow_id) = build_json_store(make_manager)
+    expected = normalized(manager.storage.get_history(build))
+
+    storage = open_storage(str(tmp_path / 'commands.db'))
+    try:
+        assert isinstance(storage, SqliteStorage)
+        assert storage.load() == manager.commands
+        assert normalized(storage.get_history(build)) == expected
+    finally:
+        storage.close()
+
+    storage = open_storage(str(tmp_path / 'commands.db'))
+    try:
+        assert storage.count_history(build) == len(expected)
+    finally:
+        storage.close()
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+import pytest
+
+from bater.storage import PersistenceWorker
+from bater.utils import atomic_write
+
+
+class Recorder:
+    """Write function counting its calls, failing the first ones if asked to."""
+
+    def __init__(self, failures=0):
+        self.calls = 0
+        self.failures = failures
+        self.written = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise RuntimeError("disk on fire")
+        self.written.set()
+
+
+def test_bursts_of_changes_are_coalesced_into_one_write():
+    write = Recorder()
+    worker = PersistenceWorker(write, delay=0.3)
+    worker.start()
+    try:
+        for _ in range(5):
+            worker.mark_dirty()
+            time.sleep(0.02)
+        assert write.written.wait(5)
+        time.sleep(0.4)
+        assert write.calls == 1
+    finally:
+        worker.stop()
+    assert write.calls == 1
+
+
+def test_flush_writes_right_away_and_only_when_dirty():
+    write = Recorder()
+    worker = PersistenceWorker(write, delay=60)
+    worker.start()
+    try:
+        worker.flush()
+        assert write.calls == 0
+        worker.mark_dirty()
+        worker.flush()
+        assert write.calls == 1
+        worker.flush()
+        assert write.calls == 1
+    finally:
+        worker.stop()
+    assert write.calls == 1
+
+
+def test_failed_write_stays_pending():
+    write = Recorder(failures=1)
+    worker = PersistenceWorker(write, delay=60)
+    worker.mark_dirty()
+    with pytest.raises(RuntimeError):
+        worker.flush()
+    assert worker.dirty
+    worker.stop()
+    assert write.calls == 2
+    assert not worker.dirty
+
+
+def test_atomic_write_replaces_the_file(tmp_path):
+    path = tmp_path / 'store.json'
+    atomic_write(str(path), "first")
+    atomic_write(str(path), "second")
+    assert path.read_text() == "second"
+    assert os.listdir(tmp_path) == ['store.json']
+
+
+def test_failed_atomic_write_keeps_the_original(tmp_path):
+    path = tmp_path / 'store.json'
+    path.write_text("original")
+    with pytest.raises(TypeError):
+        atomic_write(str(path), None)
+    assert path.read_text() == "original"
+    assert os.listdir(tmp_path) == ['store.json']
+
+
+def test_changes_are_written_by_the_worker_and_on_flush(make_manager, tmp_path):
+    manager = make_manager()
+    manager.storage.persistence.delay = 60
+    manager.add_application('web')
+    assert 'web' not in (tmp_path / 'commands.json').read_text()
+    manager.flush()
+    assert 'web' in (tmp_path / 'commands.json').read_text()
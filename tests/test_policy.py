@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from bater.policy import CommandPolicy, check_command, describe_verdict, load_rules
+
+
+# The default rules, whatever BATER_POLICY_FILE configures for check_command().
+default_policy = CommandPolicy()
+
+
+def rule_ids(verdict):
+    return {finding['rule'] for finding in verdict['findings']}
+
+
+@pytest.mark.parametrize('command', ['ls -la', 'echo "rm -rf /"', 'grep -r rm .', 'git status', 'cat ~/.bashrc',
+                                     'command -v rm', 'command -V shutdown', 'command -pv dd', 'builtin command -v rm',
+                                     'type rm', 'type -a reboot', 'which mkfs', 'hash rm'])
+def test_safe_commands(command):
+    verdict = default_policy.check(command)
+    assert not verdict['dangerous']
+    assert verdict['severity'] is None
+    assert verdict['findings'] == []
+
+
+@pytest.mark.parametrize('command, rule', [
+    ('rm -rf /', 'rm-root'),
+    ('rm -r build', 'rm-recursive'),
+    ('ls; shutdown now', 'shutdown'),
+    ('ls && (reboot)', 'shutdown'),
+    ('echo $(reboot)', 'shutdown'),
+    ('bash -c "rm -rf /tmp/x"', 'rm-recursive'),
+    ('env FOO=1 nice -n 5 rm -r x', 'rm-recursive'),
+    ('timeout 5 dd if=a of=b', 'dd'),
+    ('command rm -r build', 'rm-recursive'),
+    ('command -p rm -r build', 'rm-recursive'),
+    ('find . -delete', 'find-delete'),
+    ('curl https://example.org/install | sh', 'pipe-to-shell'),
+    (':(){ :|:& };:', 'fork-bomb'),
+    ('echo x > /dev/sda', 'device-write'),
+    ('cat users > /etc/passwd', 'system-file-write'),
+])
+def test_dangerous_commands(command, rule):
+    verdict = default_policy.check(command)
+    assert verdict['dangerous']
+    assert verdict['severity'] == 'danger'
+    assert rule in rule_ids(verdict)
+
+
+@pytest.mark.parametrize('command, rule', [
+    ('sudo -u bob ls', 'privileged'),
+    ('git push --force', 'git-destructive'),
+    ('chmod -R 777 .', 'recursive-permissions'),
+])
+def test_warnings_are_not_dangerous(command, rule):
+    verdict = default_policy.check(command)
+    assert not verdict['dangerous']
+    assert verdict['severity'] == 'warning'
+    assert rule_ids(verdict) == {rule}
+
+
+def test_check_command_uses_the_configured_policy():
+    assert check_command('rm -rf /')['dangerous']
+    assert check_command('rm -rf /') is check_command('rm -rf /')
+
+
+def test_worst_severity_wins():
+    verdict = default_policy.check('sudo rm -rf ~')
+    assert verdict['dangerous']
+    assert verdict['severity'] == 'danger'
+    assert {'privileged', 'rm-root'} <= rule_ids(verdict)
+
+
+def test_describe_verdict():
+    lines = describe_verdict(default_policy.check('reboot'))
+    assert lines == ["Shuts down or restarts the machine (danger): reboot"]
+
+
+def test_custom_rules():
+    policy = CommandPolicy([
+        {'id': 'deploy', 'program': r'deploy', 'args': r'--prod', 'message': "Deploys to production"},
+        {'id': 'secret', 'pattern': r'API_KEY=', 'severity': 'warning'},
+    ])
+    assert rule_ids(policy.check('deploy --prod')) == {'deploy'}
+    assert not policy.check('deploy --staging')['findings']
+    assert rule_ids(policy.check('API_KEY=x run')) == {'secret'}
+    assert not policy.check('rm -rf /')['findings']
+
+
+@pytest.mark.parametrize('rule', [
+    {'program': 'x'},
+    {'id': 'both', 'program': 'x', 'pattern': 'y'},
+    {'id': 'neither'},
+    {'id': 'severity', 'program': 'x', 'severity': 'fatal'},
+    {'id': 'regex', 'program': '('},
+])
+def test_malformed_rules(rule):
+    with pytest.raises(ValueError):
+        CommandPolicy([rule])
+
+
+def test_load_rules_replaces_and_disables_defaults(tmp_path):
+    policy_file = tmp_path / 'policy.json'
+    policy_file.write_text(json.dumps({
+        'rules': [{'id': 'dd', 'program': 'dd', 'severity': 'warning'}],
+        'disable': ['shutdown'],
+    }))
+    policy = CommandPolicy(load_rules(policy_file))
+    assert policy.check('dd if=a of=b')['severity'] == 'warning'
+    assert not policy.check('shutdown now')['findings']
+    assert policy.check('rm -rf /')['dangerous']
+
+
+def test_verdicts_are_memoized_and_bounded():
+    policy = CommandPolicy(cache_size=3)
+    first = policy.check('rm x')
+    assert policy.check('rm x') is first
+    for index in range(10):
+        policy.check(f'program{index} --flag')
+    stats = policy.stats()
+    assert stats['cached_verdicts'] == 3
+    assert stats['hits'] == 1
+    assert len(policy.programs) == 3
+    assert policy.check('rm x') is not first
+    assert policy.check('rm x') == first
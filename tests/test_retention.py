@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime
+
+import pytest
+
+from bater.retention import HistoryRing, RetentionPolicy
+
+NOW = datetime(2024, 6, 30, 12, 0)
+
+
+def execution(timestamp, returncode=0):
+    return {'type': 'execution', 'timestamp': timestamp, 'returncode': returncode}
+
+
+def policy(**limits):
+    settings = {'max_entries': 1000, 'max_bytes': 0, 'max_age_days': 0, 'downsample_days': 0, 'store_max_bytes': 0}
+    settings.update(limits)
+    return RetentionPolicy(**settings)
+
+
+def test_no_limits_keep_everything():
+    entries = [execution(f"2020-01-01 00:00:{second:02d}") for second in range(10)]
+    assert policy().select(entries, [100] * 10, NOW) == [True] * 10
+
+
+def test_max_entries_keeps_the_newest():
+    entries = [execution(f"2024-06-30 10:00:{second:02d}") for second in range(5)]
+    assert policy(max_entries=2).select(entries, [1] * 5, NOW) == [False, False, False, True, True]
+
+
+def test_max_bytes_keeps_the_newest_and_at_least_one():
+    entries = [execution(f"2024-06-30 10:00:{second:02d}") for second in range(4)]
+    assert policy(max_bytes=250).select(entries, [100] * 4, NOW) == [False, False, True, True]
+    assert policy(max_bytes=50).select(entries, [100] * 4, NOW) == [False, False, False, True]
+
+
+def test_max_age_drops_old_entries():
+    entries = [execution("2024-06-01 10:00:00"), execution("2024-06-25 10:00:00"), execution("2024-06-30 10:00:00")]
+    assert policy(max_age_days=7).select(entries, [1] * 3, NOW) == [False, True, True]
+
+
+def test_downsampling_keeps_first_last_and_failed_executions_of_old_days():
+    entries = [
+        execution("2024-05-01 08:00:00"),
+        execution("2024-05-01 09:00:00"),
+        execution("2024-05-01 10:00:00", returncode=1),
+        execution("2024-05-01 11:00:00", returncode=None),
+        execution("2024-05-01 12:00:00"),
+        execution("2024-05-01 13:00:00"),
+        {'type': 'workflow', 'timestamp': "2024-05-01 14:00:00", 'returncode': 0},
+        execution("2024-06-29 08:00:00"),
+        execution("2024-06-29 09:00:00"),
+        execution("2024-06-29 10:00:00"),
+    ]
+    keep = policy(downsample_days=30).select(entries, [1] * len(entries), NOW)
+    assert keep == [True, False, True, True, False, True, True, True, True, True]
+
+
+def test_shared_blobs_count_once():
+    entries = [execution(f"2024-06-30 10:00:{second:02d}") for second in range(5)]
+    blobs = [{'output': 1000}] * 5
+    assert policy(max_bytes=1500).select(entries, [100] * 5, NOW, blobs) == [True] * 5
+    assert policy(max_bytes=1400).select(entries, [100] * 5, NOW, blobs) == [False, True, True, True, True]
+    distinct = [{f'output{index}': 1000} for index in range(5)]
+    assert policy(max_bytes=2500).select(entries, [100] * 5, NOW, distinct) == [False, False, False, True, True]
+
+
+def test_trim_drops_oldest_entries_beyond_size_and_age():
+    ring = HistoryRing(10)
+    for timestamp in ["2024-06-01 10:00:00", "2024-06-29 10:00:00", "2024-06-30 10:00:00", "2024-06-30 11:00:00"]:
+        ring.append(execution(timestamp), 100)
+    dropped = policy(max_bytes=250, max_age_days=7).trim(ring, NOW)
+    assert [entry['timestamp'] for entry, size in dropped] == ["2024-06-01 10:00:00", "2024-06-29 10:00:00"]
+    assert [size for entry, size in dropped] == [100, 100]
+    assert len(ring) == 2
+    assert ring.total_bytes == 200
+
+
+def test_ring_overwrites_oldest_entry_when_full():
+    ring = HistoryRing(3)
+    evicted = [ring.append(execution(f"2024-06-30 10:00:0{second}"), 10) for second in range(5)]
+    assert evicted[:3] == [None, None, None]
+    assert [entry['timestamp'] for entry, size in evicted[3:]] == ["2024-06-30 10:00:00", "2024-06-30 10:00:01"]
+    assert [entry['timestamp'] for entry in ring] == [f"2024-06-30 10:00:0{second}" for second in (2, 3, 4)]
+    assert ring[-1]['timestamp'] == "2024-06-30 10:00:04"
+    assert len(ring[0:2]) == 2
+    assert ring.total_bytes == 30
+
+
+def test_ring_frees_a_shared_blob_with_its_last_entry():
+    ring = HistoryRing(10)
+    for second in range(3):
+        ring.append(execution(f"2024-06-30 10:00:0{second}"), 10, {'output': 500})
+    assert ring.total_bytes == 530
+    assert ring.sizes() == [("2024-06-30 10:00:00", 10), ("2024-06-30 10:00:01", 10), ("2024-06-30 10:00:02", 510)]
+    assert ring.popleft()[1] == 10
+    assert ring.popleft()[1] == 10
+    assert ring.popleft()[1] == 510
+    assert ring.total_bytes == 0
+
+
+def executions_of_one_day(day, count):
+    return [{'timestamp': f"{day} {hour:02d}:00:00", 'type': 'execution', 'command': "make", 'output': f"run {hour}",
+             'returncode': 0} for hour in range(count)]
+
+
+@pytest.mark.parametrize('store_name', ['commands.json', 'commands.db'])
+def test_store_wide_pass_is_opt_in(make_manager, store_name):
+    manager = make_manager(store_name)
+    manager.storage.retention = policy()
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = next(iter(manager.commands['web']))
+    manager.storage.import_history(build, executions_of_one_day("2020-01-01", 10))
+
+    assert not manager.retention_pass_enabled()
+    assert manager.apply_retention()['deleted_entries'] == 0
+    assert manager.count_command_history('web', build) == 11
+
+
+@pytest.mark.parametrize('store_name', ['commands.json', 'commands.db'])
+def test_store_wide_pass_downsamples_and_reports_what_it_deleted(make_manager, store_name, caplog):
+    manager = make_manager(store_name)
+    manager.storage.retention = policy(downsample_days=30)
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = next(iter(manager.commands['web']))
+    manager.storage.import_history(build, executions_of_one_day("2020-01-01", 10))
+    assert len(manager.search_history("run")) == 10
+
+    assert manager.retention_pass_enabled()
+    with caplog.at_level(logging.WARNING):
+        report = manager.apply_retention()
+    assert report['deleted_entries'] == 8
+    assert report['trimmed_histories'] == 1
+    assert "deleted 8 entries" in caplog.text
+    outputs = [entry['output'] for entry in manager.get_command_history('web', build, event_type='execution')]
+    assert outputs == ["run 9", "run 0"]
+    assert sorted(match['timestamp'] for match in manager.search_history("run")) == [
+        "2020-01-01 00:00:00", "2020-01-01 09:00:00"]
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+
+from bater.scheduler import CronExpression, parse_interval
+
+
+@pytest.mark.parametrize('text, seconds', [
+    ('30', 30),
+    ('2.5', 2.5),
+    ('90s', 90),
+    ('5m', 300),
+    ('1h30m', 5400),
+    ('1d', 86400),
+    ('2w', 1209600),
+    (' 5M ', 300),
+    (45, 45),
+])
+def test_parse_interval(text, seconds):
+    assert parse_interval(text) == seconds
+
+
+@pytest.mark.parametrize('text', ['', '0', '0m', '5x', 'm5', '1h 30m', '-5', 'five'])
+def test_parse_interval_rejects_invalid_intervals(text):
+    with pytest.raises(ValueError):
+        parse_interval(text)
+
+
+@pytest.mark.parametrize('expression, after, expected', [
+    ('*/15 * * * *', datetime(2024, 3, 1, 10, 7, 30), datetime(2024, 3, 1, 10, 15)),
+    ('*/15 * * * *', datetime(2024, 3, 1, 10, 45), datetime(2024, 3, 1, 11, 0)),
+    ('30 2 * * *', datetime(2024, 3, 1, 2, 30), datetime(2024, 3, 2, 2, 30)),
+    ('0 9 * * mon-fri', datetime(2024, 3, 1, 9, 0), datetime(2024, 3, 4, 9, 0)),
+    ('0 0 * * 7', datetime(2024, 3, 1, 12, 0), datetime(2024, 3, 3, 0, 0)),
+    ('0 0 29 2 *', datetime(2024, 3, 1), datetime(2028, 2, 29, 0, 0)),
+    ('0 0 31 * *', datetime(2024, 4, 1), datetime(2024, 5, 31, 0, 0)),
+    ('@monthly', datetime(2024, 12, 15), datetime(2025, 1, 1, 0, 0)),
+    ('@hourly', datetime(2024, 12, 31, 23, 59), datetime(2025, 1, 1, 0, 0)),
+])
+def test_cron_next_after(expression, after, expected):
+    assert CronExpression(expression).next_after(after) == expected
+
+
+def test_cron_restricted_day_and_weekday_match_either():
+    # The 13th of March 2024 is a Wednesday, between the Fridays the 8th and the 15th.
+    cron = CronExpression('0 0 13 * fri')
+    assert cron.next_after(datetime(2024, 3, 1, 1)) == datetime(2024, 3, 8, 0, 0)
+    assert cron.next_after(datetime(2024, 3, 8, 1)) == datetime(2024, 3, 13, 0, 0)
+    assert cron.next_after(datetime(2024, 3, 13, 1)) == datetime(2024, 3, 15, 0, 0)
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '60 * * * *', '* 24 * * *', '* * 0 * *', '*/0 * * * *',
+                                        '5-1 * * * *', 'x * * * *', '0 0 30 2 *'])
+def test_cron_rejects_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        CronExpression(expression)
@@ -0,0 +1,75 @@
+import pytest
+
+from bater.search import SearchIndex, build_match_query
+from bater.storage import MAX_HISTORY_ENTRIES
+
+
+def execution(timestamp, command, output, returncode=0):
+    return {'timestamp': timestamp, 'type': 'execution', 'command': command, 'output': output, 'returncode': returncode}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / 'search.db'))
+    yield index
+    index.close()
+
+
+def hit_times(hits):
+    return [hit['timestamp'] for hit in hits]
+
+
+def test_match_query_requires_every_term_and_a_prefix_of_the_last():
+    assert build_match_query('disk "full') == '"disk" """full"*'
+    assert build_match_query("   ") == ""
+
+
+def test_rebuild_indexes_histories_in_time_order(index):
+    assert not index.is_built()
+    index.rebuild([('c1', [execution("2024-01-02 10:00:00", "make", "disk full")]),
+                   ('c2', [execution("2024-01-01 10:00:00", "df -h", "disk usage"),
+                           execution("2024-01-03 10:00:00", "df -h", "all good")])])
+    assert index.is_built()
+    assert hit_times(index.search("disk", order='oldest')) == ["2024-01-01 10:00:00", "2024-01-02 10:00:00"]
+    assert hit_times(index.search("disk", order='newest')) == ["2024-01-02 10:00:00", "2024-01-01 10:00:00"]
+    hit = index.search("fu")[0]
+    assert hit['id'] == 'c1' and hit['command'] == "make" and "[full]" in hit['snippet']
+    assert index.search("") == []
+
+    index.clear()
+    assert not index.is_built() and index.search("disk") == []
+
+
+def test_added_entries_are_searchable_up_to_the_history_limit(index):
+    index.rebuild([])
+    for number in range(MAX_HISTORY_ENTRIES + 2):
+        index.add('c1', execution(f"2024-01-01 {number // 3600:02d}:{number // 60 % 60:02d}:{number % 60:02d}",
+                                  "ping", "pong"))
+    hits = index.search("pong", limit=MAX_HISTORY_ENTRIES * 2, order='oldest')
+    assert len(hits) == MAX_HISTORY_ENTRIES
+    assert hits[0]['timestamp'] == "2024-01-01 00:00:02"
+
+
+def test_retain_and_delete_command(index):
+    kept = execution("2024-01-02 10:00:00", "make", "built")
+    index.rebuild([('c1', [execution("2024-01-01 10:00:00", "make", "built"), kept]),
+                   ('c2', [execution("2024-01-01 11:00:00", "make", "built")])])
+    index.retain('c1', [kept])
+    assert hit_times(index.search("built", order='oldest')) == ["2024-01-01 11:00:00", "2024-01-02 10:00:00"]
+    index.delete_command('c2')
+    assert hit_times(index.search("built")) == ["2024-01-02 10:00:00"]
+
+
+def test_manager_builds_the_index_on_first_search_and_keeps_it_current(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'build', "make")
+    build = next(iter(manager.commands['web']))
+    manager.storage.import_history(build, [execution("2024-01-01 10:00:00", "make", "linking failed", 2)])
+
+    hits = manager.search_history("linking")
+    assert [(hit['app'], hit['name'], hit['returncode']) for hit in hits] == [('web', 'build', 2)]
+    manager.add_command_history('web', build, "make", output="linking done", returncode=0)
+    assert len(manager.search_history("linking")) == 2
+    manager.delete_command('web', build)
+    assert manager.search_history("linking") == []
@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from bater.executor import create_executor
+from bater.session import SESSIONS_SUPPORTED, SentinelParser, SessionPool, ShellSession
+
+needs_sessions = pytest.mark.skipif(not SESSIONS_SUPPORTED, reason="shell sessions need a POSIX shell")
+
+
+def test_marker_split_across_chunks_ends_the_output():
+    parser = SentinelParser(b"abc")
+    assert parser.feed(b"hello\n") == b"hello"
+    assert parser.feed(b"\nab") == b"\n"
+    assert parser.feed(b"c:3") == b""
+    assert not parser.done
+    assert parser.feed(b"\n") == b""
+    assert parser.done and parser.status() == 3
+
+
+def test_stream_ending_without_marker_keeps_its_output():
+    parser = SentinelParser(b"abc")
+    assert parser.feed(b"partial\na") == b"partial"
+    assert parser.flush() == b"\na"
+    assert parser.status() is None
+
+
+@pytest.fixture
+def session():
+    """A shell session closed after the test."""
+    session = ShellSession('web')
+    yield session
+    session.retire()
+
+
+@needs_sessions
+def test_state_persists_between_commands(session):
+    assert session.run("cd /tmp; export GREETING=hi")['success']
+    result = session.run("pwd; echo $GREETING; echo oops >&2; exit_code() { return 3; }; exit_code")
+    assert result['stdout'] == "/tmp\nhi"
+    assert result['stderr'] == "oops"
+    assert result['returncode'] == 3 and result['usage'] is None
+    assert session.runs == 2
+
+
+@needs_sessions
+def test_a_shell_that_exits_is_started_again_without_its_state(session):
+    session.run("export GREETING=hi")
+    result = session.run("exit 5")
+    assert result['returncode'] == 5 and not session.alive()
+    assert session.run("echo ${GREETING:-unset}")['stdout'] == "unset"
+
+
+@needs_sessions
+def test_timeout_terminates_the_shell(session):
+    started = time.monotonic()
+    result = session.run("echo begun; sleep 30", timeout=0.3)
+    assert time.monotonic() - started < 10
+    assert result['timed_out'] and result['stdout'] == "begun"
+    assert session.run("echo again")['stdout'] == "again"
+
+
+@needs_sessions
+def test_idle_sessions_are_closed_but_busy_ones_kept():
+    pool = SessionPool(idle_timeout=0)
+    idle, busy = pool.get('idle'), pool.get('busy')
+    idle.run("true")
+    thread = threading.Thread(target=busy.run, args=("sleep 0.5",))
+    thread.start()
+    deadline = time.monotonic() + 5
+    while not busy.busy() and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert pool.close_idle() == ['idle']
+    assert idle.closed and not idle.alive()
+    assert [stats['app'] for stats in pool.stats()] == ['busy']
+    thread.join(10)
+    pool.stop()
+    assert pool.stats() == [] and busy.closed
+
+
+@needs_sessions
+def test_commands_set_to_a_session_share_its_shell(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'enter', "cd /tmp")
+    manager.add_command('web', 'where', "pwd")
+    enter, where = list(manager.commands['web'])
+    assert manager.shell_session('web', enter) is None
+    assert manager.set_session('web', enter, True) and manager.set_session('web', where, True)
+    assert not manager.set_session('web', 'missing', True)
+    assert manager.shell_session('web', enter) is manager.shell_session('web', where)
+
+    results = []
+    for command_id in (enter, where):
+        create_executor(manager.commands['web'][command_id]['command'],
+                        lambda success, result: results.append(result), 'web', command_id, manager).execute()
+    assert results[1]['stdout'] == "/tmp"
+
+    manager.set_session('web', where, False)
+    assert 'session' not in manager.commands['web'][where]
+    assert manager.shell_session('web', where) is None
@@ -0,0 +1,60 @@
+import pytest
+
+from bater.executor import create_executor
+from bater.stats import duration_trend, execution_stats, percentile, summarize_values
+
+
+def execution(duration, returncode=0, **fields):
+    return dict({'type': 'execution', 'timestamp': "2024-01-01 10:00:00", 'returncode': returncode,
+                 'duration': duration}, **fields)
+
+
+def test_percentiles_interpolate_between_values():
+    assert percentile([], 0.5) is None
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+    assert percentile([1.0, 2.0, 3.0, 4.0], 1.0) == 4.0
+    assert summarize_values([3, 1, 2]) == {'p50': 2, 'p95': 2.9, 'max': 3, 'mean': 2}
+    assert summarize_values([]) is None
+
+
+@pytest.mark.parametrize('recent, direction', [(2.0, 'slower'), (0.5, 'faster'), (1.1, 'stable')])
+def test_trend_compares_recent_runs_with_the_ones_before(recent, direction):
+    trend = duration_trend([1.0] * 20 + [recent] * 20)
+    assert trend['window'] == 20
+    assert trend['direction'] == direction
+    assert duration_trend([1.0, 2.0, 3.0]) is None
+
+
+def test_stats_count_cached_runs_only_towards_the_failure_rate():
+    entries = [execution(1.0, cpu_user=0.5, cpu_system=0.25, max_rss_kb=1000, stdout_bytes=10, stderr_bytes=5),
+               execution(3.0, returncode=1, stdout_bytes=20),
+               execution(None, cached=True),
+               {'type': 'edit', 'timestamp': "2024-01-02 10:00:00"},
+               {'type': 'execution', 'timestamp': "2024-01-03 10:00:00"}]
+    stats = execution_stats(entries)
+    assert stats['executions'] == 4
+    assert stats['cached'] == 1
+    assert stats['failures'] == 1 and stats['failure_rate'] == 0.333
+    assert stats['last_run'] == "2024-01-03 10:00:00"
+    assert stats['duration']['p50'] == 2.0 and stats['duration']['max'] == 3.0
+    assert stats['cpu_time']['max'] == 0.75
+    assert stats['max_rss_kb']['p50'] == 1000
+    assert stats['output_bytes']['max'] == 20
+    assert stats['trend'] is None
+
+
+def test_runs_are_recorded_with_their_metrics(make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.add_command('web', 'build', "echo built; exit 2")
+    build = next(iter(manager.commands['web']))
+    for _ in range(2):
+        create_executor("echo built; exit 2", lambda success, result: None, 'web', build, manager).execute()
+
+    entry = manager.get_command_history('web', build, event_type='execution')[0]
+    assert entry['returncode'] == 2
+    assert entry['duration'] >= 0 and entry['stdout_bytes'] == 6
+    stats = manager.command_stats('web', build)
+    assert stats['executions'] == 2 and stats['failure_rate'] == 1.0
+    assert stats['duration']['max'] >= stats['duration']['p50']
+    assert manager.command_stats('web', 'missing') is None
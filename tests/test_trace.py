@@ -0,0 +1,128 @@
+import json
+import logging
+import time
+
+import pytest
+
+from bater.trace import NULL_SPAN, ActionProfiler, Tracer, parse_thresholds, traced, tracer
+
+
+@pytest.fixture
+def global_tracer():
+    """The tracer used by the instrumented code, recording spans for the test only."""
+    enabled, slow_ms = tracer.enabled, tracer.slow_ms
+    tracer.clear()
+    tracer.set_enabled(True)
+    yield tracer
+    tracer.set_slow_threshold(slow_ms)
+    tracer.set_enabled(enabled)
+    tracer.clear()
+
+
+def spans(tracer):
+    return {event['name']: event for event in tracer.chrome_trace()['traceEvents'] if event['ph'] == 'X'}
+
+
+def test_thresholds_are_parsed_by_name():
+    assert parse_thresholds("sanitize_text=5, save_commands=50,") == {'sanitize_text': 5.0, 'save_commands': 50.0}
+    with pytest.raises(ValueError):
+        parse_thresholds("save_commands=slow")
+
+
+def test_spans_cost_nothing_while_off():
+    tracer = Tracer(enabled=False, slow_ms=0, thresholds={})
+    assert tracer.span('save') is NULL_SPAN
+    with tracer.span('save') as span:
+        span.add('bytes', 10)
+    tracer.add('bytes')
+    assert not tracer.events
+
+
+def test_nested_spans_are_exported_as_chrome_events(tmp_path):
+    tracer = Tracer(enabled=True, slow_ms=0, thresholds={})
+    with tracer.span('refresh', category='ui', view='home'):
+        with tracer.span('save') as span:
+            span.add('bytes', 10)
+            tracer.add('bytes', 5)
+        tracer.add('widgets', 3)
+    with pytest.raises(KeyError):
+        with tracer.span('load'):
+            raise KeyError('missing')
+
+    events = spans(tracer)
+    assert events['refresh']['cat'] == 'ui' and events['refresh']['args'] == {'view': 'home', 'widgets': 3}
+    assert events['save']['args'] == {'bytes': 15}
+    assert events['load']['args'] == {'error': 'KeyError'}
+    assert events['refresh']['dur'] >= events['save']['dur']
+    assert tracer.stack() == []
+
+    path = str(tmp_path / 'trace.json')
+    assert tracer.save(path) == 4
+    with open(path) as file:
+        document = json.load(file)
+    assert [event['ph'] for event in document['traceEvents']] == ['M', 'X', 'X', 'X']
+    assert 'thread' not in document['traceEvents'][1]
+    tracer.clear()
+    assert tracer.chrome_trace()['traceEvents'] == []
+
+
+def test_event_buffer_is_bounded():
+    tracer = Tracer(enabled=True, slow_ms=0, thresholds={}, max_events=2)
+    for name in ('a', 'b', 'c'):
+        with tracer.span(name):
+            pass
+    assert [event['name'] for event in tracer.events] == ['b', 'c']
+
+
+def test_slow_operations_are_logged_without_recording(caplog):
+    tracer = Tracer(enabled=False, slow_ms=0, thresholds={'save': 1})
+    assert tracer.active
+    with caplog.at_level(logging.WARNING, logger='bater.slow'):
+        with tracer.span('save', path='commands.json'):
+            time.sleep(0.002)
+        with tracer.span('load'):
+            pass
+    assert len(caplog.records) == 1
+    assert caplog.records[0].getMessage().startswith("save took ")
+    assert caplog.records[0].getMessage().endswith("(path=commands.json)")
+    assert not tracer.events
+
+    tracer.set_slow_threshold(1)
+    with caplog.at_level(logging.WARNING, logger='bater.slow'):
+        with tracer.span('load'):
+            time.sleep(0.002)
+    assert len(caplog.records) == 2
+
+
+def test_traced_functions_record_a_span_with_counters(global_tracer):
+    @traced('double')
+    def double(value):
+        global_tracer.add('calls')
+        return value * 2
+
+    assert double(4) == 8
+    assert spans(global_tracer)['double']['args'] == {'calls': 1}
+    global_tracer.set_enabled(False)
+    assert double(5) == 10
+    assert len(global_tracer.events) == 1
+
+
+def test_store_operations_are_traced(global_tracer, make_manager):
+    manager = make_manager()
+    manager.add_application('web')
+    manager.flush()
+    make_manager()
+    events = spans(global_tracer)
+    assert 'save_commands' in events
+    assert events['load_commands']['args']['bytes'] > 0
+
+
+def test_profiler_reports_the_slowest_functions(tmp_path):
+    profiler = ActionProfiler(2)
+    sorted(range(1000), key=str)
+    assert not profiler.count_action()
+    assert profiler.count_action()
+    path = str(tmp_path / 'actions.prof')
+    report = profiler.stop(path, limit=5)
+    assert "cumulative" in report
+    assert (tmp_path / 'actions.prof').exists()
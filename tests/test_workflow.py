@@ -0,0 +1,85 @@
+import pytest
+
+from bater.workflow import WorkflowRun, critical_path, topological_order
+
+
+def command_id(manager, app_name, name):
+    return next(command_id for command_id, command_data in manager.commands[app_name].items()
+                if command_data['name'] == name)
+
+
+def test_dependencies_come_first():
+    nodes = {'deploy': {'depends_on': ['build', 'test']}, 'test': {'depends_on': ['build']}, 'build': {}}
+    assert topological_order(nodes) == ['build', 'test', 'deploy']
+    with pytest.raises(ValueError, match="cycle between: a, b"):
+        topological_order({'a': {'depends_on': ['b']}, 'b': {'depends_on': ['a']}})
+    with pytest.raises(ValueError, match="'Lint'"):
+        topological_order({'a': {'depends_on': ['lint']}}, {'lint': 'Lint'})
+
+
+def test_critical_path_is_the_slowest_chain():
+    nodes = {'build': {}, 'lint': {}, 'test': {'depends_on': ['build']}, 'deploy': {'depends_on': ['test', 'lint']}}
+    assert critical_path(nodes, {'build': 2.0, 'lint': 5.0, 'test': 1.0, 'deploy': 0.5}) == (['lint', 'deploy'], 5.5)
+    assert critical_path({}, {}) == ([], 0.0)
+
+
+@pytest.fixture
+def app(make_manager):
+    """A manager with commands for the steps of a release."""
+    manager = make_manager()
+    manager.add_application('web')
+    for name, command in [('build', "echo built"), ('lint', "sleep 0.2; echo linted"), ('test', "exit 1"),
+                          ('deploy', "echo deployed"), ('docs', "sleep 30")]:
+        manager.add_command('web', name, command)
+    return manager
+
+
+def add_workflow(manager, policy, steps):
+    ids = {name: command_id(manager, 'web', name) for name in steps}
+    return manager.add_workflow('web', 'release', {
+        ids[name]: {'depends_on': [ids[dependency] for dependency in dependencies]}
+        for name, dependencies in steps.items()}, policy)
+
+
+def step_states(workflow_run):
+    return {step['name']: step['state'] for step in workflow_run.steps.values()}
+
+
+def test_invalid_workflows_are_refused(app):
+    with pytest.raises(ValueError, match="cycle"):
+        add_workflow(app, 'fail-fast', {'build': ['deploy'], 'deploy': ['build']})
+    with pytest.raises(ValueError, match="policy"):
+        add_workflow(app, 'sometimes', {'build': []})
+
+
+def test_independent_steps_run_in_parallel_and_the_run_is_recorded(app):
+    workflow_id = add_workflow(app, 'fail-fast', {'build': [], 'lint': [], 'deploy': ['build', 'lint']})
+    workflow_run = WorkflowRun(app, 'web', workflow_id, max_workers=2)
+    workflow_run.start()
+    assert workflow_run.wait(10)
+
+    assert workflow_run.succeeded()
+    assert step_states(workflow_run) == {'build': 'finished', 'lint': 'finished', 'deploy': 'finished'}
+    entry = app.get_command_history('web', workflow_id)[0]
+    assert entry['success']
+    assert [app.commands['web'][step_id]['name'] for step_id in entry['critical_path']] == ['lint', 'deploy']
+    assert "== deploy: finished, exit code 0" in entry['output']
+    assert app.count_command_history('web', command_id(app, 'web', 'build'), event_type='execution') == 0
+
+
+def test_failures_skip_dependents_and_fail_fast_cancels_the_rest(app):
+    workflow_id = add_workflow(app, 'fail-fast', {'test': [], 'deploy': ['test'], 'docs': []})
+    workflow_run = WorkflowRun(app, 'web', workflow_id, max_workers=2)
+    workflow_run.start()
+    assert workflow_run.wait(10)
+    assert step_states(workflow_run) == {'test': 'finished', 'deploy': 'cancelled', 'docs': 'cancelled'}
+    assert not app.get_command_history('web', workflow_id)[0]['success']
+
+
+def test_continue_policy_keeps_running_independent_steps(app):
+    workflow_id = add_workflow(app, 'continue', {'test': [], 'deploy': ['test'], 'build': []})
+    workflow_run = WorkflowRun(app, 'web', workflow_id, max_workers=1)
+    workflow_run.start()
+    assert workflow_run.wait(10)
+    assert step_states(workflow_run) == {'test': 'finished', 'deploy': 'skipped', 'build': 'finished'}
+    assert not workflow_run.succeeded()